@@ -1,6 +1,4 @@
 import sys
-import numpy as np
-import scipy.io.wavfile as wav
 import simpl
 
 usage = 'Usage: python {0} '.format(__file__) + \
@@ -20,15 +18,12 @@ pt = simpl.SMSPartialTracking()
 partials = pt.find_partials(peaks)
 
 synth = simpl.SndObjSynthesis()
-audio_out = np.array([])
 step_size = 1.0 / time_scale_factor
 current_frame = 0
 
-while current_frame < len(partials):
-    i = int(current_frame)
-    frame = synth.synth_frame(partials[i])
-    audio_out = np.hstack((audio_out, frame))
-    current_frame += step_size
-
-audio_out = np.asarray(audio_out * 32768, np.int16)
-wav.write(output_file, sampling_rate, audio_out)
+# each frame is written to the output file as it is synthesised
+with simpl.WavWriter(output_file, sampling_rate) as output:
+    while current_frame < len(partials):
+        i = int(current_frame)
+        output.write(synth.synth_frame(partials[i]))
+        current_frame += step_size
@@ -36,7 +36,7 @@ macros = []
 link_args = []
 include_dirs = ['simpl', 'src/simpl', 'src/sms', 'src/sndobj',
                 'src/loris', 'src/mq', numpy_include, '/usr/local/include', '.']
-libs = ['m', 'fftw3', 'gsl', 'gslcblas']
+libs = ['m', 'fftw3', 'gsl', 'gslcblas', 'pthread']
 compile_args = ['-DMERSENNE_TWISTER', '-DHAVE_FFTW3_H']
 sources = []
 
@@ -75,6 +75,12 @@ sources.extend(loris_sources)
 mq_sources = glob.glob(os.path.join('src', 'mq', '*.cpp'))
 sources.extend(mq_sources)
 
+# -----------------------------------------------------------------------------
+# Window and FFT plan caches (shared by all of the above)
+# -----------------------------------------------------------------------------
+sources.append('src/simpl/window_cache.cpp')
+sources.append('src/simpl/fft_plans.cpp')
+
 # -----------------------------------------------------------------------------
 # Base
 # -----------------------------------------------------------------------------
@@ -82,8 +88,11 @@ base = Extension(
     'simpl.base',
     sources=['simpl/base.pyx',
              'src/simpl/base.cpp',
-             'src/simpl/exceptions.cpp'],
+             'src/simpl/exceptions.cpp',
+             'src/simpl/fft_plans.cpp'],
     include_dirs=include_dirs,
+    libraries=['fftw3', 'pthread'],
+    extra_compile_args=compile_args,
     language='c++'
 )
 
@@ -7,20 +7,39 @@ import simpl.residual
 import simpl.plot
 import simpl.audio
 import simpl.pybase
+import simpl.analysis_file
+import simpl.stream
+import simpl.parallel
 
 dtype = np.double
 Frame = base.Frame
+FrameSet = base.FrameSet
+TrackIndex = base.TrackIndex
 Peak = base.Peak
+peak_dtype = base.peak_dtype
 compare_peak_amps = pybase.compare_peak_amps
 compare_peak_freqs = pybase.compare_peak_freqs
 read_wav = audio.read_wav
+AudioWriter = audio.AudioWriter
+ArrayWriter = audio.ArrayWriter
+WavWriter = audio.WavWriter
+audio_writer = audio.audio_writer
+AnalysisWriter = analysis_file.AnalysisWriter
+AnalysisReader = analysis_file.AnalysisReader
+write_analysis = analysis_file.write_analysis
+read_analysis = analysis_file.read_analysis
+StreamAnalysis = stream.StreamAnalysis
+ParallelAnalysis = parallel.ParallelAnalysis
 
 PeakDetection = peak_detection.PeakDetection
 SMSPeakDetection = peak_detection.SMSPeakDetection
 SndObjPeakDetection = peak_detection.SndObjPeakDetection
 LorisPeakDetection = peak_detection.LorisPeakDetection
+twm = peak_detection.twm
+twm_frames = peak_detection.twm_frames
 
 PartialTracking = partial_tracking.PartialTracking
+OfflinePartialTracking = partial_tracking.OfflinePartialTracking
 SMSPartialTracking = partial_tracking.SMSPartialTracking
 SndObjPartialTracking = partial_tracking.SndObjPartialTracking
 LorisPartialTracking = partial_tracking.LorisPartialTracking
@@ -29,10 +48,17 @@ Synthesis = synthesis.Synthesis
 SMSSynthesis = synthesis.SMSSynthesis
 SndObjSynthesis = synthesis.SndObjSynthesis
 LorisSynthesis = synthesis.LorisSynthesis
+IFFTSynthesis = synthesis.IFFTSynthesis
 
 Residual = residual.Residual
 SMSResidual = residual.SMSResidual
 
+
+fft_plan_rigor = peak_detection.fft_plan_rigor
+load_fft_wisdom = peak_detection.load_fft_wisdom
+save_fft_wisdom = peak_detection.save_fft_wisdom
+num_fft_plans = peak_detection.num_fft_plans
+
 plot_peaks = plot.plot_peaks
 plot_partials = plot.plot_partials
 
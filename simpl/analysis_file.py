@@ -0,0 +1,253 @@
+import warnings
+import simpl
+import numpy as np
+
+# Binary analysis file layout (all values little-endian):
+#
+#   header (64 bytes, see header_dtype)
+#   num_frames fixed-size records (see record_dtype), one per frame:
+#       num_peaks, num_partials
+#       max_peaks peaks (amplitude, frequency, phase, bandwidth)
+#       max_partials partials (amplitude, frequency, phase, bandwidth)
+#
+# As every record has the same size, frame i starts at
+# header_dtype.itemsize + i * record_dtype.itemsize and can be read
+# without reading any other part of the file.
+
+magic = b'SIMPLANA'
+version = 1
+
+header_dtype = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('sampling_rate', '<i4'),
+    ('frame_size', '<i4'),
+    ('hop_size', '<i4'),
+    ('max_peaks', '<i4'),
+    ('max_partials', '<i4'),
+    ('num_frames', '<i8'),
+    ('reserved', 'V24')
+])
+
+file_peak_dtype = np.dtype([
+    ('amplitude', '<f8'),
+    ('frequency', '<f8'),
+    ('phase', '<f8'),
+    ('bandwidth', '<f8')
+])
+
+
+def record_dtype(max_peaks, max_partials):
+    "The dtype of a single frame record"
+    return np.dtype([
+        ('num_peaks', '<i4'),
+        ('num_partials', '<i4'),
+        ('peaks', file_peak_dtype, (max_peaks,)),
+        ('partials', file_peak_dtype, (max_partials,))
+    ])
+
+
+class AnalysisWriter(object):
+    """
+    Writes analysis frames (peaks and partials) to a binary analysis file.
+    Frames are appended to the file as they are written, so analysis
+    results can be saved one block at a time.
+
+    Writing a frame with more than max_peaks peaks or max_partials partials
+    raises ValueError, unless truncate is True, in which case only the
+    first max_peaks/max_partials are written (with a warning).
+    """
+    def __init__(self, path, max_peaks=100, max_partials=100,
+                 sampling_rate=44100, frame_size=2048, hop_size=512,
+                 truncate=False):
+        self.path = path
+        self.max_peaks = max_peaks
+        self.max_partials = max_partials
+        self.truncate = truncate
+        self.sampling_rate = sampling_rate
+        self.frame_size = frame_size
+        self.hop_size = hop_size
+        self.num_frames = 0
+        self.dtype = record_dtype(max_peaks, max_partials)
+        self._file = open(path, 'wb')
+        self._write_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_header(self):
+        header = np.zeros(1, dtype=header_dtype)
+        header['magic'] = magic
+        header['version'] = version
+        header['sampling_rate'] = self.sampling_rate
+        header['frame_size'] = self.frame_size
+        header['hop_size'] = self.hop_size
+        header['max_peaks'] = self.max_peaks
+        header['max_partials'] = self.max_partials
+        header['num_frames'] = self.num_frames
+        self._file.seek(0)
+        self._file.write(header.tobytes())
+
+    def _check_size(self, num_peaks, max_peaks, field):
+        if num_peaks <= max_peaks:
+            return
+        message = 'frame has %d %s, the file can only store %d' % (
+            num_peaks, field, max_peaks)
+        if not self.truncate:
+            raise ValueError(message + ' (use truncate=True to write only '
+                             'the first %d)' % max_peaks)
+        warnings.warn(message + ', only writing the first %d' % max_peaks)
+
+    def _copy_peaks(self, records, i, field, count_field, peaks, max_peaks):
+        n = min(len(peaks), max_peaks)
+        self._check_size(len(peaks), max_peaks, field)
+        if n:
+            records[field][i, :n] = peaks[:n]
+        records[count_field][i] = n
+
+    def write_frame(self, frame):
+        "Append a single Frame to the file"
+        self.write_frames([frame])
+
+    def write_frames(self, frames):
+        """
+        Append frames to the file. frames can be a list of Frames
+        (as returned by find_peaks/find_partials) or a FrameSet.
+        """
+        if isinstance(frames, simpl.FrameSet):
+            records = self._frame_set_records(frames)
+        else:
+            records = np.zeros(len(frames), dtype=self.dtype)
+            for i, frame in enumerate(frames):
+                self._copy_peaks(records, i, 'peaks', 'num_peaks',
+                                 frame.peak_array, self.max_peaks)
+                self._copy_peaks(records, i, 'partials', 'num_partials',
+                                 frame.partial_array, self.max_partials)
+
+        self._file.seek(0, 2)
+        self._file.write(records.tobytes())
+        self.num_frames += len(records)
+
+    def _frame_set_records(self, frame_set):
+        records = np.zeros(len(frame_set), dtype=self.dtype)
+        for field, count_field, max_peaks, prefix in (
+                ('peaks', 'num_peaks', self.max_peaks, 'peak_'),
+                ('partials', 'num_partials', self.max_partials, 'partial_')):
+            counts = np.asarray(getattr(frame_set, count_field))
+            if not len(counts):
+                continue
+            n = min(max_peaks, getattr(frame_set, 'max_' + field))
+            self._check_size(counts.max(), max_peaks, field)
+            for name in file_peak_dtype.names:
+                records[field][name][:, :n] = \
+                    getattr(frame_set, prefix + name)[:, :n]
+            records[count_field] = np.minimum(counts, max_peaks)
+        return records
+
+    def close(self):
+        "Write the final frame count to the header and close the file"
+        if self._file and not self._file.closed:
+            self._write_header()
+            self._file.close()
+
+
+class AnalysisReader(object):
+    """
+    Reads a binary analysis file. The file is memory-mapped, so frames
+    are only read from disk when they are accessed.
+
+    reader[i] returns a Frame, reader[start:stop] returns a list of Frames.
+    The raw records are available (without copying) as reader.records.
+    """
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=header_dtype, count=1)
+        if len(header) != 1 or header['magic'][0] != magic:
+            raise ValueError('%s is not a simpl analysis file' % path)
+        if header['version'][0] != version:
+            raise ValueError('Unsupported analysis file version: %d' %
+                             header['version'][0])
+
+        self.sampling_rate = int(header['sampling_rate'][0])
+        self.frame_size = int(header['frame_size'][0])
+        self.hop_size = int(header['hop_size'][0])
+        self.max_peaks = int(header['max_peaks'][0])
+        self.max_partials = int(header['max_partials'][0])
+        self.num_frames = int(header['num_frames'][0])
+        self.dtype = record_dtype(self.max_peaks, self.max_partials)
+
+        if self.num_frames:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r',
+                                     offset=header_dtype.itemsize,
+                                     shape=(self.num_frames,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return self.num_frames
+
+    def __iter__(self):
+        for i in range(self.num_frames):
+            yield self.frame(i)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.frame(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += self.num_frames
+        return self.frame(key)
+
+    def frame(self, i):
+        "Return frame i as a Frame"
+        if i < 0 or i >= self.num_frames:
+            raise IndexError('Invalid frame index: %d' % i)
+        record = self.records[i]
+        frame = simpl.Frame(self.frame_size, True, False)
+        frame.max_peaks = self.max_peaks
+        frame.max_partials = self.max_partials
+        frame.peak_array = record['peaks'][:record['num_peaks']]
+        frame.partial_array = record['partials'][:record['num_partials']]
+        return frame
+
+    def frame_set(self, start=0, stop=None):
+        "Return frames start to stop as a FrameSet"
+        start, stop, step = slice(start, stop).indices(self.num_frames)
+        records = self.records[start:stop]
+        frame_set = simpl.FrameSet(len(records), self.max_peaks,
+                                   self.max_partials)
+        for field, count_field, prefix in (
+                ('peaks', 'num_peaks', 'peak_'),
+                ('partials', 'num_partials', 'partial_')):
+            getattr(frame_set, count_field)[:] = records[count_field]
+            for name in file_peak_dtype.names:
+                getattr(frame_set, prefix + name)[:] = records[field][name]
+        return frame_set
+
+    def close(self):
+        "Release the memory map"
+        self.records = np.zeros(0, dtype=self.dtype)
+        self.num_frames = 0
+
+
+def write_analysis(path, frames, **kwargs):
+    """
+    Write frames (a list of Frames or a FrameSet) to a binary analysis file.
+    Keyword arguments are passed to AnalysisWriter.
+    """
+    if isinstance(frames, simpl.FrameSet):
+        kwargs.setdefault('max_peaks', frames.max_peaks)
+        kwargs.setdefault('max_partials', frames.max_partials)
+    elif len(frames):
+        kwargs.setdefault('max_peaks', frames[0].max_peaks)
+        kwargs.setdefault('max_partials', frames[0].max_partials)
+        kwargs.setdefault('frame_size', frames[0].size)
+    with AnalysisWriter(path, **kwargs) as writer:
+        writer.write_frames(frames)
+
+
+def read_analysis(path):
+    "Open a binary analysis file for reading"
+    return AnalysisReader(path)
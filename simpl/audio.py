@@ -1,3 +1,4 @@
+import wave
 import numpy as np
 import scipy.io.wavfile as wav
 import simpl
@@ -12,3 +13,97 @@ def read_wav(file):
         audio = audio.T[0]
 
     return np.asarray(audio, dtype=simpl.dtype) / 32768.0, sampling_rate
+
+
+class AudioWriter(object):
+    """
+    Destination for audio that is produced one block at a time, such as the
+    output of a synthesis or residual loop. num_samples is the number of
+    samples written so far.
+    """
+    def __init__(self):
+        self.num_samples = 0
+
+    def write(self, samples):
+        "Append samples to the output."
+        raise Exception("NotYetImplemented")
+
+    def close(self):
+        "Finish writing, the writer can not be used afterwards."
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ArrayWriter(AudioWriter):
+    """
+    Writes audio into a NumPy array (or a numpy.memmap).
+
+    If output is given, samples are written into it from the start and
+    writing more than len(output) samples is an error. Otherwise an array
+    of size samples is allocated, and it grows (doubling in size) if more
+    samples are written. audio is a view of the samples written so far.
+    """
+    def __init__(self, output=None, size=0):
+        AudioWriter.__init__(self)
+        self._fixed_size = output is not None
+        if output is None:
+            output = np.zeros(size, dtype=simpl.dtype)
+        self._output = output
+
+    @property
+    def audio(self):
+        return self._output[:self.num_samples]
+
+    def write(self, samples):
+        end = self.num_samples + len(samples)
+        if end > len(self._output):
+            if self._fixed_size:
+                raise ValueError('output array is full (%d samples)' %
+                                 len(self._output))
+            output = np.zeros(max(end, 2 * len(self._output)),
+                              dtype=self._output.dtype)
+            output[:self.num_samples] = self.audio
+            self._output = output
+        self._output[self.num_samples:end] = samples
+        self.num_samples = end
+
+
+class WavWriter(AudioWriter):
+    """
+    Writes audio to a mono 16-bit wav file as it is produced, so that the
+    memory used does not depend on the length of the output. Samples are
+    floating point values between -1 and 1 (as returned by read_wav) and
+    are clipped to that range.
+    """
+    def __init__(self, path, sampling_rate=44100):
+        AudioWriter.__init__(self)
+        self._file = wave.open(path, 'wb')
+        self._file.setnchannels(1)
+        self._file.setsampwidth(2)
+        self._file.setframerate(sampling_rate)
+
+    def write(self, samples):
+        samples = np.clip(np.asarray(samples) * 32768, -32768, 32767)
+        self._file.writeframes(samples.astype('<i2').tobytes())
+        self.num_samples += len(samples)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def audio_writer(output=None, size=0):
+    """
+    Returns an AudioWriter for output, which can be an AudioWriter, an
+    array to write into, or None for a new ArrayWriter with an initial
+    size of size samples.
+    """
+    if isinstance(output, AudioWriter):
+        return output
+    return ArrayWriter(output, size)
@@ -16,12 +16,43 @@ cdef class Peak:
     cdef copy(self, c_Peak* p)
 
 
+cdef class _Exports:
+    cdef int count
+
+
+cdef class _ArrayExport:
+    cdef object owner
+    cdef _Exports exports
+
+
 cdef class Frame:
     cdef c_Frame* thisptr
     cdef int created
     cdef set_frame(self, c_Frame* f)
     cdef list _peaks
     cdef list _partials
+    cdef object _audio_source
+    cdef _Exports _peak_exports
+    cdef _Exports _partial_exports
+    cdef object _peak_view(self, c_Peak* data, int num_peaks,
+                           _Exports exports)
+    cdef np.ndarray _peak_data(self, peaks)
+
+
+cdef class FrameSet:
+    cdef c_FrameSet* thisptr
+    cdef _Exports _exports
+    cdef object _array_view(self, double* data, int num_columns)
+    cdef object _int_view(self, int* data)
+    cdef _check_resize(self)
+
+
+cdef class TrackIndex:
+    cdef c_TrackIndex* thisptr
+    cdef _Exports _exports
+    cdef object _track_view(self, void* data, int typenum)
+    cdef object _point_view(self, double* data)
+    cdef _check_resize(self)
 
 
 cdef extern from "<string>" namespace "std":
@@ -53,6 +84,8 @@ cdef extern from "../src/simpl/base.h" namespace "simpl":
         c_Peak* peak(int peak_number)
         void add_peak(double amplitude, double frequency,
                       double phase, double bandwidth)
+        c_Peak* peaks()
+        void peaks(int num_peaks, double* peak_data)
         void clear_peaks()
 
         # partials
@@ -65,6 +98,8 @@ cdef extern from "../src/simpl/base.h" namespace "simpl":
         c_Peak* partial(int partial_number)
         void partial(int partial_number, double amplitude, double frequency,
                      double phase, double bandwidth)
+        c_Peak* partials()
+        void partials(int num_partials, double* partial_data)
         void clear_partials()
 
         # audio buffers
@@ -73,6 +108,12 @@ cdef extern from "../src/simpl/base.h" namespace "simpl":
         int synth_size()
         void synth_size(int new_size)
         void audio(double* new_audio)
+        void audio_view(double* new_audio, int size) except +
+        bool audio_is_view()
+        bool has_audio()
+        bool has_synth()
+        bool has_residual()
+        bool has_synth_residual()
         double* audio()
         void synth(double* new_synth)
         double* synth()
@@ -80,3 +121,55 @@ cdef extern from "../src/simpl/base.h" namespace "simpl":
         double* residual()
         void synth_residual(double* new_synth_residual)
         double* synth_residual()
+
+    cdef cppclass c_FrameSet "simpl::FrameSet":
+        c_FrameSet()
+        c_FrameSet(int num_frames, int max_peaks, int max_partials)
+
+        void clear()
+        int num_frames()
+        void num_frames(int new_num_frames)
+        int max_peaks()
+        void max_peaks(int new_max_peaks)
+        int max_partials()
+        void max_partials(int new_max_partials)
+
+        int num_peaks(int frame_number)
+        void num_peaks(int frame_number, int new_num_peaks)
+        int num_partials(int frame_number)
+        void num_partials(int frame_number, int new_num_partials)
+        int* num_peaks()
+        int* num_partials()
+
+        double* peak_amplitude()
+        double* peak_frequency()
+        double* peak_phase()
+        double* peak_bandwidth()
+        double* partial_amplitude()
+        double* partial_frequency()
+        double* partial_phase()
+        double* partial_bandwidth()
+
+        void read_frame(int frame_number, c_Frame* frame)
+        void write_frame(int frame_number, c_Frame* frame)
+        void add_frame(c_Frame* frame)
+
+    cdef cppclass c_TrackIndex "simpl::TrackIndex":
+        c_TrackIndex()
+        void clear()
+        void build(c_FrameSet* frame_set)
+        int num_frames()
+        int num_tracks()
+        int num_points()
+        int* partial_number()
+        int* start()
+        int* length()
+        int* offset()
+        double* min_frequency()
+        double* max_frequency()
+        double* amplitude()
+        double* frequency()
+        double* phase()
+        double* bandwidth()
+        vector[int] find(int first_frame, int last_frame,
+                         double min_frequency, double max_frequency)
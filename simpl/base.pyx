@@ -1,11 +1,27 @@
 import numpy as np
 cimport numpy as np
 from libcpp.vector cimport vector
+from cpython.pycapsule cimport PyCapsule_New
 
 cimport base
 
 np.import_array()
 
+cdef extern from "../src/simpl/fft_plans.h" namespace "simpl":
+    cdef cppclass FFTPlanCache "simpl::FFTPlanCache":
+        pass
+    cdef FFTPlanCache* c_fft_plan_cache "simpl::fft_plan_cache"()
+
+# The process-wide FFTW plan registry, used by the other extension
+# modules (see fft_plans.pxi)
+fft_plan_cache = PyCapsule_New(<void*> c_fft_plan_cache(),
+                               'simpl.fft_plan_cache', NULL)
+
+# Layout of simpl::Peak, used for structured views of Frame peaks/partials
+peak_dtype = np.dtype([('amplitude', np.float64), ('frequency', np.float64),
+                       ('phase', np.float64), ('bandwidth', np.float64)])
+
+
 cdef class Peak:
     def __cinit__(self, create_new=True):
         if create_new:
@@ -45,12 +61,14 @@ cdef class Peak:
 
 
 cdef class Frame:
-    def __cinit__(self, size=2048, create_new=True):
+    def __cinit__(self, size=2048, create_new=True, alloc_memory=True):
         self._peaks = []
         self._partials = []
+        self._peak_exports = _Exports()
+        self._partial_exports = _Exports()
 
         if create_new:
-            self.thisptr = new c_Frame(size, True)
+            self.thisptr = new c_Frame(size, alloc_memory)
             self.created = True
         else:
             self.created = False
@@ -63,10 +81,34 @@ cdef class Frame:
     cdef set_frame(self, c_Frame* f):
         self.thisptr = f
 
+    cdef object _peak_view(self, c_Peak* data, int num_peaks,
+                           _Exports exports):
+        cdef np.npy_intp shape[2]
+        if num_peaks == 0:
+            return np.zeros(0, dtype=peak_dtype)
+        shape[0] = <np.npy_intp> num_peaks
+        shape[1] = 4
+        cdef np.ndarray a = np.PyArray_SimpleNewFromData(
+            2, shape, np.NPY_DOUBLE, <double*> data
+        )
+        np.set_array_base(a, _ArrayExport(self, exports))
+        return a.view(peak_dtype).reshape(num_peaks)
+
+    cdef np.ndarray _peak_data(self, peaks):
+        a = np.asarray(peaks)
+        if a.dtype.names:
+            a = np.ascontiguousarray(a, dtype=peak_dtype).view(np.float64)
+        return np.ascontiguousarray(a, dtype=np.float64).reshape(-1, 4)
+
     # peaks
     property max_peaks:
         def __get__(self): return self.thisptr.max_peaks()
-        def __set__(self, int i): self.thisptr.max_peaks(i)
+        def __set__(self, int i):
+            # the peaks can not be reallocated while views of them exist
+            if i != self.thisptr.max_peaks() and self._peak_exports.count > 0:
+                raise BufferError('max_peaks can not be changed while views '
+                                  'of peak_array exist')
+            self.thisptr.max_peaks(i)
 
     def add_peak(self, Peak p not None):
         self.thisptr.add_peak(p.amplitude, p.frequency,
@@ -105,15 +147,38 @@ cdef class Frame:
             self.add_peaks(peaks)
             self._peaks = peaks
 
+    property peak_array:
+        """
+        Structured array view (fields amplitude, frequency, phase and
+        bandwidth) of the peaks in this frame. The view shares memory with
+        the frame, so max_peaks can not be changed while it exists (this
+        raises BufferError). Can be set from a structured array or an
+        (n, 4) array.
+        """
+        def __get__(self):
+            return self._peak_view(self.thisptr.peaks(),
+                                   self.thisptr.num_peaks(),
+                                   self._peak_exports)
+        def __set__(self, peaks):
+            cdef np.ndarray[dtype_t, ndim=2] a = self._peak_data(peaks)
+            self.thisptr.peaks(a.shape[0], <double*> a.data)
+            self._peaks = []
+
     def clear(self):
         self.thisptr.clear()
         self._peaks = []
         self._partials = []
+        self._audio_source = None
 
     # partials
     property max_partials:
         def __get__(self): return self.thisptr.max_partials()
-        def __set__(self, int i): self.thisptr.max_partials(i)
+        def __set__(self, int i):
+            if (i != self.thisptr.max_partials() and
+                    self._partial_exports.count > 0):
+                raise BufferError('max_partials can not be changed while '
+                                  'views of partial_array exist')
+            self.thisptr.max_partials(i)
 
     def add_partial(self, Peak p not None):
         self.thisptr.add_partial(p.amplitude, p.frequency,
@@ -157,10 +222,26 @@ cdef class Frame:
             self.add_partials(peaks)
             self._partials = peaks
 
+    property partial_array:
+        """
+        Structured array view of the partials in this frame, see peak_array.
+        """
+        def __get__(self):
+            return self._peak_view(self.thisptr.partials(),
+                                   self.thisptr.num_partials(),
+                                   self._partial_exports)
+        def __set__(self, peaks):
+            cdef np.ndarray[dtype_t, ndim=2] a = self._peak_data(peaks)
+            self.thisptr.partials(a.shape[0], <double*> a.data)
+            self._partials = []
+
     # audio buffers
     property size:
         def __get__(self): return self.thisptr.size()
-        def __set__(self, int i): self.thisptr.size(i)
+        def __set__(self, int i):
+            self.thisptr.size(i)
+            if not self.thisptr.audio_is_view():
+                self._audio_source = None
 
     property synth_size:
         def __get__(self): return self.thisptr.synth_size()
@@ -173,6 +254,38 @@ cdef class Frame:
             return np.PyArray_SimpleNewFromData(1, shape, np.NPY_DOUBLE, self.thisptr.audio())
         def __set__(self, np.ndarray[dtype_t, ndim=1] a):
             self.thisptr.audio(<double*> a.data)
+            self._audio_source = None
+
+    def audio_view(self, np.ndarray[dtype_t, ndim=1, mode='c'] a not None):
+        """
+        Use the memory of a as this frame's audio buffer instead of copying
+        it. A reference to a is kept for as long as the view is in use.
+        If a is shorter than the frame size it is copied and zero-padded,
+        unless the frame does not manage its own memory, in which case
+        RuntimeError is raised.
+        """
+        self.thisptr.audio_view(<double*> a.data, len(a))
+        if self.thisptr.audio_is_view():
+            self._audio_source = a
+        else:
+            self._audio_source = None
+
+    property audio_is_view:
+        def __get__(self): return self.thisptr.audio_is_view()
+
+    # buffers are allocated when they are first accessed, these flags
+    # show whether a buffer exists without allocating it
+    property has_audio:
+        def __get__(self): return self.thisptr.has_audio()
+
+    property has_synth:
+        def __get__(self): return self.thisptr.has_synth()
+
+    property has_residual:
+        def __get__(self): return self.thisptr.has_residual()
+
+    property has_synth_residual:
+        def __get__(self): return self.thisptr.has_synth_residual()
 
     property synth:
         def __get__(self):
@@ -197,3 +310,338 @@ cdef class Frame:
             return np.PyArray_SimpleNewFromData(1, shape, np.NPY_DOUBLE, self.thisptr.synth_residual())
         def __set__(self, np.ndarray[dtype_t, ndim=1] a):
             self.thisptr.synth_residual(<double*> a.data)
+
+
+cdef class _Exports:
+    "Number of NumPy views that are exported from an object's storage."
+    def __cinit__(self):
+        self.count = 0
+
+
+cdef class _ArrayExport:
+    """
+    Base object of a NumPy view of a Frame, FrameSet or TrackIndex array.
+    It keeps the owner alive and is counted in exports for as long as the
+    view (or any array derived from it) exists.
+    """
+    def __cinit__(self, owner, _Exports exports not None):
+        self.owner = owner
+        self.exports = exports
+        self.exports.count += 1
+
+    def __dealloc__(self):
+        if self.exports is not None:
+            self.exports.count -= 1
+
+
+cdef class FrameSet:
+    """
+    Peak and partial data for a whole signal.
+
+    Amplitudes, frequencies, phases and bandwidths are stored in contiguous
+    (num_frames, max_peaks) and (num_frames, max_partials) arrays, which are
+    returned as NumPy views without copying. While any view exists, the
+    number of frames and max_peaks/max_partials can not be changed (this
+    raises BufferError), as that would reallocate the arrays.
+    """
+    def __cinit__(self, int num_frames=0, int max_peaks=100,
+                  int max_partials=100):
+        self.thisptr = new c_FrameSet(num_frames, max_peaks, max_partials)
+        self._exports = _Exports()
+
+    def __dealloc__(self):
+        if self.thisptr:
+            del self.thisptr
+            self.thisptr = <c_FrameSet*>0
+
+    def __len__(self):
+        return self.thisptr.num_frames()
+
+    cdef object _array_view(self, double* data, int num_columns):
+        cdef np.npy_intp shape[2]
+        shape[0] = <np.npy_intp> self.thisptr.num_frames()
+        shape[1] = <np.npy_intp> num_columns
+        if data == NULL:
+            return np.zeros((shape[0], shape[1]), dtype=np.float64)
+        cdef np.ndarray a = np.PyArray_SimpleNewFromData(
+            2, shape, np.NPY_DOUBLE, data
+        )
+        np.set_array_base(a, _ArrayExport(self, self._exports))
+        return a
+
+    cdef object _int_view(self, int* data):
+        cdef np.npy_intp shape[1]
+        shape[0] = <np.npy_intp> self.thisptr.num_frames()
+        if data == NULL:
+            return np.zeros(0, dtype=np.intc)
+        cdef np.ndarray a = np.PyArray_SimpleNewFromData(
+            1, shape, np.NPY_INT, data
+        )
+        np.set_array_base(a, _ArrayExport(self, self._exports))
+        return a
+
+    cdef _check_resize(self):
+        # the arrays can not be reallocated while views of them exist
+        if self._exports.count > 0:
+            raise BufferError('FrameSet can not be resized while views of '
+                              'its arrays exist')
+
+    def clear(self):
+        self._check_resize()
+        self.thisptr.clear()
+
+    property num_frames:
+        def __get__(self): return self.thisptr.num_frames()
+        def __set__(self, int i):
+            if i != self.thisptr.num_frames():
+                self._check_resize()
+            self.thisptr.num_frames(i)
+
+    property max_peaks:
+        def __get__(self): return self.thisptr.max_peaks()
+        def __set__(self, int i):
+            if i != self.thisptr.max_peaks():
+                self._check_resize()
+            self.thisptr.max_peaks(i)
+
+    property max_partials:
+        def __get__(self): return self.thisptr.max_partials()
+        def __set__(self, int i):
+            if i != self.thisptr.max_partials():
+                self._check_resize()
+            self.thisptr.max_partials(i)
+
+    property num_peaks:
+        def __get__(self): return self._int_view(self.thisptr.num_peaks())
+
+    property num_partials:
+        def __get__(self): return self._int_view(self.thisptr.num_partials())
+
+    # (num_frames, max_peaks) arrays
+    property peak_amplitude:
+        def __get__(self):
+            return self._array_view(self.thisptr.peak_amplitude(),
+                                    self.thisptr.max_peaks())
+
+    property peak_frequency:
+        def __get__(self):
+            return self._array_view(self.thisptr.peak_frequency(),
+                                    self.thisptr.max_peaks())
+
+    property peak_phase:
+        def __get__(self):
+            return self._array_view(self.thisptr.peak_phase(),
+                                    self.thisptr.max_peaks())
+
+    property peak_bandwidth:
+        def __get__(self):
+            return self._array_view(self.thisptr.peak_bandwidth(),
+                                    self.thisptr.max_peaks())
+
+    # (num_frames, max_partials) arrays
+    property partial_amplitude:
+        def __get__(self):
+            return self._array_view(self.thisptr.partial_amplitude(),
+                                    self.thisptr.max_partials())
+
+    property partial_frequency:
+        def __get__(self):
+            return self._array_view(self.thisptr.partial_frequency(),
+                                    self.thisptr.max_partials())
+
+    property partial_phase:
+        def __get__(self):
+            return self._array_view(self.thisptr.partial_phase(),
+                                    self.thisptr.max_partials())
+
+    property partial_bandwidth:
+        def __get__(self):
+            return self._array_view(self.thisptr.partial_bandwidth(),
+                                    self.thisptr.max_partials())
+
+    def frame(self, int i, int size=2048):
+        """Return a new Frame holding a copy of the peaks and partials of
+        frame i. Audio buffers are not allocated."""
+        if i < 0 or i >= self.thisptr.num_frames():
+            raise IndexError('frame index out of range')
+        f = Frame(size, True, False)
+        self.thisptr.read_frame(i, (<Frame>f).thisptr)
+        return f
+
+    def set_frame(self, int i, Frame frame not None):
+        if i < 0 or i >= self.thisptr.num_frames():
+            raise IndexError('frame index out of range')
+        self.thisptr.write_frame(i, frame.thisptr)
+
+    def add_frame(self, Frame frame not None):
+        self._check_resize()
+        self.thisptr.add_frame(frame.thisptr)
+
+    def add_frames(self, frames not None):
+        for f in frames:
+            self.add_frame(f)
+
+    def __getitem__(self, int i):
+        if i < 0:
+            i += self.thisptr.num_frames()
+        return self.frame(i)
+
+    def __iter__(self):
+        for i in range(self.thisptr.num_frames()):
+            yield self.frame(i)
+
+
+cdef class TrackIndex:
+    """
+    The partials of a FrameSet as a list of tracks, where a track is a run of
+    consecutive frames in which a partial has a non-zero amplitude.
+
+    Tracks are numbered in order of their start frame. The start, length,
+    partial_number and offset of each track are (num_tracks,) arrays, and
+    the amplitude, frequency, phase and bandwidth of all tracks are stored
+    one track after another in (num_points,) arrays, so the frequencies of
+    track i are frequency[offset[i]:offset[i] + length[i]].
+
+    Arrays are NumPy views without copying. While any view exists, the
+    index can not be rebuilt or cleared (this raises BufferError).
+    """
+    def __cinit__(self, FrameSet frame_set=None):
+        self.thisptr = new c_TrackIndex()
+        self._exports = _Exports()
+        if frame_set is not None:
+            self.thisptr.build(frame_set.thisptr)
+
+    def __dealloc__(self):
+        if self.thisptr:
+            del self.thisptr
+            self.thisptr = <c_TrackIndex*>0
+
+    def __len__(self):
+        return self.thisptr.num_tracks()
+
+    cdef object _track_view(self, void* data, int typenum):
+        cdef np.npy_intp shape[1]
+        shape[0] = <np.npy_intp> self.thisptr.num_tracks()
+        if data == NULL:
+            return np.zeros(0, dtype=np.PyArray_DescrFromType(typenum))
+        cdef np.ndarray a = np.PyArray_SimpleNewFromData(
+            1, shape, typenum, data
+        )
+        np.set_array_base(a, _ArrayExport(self, self._exports))
+        return a
+
+    cdef object _point_view(self, double* data):
+        cdef np.npy_intp shape[1]
+        shape[0] = <np.npy_intp> self.thisptr.num_points()
+        if data == NULL:
+            return np.zeros(0, dtype=np.float64)
+        cdef np.ndarray a = np.PyArray_SimpleNewFromData(
+            1, shape, np.NPY_DOUBLE, data
+        )
+        np.set_array_base(a, _ArrayExport(self, self._exports))
+        return a
+
+    cdef _check_resize(self):
+        if self._exports.count > 0:
+            raise BufferError('TrackIndex can not be rebuilt while views of '
+                              'its arrays exist')
+
+    def build(self, FrameSet frame_set not None):
+        self._check_resize()
+        self.thisptr.build(frame_set.thisptr)
+
+    def clear(self):
+        self._check_resize()
+        self.thisptr.clear()
+
+    property num_frames:
+        def __get__(self): return self.thisptr.num_frames()
+
+    property num_tracks:
+        def __get__(self): return self.thisptr.num_tracks()
+
+    property num_points:
+        def __get__(self): return self.thisptr.num_points()
+
+    # (num_tracks,) arrays
+    property partial_number:
+        def __get__(self):
+            return self._track_view(self.thisptr.partial_number(), np.NPY_INT)
+
+    property start:
+        def __get__(self):
+            return self._track_view(self.thisptr.start(), np.NPY_INT)
+
+    property length:
+        def __get__(self):
+            return self._track_view(self.thisptr.length(), np.NPY_INT)
+
+    property offset:
+        def __get__(self):
+            return self._track_view(self.thisptr.offset(), np.NPY_INT)
+
+    property min_frequency:
+        def __get__(self):
+            return self._track_view(self.thisptr.min_frequency(),
+                                    np.NPY_DOUBLE)
+
+    property max_frequency:
+        def __get__(self):
+            return self._track_view(self.thisptr.max_frequency(),
+                                    np.NPY_DOUBLE)
+
+    # (num_points,) arrays
+    property amplitude:
+        def __get__(self): return self._point_view(self.thisptr.amplitude())
+
+    property frequency:
+        def __get__(self): return self._point_view(self.thisptr.frequency())
+
+    property phase:
+        def __get__(self): return self._point_view(self.thisptr.phase())
+
+    property bandwidth:
+        def __get__(self): return self._point_view(self.thisptr.bandwidth())
+
+    def find(self, int first_frame, int last_frame, double min_frequency=0.0,
+             double max_frequency=np.inf):
+        """
+        Return an array of the numbers of the tracks with a frequency
+        between min_frequency and max_frequency (inclusive) in at least one
+        frame between first_frame and last_frame (inclusive).
+        """
+        cdef vector[int] tracks = self.thisptr.find(
+            first_frame, last_frame, min_frequency, max_frequency
+        )
+        return np.array(tracks, dtype=np.intc)
+
+    def partial(self, int i):
+        """Return track i as a simpl.pybase.Partial, with a
+        simpl.pybase.Peak per frame."""
+        import simpl.pybase as pybase
+
+        if i < 0 or i >= self.thisptr.num_tracks():
+            raise IndexError('track index out of range')
+
+        partial = pybase.Partial()
+        partial.starting_frame = self.thisptr.start()[i]
+        partial.partial_number = self.thisptr.partial_number()[i]
+
+        cdef int offset = self.thisptr.offset()[i]
+        cdef int n
+        for n in range(self.thisptr.length()[i]):
+            peak = pybase.Peak()
+            peak.amplitude = self.thisptr.amplitude()[offset + n]
+            peak.frequency = self.thisptr.frequency()[offset + n]
+            peak.phase = self.thisptr.phase()[offset + n]
+            peak.bandwidth = self.thisptr.bandwidth()[offset + n]
+            peak.frame_number = partial.starting_frame + n
+            partial.add_peak(peak)
+        return partial
+
+    def partials(self, tracks=None):
+        """Return a list of Partials for the given track numbers (such as
+        the result of find), or for all tracks."""
+        if tracks is None:
+            tracks = range(self.thisptr.num_tracks())
+        return [self.partial(i) for i in tracks]
@@ -0,0 +1,31 @@
+# Bulk parameter changes, included by every extension module with classes
+# that are expensive to re-initialise (see SMSPeakDetection.configure).
+import inspect
+
+
+def _configure(obj, params, begin_configure, end_configure):
+    """
+    Set the properties of obj named in params. The changes are made between
+    calls to begin_configure and end_configure, so that obj is only
+    re-initialised once. If any property cannot be set, the properties that
+    were already changed are restored and the exception is raised.
+    """
+    for name in params:
+        if not inspect.isdatadescriptor(getattr(type(obj), name, None)):
+            raise AttributeError("'%s' has no parameter '%s'" %
+                                 (type(obj).__name__, name))
+
+    previous = []
+    begin_configure()
+    try:
+        try:
+            for name, value in params.items():
+                current = getattr(obj, name)
+                setattr(obj, name, value)
+                previous.append((name, current))
+        except Exception:
+            for name, value in reversed(previous):
+                setattr(obj, name, value)
+            raise
+    finally:
+        end_configure()
@@ -0,0 +1,67 @@
+# FFTW plan cache settings, included by every extension module that
+# compiles the analysis/synthesis backends. Each of these modules contains
+# its own copy of the plan cache code, so on import it attaches to the
+# registry owned by simpl.base: all modules share one set of plans, one
+# planner rigor and one planner lock.
+from libcpp cimport bool
+from cpython.pycapsule cimport PyCapsule_GetPointer
+
+cdef extern from "<fftw3.h>":
+    cdef unsigned FFTW_ESTIMATE
+    cdef unsigned FFTW_MEASURE
+    cdef unsigned FFTW_PATIENT
+    cdef unsigned FFTW_EXHAUSTIVE
+
+cdef extern from "../src/simpl/fft_plans.h" namespace "simpl":
+    cdef cppclass FFTPlanCache "simpl::FFTPlanCache":
+        pass
+    cdef void c_fft_share_plan_cache "simpl::fft_share_plan_cache"(
+        FFTPlanCache* cache)
+    cdef void c_fft_plan_rigor "simpl::fft_plan_rigor"(unsigned rigor)
+    cdef unsigned c_get_fft_plan_rigor "simpl::fft_plan_rigor"()
+    cdef bool c_fft_load_wisdom "simpl::fft_load_wisdom"(char* path)
+    cdef bool c_fft_save_wisdom "simpl::fft_save_wisdom"(char* path)
+    cdef int c_fft_num_plans "simpl::fft_num_plans"()
+
+from base import fft_plan_cache as _fft_plan_cache
+c_fft_share_plan_cache(<FFTPlanCache*> PyCapsule_GetPointer(
+    _fft_plan_cache, 'simpl.fft_plan_cache'))
+
+fft_rigors = {
+    'estimate': FFTW_ESTIMATE,
+    'measure': FFTW_MEASURE,
+    'patient': FFTW_PATIENT,
+    'exhaustive': FFTW_EXHAUSTIVE
+}
+
+
+def fft_plan_rigor(rigor=None):
+    """
+    Get or set the FFTW planner rigor ('estimate', 'measure', 'patient'
+    or 'exhaustive') used for new FFT plans.
+    """
+    if rigor is not None:
+        if rigor not in fft_rigors:
+            raise ValueError('Invalid FFT plan rigor: %s' % rigor)
+        c_fft_plan_rigor(fft_rigors[rigor])
+    current = c_get_fft_plan_rigor()
+    for name, value in fft_rigors.items():
+        if value == current:
+            return name
+
+
+def load_fft_wisdom(path):
+    "Load FFTW wisdom from path, returns True on success"
+    path = path.encode('utf-8') if isinstance(path, unicode) else path
+    return c_fft_load_wisdom(path)
+
+
+def save_fft_wisdom(path):
+    "Save the accumulated FFTW wisdom to path, returns True on success"
+    path = path.encode('utf-8') if isinstance(path, unicode) else path
+    return c_fft_save_wisdom(path)
+
+
+def num_fft_plans():
+    "The number of cached FFT plans"
+    return c_fft_num_plans()
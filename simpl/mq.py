@@ -1,6 +1,29 @@
+import bisect
+import collections
 import simpl
 import numpy as np
-import operator as op
+
+
+# Analysis windows are shared by all MQPeakDetection instances. At most
+# max_cached_windows windows are kept, least recently used first out.
+max_cached_windows = 32
+_windows = collections.OrderedDict()
+
+
+def analysis_window(frame_size):
+    """
+    A normalised hamming window of size frame_size. Windows are cached, so
+    the returned array is read-only.
+    """
+    window = _windows.pop(frame_size, None)
+    if window is None:
+        window = np.hamming(frame_size)
+        window /= np.sum(window)
+        window.flags.writeable = False
+    _windows[frame_size] = window
+    while len(_windows) > max_cached_windows:
+        _windows.popitem(last=False)
+    return window
 
 
 def best_match(f, candidates):
@@ -13,58 +36,138 @@ def best_match(f, candidates):
     return pos
 
 
-def twm(peaks, f_min=0.0, f_max=3000.0, f_step=20.0):
+def _best_matches(diffs):
+    """
+    Flat indices of the best match (see best_match) along the last axis
+    of an array of frequency differences.
+    """
+    k = np.argmin(diffs, axis=-1)
+    k[np.min(diffs, axis=-1) >= 22050.0] = 0
+    offsets = np.arange(k.size).reshape(k.shape) * diffs.shape[-1]
+    return offsets + k
+
+
+def _twm_errors(amps, freqs, f_max, f_candidates, p, q, r, rho, N):
+    """
+    Total TWM error for each frame (rows of amps, freqs) and candidate
+    fundamental frequency. Unused peaks have a frequency of inf, candidates
+    that are not less than the f_max of a frame have an error of inf.
+    """
+    num_frames = amps.shape[0]
+    max_amp = np.max(amps, axis=1)[:, np.newaxis, np.newaxis]
+    c = f_candidates[np.newaxis, :, np.newaxis]
+
+    # harmonics of each candidate (as created by np.arange(c, f_max, c)),
+    # harmonics above the f_max of a frame are set to inf
+    harmonic_numbers = np.arange(N)[np.newaxis, np.newaxis, :]
+    f_max = f_max[:, np.newaxis, np.newaxis]
+    valid = harmonic_numbers < np.ceil((f_max - c) / c)
+    harmonics = np.where(valid, c + (harmonic_numbers * c), np.inf)
+
+    # mismatch between predicted and actual peaks,
+    # diffs has shape (frames, candidates, harmonics, peaks)
+    diffs = np.abs(harmonics[..., np.newaxis] -
+                   freqs[:, np.newaxis, np.newaxis, :])
+    k = _best_matches(diffs)
+    diff = np.take(diffs, k)
+    k = np.unravel_index(k, diffs.shape)[3]
+    a = amps[np.arange(num_frames)[:, np.newaxis, np.newaxis], k]
+    err_pm = diff * (harmonics ** -p) + (a / max_amp) * \
+        ((q * diff) * (harmonics ** -p) - r)
+    err_pm = np.sum(np.where(valid, err_pm, 0.0), axis=2)
+    num_harmonics = np.sum(valid, axis=2)
+
+    # mismatch between actual and predicted peaks,
+    # diffs has shape (frames, candidates, peaks, harmonics)
+    peak_freqs = freqs[:, np.newaxis, :]
+    diffs = np.abs(peak_freqs[..., np.newaxis] -
+                   harmonics[:, :, np.newaxis, :])
+    diff = np.take(diffs, _best_matches(diffs))
+    err_mp = diff * (peak_freqs ** -p) + \
+        (amps[:, np.newaxis, :] / max_amp) * \
+        ((q * diff) * (peak_freqs ** -p) - r)
+    used = np.isfinite(peak_freqs)
+    err_mp = np.sum(np.where(used, err_mp, 0.0), axis=2)
+    num_peaks = np.sum(used, axis=2)
+
+    err = (err_pm / num_harmonics) + (rho * err_mp / num_peaks)
+    err[f_candidates[np.newaxis, :] >= f_max[:, :, 0]] = np.inf
+    return err
+
+
+def twm_frames(amplitudes, frequencies, num_peaks=None, f_min=0.0,
+               f_max=3000.0, f_step=20.0, block_size=16):
+    """
+    Estimate the fundamental frequency of each frame using the two-way
+    mismatch algorithm (see twm). amplitudes and frequencies are
+    (num_frames, max_peaks) arrays (as in FrameSet.peak_amplitude and
+    FrameSet.peak_frequency), num_peaks is the number of peaks used in
+    each row. All candidate frequencies are scored against all peaks at
+    once, for block_size frames at a time.
+
+    Returns an array of estimates, which are nan for frames without peaks.
+    """
     p = 0.5
     q = 1.4
     r = 0.5
     rho = 0.33
     N = 20
-    Err = {}
 
-    max_amp = max([x.amplitude for x in peaks])
+    amplitudes = np.atleast_2d(np.asarray(amplitudes, dtype=np.float64))
+    frequencies = np.atleast_2d(np.asarray(frequencies, dtype=np.float64))
+    num_frames, max_peaks = amplitudes.shape
+    if num_peaks is None:
+        num_peaks = np.repeat(max_peaks, num_frames)
+    in_frame = np.arange(max_peaks)[np.newaxis, :] < \
+        np.asarray(num_peaks)[:, np.newaxis]
+    amps = np.where(in_frame, amplitudes, 0.0)
 
     # remove all peaks with amplitude of less than 10% of max
     # note: this is not in the TWM paper, found that it improved
     # accuracy however
-    peaks = [x for x in peaks if x.amplitude >= (max_amp * 0.1)]
-
-    # get the max frequency of the remaining peaks
-    max_freq = max([x.frequency for x in peaks])
-    if max_freq < f_max:
-        f_max = max_freq
-
-    f_current = f_min
-    while f_current < f_max:
-        Err_pm = 0.0
-        Err_mp = 0.0
-        harmonics = np.arange(f_current, f_max, f_current)
-        if len(harmonics) > N:
-            harmonics = harmonics[0:N]
-
-        # calculate mismatch between predicted and actual peaks
-        for h in harmonics:
-            k = best_match(h, [x.frequency for x in peaks])
-            f = peaks[k].frequency
-            a = peaks[k].amplitude
-            Err_pm += abs(h - f) * (h ** -p) + (a / max_amp) * \
-                      ((q * (abs(h - f)) * (h ** -p) - r))
-
-        # calculate the mismatch between actual and predicted peaks
-        for x in peaks:
-            k = best_match(x.frequency, harmonics)
-            f = harmonics[k]
-            xf = x.frequency
-            a = x.amplitude
-            Err_mp += abs(xf - f) * (xf ** -p) + (a / max_amp) * \
-                      ((q * (abs(xf - f)) * (xf ** -p) - r))
-
-        # calculate the total error for f_current as a fundamental frequency
-        Err[f_current] = (Err_pm / len(harmonics)) + \
-                         (rho * Err_mp / len(peaks))
-        f_current += f_step
-
-    # return the value with the minimum total error
-    return min(Err.iteritems(), key=op.itemgetter(1))[0]
+    max_amp = np.max(amps, axis=1) if max_peaks else np.zeros(num_frames)
+    used = in_frame & (amps >= (max_amp * 0.1)[:, np.newaxis])
+    has_peaks = np.any(used, axis=1)
+    freqs = np.where(used, frequencies, np.inf)
+
+    # f_max is the max frequency of the remaining peaks (if lower)
+    frame_f_max = np.repeat(float(f_max), num_frames)
+    if max_peaks:
+        max_freq = np.max(np.where(used, frequencies, -np.inf), axis=1)
+        frame_f_max = np.where(max_freq < f_max, max_freq, f_max)
+
+    # candidates f_min, f_min + f_step, ... (accumulated as in a loop)
+    num_candidates = max(int(np.ceil((f_max - f_min) / f_step)) + 1, 1)
+    f_candidates = np.cumsum(
+        np.hstack(([f_min], np.repeat(float(f_step), num_candidates)))
+    )
+    f_candidates = f_candidates[f_candidates < f_max]
+
+    estimates = np.repeat(np.nan, num_frames)
+    frames = np.flatnonzero(has_peaks)
+    for i in range(0, len(frames), block_size):
+        block = frames[i:i + block_size]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            err = _twm_errors(amps[block], freqs[block], frame_f_max[block],
+                              f_candidates, p, q, r, rho, N)
+        best = np.argmin(err, axis=1)
+        valid = np.isfinite(err[np.arange(len(block)), best])
+        estimates[block[valid]] = f_candidates[best[valid]]
+    return estimates
+
+
+def twm(peaks, f_min=0.0, f_max=3000.0, f_step=20.0):
+    """
+    Estimate the fundamental frequency of a list of peaks using the two-way
+    mismatch (TWM) algorithm. Every candidate from f_min to f_max (in steps
+    of f_step) is scored against all peaks in a single array operation.
+    """
+    amps = np.array([[x.amplitude for x in peaks]])
+    freqs = np.array([[x.frequency for x in peaks]])
+    estimate = twm_frames(amps, freqs, None, f_min, f_max, f_step)[0]
+    if np.isnan(estimate):
+        raise ValueError('No fundamental frequency candidates for peaks')
+    return estimate
 
 
 class MQPeakDetection(simpl.PeakDetection):
@@ -105,8 +208,7 @@ class MQPeakDetection(simpl.PeakDetection):
 
     def _create_analysis_window(self):
         'Creates the analysis window, a normalised hamming window'
-        self._window = np.hamming(self._frame_size)
-        self._window /= np.sum(self._window)
+        self._window = analysis_window(self._frame_size)
 
     def next_frame_size(self):
         if not len(self._current_peaks):
@@ -134,39 +236,95 @@ class MQPeakDetection(simpl.PeakDetection):
         Selects the highest peaks from the given spectral frame, up to a
         maximum of self._max_peaks peaks.
         '''
-        self._current_peaks = []
-
         if frame.max_peaks != self.max_peaks:
             frame.max_peaks = self.max_peaks
 
         f = np.fft.rfft(frame.audio * self._window)
-        spectrum = abs(f)
+        spectrum = np.abs(f)
+
+        # find all peaks in the spectrum: bins (from 2 to len(spectrum) - 2)
+        # with a greater magnitude than both neighbours
+        mags = spectrum[2:-1]
+        bins = np.flatnonzero((mags > spectrum[1:-2]) & (mags > spectrum[3:]))
+        bins += 2
+
+        # select the self.max_peaks largest amplitude peaks, returned
+        # in ascending frequency order
+        if len(bins) > self.max_peaks:
+            largest = np.argpartition(-spectrum[bins], self.max_peaks - 1)
+            bins = np.sort(bins[largest[:self.max_peaks]])
+
+        peaks = np.zeros((len(bins), 4))
+        peaks[:, 0] = spectrum[bins]
+        peaks[:, 1] = bins * self._fundamental
+        peaks[:, 2] = np.angle(f[bins])
+        frame.peak_array = peaks
+
+        self._current_peaks = frame.peaks
+        return self._current_peaks
 
-        # find all peaks in the spectrum
-        for bin in range(2, len(spectrum) - 1):
-            current_mag = spectrum[bin]
-            prev_mag = spectrum[bin - 1]
-            next_mag = spectrum[bin + 1]
 
-            if (current_mag > prev_mag and
-                current_mag > next_mag):
-                p = simpl.Peak()
-                p.amplitude = current_mag
-                p.frequency = bin * self._fundamental
-                p.phase = np.angle(f[bin])
-                self._current_peaks.append(p)
-
-        # sort peaks, largest amplitude first, and up to a max
-        # of self.num_peaks peaks
-        self._current_peaks.sort(cmp=simpl.compare_peak_amps)
-        self._current_peaks.reverse()
-        if len(self._current_peaks) > self.max_peaks:
-            self._current_peaks = self._current_peaks[0:self.max_peaks]
-
-        # put back into ascending frequency order
-        self._current_peaks.sort(cmp=simpl.compare_peak_freqs)
-        frame.peaks = list(self._current_peaks)
-        return self._current_peaks
+class _PartialSlots(object):
+    '''
+    The partials of the frame that is being tracked, with the bookkeeping
+    needed to find unmatched peaks without searching the partials: how many
+    partials use each peak (by index) and each frequency, and the sorted
+    indices of the peaks whose frequency is not used by any partial.
+    '''
+    def __init__(self, num_partials, peaks):
+        self.partials = [None for i in range(num_partials)]
+        self.num_matches = [0 for p in peaks]
+        self._peak_numbers = [-1 for i in range(num_partials)]
+        self._frequency_count = {}
+        self._peaks_at_frequency = {}
+        for peak_number, p in enumerate(peaks):
+            self._peaks_at_frequency.setdefault(p.frequency, []).append(
+                peak_number
+            )
+        self._unused = list(range(len(peaks)))
+
+    def _use_frequency(self, frequency, count):
+        old_count = self._frequency_count.get(frequency, 0)
+        self._frequency_count[frequency] = old_count + count
+        if old_count == 0 or old_count + count == 0:
+            for peak_number in self._peaks_at_frequency.get(frequency, []):
+                if count > 0:
+                    del self._unused[bisect.bisect_left(self._unused,
+                                                        peak_number)]
+                else:
+                    bisect.insort(self._unused, peak_number)
+
+    def set(self, partial_number, peak, peak_number=-1):
+        '''
+        Set partial partial_number to peak, which is peak number
+        peak_number in the frame (or -1 if it is not a peak in the frame).
+        '''
+        old_peak = self.partials[partial_number]
+        if old_peak is not None:
+            self._use_frequency(old_peak.frequency, -1)
+            if self._peak_numbers[partial_number] >= 0:
+                self.num_matches[self._peak_numbers[partial_number]] -= 1
+
+        self.partials[partial_number] = peak
+        self._peak_numbers[partial_number] = peak_number
+        if peak is not None:
+            self._use_frequency(peak.frequency, 1)
+            if peak_number >= 0:
+                self.num_matches[peak_number] += 1
+
+    def first_peak_at(self, frequency):
+        'Index of the first peak with the given frequency'
+        return self._peaks_at_frequency[frequency][0]
+
+    def unused_peak_below(self, peak_number):
+        '''
+        Index of the closest peak before peak_number whose frequency is not
+        used by any partial, or -1.
+        '''
+        i = bisect.bisect_left(self._unused, peak_number)
+        if i > 0:
+            return self._unused[i - 1]
+        return -1
 
 
 class MQPartialTracking(simpl.PartialTracking):
@@ -176,62 +334,67 @@ class MQPartialTracking(simpl.PartialTracking):
         self._matching_interval = 100  # peak matching interval, in Hz
         self._current_frame = None  # current frame in peak tracking
 
-    def _find_closest_match(self, peak, frame_peaks, matched_peaks):
+    def _sort_by_frequency(self, peaks):
         '''
-        Find a candidate match for peak in frame if one exists.
-        This is the closest (in frequency) match that is within
-        self._matching_interval.
+        Returns the indices of the peaks in peaks with non-zero amplitude,
+        sorted by frequency (then by index), and their frequencies.
         '''
-        free_peaks = [p for p in frame_peaks if not p in matched_peaks]
-        free_peaks = [p for p in free_peaks if p.amplitude > 0]
-        distances = [abs(peak.frequency - p.frequency) for p in free_peaks]
-        if len(distances):
-            min_distance_position = min(range(len(distances)),
-                                        key=distances.__getitem__)
-            if min(distances) < self._matching_interval:
-                return free_peaks[min_distance_position]
-        return None
-
-    def _get_free_peak_below(self, peak, frame_peaks, matched_peaks):
+        indices = [i for i, p in enumerate(peaks) if p.amplitude > 0]
+        indices.sort(key=lambda i: peaks[i].frequency)
+        return indices, [peaks[i].frequency for i in indices]
+
+    def _find_closest_match(self, frequency, sorted_peaks, is_free=None):
         '''
-        Returns the closest unmatched peak in frame_peaks with a frequency
-        less than peak.frequency.
+        Find a candidate match for a peak at frequency in a list of peaks
+        sorted by _sort_by_frequency, if one exists. This is the index of the
+        closest (in frequency) free peak that is within
+        self._matching_interval, or of the first of equally close peaks.
+        Returns -1 if there is no match.
         '''
-        freqs = [p.frequency for p in matched_peaks if p]
-        for peak_number, p in enumerate(frame_peaks):
-            if p.frequency == peak.frequency:
-                # go back through lower peaks (in order) and
-                # return the first unmatched
-                current_peak = peak_number - 1
-                while current_peak >= 0:
-                    if not frame_peaks[current_peak].frequency in freqs:
-                        return frame_peaks[current_peak]
-                    current_peak -= 1
-                return None
-        return None
-
-    def _kill_partial(self, partials, prev_peak):
+        indices, freqs = sorted_peaks
+        match = -1
+        best_distance = self._matching_interval
+        position = bisect.bisect_left(freqs, frequency)
+
+        # search outwards on both sides, while peaks are not further
+        # away than the best match so far
+        for candidates in (range(position - 1, -1, -1),
+                           range(position, len(freqs))):
+            for i in candidates:
+                distance = abs(frequency - freqs[i])
+                if distance > best_distance:
+                    break
+                peak_number = indices[i]
+                if is_free is not None and not is_free(peak_number):
+                    continue
+                if distance < best_distance or \
+                        (match >= 0 and peak_number < match):
+                    best_distance = distance
+                    match = peak_number
+        return match
+
+    def _kill_partial(self, slots, prev_partials, partial_numbers):
         '''
         When a partial dies it is matched to itself in the next frame,
         with 0 amplitude.
         '''
-        for peak_number, peak in enumerate(self._current_frame.partials):
-            if peak.frequency == prev_peak.frequency:
-                if peak.amplitude == 0:
-                    partials[peak_number] = None
-                else:
-                    p = simpl.Peak()
-                    p.frequency = peak.frequency
-                    partials[peak_number] = p
+        for partial_number in partial_numbers:
+            peak = prev_partials[partial_number]
+            if peak.amplitude == 0:
+                slots.set(partial_number, None)
+            else:
+                p = simpl.Peak()
+                p.frequency = peak.frequency
+                slots.set(partial_number, p)
 
-    def _extend_partial(self, partials, prev_peak, next_peak):
+    def _extend_partial(self, slots, partial_numbers, next_peak, peak_number):
         '''
-        Sets next_peak to be the next sinusoidal peak in the partial
-        that currently ends with prev_peak.
+        Sets next_peak (peak number peak_number in the next frame) to be the
+        next sinusoidal peak in the partials that currently end at the
+        frequency of partial_numbers.
         '''
-        for peak_number, peak in enumerate(self._current_frame.partials):
-            if peak.frequency == prev_peak.frequency:
-                partials[peak_number] = next_peak
+        for partial_number in partial_numbers:
+            slots.set(partial_number, next_peak, peak_number)
 
     def update_partials(self, frame):
         '''
@@ -253,11 +416,14 @@ class MQPartialTracking(simpl.PartialTracking):
         still be peaks remaining in the next frame. A new peak is created in
         the current frame at the same frequency and with 0 amplitude, and a
         match is made.
+
+        Peaks in both frames are searched in frequency order, so a frame is
+        tracked in O(P log P) time for P peaks and partials.
         '''
         if not frame.max_partials == self.max_partials:
             frame.max_partials = self.max_partials
 
-        partials = [None for i in range(self.max_partials)]
+        peaks = frame.peaks
 
         # MQ algorithm needs 2 frames of data, so create new partials and
         # return if this is the first frame
@@ -265,61 +431,79 @@ class MQPartialTracking(simpl.PartialTracking):
             self._current_frame = frame
             # if more peaks than paritals, select the max_partials largest
             # amplitude peaks in frame
-            if len(frame.peaks) > self.max_partials:
-                frame.peaks.sort(cmp=simpl.compare_peak_amps)
-                frame.peaks.reverse()
-                partials = frame.peaks[0:self.max_partials]
+            if len(peaks) > self.max_partials:
+                partials = sorted(peaks, key=lambda p: p.amplitude)
+                partials.reverse()
+                partials = partials[0:self.max_partials]
             # if not, save all peaks as new partials, and add a few zero
             # peaks if necessary
             else:
-                partials = frame.peaks
-                for i in range(len(frame.peaks), self.max_partials):
+                partials = list(peaks)
+                for i in range(len(peaks), self.max_partials):
                     partials.append(simpl.Peak())
             frame.partials = partials
             return partials
 
-        for peak in self._current_frame.partials:
-            match = self._find_closest_match(peak, frame.peaks, partials)
-            if match:
+        prev_partials = self._current_frame.partials
+        slots = _PartialSlots(self.max_partials, peaks)
+        sorted_peaks = self._sort_by_frequency(peaks)
+        sorted_partials = self._sort_by_frequency(prev_partials)
+        is_free = lambda peak_number: not slots.num_matches[peak_number]
+
+        # partials that end at the same frequency are extended or killed
+        # together
+        partials_at_frequency = {}
+        for partial_number, peak in enumerate(prev_partials):
+            partials_at_frequency.setdefault(peak.frequency, []).append(
+                partial_number
+            )
+
+        for peak in prev_partials:
+            partial_numbers = partials_at_frequency[peak.frequency]
+            match = self._find_closest_match(peak.frequency, sorted_peaks,
+                                             is_free)
+            if match >= 0:
                 # is this match closer to any of the other unmatched
                 # peaks in frame?
                 closest_to_candidate = self._find_closest_match(
-                    match, self._current_frame.partials, []
+                    peaks[match].frequency, sorted_partials
                 )
-                if not closest_to_candidate == peak:
+                if closest_to_candidate < 0 or \
+                        not prev_partials[closest_to_candidate] is peak:
                     # see if the closest peak with lower frequency to
                     # the candidate is within the matching interval
-                    lower_peak = self._get_free_peak_below(
-                        match, frame.peaks, partials
+                    lower = slots.unused_peak_below(
+                        slots.first_peak_at(peaks[match].frequency)
                     )
-                    if lower_peak:
-                        if abs(lower_peak.frequency - peak.frequency) < \
+                    if lower >= 0 and \
+                            abs(peaks[lower].frequency - peak.frequency) < \
                             self._matching_interval:
-                            # this is the definitive match
-                            self._extend_partial(partials, peak, lower_peak)
-                        else:
-                            self._kill_partial(partials, peak)
+                        # this is the definitive match
+                        self._extend_partial(slots, partial_numbers,
+                                             peaks[lower], lower)
                     else:
-                        self._kill_partial(partials, peak)
+                        self._kill_partial(slots, prev_partials,
+                                           partial_numbers)
                 # if not, it is a definitive match
                 else:
-                    self._extend_partial(partials, peak, match)
+                    self._extend_partial(slots, partial_numbers,
+                                         peaks[match], match)
             else:  # no match
-                self._kill_partial(partials, peak)
+                self._kill_partial(slots, prev_partials, partial_numbers)
 
         # now that all peaks in the current frame have been matched,
-        # look for any unmatched peaks in the next frame
-        for p in frame.peaks:
-            if not p in partials:
-                # look for the first free partial spot in partials
-                free_partial = -1
-                for i in range(self.max_partials):
-                    if not partials[i]:
-                        free_partial = i
-                        break
-                if not free_partial == -1:
-                    # create a new track by adding a peak in the current frame
-                    partials[free_partial] = p
+        # look for any unmatched peaks in the next frame, and create new
+        # tracks for them in the free partial spots
+        partials = slots.partials
+        free_partial = 0
+        for peak_number, p in enumerate(peaks):
+            if not slots.num_matches[peak_number]:
+                while free_partial < self.max_partials and \
+                        partials[free_partial] is not None:
+                    free_partial += 1
+                if free_partial == self.max_partials:
+                    break
+                partials[free_partial] = p
 
         # add zero peaks for any remaining free partials
         for i in range(self.max_partials):
@@ -335,9 +519,14 @@ class MQSynthesis(simpl.Synthesis):
     def __init__(self):
         simpl.Synthesis.__init__(self)
         self._max_partials = super(MQSynthesis, self).max_partials
-        self._previous_partials = [
-            simpl.Peak() for i in range(self._max_partials)
-        ]
+        self._reset_previous_partials()
+
+    def _reset_previous_partials(self):
+        # amplitude, frequency (in radians) and phase of each partial in
+        # the previous frame
+        self._prev_amps = np.zeros(self._max_partials, dtype=simpl.dtype)
+        self._prev_freqs = np.zeros(self._max_partials, dtype=simpl.dtype)
+        self._prev_phases = np.zeros(self._max_partials, dtype=simpl.dtype)
 
     @property
     def max_partials(self):
@@ -346,69 +535,69 @@ class MQSynthesis(simpl.Synthesis):
     @max_partials.setter
     def max_partials(self, new_max_partials):
         self._max_partials = new_max_partials
-        self._previous_partials = [
-            simpl.Peak() for i in range(self._max_partials)
-        ]
+        self._reset_previous_partials()
 
     def hz_to_radians(self, frequency):
-        if not frequency:
-            return 0.0
-        else:
-            return (frequency * 2.0 * np.pi) / self.sampling_rate
+        return (frequency * 2.0 * np.pi) / self.sampling_rate
 
     def synth_frame(self, frame):
-        output = np.zeros(self.hop_size, dtype=simpl.dtype)
+        """
+        Synthesise one hop of audio from the partials in frame. The
+        amplitude ramps and cubic phase trajectories of all partials are
+        evaluated together as (partials, hop_size) arrays.
+        """
         size = self.hop_size
-
-        num_partials = min(len(frame.partials), self._max_partials)
-
-        for n in range(num_partials):
-            partials = frame.partials
-            p = partials[n]
-
-            # get values for last amplitude, frequency and phase
-            # these are the initial values of the instantaneous
-            # amplitude/frequency/phase
-            current_freq = self.hz_to_radians(p.frequency)
-            prev_amp = self._previous_partials[n].amplitude
-            if prev_amp == 0:
-                prev_freq = current_freq
-                prev_phase = p.phase - (current_freq * size)
-                while prev_phase >= np.pi:
-                    prev_phase -= 2.0 * np.pi
-                while prev_phase < -np.pi:
-                    prev_phase += 2.0 * np.pi
-            else:
-                prev_freq = self.hz_to_radians(
-                    self._previous_partials[n].frequency
-                )
-                prev_phase = self._previous_partials[n].phase
-
-            # amplitudes are linearly interpolated between frames
-            inst_amp = prev_amp
-            amp_inc = (p.amplitude - prev_amp) / size
-
-            # freqs/phases are calculated by cubic interpolation
-            freq_diff = current_freq - prev_freq
-            x = ((prev_phase + (prev_freq * size) - p.phase) +
-                 (freq_diff * (size / 2.0)))
-            x /= (2.0 * np.pi)
-            m = int(np.round(x))
-            phase_diff = p.phase - prev_phase - (prev_freq * size) + \
-                         (2.0 * np.pi * m)
-            alpha = ((3.0 / (size ** 2)) * phase_diff) - (freq_diff / size)
-            beta = ((-2.0 / (size ** 3)) * phase_diff) + \
-                   (freq_diff / (size ** 2))
-
-            # calculate output samples
-            for i in range(size):
-                inst_amp += amp_inc
-                inst_phase = prev_phase + (prev_freq * i) + \
-                             (alpha * (i ** 2)) + (beta * (i ** 3))
-                output[i] += (2.0 * inst_amp) * np.cos(inst_phase)
-
-            # update previous partials list
-            self._previous_partials[n] = p
+        num_partials = min(len(frame.partial_array), self._max_partials)
+        partials = frame.partial_array[:num_partials]
+
+        amps = partials['amplitude']
+        freqs = self.hz_to_radians(partials['frequency'])
+        phases = partials['phase']
+
+        # get values for last amplitude, frequency and phase
+        # these are the initial values of the instantaneous
+        # amplitude/frequency/phase, partials that start in this frame
+        # use the current frequency and the phase that it implies,
+        # wrapped to [-pi, pi)
+        prev_amps = self._prev_amps[:num_partials]
+        new = prev_amps == 0
+        prev_freqs = np.where(new, freqs, self._prev_freqs[:num_partials])
+        start_phases = phases - (freqs * size)
+        start_phases -= 2.0 * np.pi * np.floor(
+            (start_phases + np.pi) / (2.0 * np.pi)
+        )
+        prev_phases = np.where(new, start_phases,
+                               self._prev_phases[:num_partials])
+
+        # amplitudes are linearly interpolated between frames
+        amp_incs = (amps - prev_amps) / size
+
+        # freqs/phases are calculated by cubic interpolation
+        freq_diffs = freqs - prev_freqs
+        x = ((prev_phases + (prev_freqs * size) - phases) +
+             (freq_diffs * (size / 2.0)))
+        x /= (2.0 * np.pi)
+        m = np.round(x)
+        phase_diffs = phases - prev_phases - (prev_freqs * size) + \
+            (2.0 * np.pi * m)
+        alphas = ((3.0 / (size ** 2)) * phase_diffs) - (freq_diffs / size)
+        betas = ((-2.0 / (size ** 3)) * phase_diffs) + \
+            (freq_diffs / (size ** 2))
+
+        # calculate output samples
+        i = np.arange(size, dtype=simpl.dtype)
+        inst_amps = prev_amps[:, np.newaxis] + \
+            (amp_incs[:, np.newaxis] * (i + 1))
+        inst_phases = prev_phases[:, np.newaxis] + \
+            (prev_freqs[:, np.newaxis] * i) + \
+            (alphas[:, np.newaxis] * (i ** 2)) + \
+            (betas[:, np.newaxis] * (i ** 3))
+        output = np.sum((2.0 * inst_amps) * np.cos(inst_phases), axis=0)
+
+        # update previous partials
+        self._prev_amps[:num_partials] = amps
+        self._prev_freqs[:num_partials] = freqs
+        self._prev_phases[:num_partials] = phases
 
         frame.synth = output
         return output
@@ -0,0 +1,210 @@
+import multiprocessing
+import numpy as np
+import simpl
+
+# peak_detection, partial_tracking and audio of the running analysis, set in
+# the parent process before the workers are forked
+_analysis = None
+
+
+def _analyse_segment(segment):
+    # runs in a worker process: analyse num_frames frames starting at frame
+    # first, or all of the remaining frames if num_frames is None
+    first, num_frames = segment
+    peak_detection, partial_tracking, audio = _analysis
+    stream = simpl.StreamAnalysis(peak_detection, partial_tracking)
+    block_size = 16 * peak_detection.hop_size
+
+    frames = []
+    pos = first * peak_detection.hop_size
+    while pos < len(audio) and (num_frames is None or
+                                len(frames) < num_frames):
+        frames.extend(stream.process(audio[pos:pos + block_size]))
+        pos += block_size
+    if pos >= len(audio):
+        frames.extend(stream.flush())
+    if num_frames is not None:
+        frames = frames[:num_frames]
+
+    return [(f.size, f.max_peaks, f.max_partials,
+             f.peak_array.copy(), f.partial_array.copy()) for f in frames]
+
+
+class ParallelAnalysis(object):
+    """
+    Analyse a long signal in overlapping segments in a pool of processes.
+
+    Every segment is analysed from scratch with a StreamAnalysis of its own
+    (so with the state of peak_detection and partial_tracking at the time
+    that analyse is called), starting overlap samples before the segment.
+    Tracks are then stitched across segment boundaries: the partials of the
+    overlapping frames are matched with those of the previous segment by
+    frequency, and each segment's partial numbers are renumbered to
+    continue the previous segment's tracks.
+
+    If the partial tracking converges within the overlap the result is the
+    same as a serial analysis, apart from the numbering of the partials.
+    Peak detection should use a static frame size, as the frame sizes of a
+    segment are otherwise adapted from its own start.
+
+    Workers are started with fork, so the analysis objects do not need to
+    be picklable. Where fork is not available, or if num_processes is 1,
+    the signal is analysed serially.
+    """
+    def __init__(self, peak_detection, partial_tracking=None,
+                 segment_size=None, overlap=None, num_processes=None,
+                 frequency_tolerance=1.0):
+        self.peak_detection = peak_detection
+        self.partial_tracking = partial_tracking
+        # segment size and overlap in samples, rounded down to a whole number
+        # of hops (by default 30 seconds and 0.5 seconds)
+        self.segment_size = segment_size or 30 * peak_detection.sampling_rate
+        self.overlap = overlap
+        if overlap is None:
+            self.overlap = peak_detection.sampling_rate // 2
+        self.num_processes = num_processes or multiprocessing.cpu_count()
+        # maximum frequency difference (in Hz) of stitched partials
+        self.frequency_tolerance = frequency_tolerance
+
+    def _segments(self, num_samples):
+        hop_size = self.peak_detection.hop_size
+        segment_frames = max(self.segment_size // hop_size, 1)
+        overlap_frames = self.overlap // hop_size
+        num_segments = max(-(-(num_samples // hop_size) // segment_frames), 1)
+
+        segments = []
+        for i in range(num_segments):
+            first = max(i * segment_frames - overlap_frames, 0)
+            num_frames = None
+            if i < num_segments - 1:
+                num_frames = (i + 1) * segment_frames - first
+            segments.append((first, num_frames))
+        return segments
+
+    def _frame(self, audio, pos, data):
+        size, max_peaks, max_partials, peaks, partials = data
+        frame = simpl.Frame(size)
+        if pos + size <= len(audio):
+            frame.audio_view(audio[pos:pos + size])
+        else:
+            frame.audio_view(np.hstack((
+                audio[pos:], np.zeros(size - max(len(audio) - pos, 0))
+            )))
+        frame.max_peaks = max_peaks
+        frame.peak_array = peaks
+        frame.max_partials = max_partials
+        frame.partial_array = partials
+        return frame
+
+    def _partial_numbers(self, previous, overlap):
+        """
+        Returns the partial number in previous (the partial arrays of the
+        last frames of the previous segment) to use for each partial in
+        overlap (the partial arrays of the same frames in the next segment).
+        """
+        num_partials = max([len(p) for p in previous + overlap] + [0])
+        score = np.zeros((num_partials, num_partials))
+        for i, (p1, p2) in enumerate(zip(previous, overlap)):
+            active1 = np.zeros(num_partials, dtype=bool)
+            active1[:len(p1)] = p1['amplitude'] > 0
+            active2 = np.zeros(num_partials, dtype=bool)
+            active2[:len(p2)] = p2['amplitude'] > 0
+            f1 = np.zeros(num_partials)
+            f1[:len(p1)] = p1['frequency']
+            f2 = np.zeros(num_partials)
+            f2[:len(p2)] = p2['frequency']
+            # later frames count for more, as the tracks of the next
+            # segment converge over the overlap
+            score += (i + 1) * (
+                np.outer(active2, active1) &
+                (np.abs(f2[:, None] - f1[None, :]) <=
+                 self.frequency_tolerance)
+            )
+
+        numbers = -np.ones(num_partials, dtype=int)
+        used = np.zeros(num_partials, dtype=bool)
+        for k in np.argsort(-score, axis=None, kind='stable'):
+            new, old = np.unravel_index(k, score.shape)
+            if score[new, old] <= 0:
+                break
+            if numbers[new] < 0 and not used[old]:
+                numbers[new] = old
+                used[old] = True
+
+        # unmatched partials keep their number if possible, preferring
+        # partials that are not active at the end of the previous segment
+        # so that unrelated tracks are not joined
+        active = np.zeros(num_partials, dtype=bool)
+        if previous:
+            active[:len(previous[-1])] = previous[-1]['amplitude'] > 0
+        for new in np.flatnonzero(numbers < 0):
+            free = np.flatnonzero(~used)
+            if not used[new] and not active[new]:
+                old = new
+            elif np.any(~active[free]):
+                old = free[~active[free]][0]
+            else:
+                old = free[0]
+            numbers[new] = old
+            used[old] = True
+        return numbers
+
+    def _renumber(self, partials, numbers):
+        renumbered = np.zeros(len(numbers), dtype=simpl.peak_dtype)
+        renumbered[numbers[:len(partials)]] = partials
+        return renumbered
+
+    def _stitch(self, audio, segments):
+        hop_size = self.peak_detection.hop_size
+        frames = []
+        for first, data in segments:
+            # frames before the end of the previous segment are only used
+            # to match the partials of the two segments
+            overlap = len(frames) - first
+            if self.partial_tracking is not None and overlap > 0:
+                numbers = self._partial_numbers(
+                    [f.partial_array for f in frames[first:]],
+                    [d[4] for d in data[:overlap]]
+                )
+                data = [d[:4] + (self._renumber(d[4], numbers),)
+                        for d in data]
+            for i in range(max(overlap, 0), len(data)):
+                frames.append(self._frame(audio, (first + i) * hop_size,
+                                          data[i]))
+        return frames
+
+    def analyse(self, audio):
+        """
+        Find the peaks (and partials, if partial_tracking was given) of
+        audio, returning a list of Frames.
+        """
+        global _analysis
+
+        audio = np.ascontiguousarray(audio, dtype=simpl.dtype)
+        segments = self._segments(len(audio))
+
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            context = None
+        if context is None or self.num_processes == 1 or len(segments) == 1:
+            stream = simpl.StreamAnalysis(self.peak_detection,
+                                          self.partial_tracking)
+            return stream.process(audio) + stream.flush()
+
+        _analysis = (self.peak_detection, self.partial_tracking, audio)
+        try:
+            # each segment is analysed by a new process, so that it starts
+            # from the state of the analysis objects in this process
+            pool = context.Pool(min(self.num_processes, len(segments)),
+                                maxtasksperchild=1)
+            try:
+                results = pool.imap(_analyse_segment, segments)
+                return self._stitch(
+                    audio, zip([s[0] for s in segments], results)
+                )
+            finally:
+                pool.terminate()
+                pool.join()
+        finally:
+            _analysis = None
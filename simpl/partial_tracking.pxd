@@ -6,6 +6,7 @@ from libcpp cimport bool
 
 from base cimport c_Peak
 from base cimport c_Frame
+from base cimport c_FrameSet
 from base cimport string
 from base cimport dtype_t
 from base import dtype
@@ -25,12 +26,22 @@ cdef extern from "../src/simpl/partial_tracking.h" namespace "simpl":
         void max_gap(int new_max_gap)
         void update_partials(c_Frame* frame)
         vector[c_Frame*] find_partials(vector[c_Frame*] frames)
+        c_FrameSet* find_partials(c_FrameSet* frame_set)
 
     cdef cppclass c_MQPartialTracking "simpl::MQPartialTracking"(c_PartialTracking):
         c_MQPartialTracking()
 
+    cdef cppclass c_OfflinePartialTracking "simpl::OfflinePartialTracking"(c_PartialTracking):
+        c_OfflinePartialTracking()
+        double matching_interval()
+        void matching_interval(double new_matching_interval)
+
     cdef cppclass c_SMSPartialTracking "simpl::SMSPartialTracking"(c_PartialTracking):
         c_SMSPartialTracking()
+        void begin_configure()
+        void end_configure()
+        double default_fundamental()
+        void default_fundamental(double new_default_fundamental)
         bool realtime()
         void realtime(bool is_realtime)
         bool harmonic()
@@ -6,9 +6,13 @@ from libcpp cimport bool
 
 from base cimport Peak
 from base cimport Frame
+from base cimport FrameSet
 from base cimport c_Peak
 from base cimport c_Frame
 
+include "fft_plans.pxi"
+include "configure.pxi"
+
 
 cdef class PartialTracking:
     cdef c_PartialTracking* thisptr
@@ -43,7 +47,24 @@ cdef class PartialTracking:
         self.thisptr.update_partials(frame.thisptr)
         return frame.partials
 
-    def find_partials(self, frames):
+    def find_partials(self, frames, engine='frame'):
+        """
+        Find partials from the peaks in frames (a list of Frames or a
+        FrameSet).
+
+        With engine='frame' (the default) each frame is passed to
+        update_partials in turn. With engine='offline' the peaks of all
+        frames are linked by an OfflinePartialTracking with the same
+        sampling rate and max_partials, which works on the whole FrameSet.
+        """
+        if engine == 'offline':
+            return self._find_partials_offline(frames)
+        elif engine != 'frame':
+            raise ValueError('unknown partial tracking engine: %s' % engine)
+
+        if isinstance(frames, FrameSet):
+            return self._find_partials_in_frame_set(frames)
+
         partial_frames = []
         for frame in frames:
             if frame.max_partials != self.thisptr.max_partials():
@@ -52,6 +73,33 @@ cdef class PartialTracking:
             partial_frames.append(frame)
         return partial_frames
 
+    def _find_partials_in_frame_set(self, FrameSet frame_set not None):
+        frame_set.max_partials = self.thisptr.max_partials()
+        for i in range(len(frame_set)):
+            # a new Frame is used for each row as trackers may keep a
+            # reference to the previous frame
+            frame = frame_set.frame(i)
+            self.update_partials(frame)
+            frame_set.set_frame(i, frame)
+        return frame_set
+
+    def _find_partials_offline(self, frames):
+        pt = OfflinePartialTracking()
+        pt.sampling_rate = self.thisptr.sampling_rate()
+        pt.max_partials = self.thisptr.max_partials()
+        if isinstance(frames, FrameSet):
+            return pt.find_partials(frames)
+
+        frame_set = FrameSet(0, max([f.max_peaks for f in frames] + [1]),
+                             pt.max_partials)
+        frame_set.add_frames(frames)
+        pt.find_partials(frame_set)
+        for i, frame in enumerate(frames):
+            if frame.max_partials != pt.max_partials:
+                frame.max_partials = pt.max_partials
+            frame.partials = frame_set.frame(i).partials
+        return frames
+
 
 cdef class MQPartialTracking(PartialTracking):
     def __cinit__(self):
@@ -65,6 +113,37 @@ cdef class MQPartialTracking(PartialTracking):
             self.thisptr = <c_PartialTracking*>0
 
 
+cdef class OfflinePartialTracking(PartialTracking):
+    """
+    Partial tracking for whole signals. The peaks in each frame are linked
+    to the partials of the previous frame by solving a minimum cost
+    assignment, where the cost of continuing a partial is the change in
+    frequency. Partials are only continued by peaks that are less than
+    matching_interval Hz away.
+
+    find_partials works directly on the arrays of a FrameSet, so it is much
+    faster for a FrameSet than for a list of Frames.
+    """
+    def __cinit__(self):
+        if self.thisptr:
+            del self.thisptr
+        self.thisptr = new c_OfflinePartialTracking()
+
+    def __dealloc__(self):
+        if self.thisptr:
+            del self.thisptr
+            self.thisptr = <c_PartialTracking*>0
+
+    property matching_interval:
+        def __get__(self): return (<c_OfflinePartialTracking*>self.thisptr).matching_interval()
+        def __set__(self, double d): (<c_OfflinePartialTracking*>self.thisptr).matching_interval(d)
+
+    def _find_partials_in_frame_set(self, FrameSet frame_set not None):
+        frame_set.max_partials = self.thisptr.max_partials()
+        self.thisptr.find_partials(frame_set.thisptr)
+        return frame_set
+
+
 cdef class SMSPartialTracking(PartialTracking):
     def __cinit__(self):
         if self.thisptr:
@@ -100,6 +179,24 @@ cdef class SMSPartialTracking(PartialTracking):
         def __get__(self): return (<c_SMSPartialTracking*>self.thisptr).clean_tracks()
         def __set__(self, bool b): (<c_SMSPartialTracking*>self.thisptr).clean_tracks(b)
 
+    property default_fundamental:
+        def __get__(self): return (<c_SMSPartialTracking*>self.thisptr).default_fundamental()
+        def __set__(self, double d): (<c_SMSPartialTracking*>self.thisptr).default_fundamental(d)
+
+    def configure(self, **params):
+        """
+        Set several parameters at once, re-initialising the SMS analysis
+        only once instead of after every change, for example
+        pt.configure(harmonic=True, max_partials=20, max_frame_delay=2).
+        """
+        _configure(self, params, self._begin_configure, self._end_configure)
+
+    def _begin_configure(self):
+        (<c_SMSPartialTracking*>self.thisptr).begin_configure()
+
+    def _end_configure(self):
+        (<c_SMSPartialTracking*>self.thisptr).end_configure()
+
 
 cdef class SndObjPartialTracking(PartialTracking):
     def __cinit__(self):
@@ -6,6 +6,7 @@ from libcpp cimport bool
 
 from base cimport c_Peak
 from base cimport c_Frame
+from base cimport c_FrameSet
 from base cimport string
 from base cimport dtype_t
 from base import dtype
@@ -31,11 +32,16 @@ cdef extern from "../src/simpl/peak_detection.h" namespace "simpl":
         void window_size(int new_window_size)
         double min_peak_separation()
         void min_peak_separation(double new_min_peak_separation)
+        int num_threads()
+        void num_threads(int new_num_threads)
         int num_frames()
         c_Frame* frame(int frame_number)
         void frames(vector[c_Frame*] new_frames)
+        vector[c_Frame*] take_frames()
         void find_peaks_in_frame(c_Frame* frame)
-        vector[c_Frame*] find_peaks(int audio_size, double* audio)
+        vector[c_Frame*] find_peaks(int audio_size, double* audio) nogil
+        c_FrameSet* find_peaks(int audio_size, double* audio,
+                               c_FrameSet* frame_set) nogil
 
     cdef cppclass c_MQPeakDetection "simpl::MQPeakDetection"(c_PeakDetection):
         c_MQPeakDetection()
@@ -45,10 +51,14 @@ cdef extern from "../src/simpl/peak_detection.h" namespace "simpl":
 
     cdef cppclass c_SMSPeakDetection "simpl::SMSPeakDetection"(c_PeakDetection):
         c_SMSPeakDetection()
+        void begin_configure()
+        void end_configure()
         void hop_size(int new_hop_size)
         void max_peaks(int new_max_peaks)
         void find_peaks_in_frame(c_Frame* frame)
         vector[c_Frame*] find_peaks(int audio_size, double* audio)
+        c_FrameSet* find_peaks(int audio_size, double* audio,
+                               c_FrameSet* frame_set)
 
     cdef cppclass c_SndObjPeakDetection "simpl::SndObjPeakDetection"(c_PeakDetection):
         c_SndObjPeakDetection()
@@ -61,3 +71,8 @@ cdef extern from "../src/simpl/peak_detection.h" namespace "simpl":
         void hop_size(int new_hop_size)
         void max_peaks(int new_max_peaks)
         void find_peaks_in_frame(c_Frame* frame)
+
+
+cdef extern from "../src/mq/twm.h" namespace "simpl":
+    double c_twm "simpl::twm"(int num_peaks, c_Peak* peaks, double f_min,
+                              double f_max, double f_step)
@@ -6,8 +6,13 @@ from libcpp cimport bool
 
 from base cimport Peak
 from base cimport Frame
+from base cimport FrameSet
 from base cimport c_Peak
 from base cimport c_Frame
+from base import peak_dtype
+
+include "fft_plans.pxi"
+include "configure.pxi"
 
 
 cdef class PeakDetection:
@@ -59,18 +64,31 @@ cdef class PeakDetection:
         def __get__(self): return self.thisptr.min_peak_separation()
         def __set__(self, double d): self.thisptr.min_peak_separation(d)
 
+    property num_threads:
+        def __get__(self): return self.thisptr.num_threads()
+        def __set__(self, int i): self.thisptr.num_threads(i)
+
     def frame(self, int i):
-        cdef c_Frame* c_f = self.thisptr.frame(i)
-        f = Frame(None, False)
-        f.set_frame(c_f)
-        return f
+        # frames found by find_peaks are owned by their Python Frames,
+        # not by the detector
+        return self.frames[i]
 
     def find_peaks_in_frame(self, Frame frame not None):
         self.thisptr.find_peaks_in_frame(frame.thisptr)
         return frame.peaks
 
-    def find_peaks(self, np.ndarray[dtype_t, ndim=1] audio):
+    def find_peaks(self, np.ndarray[dtype_t, ndim=1] audio,
+                   FrameSet frame_set=None):
+        """
+        Find the spectral peaks in audio, returning a list of Frames.
+        If frame_set is given, the peaks are stored in it instead and
+        frame_set is returned.
+        """
+        audio = np.ascontiguousarray(audio)
         self.frames = []
+        if frame_set is not None:
+            frame_set.clear()
+            frame_set.max_peaks = self.max_peaks
 
         cdef int pos = 0
         while pos <= len(audio) - self.hop_size:
@@ -79,19 +97,60 @@ cdef class PeakDetection:
 
             frame = Frame(self.frame_size)
 
+            # frames are views of the input signal, only the final frame
+            # is copied (and zero-padded)
             if pos < len(audio) - self.frame_size:
-                frame.audio = audio[pos:pos + self.frame_size]
+                frame.audio_view(audio[pos:pos + self.frame_size])
             else:
-                frame.audio = np.hstack((
+                frame.audio_view(np.hstack((
                     audio[pos:len(audio)],
                     np.zeros(self.frame_size - (len(audio) - pos))
-                ))
+                )))
 
             frame.max_peaks = self.max_peaks
             self.find_peaks_in_frame(frame)
-            self.frames.append(frame)
+            if frame_set is None:
+                self.frames.append(frame)
+            else:
+                frame_set.add_frame(frame)
             pos += self.hop_size
 
+        if frame_set is not None:
+            return frame_set
+        return self.frames
+
+    cdef object _find_peaks_native(self, np.ndarray[dtype_t, ndim=1] audio,
+                                   FrameSet frame_set):
+        # find peaks using the C++ find_peaks implementation, the GIL is
+        # released while the frames are analysed
+        audio = np.ascontiguousarray(audio)
+        self.frames = []
+        cdef int audio_size = len(audio)
+        cdef double* audio_data = <double*> audio.data
+        cdef c_FrameSet* c_frame_set
+        if frame_set is not None:
+            frame_set._check_resize()
+            c_frame_set = frame_set.thisptr
+            with nogil:
+                self.thisptr.find_peaks(audio_size, audio_data, c_frame_set)
+            return frame_set
+
+        cdef vector[c_Frame*] output_frames
+        cdef Frame f
+        with nogil:
+            self.thisptr.find_peaks(audio_size, audio_data)
+
+        # the Python Frames take ownership of the frames, so they are not
+        # reused by later calls, and keep audio alive as the frames are
+        # views of it
+        output_frames = self.thisptr.take_frames()
+        for i in range(output_frames.size()):
+            f = Frame(output_frames[i].size(), False)
+            f.set_frame(output_frames[i])
+            f.created = True
+            if output_frames[i].audio_is_view():
+                f._audio_source = audio
+            self.frames.append(f)
         return self.frames
 
 
@@ -106,6 +165,16 @@ cdef class MQPeakDetection(PeakDetection):
             del self.thisptr
             self.thisptr = <c_PeakDetection*>0
 
+    def find_peaks(self, np.ndarray[dtype_t, ndim=1] audio,
+                   FrameSet frame_set=None):
+        """
+        Find the spectral peaks in audio, returning a list of Frames.
+        Frames are analysed in batches, with the spectra of all frames
+        in a batch computed by a single FFT plan. If num_threads > 1,
+        the frames are split between num_threads threads.
+        """
+        return self._find_peaks_native(audio, frame_set)
+
 
 cdef class SMSPeakDetection(PeakDetection):
     def __cinit__(self):
@@ -118,15 +187,23 @@ cdef class SMSPeakDetection(PeakDetection):
             del self.thisptr
             self.thisptr = <c_PeakDetection*>0
 
-    def find_peaks(self, np.ndarray[dtype_t, ndim=1] audio):
-        self.frames = []
-        cdef vector[c_Frame*] output_frames = \
-            self.thisptr.find_peaks(len(audio), <double*> audio.data)
-        for i in range(output_frames.size()):
-            f = Frame(output_frames[i].size(), False)
-            f.set_frame(output_frames[i])
-            self.frames.append(f)
-        return self.frames
+    def configure(self, **params):
+        """
+        Set several parameters at once, re-initialising the SMS analysis
+        only once instead of after every change, for example
+        pd.configure(hop_size=256, max_peaks=50).
+        """
+        _configure(self, params, self._begin_configure, self._end_configure)
+
+    def _begin_configure(self):
+        (<c_SMSPeakDetection*>self.thisptr).begin_configure()
+
+    def _end_configure(self):
+        (<c_SMSPeakDetection*>self.thisptr).end_configure()
+
+    def find_peaks(self, np.ndarray[dtype_t, ndim=1] audio,
+                   FrameSet frame_set=None):
+        return self._find_peaks_native(audio, frame_set)
 
 
 cdef class SndObjPeakDetection(PeakDetection):
@@ -151,3 +228,73 @@ cdef class LorisPeakDetection(PeakDetection):
         if self.thisptr:
             del self.thisptr
             self.thisptr = <c_PeakDetection*>0
+
+    def find_peaks(self, np.ndarray[dtype_t, ndim=1] audio,
+                   FrameSet frame_set=None):
+        """
+        Find the spectral peaks in audio, returning a list of Frames.
+        If num_threads > 1 (and the frame size is static), the frames are
+        split between num_threads threads.
+        """
+        return self._find_peaks_native(audio, frame_set)
+
+
+cdef np.ndarray _twm_peak_data(peaks):
+    if len(peaks) and isinstance(peaks[0], Peak):
+        peaks = [(p.amplitude, p.frequency, p.phase, p.bandwidth)
+                 for p in peaks]
+    a = np.asarray(peaks)
+    if a.dtype.names:
+        a = np.ascontiguousarray(a, dtype=peak_dtype).view(np.float64)
+    return np.ascontiguousarray(a, dtype=np.float64).reshape(-1, 4)
+
+
+def twm(peaks, double f_min=20.0, double f_max=3000.0, double f_step=10.0):
+    """
+    Estimate the fundamental frequency of peaks using the two-way mismatch
+    algorithm (native implementation). peaks can be a list of Peaks,
+    a structured peak array (see Frame.peak_array) or an (n, 4) array.
+    Returns 0.0 if there are no peaks.
+    """
+    cdef np.ndarray[dtype_t, ndim=2] a = _twm_peak_data(peaks)
+    if a.shape[0] == 0:
+        return 0.0
+    return c_twm(a.shape[0], <c_Peak*> a.data, f_min, f_max, f_step)
+
+
+def twm_frames(frames, double f_min=20.0, double f_max=3000.0,
+               double f_step=10.0):
+    """
+    Estimate the fundamental frequency of each frame in frames (a FrameSet
+    or a list of Frames) using the native two-way mismatch implementation.
+    Peaks are read from the frames without copying them to Python objects.
+    Returns an array with one estimate per frame.
+    """
+    cdef int i
+    cdef Frame frame
+    cdef FrameSet frame_set
+    cdef np.ndarray[dtype_t, ndim=3] peaks
+    cdef np.ndarray[dtype_t, ndim=1] estimates = np.zeros(len(frames))
+
+    if isinstance(frames, FrameSet):
+        frame_set = frames
+        if frame_set.max_peaks == 0:
+            return estimates
+        peaks = np.ascontiguousarray(np.dstack((
+            frame_set.peak_amplitude, frame_set.peak_frequency,
+            frame_set.peak_phase, frame_set.peak_bandwidth
+        )))
+        num_peaks = frame_set.num_peaks
+        for i in range(len(frame_set)):
+            if num_peaks[i]:
+                estimates[i] = c_twm(num_peaks[i], <c_Peak*> &peaks[i, 0, 0],
+                                     f_min, f_max, f_step)
+    else:
+        for i in range(len(frames)):
+            frame = frames[i]
+            if frame.thisptr.num_peaks():
+                estimates[i] = c_twm(frame.thisptr.num_peaks(),
+                                     frame.thisptr.peaks(),
+                                     f_min, f_max, f_step)
+    return estimates
+
@@ -336,12 +336,23 @@ class Synthesis(object):
         "Synthesises a frame of audio, given a list of peaks from tracks"
         raise Exception("NotYetImplemented")
 
-    def synth(self, frames):
-        "Synthesise audio from the given partials"
-        audio_out = np.array([], dtype=simpl.dtype)
+    def synth(self, frames, output=None):
+        """
+        Synthesise audio from the given partials. Each frame is written to
+        output (an AudioWriter or an array, see simpl.audio_writer) as it
+        is synthesised, and output is returned. If output is None, a new
+        array is returned.
+        """
+        # frames can be any iterable, such as a generator
+        size = 0
+        if hasattr(frames, '__len__'):
+            size = len(frames) * self.hop_size
+        writer = simpl.audio_writer(output, size)
         for frame in frames:
-            audio_out = np.hstack((audio_out, self.synth_frame(frame)))
-        return audio_out
+            writer.write(self.synth_frame(frame))
+        if output is None:
+            return writer.audio
+        return output
 
 
 class Residual(object):
@@ -372,34 +383,43 @@ class Residual(object):
         "Computes the residual signal for a frame of audio"
         raise Exception("NotYetImplemented")
 
-    def find_residual(self, synth, original):
-        "Calculate and return the residual signal"
-        num_frames = len(original) / self.hop_size
-        residual = np.array([], dtype=simpl.dtype)
-        sample_offset = 0
+    def find_residual(self, synth, original, output=None):
+        """
+        Calculate the residual signal. Each hop is written to output (an
+        AudioWriter or an array, see simpl.audio_writer) as it is computed,
+        and output is returned. If output is None, a new array is returned.
+        """
+        num_frames = len(original) // self.hop_size
+        writer = simpl.audio_writer(output, num_frames * self.hop_size)
 
         for i in range(num_frames):
-            synth_frame = synth[sample_offset:sample_offset + self.hop_size]
-            original_frame = original[sample_offset:sample_offset + self.hop_size]
-            residual = np.hstack((residual,
-                                  self.residual_frame(synth_frame, original_frame)))
-            sample_offset += self.hop_size
-        return residual
+            start = i * self.hop_size
+            synth_frame = synth[start:start + self.hop_size]
+            original_frame = original[start:start + self.hop_size]
+            writer.write(self.residual_frame(synth_frame, original_frame))
+        if output is None:
+            return writer.audio
+        return output
 
     def synth_frame(self, synth, original):
         "Calculate and return one frame of the synthesised residual signal"
         raise Exception("NotYetImplemented")
 
-    def synth(self, synth, original):
-        "Calculate and return a synthesised residual signal"
-        num_frames = len(original) / self.hop_size
-        residual = np.array([], dtype=simpl.dtype)
-        sample_offset = 0
+    def synth(self, synth, original, output=None):
+        """
+        Calculate a synthesised residual signal. Each hop is written to
+        output (an AudioWriter or an array, see simpl.audio_writer) as it is
+        computed, and output is returned. If output is None, a new array is
+        returned.
+        """
+        num_frames = len(original) // self.hop_size
+        writer = simpl.audio_writer(output, num_frames * self.hop_size)
 
         for i in range(num_frames):
-            synth_frame = synth[sample_offset:sample_offset + self.hop_size]
-            original_frame = original[sample_offset:sample_offset + self.hop_size]
-            residual = np.hstack((residual,
-                                  self.synth_frame(synth_frame, original_frame)))
-            sample_offset += self.hop_size
-        return residual
+            start = i * self.hop_size
+            synth_frame = synth[start:start + self.hop_size]
+            original_frame = original[start:start + self.hop_size]
+            writer.write(self.synth_frame(synth_frame, original_frame))
+        if output is None:
+            return writer.audio
+        return output
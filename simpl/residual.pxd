@@ -29,5 +29,7 @@ cdef extern from "../src/simpl/residual.h" namespace "simpl":
 
     cdef cppclass c_SMSResidual "simpl::SMSResidual"(c_Residual):
         c_SMSResidual()
+        void begin_configure()
+        void end_configure()
         int num_stochastic_coeffs()
         void num_stochastic_coeffs(int new_num_stochastic_coeffs)
@@ -8,6 +8,9 @@ from base cimport Frame
 from base cimport c_Peak
 from base cimport c_Frame
 
+include "fft_plans.pxi"
+include "configure.pxi"
+
 
 cdef class Residual:
     cdef c_Residual* thisptr
@@ -84,3 +87,17 @@ cdef class SMSResidual(Residual):
     property num_stochastic_coeffs:
         def __get__(self): return (<c_SMSResidual*>self.thisptr).num_stochastic_coeffs()
         def __set__(self, int i): (<c_SMSResidual*>self.thisptr).num_stochastic_coeffs(i)
+
+    def configure(self, **params):
+        """
+        Set several parameters at once, re-initialising the SMS residual analysis
+        only once instead of after every change, for example
+        res.configure(hop_size=256, num_stochastic_coeffs=64).
+        """
+        _configure(self, params, self._begin_configure, self._end_configure)
+
+    def _begin_configure(self):
+        (<c_SMSResidual*>self.thisptr).begin_configure()
+
+    def _end_configure(self):
+        (<c_SMSResidual*>self.thisptr).end_configure()
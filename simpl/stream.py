@@ -0,0 +1,121 @@
+import numpy as np
+import simpl
+
+
+class StreamAnalysis(object):
+    """
+    Analyse audio that arrives in blocks of any size, such as the buffers
+    passed to a soundcard callback.
+
+    Samples are kept in a ring buffer that holds one frame. As soon as a
+    frame is complete its peaks are found with peak_detection (and its
+    partials with partial_tracking, if given) and it is returned by the
+    call to process that completed it. Frames start every hop_size
+    samples, so (for hop sizes up to the frame size) the frames returned
+    by process and flush are the same as those returned by
+    peak_detection.find_peaks for the whole signal.
+
+    Memory use depends on the frame size only, not on the length of the
+    stream.
+    """
+    def __init__(self, peak_detection, partial_tracking=None):
+        self.peak_detection = peak_detection
+        self.partial_tracking = partial_tracking
+        self._buffer = np.zeros(peak_detection.frame_size, dtype=simpl.dtype)
+        self.reset()
+
+    def reset(self):
+        "Discard any buffered audio, the next sample starts a new frame."
+        self._start = 0  # position of the next frame in the ring buffer
+        self._count = 0  # number of samples buffered for the next frame
+        self._skip = 0  # samples between frames, if hop_size > frame_size
+        self._next_frame()
+
+    def _next_frame(self):
+        pd = self.peak_detection
+        if not pd.static_frame_size:
+            pd.frame_size = pd.next_frame_size()
+        self._frame_size = pd.frame_size
+
+        if self._frame_size > len(self._buffer):
+            buffer = np.zeros(self._frame_size, dtype=simpl.dtype)
+            self._read(buffer[:self._count])
+            self._buffer = buffer
+            self._start = 0
+
+    def _read(self, out):
+        # copy the first len(out) buffered samples to out
+        n = min(len(out), len(self._buffer) - self._start)
+        out[:n] = self._buffer[self._start:self._start + n]
+        out[n:] = self._buffer[:len(out) - n]
+
+    def _write(self, samples):
+        # append samples to the buffered samples
+        pos = (self._start + self._count) % len(self._buffer)
+        n = min(len(samples), len(self._buffer) - pos)
+        self._buffer[pos:pos + n] = samples[:n]
+        self._buffer[:len(samples) - n] = samples[n:]
+        self._count += len(samples)
+
+    def _analyse_frame(self):
+        pd = self.peak_detection
+        pt = self.partial_tracking
+
+        frame = simpl.Frame(self._frame_size)
+        frame.max_peaks = pd.max_peaks
+        self._read(frame.audio)
+        pd.find_peaks_in_frame(frame)
+        if pt is not None:
+            if frame.max_partials != pt.max_partials:
+                frame.max_partials = pt.max_partials
+            pt.update_partials(frame)
+
+        # drop the samples before the start of the next frame
+        hop_size = pd.hop_size
+        if hop_size < self._count:
+            self._start = (self._start + hop_size) % len(self._buffer)
+            self._count -= hop_size
+        else:
+            self._skip = hop_size - self._count
+            self._start = 0
+            self._count = 0
+
+        self._next_frame()
+        return frame
+
+    def process(self, audio):
+        """
+        Add a block of audio samples to the stream, returning a list of the
+        frames that were completed by it (possibly empty).
+        """
+        frames = []
+        pos = 0
+        while pos < len(audio):
+            if self._skip:
+                n = min(self._skip, len(audio) - pos)
+                self._skip -= n
+                pos += n
+                continue
+
+            n = min(self._frame_size - self._count, len(audio) - pos)
+            self._write(audio[pos:pos + n])
+            pos += n
+            if self._count == self._frame_size:
+                frames.append(self._analyse_frame())
+        return frames
+
+    def flush(self):
+        """
+        End the stream. The remaining frames that start at least hop_size
+        samples before the end of the stream are zero-padded, analysed and
+        returned, and the stream is reset.
+        """
+        frames = []
+        while not self._skip and self._count >= self.peak_detection.hop_size:
+            count = self._count
+            self._write(np.zeros(self._frame_size - count, dtype=simpl.dtype))
+            frames.append(self._analyse_frame())
+            # the padding is not part of the next frame
+            self._count = max(count - self.peak_detection.hop_size, 0)
+        self.reset()
+        return frames
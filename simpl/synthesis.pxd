@@ -5,6 +5,7 @@ from libcpp.vector cimport vector
 
 from base cimport c_Peak
 from base cimport c_Frame
+from base cimport c_FrameSet
 from base cimport string
 from base cimport dtype_t
 from base import dtype
@@ -22,14 +23,21 @@ cdef extern from "../src/simpl/synthesis.h" namespace "simpl":
         void sampling_rate(int new_sampling_rate)
         int max_partials()
         void max_partials(int new_max_partials)
+        int num_threads()
+        void num_threads(int new_num_threads)
         void synth_frame(c_Frame* frame)
         vector[c_Frame*] synth(vector[c_Frame*] frames)
+        void synth(c_FrameSet* frame_set, int output_size, double* output)
 
     cdef cppclass c_MQSynthesis "simpl::MQSynthesis"(c_Synthesis):
         c_MQSynthesis()
+        int oscillator_mode()
+        void oscillator_mode(int new_oscillator_mode)
 
     cdef cppclass c_SMSSynthesis "simpl::SMSSynthesis"(c_Synthesis):
         c_SMSSynthesis()
+        void begin_configure()
+        void end_configure()
         int num_stochastic_coeffs()
         int stochastic_type()
         int det_synthesis_type()
@@ -42,3 +50,6 @@ cdef extern from "../src/simpl/synthesis.h" namespace "simpl":
         c_LorisSynthesis()
         double bandwidth()
         void bandwidth(double new_bandwidth)
+
+    cdef cppclass c_IFFTSynthesis "simpl::IFFTSynthesis"(c_Synthesis):
+        c_IFFTSynthesis()
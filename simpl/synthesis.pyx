@@ -5,9 +5,13 @@ from libcpp.vector cimport vector
 
 from base cimport Peak
 from base cimport Frame
+from base cimport FrameSet
 from base cimport c_Peak
 from base cimport c_Frame
 
+include "fft_plans.pxi"
+include "configure.pxi"
+
 
 cdef class Synthesis:
     cdef c_Synthesis* thisptr
@@ -35,11 +39,23 @@ cdef class Synthesis:
         def __get__(self): return self.thisptr.max_partials()
         def __set__(self, int i): self.thisptr.max_partials(i)
 
+    property num_threads:
+        """
+        Number of threads used to synthesise the partials of each frame
+        (default 1). Supported by MQSynthesis, SndObjSynthesis and
+        LorisSynthesis, the output only depends on the number of threads.
+        """
+        def __get__(self): return self.thisptr.num_threads()
+        def __set__(self, int i): self.thisptr.num_threads(i)
+
     def synth_frame(self, Frame frame not None):
         self.thisptr.synth_frame(frame.thisptr)
         return frame.synth
 
     def synth(self, frames):
+        if isinstance(frames, FrameSet):
+            return self._synth_frame_set(frames)
+
         cdef int hop = self.thisptr.hop_size()
         cdef np.ndarray[dtype_t, ndim=1] output = np.zeros(len(frames) * hop)
         for i in range(len(frames)):
@@ -49,8 +65,25 @@ cdef class Synthesis:
             output[i * hop:(i + 1) * hop] = frames[i].synth
         return output
 
+    def _synth_frame_set(self, FrameSet frame_set not None):
+        cdef int hop = self.thisptr.hop_size()
+        cdef np.ndarray[dtype_t, ndim=1] output = np.zeros(len(frame_set) * hop)
+        cdef np.ndarray[dtype_t, ndim=1] silence = np.zeros(hop)
+        # one Frame is reused for every row of the set
+        frame = Frame(self.thisptr.frame_size())
+        frame.synth_size = hop
+        for i in range(len(frame_set)):
+            frame_set.thisptr.read_frame(i, (<Frame>frame).thisptr)
+            frame.synth = silence
+            self.synth_frame(frame)
+            output[i * hop:(i + 1) * hop] = frame.synth
+        return output
+
 
 cdef class MQSynthesis(Synthesis):
+    OSC_EXACT = 0
+    OSC_FAST = 1
+
     def __cinit__(self):
         if self.thisptr:
             del self.thisptr
@@ -61,6 +94,18 @@ cdef class MQSynthesis(Synthesis):
             del self.thisptr
             self.thisptr = <c_Synthesis*>0
 
+    property oscillator_mode:
+        """
+        OSC_EXACT (the default) or OSC_FAST, which synthesises all partials
+        together as a vectorised oscillator bank. OSC_FAST output differs
+        from OSC_EXACT by less than 1e-9 times the sum of the amplitudes.
+        """
+        def __get__(self): return (<c_MQSynthesis*>self.thisptr).oscillator_mode()
+        def __set__(self, int i):
+            if i not in (self.OSC_EXACT, self.OSC_FAST):
+                raise ValueError('invalid oscillator mode: %d' % i)
+            (<c_MQSynthesis*>self.thisptr).oscillator_mode(i)
+
 
 cdef class SMSSynthesis(Synthesis):
     SMS_DET_IFFT = 0
@@ -88,6 +133,20 @@ cdef class SMSSynthesis(Synthesis):
         def __get__(self): return (<c_SMSSynthesis*>self.thisptr).det_synthesis_type()
         def __set__(self, int i): (<c_SMSSynthesis*>self.thisptr).det_synthesis_type(i)
 
+    def configure(self, **params):
+        """
+        Set several parameters at once, re-initialising the SMS synthesis
+        only once instead of after every change, for example
+        synth.configure(hop_size=256, max_partials=50).
+        """
+        _configure(self, params, self._begin_configure, self._end_configure)
+
+    def _begin_configure(self):
+        (<c_SMSSynthesis*>self.thisptr).begin_configure()
+
+    def _end_configure(self):
+        (<c_SMSSynthesis*>self.thisptr).end_configure()
+
 
 cdef class SndObjSynthesis(Synthesis):
     def __cinit__(self):
@@ -115,3 +174,20 @@ cdef class LorisSynthesis(Synthesis):
     property bandwidth:
         def __get__(self): return (<c_LorisSynthesis*>self.thisptr).bandwidth()
         def __set__(self, double d): (<c_LorisSynthesis*>self.thisptr).bandwidth(d)
+
+
+cdef class IFFTSynthesis(Synthesis):
+    """
+    Synthesises the partials of each frame with one inverse FFT and
+    overlap-add (50% overlap, FFT size 2 * hop_size). Works with partials
+    from any analysis backend, the output is delayed by hop_size samples.
+    """
+    def __cinit__(self):
+        if self.thisptr:
+            del self.thisptr
+        self.thisptr = new c_IFFTSynthesis()
+
+    def __dealloc__(self):
+        if self.thisptr:
+            del self.thisptr
+            self.thisptr = <c_Synthesis*>0
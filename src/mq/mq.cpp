@@ -1,4 +1,6 @@
 #include "mq.h"
+#include "window_cache.h"
+#include <algorithm>
 #include <cstdio>
 
 using namespace simpl;
@@ -7,6 +9,10 @@ using namespace simpl;
 // Windowing
 
 void hamming_window(int window_size, s_sample *window) {
+  if (simpl_window_lookup("mq_hamming", window_size, 0, NULL, window)) {
+    return;
+  }
+
   s_sample sum = 0;
   for (int i = 0; i < window_size; i++) {
     window[i] = 0.54 - (0.46 * cos(2.0 * M_PI * i / (window_size - 1)));
@@ -16,6 +22,8 @@ void hamming_window(int window_size, s_sample *window) {
   for (int i = 0; i < window_size; i++) {
     window[i] /= sum;
   }
+
+  simpl_window_store("mq_hamming", window_size, 0, NULL, window);
 }
 
 // ----------------------------------------------------------------------------
@@ -31,8 +39,25 @@ int simpl::init_mq(MQParameters *params) {
       (s_sample *)fftw_malloc(sizeof(s_sample) * params->frame_size);
   params->fft_out =
       (fftw_complex *)fftw_malloc(sizeof(fftw_complex) * params->num_bins);
-  params->fft_plan = fftw_plan_dft_r2c_1d(params->frame_size, params->fft_in,
-                                          params->fft_out, FFTW_ESTIMATE);
+  params->fft_plan =
+      fft_plan_r2c(params->frame_size, params->fft_in, params->fft_out);
+  params->magnitudes = new s_sample[params->num_bins];
+  params->peaks = new MQPeak[params->num_bins];
+
+  // allocate memory for batched FFTs, frames are stored in consecutive
+  // rows of batch_in and transformed by a single plan
+  if (params->batch_size > 0) {
+    params->batch_in = (s_sample *)fftw_malloc(
+        sizeof(s_sample) * params->frame_size * params->batch_size);
+    params->batch_out = (fftw_complex *)fftw_malloc(
+        sizeof(fftw_complex) * params->num_bins * params->batch_size);
+    params->batch_plan =
+        fft_plan(FFT_R2C, params->frame_size, params->batch_size,
+                 params->batch_in, params->batch_out);
+    params->batch_magnitudes =
+        new s_sample[params->num_bins * params->batch_size];
+  }
+
   // set other variables to defaults
   reset_mq(params);
   return 0;
@@ -48,11 +73,25 @@ int simpl::destroy_mq(MQParameters *params) {
       fftw_free(params->fft_in);
     if (params->fft_out)
       fftw_free(params->fft_out);
-    fftw_destroy_plan(params->fft_plan);
+    if (params->magnitudes)
+      delete[] params->magnitudes;
+    if (params->peaks)
+      delete[] params->peaks;
+
+    if (params->batch_in) {
+      fftw_free(params->batch_in);
+      fftw_free(params->batch_out);
+      delete[] params->batch_magnitudes;
+    }
 
     params->window = NULL;
     params->fft_in = NULL;
     params->fft_out = NULL;
+    params->magnitudes = NULL;
+    params->peaks = NULL;
+    params->batch_in = NULL;
+    params->batch_out = NULL;
+    params->batch_magnitudes = NULL;
   }
   return 0;
 }
@@ -60,320 +99,261 @@ int simpl::destroy_mq(MQParameters *params) {
 // ----------------------------------------------------------------------------
 // Peak Detection
 
-// Add new_peak to the doubly linked list of peaks, keeping peaks sorted
-// with the largest amplitude peaks at the start of the list
-void simpl::mq_add_peak(MQPeak *new_peak, MQPeakList *peak_list) {
-  while (true) {
-    if (peak_list->peak) {
-      if (peak_list->peak->amplitude > new_peak->amplitude) {
-        if (peak_list->next) {
-          peak_list = peak_list->next;
-        } else {
-          MQPeakList *new_node = new MQPeakList();
-          new_node->peak = new_peak;
-          new_node->prev = peak_list;
-          new_node->next = NULL;
-          peak_list->next = new_node;
-          return;
-        }
-      } else {
-        MQPeakList *new_node = new MQPeakList();
-        new_node->peak = peak_list->peak;
-        new_node->prev = peak_list;
-        new_node->next = peak_list->next;
-        peak_list->next = new_node;
-        peak_list->peak = new_peak;
-        return;
-      }
-    } else {
-      // should only happen for the first peak
-      peak_list->peak = new_peak;
-      return;
-    }
-  }
+s_sample get_magnitude(s_sample x, s_sample y) {
+  return sqrt((x * x) + (y * y));
 }
 
-void simpl::delete_peak_list(MQPeakList *peak_list) {
-  while (peak_list && peak_list->next) {
-    if (peak_list->peak) {
-      delete peak_list->peak;
-      peak_list->peak = NULL;
-    }
-    MQPeakList *temp = peak_list->next;
-    delete peak_list;
-    peak_list = temp;
-  }
-  if (peak_list) {
-    if (peak_list->peak) {
-      delete peak_list->peak;
-      peak_list->peak = NULL;
-    }
-    peak_list->next = NULL;
-    peak_list->prev = NULL;
-    delete peak_list;
-    peak_list = NULL;
+s_sample get_phase(s_sample x, s_sample y) { return atan2(y, x); }
+
+// Peaks are selected by amplitude, then (for equal amplitudes) higher bins
+// are preferred
+static bool mq_compare_amplitudes(const MQPeak &a, const MQPeak &b) {
+  if (a.amplitude != b.amplitude) {
+    return a.amplitude > b.amplitude;
   }
+  return a.bin > b.bin;
 }
 
-s_sample get_magnitude(s_sample x, s_sample y) {
-  return sqrt((x * x) + (y * y));
+static bool mq_compare_bins(const MQPeak &a, const MQPeak &b) {
+  return a.bin < b.bin;
 }
 
-s_sample get_phase(s_sample x, s_sample y) { return atan2(y, x); }
-
-MQPeakList *simpl::mq_find_peaks(int signal_size, s_sample *signal,
-                                 MQParameters *params) {
+// Find the max_peaks largest peaks in a magnitude spectrum. The peaks are
+// stored in params->peaks sorted by frequency, the number of peaks is
+// returned.
+static int mq_select_peaks(s_sample *magnitudes, fftw_complex *spectrum,
+                           MQParameters *params) {
   int num_peaks = 0;
-  s_sample prev_amp, current_amp, next_amp;
-  MQPeakList *peak_list = new MQPeakList();
-
-  // take fft of the signal
-  memcpy(params->fft_in, signal, sizeof(s_sample) * params->frame_size);
-  for (int i = 0; i < params->frame_size; i++) {
-    params->fft_in[i] *= params->window[i];
-  }
-  fftw_execute(params->fft_plan);
-
-  // get initial magnitudes
-  prev_amp = get_magnitude(params->fft_out[0][0], params->fft_out[0][1]);
-  current_amp = get_magnitude(params->fft_out[1][0], params->fft_out[1][1]);
-
-  // find all peaks in the amplitude spectrum
-  for (int i = 1; i < params->num_bins - 1; i++) {
-    next_amp =
-        get_magnitude(params->fft_out[i + 1][0], params->fft_out[i + 1][1]);
-
-    if ((current_amp > prev_amp) && (current_amp > next_amp) &&
-        (current_amp > params->peak_threshold)) {
-      MQPeak *p = new MQPeak();
-      p->amplitude = current_amp;
-      p->frequency = i * params->fundamental;
-
-      p->phase = get_phase(params->fft_out[i][0], params->fft_out[i][1]);
-      p->bin = i;
-      p->next = NULL;
-      p->prev = NULL;
-
-      // add it to the appropriate position in the list of Peaks
-      mq_add_peak(p, peak_list);
+  int num_bins = params->num_bins;
+  MQPeak *peaks = params->peaks;
+
+  for (int i = 1; i < num_bins - 1; i++) {
+    if ((magnitudes[i] > magnitudes[i - 1]) &&
+        (magnitudes[i] > magnitudes[i + 1]) &&
+        (magnitudes[i] > params->peak_threshold)) {
+      peaks[num_peaks].amplitude = magnitudes[i];
+      peaks[num_peaks].bin = i;
       num_peaks++;
     }
-    prev_amp = current_amp;
-    current_amp = next_amp;
   }
 
   // limit peaks to a maximum of max_peaks
   if (num_peaks > params->max_peaks) {
-    MQPeakList *current = peak_list;
-    for (int i = 0; i < params->max_peaks - 1; i++) {
-      current = current->next;
-    }
-
-    delete_peak_list(current->next);
-    current->next = NULL;
+    std::nth_element(peaks, peaks + params->max_peaks, peaks + num_peaks,
+                     mq_compare_amplitudes);
     num_peaks = params->max_peaks;
   }
+  std::sort(peaks, peaks + num_peaks, mq_compare_bins);
+
+  for (int i = 0; i < num_peaks; i++) {
+    int bin = peaks[i].bin;
+    peaks[i].frequency = bin * params->fundamental;
+    peaks[i].phase = get_phase(spectrum[bin][0], spectrum[bin][1]);
+    peaks[i].next = NULL;
+    peaks[i].prev = NULL;
+  }
 
-  return simpl::mq_sort_peaks_by_frequency(peak_list, num_peaks);
+  return num_peaks;
 }
 
-// ----------------------------------------------------------------------------
-// Sorting
+// Find the max_peaks largest peaks in the spectrum of signal. The peaks are
+// stored in params->peaks sorted by frequency, the number of peaks is
+// returned.
+int simpl::mq_find_peaks(int signal_size, s_sample *signal,
+                         MQParameters *params) {
+  // take fft of the signal
+  memcpy(params->fft_in, signal, sizeof(s_sample) * params->frame_size);
+  for (int i = 0; i < params->frame_size; i++) {
+    params->fft_in[i] *= params->window[i];
+  }
+  fftw_execute_dft_r2c(params->fft_plan, params->fft_in, params->fft_out);
 
-MQPeakList *merge(MQPeakList *list1, MQPeakList *list2) {
-  MQPeakList *merged_head = NULL;
-  MQPeakList *merged_tail;
-
-  while (list1 || list2) {
-    if (list1 && list2) {
-      if (list1->peak->frequency <= list2->peak->frequency) {
-        if (!merged_head) {
-          merged_head = list1;
-          merged_tail = merged_head;
-        } else {
-          merged_tail->next = list1;
-          merged_tail = merged_tail->next;
-        }
-        list1 = list1->next;
-        merged_tail->next = NULL;
-      } else {
-        if (!merged_head) {
-          merged_head = list2;
-          merged_tail = merged_head;
-        } else {
-          merged_tail->next = list2;
-          merged_tail = merged_tail->next;
-        }
-        list2 = list2->next;
-        merged_tail->next = NULL;
-      }
-    } else if (list1) {
-      if (!merged_head) {
-        merged_head = list1;
-        merged_tail = merged_head;
-      } else {
-        merged_tail->next = list1;
-        merged_tail = merged_tail->next;
-      }
-      list1 = list1->next;
-      merged_tail->next = NULL;
-    } else if (list2) {
-      if (!merged_head) {
-        merged_head = list2;
-        merged_tail = merged_head;
-      } else {
-        merged_tail->next = list2;
-        merged_tail = merged_tail->next;
-      }
-      list2 = list2->next;
-      merged_tail->next = NULL;
-    }
+  for (int i = 0; i < params->num_bins; i++) {
+    params->magnitudes[i] =
+        get_magnitude(params->fft_out[i][0], params->fft_out[i][1]);
   }
 
-  return merged_head;
+  return mq_select_peaks(params->magnitudes, params->fft_out, params);
 }
 
-MQPeakList *merge_sort(MQPeakList *peak_list, int num_peaks) {
-  if (num_peaks <= 1) {
-    return peak_list;
-  }
-
-  MQPeakList *left;
-  MQPeakList *right;
-  MQPeakList *current = peak_list;
-  int n = 0;
-
-  // find the index of the middle peak. If we have an odd number,
-  // give the extra peak to the left
-  int middle;
-  if (num_peaks % 2 == 0) {
-    middle = num_peaks / 2;
-  } else {
-    middle = (num_peaks / 2) + 1;
+// ----------------------------------------------------------------------------
+// Batched Peak Detection
+//
+// Equivalent to calling mq_find_peaks for each frame, but the FFTs of up to
+// batch_size frames are computed by a single FFTW plan and the magnitude
+// spectra of all frames are computed in one pass.
+// Usage: mq_batch_frame for each frame, mq_batch_stft, then
+// mq_batch_find_peaks for each frame.
+
+// Copy a windowed frame of signal into row frame_number of the batch
+void simpl::mq_batch_frame(int frame_number, s_sample *signal,
+                           MQParameters *params) {
+  s_sample *in = params->batch_in + (frame_number * params->frame_size);
+  for (int i = 0; i < params->frame_size; i++) {
+    in[i] = signal[i] * params->window[i];
   }
+}
 
-  // split the peak list into left and right at the middle value
-  left = peak_list;
-  while (current) {
-    if (n == middle - 1) {
-      right = current->next;
-      current->next = NULL;
-      break;
-    }
+// Compute the magnitude spectra of the first num_frames frames of the batch
+void simpl::mq_batch_stft(int num_frames, MQParameters *params) {
+  fftw_execute_dft_r2c(params->batch_plan, params->batch_in,
+                       params->batch_out);
 
-    n++;
-    current = current->next;
+  int num_values = num_frames * params->num_bins;
+  for (int i = 0; i < num_values; i++) {
+    params->batch_magnitudes[i] =
+        get_magnitude(params->batch_out[i][0], params->batch_out[i][1]);
   }
+}
 
-  // recursively sort and merge
-  left = merge_sort(left, middle);
-  right = merge_sort(right, num_peaks - middle);
-  return merge(left, right);
+// Find the max_peaks largest peaks in frame frame_number of the batch.
+// The peaks are stored in params->peaks sorted by frequency,
+// the number of peaks is returned.
+int simpl::mq_batch_find_peaks(int frame_number, MQParameters *params) {
+  int num_bins = params->num_bins;
+  return mq_select_peaks(params->batch_magnitudes + (frame_number * num_bins),
+                         params->batch_out + (frame_number * num_bins),
+                         params);
 }
 
-// Sort peak_list into a list order from smaller to largest frequency.
-MQPeakList *simpl::mq_sort_peaks_by_frequency(MQPeakList *peak_list,
-                                              int num_peaks) {
-  if (!peak_list) {
-    return NULL;
-  } else if (num_peaks == 0) {
-    return peak_list;
-  } else {
-    return merge_sort(peak_list, num_peaks);
+// ----------------------------------------------------------------------------
+// Sorting
+
+// Peaks with equal frequencies are ordered by amplitude (largest first),
+// then by bin (highest first)
+static bool mq_compare_frequencies(const MQPeak &a, const MQPeak &b) {
+  if (a.frequency != b.frequency) {
+    return a.frequency < b.frequency;
   }
+  if (a.amplitude != b.amplitude) {
+    return a.amplitude > b.amplitude;
+  }
+  return a.bin > b.bin;
+}
+
+// Sort peak_list into order from smallest to largest frequency.
+void simpl::mq_sort_peaks_by_frequency(MQPeakList *peak_list) {
+  std::sort(peak_list->peaks, peak_list->peaks + peak_list->num_peaks,
+            mq_compare_frequencies);
 }
 
 // ----------------------------------------------------------------------------
 // Partial Tracking
+//
+// Both peak lists are sorted by frequency, so the candidates for a peak
+// are the peaks in a window of +/- matching_interval around its frequency.
+
+// Index of the first peak in peak_list with a frequency greater than
+// frequency - matching_interval
+static int first_candidate(s_sample frequency, MQPeakList *peak_list,
+                           MQParameters *params) {
+  s_sample min_frequency = frequency - params->matching_interval;
+  int low = 0;
+  int high = peak_list->num_peaks;
+
+  while (low < high) {
+    int middle = (low + high) / 2;
+    if (peak_list->peaks[middle].frequency <= min_frequency) {
+      low = middle + 1;
+    } else {
+      high = middle;
+    }
+  }
+  return low;
+}
 
-// Find a candidate match for peak in frame if one exists. This is the closest
-// (in frequency) match that is within the matching interval.
-MQPeak *find_closest_match(MQPeak *p, MQPeakList *peak_list,
-                           MQParameters *params, int backwards) {
-  MQPeakList *current = peak_list;
+// Find a candidate match for a peak at frequency in peak_list if one exists,
+// starting at peak number start. This is the closest (in frequency) unmatched
+// peak that is within the matching interval.
+static MQPeak *find_closest_match(s_sample frequency, MQPeakList *peak_list,
+                                  int start, MQParameters *params,
+                                  int backwards) {
   MQPeak *match = NULL;
-  s_sample best_distance = 44100.0;
-  s_sample distance;
+  s_sample best_distance = params->matching_interval;
 
-  while (current && current->peak) {
-    if (backwards) {
-      if (current->peak->prev) {
-        current = current->next;
-        continue;
-      }
-    } else {
-      if (current->peak->next) {
-        current = current->next;
-        continue;
-      }
+  for (int i = start; i < peak_list->num_peaks; i++) {
+    MQPeak *current = &(peak_list->peaks[i]);
+    s_sample distance = current->frequency - frequency;
+    if (distance >= params->matching_interval) {
+      break;
+    }
+
+    if ((backwards && current->prev) || (!backwards && current->next)) {
+      continue;
     }
 
-    distance = fabs(current->peak->frequency - p->frequency);
-    if ((distance < params->matching_interval) && (distance < best_distance)) {
+    distance = fabs(distance);
+    if (distance < best_distance) {
       best_distance = distance;
-      match = current->peak;
+      match = current;
     }
-    current = current->next;
   }
 
   return match;
 }
 
-// Returns the closest unmatched peak in frame with a frequency less
+// Returns the closest unmatched peak in peak_list with a frequency less
 // than p.frequency.
-MQPeak *free_peak_below(MQPeak *p, MQPeakList *peak_list) {
-  MQPeakList *current = peak_list;
-  MQPeak *free_peak = NULL;
-  s_sample closest_frequency = 44100;
-
-  while (current && current->peak) {
-    if (current->peak != p) {
-      // if current peak is unmatched, and it is closer to p than the
-      // last unmatched peak that we saw, save it
-      if (!current->peak->prev && (current->peak->frequency < p->frequency) &&
-          (fabs(current->peak->frequency - p->frequency) < closest_frequency)) {
-        closest_frequency = fabs(current->peak->frequency - p->frequency);
-        free_peak = current->peak;
-      }
+static MQPeak *free_peak_below(MQPeak *p, MQPeakList *peak_list) {
+  for (int i = (int)(p - peak_list->peaks) - 1; i >= 0; i--) {
+    MQPeak *current = &(peak_list->peaks[i]);
+    if (!current->prev && (current->frequency < p->frequency)) {
+      return current;
     }
-    current = current->next;
   }
-  return free_peak;
+  return NULL;
 }
 
 // MQ Partial Tracking
+//
+// Link the peaks in peak_list to the peaks of the previous frame
+// (params->prev_peaks). Both lists must be sorted by frequency, and the
+// previous list must stay valid until the next call.
 MQPeakList *simpl::mq_track_peaks(MQPeakList *peak_list, MQParameters *params) {
-  MQPeakList *current = peak_list;
+  MQPeakList *prev_peaks = params->prev_peaks;
 
   // MQ algorithm needs 2 frames of data, so do nothing if this is the
   // first frame
-  if (params->prev_peaks) {
+  if (prev_peaks) {
+    // previous peaks are visited in order of frequency, so the first
+    // candidate in this frame only moves forwards
+    int start = 0;
+
     // find all matches for previous peaks in the current frame
-    current = params->prev_peaks;
-    while (current && current->peak) {
-      MQPeak *match = find_closest_match(current->peak, peak_list, params, 1);
-      if (match) {
-        MQPeak *closest_to_cand =
-            find_closest_match(match, params->prev_peaks, params, 0);
-        if (closest_to_cand != current->peak) {
-          // see if the closest peak with lower frequency to the
-          // candidate is within the matching interval
-          MQPeak *lower = free_peak_below(match, peak_list);
-          if (lower) {
-            if (fabs(lower->frequency - current->peak->frequency) <
-                params->matching_interval) {
-              lower->prev = current->peak;
-              current->peak->next = lower;
-            }
+    for (int i = 0; i < prev_peaks->num_peaks; i++) {
+      MQPeak *current = &(prev_peaks->peaks[i]);
+      while ((start < peak_list->num_peaks) &&
+             (peak_list->peaks[start].frequency <=
+              current->frequency - params->matching_interval)) {
+        start++;
+      }
+
+      MQPeak *match =
+          find_closest_match(current->frequency, peak_list, start, params, 1);
+      if (!match) {
+        continue;
+      }
+
+      MQPeak *closest_to_cand = find_closest_match(
+          match->frequency, prev_peaks,
+          first_candidate(match->frequency, prev_peaks, params), params, 0);
+      if (closest_to_cand != current) {
+        // see if the closest peak with lower frequency to the
+        // candidate is within the matching interval
+        MQPeak *lower = free_peak_below(match, peak_list);
+        if (lower) {
+          if (fabs(lower->frequency - current->frequency) <
+              params->matching_interval) {
+            lower->prev = current;
+            current->next = lower;
           }
         }
-        // if closest_peak == peak, it is a definitive match
-        else {
-          match->prev = current->peak;
-          current->peak->next = match;
-        }
       }
-      current = current->next;
+      // if closest_peak == peak, it is a definitive match
+      else {
+        match->prev = current;
+        current->next = match;
+      }
     }
   }
 
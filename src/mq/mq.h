@@ -8,11 +8,15 @@
 #include <string.h>
 
 #include "base.h"
+#include "fft_plans.h"
 
 namespace simpl {
 
 // ---------------------------------------------------------------------------
 // MQPeak
+//
+// next and prev link a peak to the matching peaks in the following and
+// previous frames (set by mq_track_peaks).
 // ---------------------------------------------------------------------------
 class MQPeak {
 public:
@@ -35,17 +39,38 @@ public:
 
 // ---------------------------------------------------------------------------
 // MQPeakList
+//
+// The peaks of one frame, stored in a contiguous array. Lists are reused
+// from frame to frame, memory is only allocated when a frame has more
+// peaks than any previous one.
 // ---------------------------------------------------------------------------
 class MQPeakList {
+private:
+  MQPeakList(const MQPeakList &);
+  MQPeakList &operator=(const MQPeakList &);
+
 public:
-  MQPeakList *next;
-  MQPeakList *prev;
-  MQPeak *peak;
+  int num_peaks;
+  int capacity;
+  MQPeak *peaks;
 
   MQPeakList() {
-    next = NULL;
-    prev = NULL;
-    peak = NULL;
+    num_peaks = 0;
+    capacity = 0;
+    peaks = NULL;
+  }
+
+  ~MQPeakList() { delete[] peaks; }
+
+  // Set the number of peaks to new_num_peaks, the peaks are not
+  // initialised
+  void resize(int new_num_peaks) {
+    if (new_num_peaks > capacity) {
+      delete[] peaks;
+      peaks = new MQPeak[new_num_peaks];
+      capacity = new_num_peaks;
+    }
+    num_peaks = new_num_peaks;
   }
 };
 
@@ -63,9 +88,18 @@ public:
   s_sample *window;
   s_sample *fft_in;
   fftw_complex *fft_out;
-  fftw_plan fft_plan;
+  fftw_plan fft_plan; // owned by the FFT plan cache
+  s_sample *magnitudes;
+  MQPeak *peaks;
   MQPeakList *prev_peaks;
 
+  // batched analysis of batch_size frames at a time (if batch_size > 0)
+  int batch_size;
+  s_sample *batch_in;
+  fftw_complex *batch_out;
+  fftw_plan batch_plan;
+  s_sample *batch_magnitudes;
+
   MQParameters() {
     frame_size = 0;
     max_peaks = 0;
@@ -76,7 +110,13 @@ public:
     window = NULL;
     fft_in = NULL;
     fft_out = NULL;
+    magnitudes = NULL;
+    peaks = NULL;
     prev_peaks = NULL;
+    batch_size = 0;
+    batch_in = NULL;
+    batch_out = NULL;
+    batch_magnitudes = NULL;
   }
 };
 
@@ -86,14 +126,15 @@ public:
 int init_mq(MQParameters *params);
 void reset_mq(MQParameters *params);
 int destroy_mq(MQParameters *params);
-void mq_add_peak(MQPeak *new_peak, MQPeakList *peak_list);
-void delete_peak_list(MQPeakList *peak_list);
 
-MQPeakList *mq_sort_peaks_by_frequency(MQPeakList *peak_list, int num_peaks);
-MQPeakList *mq_find_peaks(int signal_size, s_sample *signal,
-                          MQParameters *params);
+void mq_sort_peaks_by_frequency(MQPeakList *peak_list);
+int mq_find_peaks(int signal_size, s_sample *signal, MQParameters *params);
 MQPeakList *mq_track_peaks(MQPeakList *peak_list, MQParameters *params);
 
+void mq_batch_frame(int frame_number, s_sample *signal, MQParameters *params);
+void mq_batch_stft(int num_frames, MQParameters *params);
+int mq_batch_find_peaks(int frame_number, MQParameters *params);
+
 } // end of namespace simpl
 
 #endif
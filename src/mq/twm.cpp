@@ -3,12 +3,20 @@
 
 using namespace simpl;
 
-int simpl::best_match(s_sample freq, std::vector<s_sample> candidates) {
+int simpl::best_match(s_sample freq, const std::vector<s_sample> &candidates) {
+  if (candidates.empty()) {
+    return 0;
+  }
+  return best_match(freq, candidates.size(), &candidates[0]);
+}
+
+int simpl::best_match(s_sample freq, int num_candidates,
+                      const s_sample *candidates) {
   s_sample best_diff = 22050.0;
   s_sample diff = 0.0;
   int best = 0;
 
-  for (int i = 0; i < candidates.size(); i++) {
+  for (int i = 0; i < num_candidates; i++) {
     diff = fabs(freq - candidates[i]);
     if (diff < best_diff) {
       best_diff = diff;
@@ -21,21 +29,33 @@ int simpl::best_match(s_sample freq, std::vector<s_sample> candidates) {
 
 s_sample simpl::twm(Peaks peaks, s_sample f_min, s_sample f_max,
                     s_sample f_step) {
+  std::vector<Peak> peak_data;
+  for (int i = 0; i < peaks.size(); i++) {
+    peak_data.push_back(*peaks[i]);
+  }
+
+  if (peak_data.size() == 0) {
+    return 0.0;
+  }
+  return twm(peak_data.size(), &peak_data[0], f_min, f_max, f_step);
+}
+
+s_sample simpl::twm(int num_peaks, Peak *peaks, s_sample f_min,
+                    s_sample f_max, s_sample f_step) {
   s_sample p = 0.5;
   s_sample q = 1.4;
   s_sample r = 0.5;
   s_sample rho = 0.33;
   int N = 30;
-  std::map<s_sample, s_sample> err;
 
-  if (peaks.size() == 0) {
+  if (num_peaks == 0) {
     return 0.0;
   }
 
   s_sample max_amp = 0.0;
-  for (int i = 0; i < peaks.size(); i++) {
-    if (peaks[i]->amplitude > max_amp) {
-      max_amp = peaks[i]->amplitude;
+  for (int i = 0; i < num_peaks; i++) {
+    if (peaks[i].amplitude > max_amp) {
+      max_amp = peaks[i].amplitude;
     }
   }
 
@@ -46,30 +66,35 @@ s_sample simpl::twm(Peaks peaks, s_sample f_min, s_sample f_max,
   // remove all peaks with amplitude of less than 10% of max
   // note: this is not in the TWM paper, found that it improved
   // accuracy however
-  for (int i = 0; i < peaks.size(); i++) {
-    if (peaks[i]->amplitude < (max_amp * 0.1)) {
-      peaks.erase(peaks.begin() + i);
+  std::vector<s_sample> peak_freqs;
+  std::vector<s_sample> peak_amps;
+  for (int i = 0; i < num_peaks; i++) {
+    if (peaks[i].amplitude >= (max_amp * 0.1)) {
+      peak_freqs.push_back(peaks[i].frequency);
+      peak_amps.push_back(peaks[i].amplitude);
     }
   }
 
-  // get the max frequency of the remaining peaks
-  s_sample max_freq = 0.0;
-  for (int i = 0; i < peaks.size(); i++) {
-    if (peaks[i]->frequency > max_freq) {
-      max_freq = peaks[i]->frequency;
-    }
-  }
+  int num_freqs = peak_freqs.size();
 
-  std::vector<s_sample> peak_freqs;
-  for (int i = 0; i < peaks.size(); i++) {
-    peak_freqs.push_back(peaks[i]->frequency);
+  // the weights f^-p only depend on the peak frequencies
+  std::vector<s_sample> peak_weights(num_freqs);
+  for (int i = 0; i < num_freqs; i++) {
+    peak_weights[i] = pow(peak_freqs[i], -p);
   }
 
+  std::vector<s_sample> harmonics;
+  harmonics.reserve(N);
+
+  // keep the value with the minimum total error
+  s_sample best_freq = 0;
+  s_sample min_error = 22050;
+
   s_sample f_current = f_min;
   while (f_current < f_max) {
     s_sample err_pm = 0.0;
     s_sample err_mp = 0.0;
-    std::vector<s_sample> harmonics;
+    harmonics.clear();
 
     for (s_sample f = f_current; f <= f_max; f += f_current) {
       harmonics.push_back(f);
@@ -81,40 +106,34 @@ s_sample simpl::twm(Peaks peaks, s_sample f_min, s_sample f_max,
     // calculate mismatch between predicted and actual peaks
     for (int i = 0; i < harmonics.size(); i++) {
       s_sample h = harmonics[i];
-      int k = best_match(h, peak_freqs);
-      s_sample f = peaks[k]->frequency;
-      s_sample a = peaks[k]->amplitude;
-      err_pm += (fabs(h - f) * pow(h, -p)) +
-                (((a / max_amp) * (q * fabs(h - f)) * (pow(h, -p) - r)));
+      int k = best_match(h, num_freqs, &peak_freqs[0]);
+      s_sample f = peak_freqs[k];
+      s_sample a = peak_amps[k];
+      s_sample w = pow(h, -p);
+      err_pm +=
+          (fabs(h - f) * w) + ((a / max_amp) * ((q * fabs(h - f) * w) - r));
     }
 
     // calculate the mismatch between actual and predicted peaks
-    for (int i = 0; i < peaks.size(); i++) {
-      s_sample f = peaks[i]->frequency;
-      s_sample a = peaks[i]->amplitude;
-      int k = best_match(f, harmonics);
+    for (int i = 0; i < num_freqs; i++) {
+      s_sample f = peak_freqs[i];
+      s_sample a = peak_amps[i];
+      int k = best_match(f, harmonics.size(), &harmonics[0]);
       s_sample h = harmonics[k];
-      err_mp += (fabs(f - h) * pow(f, -p)) +
-                ((a / max_amp) * (q * fabs(f - h)) * (pow(f, -p) - r));
+      s_sample w = peak_weights[i];
+      err_mp +=
+          (fabs(f - h) * w) + ((a / max_amp) * ((q * fabs(f - h) * w) - r));
     }
 
     // calculate the total error for f_current as a fundamental frequency
-    err[f_current] =
-        (err_pm / harmonics.size()) + (rho * err_mp / peaks.size());
+    s_sample err = (err_pm / harmonics.size()) + (rho * err_mp / num_freqs);
+    if (fabs(err) < min_error) {
+      min_error = fabs(err);
+      best_freq = f_current;
+    }
 
     f_current += f_step;
   }
 
-  // return the value with the minimum total error
-  s_sample best_freq = 0;
-  s_sample min_error = 22050;
-  for (std::map<s_sample, s_sample>::iterator i = err.begin(); i != err.end();
-       i++) {
-    if (fabs((*i).second) < min_error) {
-      min_error = fabs((*i).second);
-      best_freq = (*i).first;
-    }
-  }
-
   return best_freq;
 }
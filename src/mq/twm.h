@@ -8,10 +8,13 @@
 
 namespace simpl {
 
-int best_match(s_sample freq, std::vector<s_sample> candidates);
+int best_match(s_sample freq, const std::vector<s_sample> &candidates);
+int best_match(s_sample freq, int num_candidates, const s_sample *candidates);
 
 s_sample twm(Peaks peaks, s_sample f_min = 20.0, s_sample f_max = 3000.0,
              s_sample f_step = 10.0);
+s_sample twm(int num_peaks, Peak *peaks, s_sample f_min = 20.0,
+             s_sample f_max = 3000.0, s_sample f_step = 10.0);
 
 } // namespace simpl
 
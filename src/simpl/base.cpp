@@ -28,6 +28,11 @@ void Peak::reset() {
 
 // ---------------------------------------------------------------------------
 // Frame
+//
+// If the Frame manages its own memory (alloc_memory), the audio, synth and
+// residual buffers are not allocated when the Frame is created, but when
+// each one is first written to or accessed. A Frame that is only used for
+// peak detection never allocates its synth and residual buffers.
 // ---------------------------------------------------------------------------
 Frame::Frame() {
   _size = 512;
@@ -41,28 +46,27 @@ Frame::Frame(int frame_size, bool alloc_memory) {
   _synth_size = 512;
   _alloc_memory = alloc_memory;
   init();
+}
 
-  if (_alloc_memory) {
-    create_arrays();
-  }
+// Create a Frame whose audio buffer is a view of audio_view rather than a
+// copy. The synth and residual buffers are managed by the Frame.
+Frame::Frame(int frame_size, s_sample *audio_view, int audio_size) {
+  _size = frame_size;
+  _synth_size = 512;
+  _alloc_memory = true;
+  init();
+  this->audio_view(audio_view, audio_size);
 }
 
 Frame::~Frame() {
-  clear_peaks();
-  clear_partials();
-
-  for (int i = 0; i < _peaks.size(); i++) {
-    if (_peaks[i]) {
-      delete _peaks[i];
-      _peaks[i] = NULL;
-    }
+  if (_peaks) {
+    delete[] _peaks;
+    _peaks = NULL;
   }
 
-  for (int i = 0; i < _partials.size(); i++) {
-    if (_partials[i]) {
-      delete _partials[i];
-      _partials[i] = NULL;
-    }
+  if (_partials) {
+    delete[] _partials;
+    _partials = NULL;
   }
 
   if (_alloc_memory) {
@@ -79,22 +83,28 @@ void Frame::init() {
   _synth = NULL;
   _residual = NULL;
   _synth_residual = NULL;
+  _audio_is_view = false;
+  _peak_capacity = 0;
+  _partial_capacity = 0;
+  _peaks = NULL;
+  _partials = NULL;
   resize_peaks(_max_peaks);
   resize_partials(_max_partials);
 }
 
-void Frame::create_arrays() {
-  _audio = new s_sample[_size];
-  _residual = new s_sample[_size];
-  memset(_audio, 0.0, sizeof(s_sample) * _size);
-  memset(_residual, 0.0, sizeof(s_sample) * _size);
-  create_synth_arrays();
+s_sample *Frame::create_buffer(int size) {
+  s_sample *buffer = new s_sample[size];
+  memset(buffer, 0.0, sizeof(s_sample) * size);
+  return buffer;
 }
 
 void Frame::destroy_arrays() {
   if (_audio) {
-    delete[] _audio;
+    if (!_audio_is_view) {
+      delete[] _audio;
+    }
     _audio = NULL;
+    _audio_is_view = false;
   }
   if (_residual) {
     delete[] _residual;
@@ -104,13 +114,6 @@ void Frame::destroy_arrays() {
   destroy_synth_arrays();
 }
 
-void Frame::create_synth_arrays() {
-  _synth = new s_sample[_synth_size];
-  _synth_residual = new s_sample[_synth_size];
-  memset(_synth, 0.0, sizeof(s_sample) * _synth_size);
-  memset(_synth_residual, 0.0, sizeof(s_sample) * _synth_size);
-}
-
 void Frame::destroy_synth_arrays() {
   if (_synth) {
     delete[] _synth;
@@ -122,45 +125,40 @@ void Frame::destroy_synth_arrays() {
   }
 }
 
+// Peak storage is only reallocated if it needs to grow
 void Frame::resize_peaks(int new_num_peaks) {
-  clear_peaks();
-
-  for (int i = 0; i < _peaks.size(); i++) {
-    if (_peaks[i]) {
-      delete _peaks[i];
-      _peaks[i] = NULL;
+  if (new_num_peaks > _peak_capacity) {
+    if (_peaks) {
+      delete[] _peaks;
     }
+    _peaks = new Peak[new_num_peaks];
+    _peak_capacity = new_num_peaks;
   }
 
-  _peaks.resize(new_num_peaks);
-
-  for (int i = 0; i < _peaks.size(); i++) {
-    _peaks[i] = new Peak();
-  }
+  clear_peaks();
 }
 
 void Frame::resize_partials(int new_num_partials) {
-  clear_partials();
-
-  for (int i = 0; i < _partials.size(); i++) {
-    if (_partials[i]) {
-      delete _partials[i];
-      _partials[i] = NULL;
+  if (new_num_partials > _partial_capacity) {
+    if (_partials) {
+      delete[] _partials;
     }
+    _partials = new Peak[new_num_partials];
+    _partial_capacity = new_num_partials;
   }
 
-  _partials.resize(new_num_partials);
-
-  for (int i = 0; i < _partials.size(); i++) {
-    _partials[i] = new Peak();
-  }
+  clear_partials();
 }
 
 void Frame::clear() {
   clear_peaks();
   clear_partials();
 
-  if (_alloc_memory) {
+  if (_audio_is_view) {
+    // never write to memory that the Frame does not own
+    _audio = NULL;
+    _audio_is_view = false;
+  } else if (_alloc_memory && _audio) {
     memset(_audio, 0.0, sizeof(s_sample) * _size);
   }
   clear_synth();
@@ -168,27 +166,29 @@ void Frame::clear() {
 
 void Frame::clear_peaks() {
   _num_peaks = 0;
-  for (int i = 0; i < _peaks.size(); i++) {
-    if (_peaks[i]) {
-      _peaks[i]->reset();
-    }
+  for (int i = 0; i < _max_peaks; i++) {
+    _peaks[i].reset();
   }
 }
 
 void Frame::clear_partials() {
   _num_partials = 0;
-  for (int i = 0; i < _partials.size(); i++) {
-    if (_partials[i]) {
-      _partials[i]->reset();
-    }
+  for (int i = 0; i < _max_partials; i++) {
+    _partials[i].reset();
   }
 }
 
 void Frame::clear_synth() {
   if (_alloc_memory) {
-    memset(_synth, 0.0, sizeof(s_sample) * _synth_size);
-    memset(_residual, 0.0, sizeof(s_sample) * _size);
-    memset(_synth_residual, 0.0, sizeof(s_sample) * _synth_size);
+    if (_synth) {
+      memset(_synth, 0.0, sizeof(s_sample) * _synth_size);
+    }
+    if (_residual) {
+      memset(_residual, 0.0, sizeof(s_sample) * _size);
+    }
+    if (_synth_residual) {
+      memset(_synth_residual, 0.0, sizeof(s_sample) * _synth_size);
+    }
   }
 }
 
@@ -222,21 +222,54 @@ void Frame::add_peak(s_sample amplitude, s_sample frequency, s_sample phase,
     return;
   }
 
-  _peaks[_num_peaks]->amplitude = amplitude;
-  _peaks[_num_peaks]->frequency = frequency;
-  _peaks[_num_peaks]->phase = phase;
-  _peaks[_num_peaks]->bandwidth = bandwidth;
+  _peaks[_num_peaks].amplitude = amplitude;
+  _peaks[_num_peaks].frequency = frequency;
+  _peaks[_num_peaks].phase = phase;
+  _peaks[_num_peaks].bandwidth = bandwidth;
   _num_peaks++;
 }
 
-Peak *Frame::peak(int peak_number) { return _peaks[peak_number]; }
+Peak *Frame::peak(int peak_number) { return &_peaks[peak_number]; }
 
 void Frame::peak(int peak_number, s_sample amplitude, s_sample frequency,
                  s_sample phase, s_sample bandwidth) {
-  _peaks[peak_number]->amplitude = amplitude;
-  _peaks[peak_number]->frequency = frequency;
-  _peaks[peak_number]->phase = phase;
-  _peaks[peak_number]->bandwidth = bandwidth;
+  _peaks[peak_number].amplitude = amplitude;
+  _peaks[peak_number].frequency = frequency;
+  _peaks[peak_number].phase = phase;
+  _peaks[peak_number].bandwidth = bandwidth;
+}
+
+Peak *Frame::peaks() { return _peaks; }
+
+// Copy num_peaks rows of a (num_peaks x 4) array of amplitude, frequency,
+// phase, bandwidth values to peaks
+static void read_peaks(int num_peaks, s_sample *peak_data, Peak *peaks) {
+  for (int i = 0; i < num_peaks; i++) {
+    peaks[i].amplitude = peak_data[(i * 4)];
+    peaks[i].frequency = peak_data[(i * 4) + 1];
+    peaks[i].phase = peak_data[(i * 4) + 2];
+    peaks[i].bandwidth = peak_data[(i * 4) + 3];
+  }
+}
+
+// Replace the peaks in this frame with num_peaks peaks read from
+// peak_data, a row-major (num_peaks x 4) array of
+// amplitude, frequency, phase, bandwidth values. peak_data may point into
+// this frame's own peaks (a view of them from Python), so the peaks are
+// copied first and only the unused ones are cleared afterwards.
+void Frame::peaks(int num_peaks, s_sample *peak_data) {
+  if (num_peaks > _max_peaks) {
+    printf("Warning: attempted to add more than the specified"
+           " maximum number of peaks (%d) to a frame, ignoring.\n",
+           _max_peaks);
+    num_peaks = _max_peaks;
+  }
+
+  read_peaks(num_peaks, peak_data, _peaks);
+  for (int i = num_peaks; i < _max_peaks; i++) {
+    _peaks[i].reset();
+  }
+  _num_peaks = num_peaks;
 }
 
 // Frame - partials
@@ -271,25 +304,49 @@ void Frame::add_partial(s_sample amplitude, s_sample frequency, s_sample phase,
     return;
   }
 
-  _partials[_num_partials]->amplitude = amplitude;
-  _partials[_num_partials]->frequency = frequency;
-  _partials[_num_partials]->phase = phase;
-  _partials[_num_partials]->bandwidth = bandwidth;
+  _partials[_num_partials].amplitude = amplitude;
+  _partials[_num_partials].frequency = frequency;
+  _partials[_num_partials].phase = phase;
+  _partials[_num_partials].bandwidth = bandwidth;
   _num_partials++;
 }
 
-Peak *Frame::partial(int partial_number) { return _partials[partial_number]; }
+Peak *Frame::partial(int partial_number) { return &_partials[partial_number]; }
 
 void Frame::partial(int partial_number, s_sample amplitude, s_sample frequency,
                     s_sample phase, s_sample bandwidth) {
-  _partials[partial_number]->amplitude = amplitude;
-  _partials[partial_number]->frequency = frequency;
-  _partials[partial_number]->phase = phase;
-  _partials[partial_number]->bandwidth = bandwidth;
+  _partials[partial_number].amplitude = amplitude;
+  _partials[partial_number].frequency = frequency;
+  _partials[partial_number].phase = phase;
+  _partials[partial_number].bandwidth = bandwidth;
+}
+
+Peak *Frame::partials() { return _partials; }
+
+// Replace the partials in this frame with num_partials partials read from
+// partial_data, as in peaks(num_peaks, peak_data).
+void Frame::partials(int num_partials, s_sample *partial_data) {
+  if (num_partials > _max_partials) {
+    printf("Warning: attempted to add more than the specified"
+           " maximum number of partials (%d) to a frame, ignoring.\n",
+           _max_partials);
+    num_partials = _max_partials;
+  }
+
+  read_peaks(num_partials, partial_data, _partials);
+  for (int i = num_partials; i < _max_partials; i++) {
+    _partials[i].reset();
+  }
+  _num_partials = num_partials;
 }
 
 // Frame - audio buffers
 // ---------------------
+//
+// If the Frame manages its own memory, buffers that are not yet allocated
+// (or that were released by a change of size) are allocated and zeroed
+// when they are first accessed. has_audio, has_synth etc. can be used to
+// check whether a buffer exists without allocating it.
 
 int Frame::size() { return _size; }
 
@@ -298,7 +355,10 @@ void Frame::size(int new_size) {
 
   if (_alloc_memory) {
     destroy_arrays();
-    create_arrays();
+  } else if (_audio_is_view) {
+    // the view may be shorter than the new size
+    _audio = NULL;
+    _audio_is_view = false;
   }
 }
 
@@ -309,15 +369,27 @@ void Frame::synth_size(int new_size) {
 
   if (_alloc_memory) {
     destroy_synth_arrays();
-    create_synth_arrays();
+  }
+}
+
+// Make sure that the audio buffer is owned by the Frame, copying the
+// contents of the current view if there is one.
+void Frame::own_audio() {
+  if (_audio_is_view) {
+    s_sample *view = _audio;
+    _audio = new s_sample[_size];
+    std::copy(view, view + _size, _audio);
+    _audio_is_view = false;
   }
 }
 
 void Frame::audio(s_sample *new_audio) {
   if (_alloc_memory) {
-    std::copy(new_audio, new_audio + _size, _audio);
+    own_audio();
+    std::copy(new_audio, new_audio + _size, audio());
   } else {
     _audio = new_audio;
+    _audio_is_view = false;
   }
 }
 
@@ -328,27 +400,80 @@ void Frame::audio(s_sample *new_audio, int size) {
     throw Exception(std::string("Memory not managed by Frame."));
   }
 
+  own_audio();
+  s_sample *buffer = audio();
+
   if ((size < _size) && (_size % size == 0)) {
-    std::rotate(_audio, _audio + size, _audio + _size);
-    std::copy(new_audio, new_audio + size, _audio + (_size - size));
+    std::rotate(buffer, buffer + size, buffer + _size);
+    std::copy(new_audio, new_audio + size, buffer + (_size - size));
   } else if (size < _size) {
-    std::copy(new_audio, new_audio + size, _audio);
+    std::copy(new_audio, new_audio + size, buffer);
     for (int i = size; i < _size; i++) {
-      _audio[i] = 0.0;
+      buffer[i] = 0.0;
     }
   } else if (size == _size) {
-    std::copy(new_audio, new_audio + size, _audio);
+    std::copy(new_audio, new_audio + size, buffer);
   } else {
     throw Exception(std::string("Specified copy size must be a multiple "
                                 "of the current Frame size."));
   }
 }
 
-s_sample *Frame::audio() { return _audio; }
+// Use new_audio as the audio buffer without copying it. The memory must
+// stay valid for as long as the Frame uses it. If fewer than size()
+// samples are available (the end of a signal), the samples are instead
+// copied into a zero-padded buffer owned by the Frame, as in
+// audio(new_audio, size). A Frame that does not manage its memory has no
+// buffer to copy into, so it only accepts views of at least size() samples.
+void Frame::audio_view(s_sample *new_audio, int size) {
+  if (!_alloc_memory) {
+    if (size < _size) {
+      throw Exception(std::string("Audio view is shorter than the Frame "
+                                  "and memory is not managed by Frame."));
+    }
+    _audio = new_audio;
+    _audio_is_view = true;
+    return;
+  }
+
+  if (size >= _size) {
+    if (_audio && !_audio_is_view) {
+      delete[] _audio;
+    }
+    _audio = new_audio;
+    _audio_is_view = true;
+  } else {
+    if (_audio_is_view) {
+      _audio = NULL;
+      _audio_is_view = false;
+    }
+    if (_audio) {
+      memset(_audio, 0.0, sizeof(s_sample) * _size);
+    }
+    audio(new_audio, size);
+  }
+}
+
+bool Frame::audio_is_view() { return _audio_is_view; }
+
+bool Frame::has_audio() { return _audio != NULL; }
+
+bool Frame::has_synth() { return _synth != NULL; }
+
+bool Frame::has_residual() { return _residual != NULL; }
+
+bool Frame::has_synth_residual() { return _synth_residual != NULL; }
+
+s_sample *Frame::audio() {
+  if (!_audio && _alloc_memory) {
+    _audio = create_buffer(_size);
+  }
+  return _audio;
+}
 
 void Frame::synth(s_sample *new_synth) {
   if (_alloc_memory) {
-    std::copy(new_synth, new_synth + _synth_size, _synth);
+    std::copy(new_synth, new_synth + _synth_size, synth());
   } else {
     _synth = new_synth;
   }
@@ -367,14 +492,19 @@ void Frame::synth(s_sample *new_synth, int size) {
                                 "it must be less than the Frame synth size."));
   }
 
-  memcpy(_synth, new_synth, sizeof(s_sample) * size);
+  memcpy(synth(), new_synth, sizeof(s_sample) * size);
 }
 
-s_sample *Frame::synth() { return _synth; }
+s_sample *Frame::synth() {
+  if (!_synth && _alloc_memory) {
+    _synth = create_buffer(_synth_size);
+  }
+  return _synth;
+}
 
 void Frame::residual(s_sample *new_residual) {
   if (_alloc_memory) {
-    memcpy(_residual, new_residual, sizeof(s_sample) * _size);
+    memcpy(residual(), new_residual, sizeof(s_sample) * _size);
   } else {
     _residual = new_residual;
   }
@@ -393,14 +523,20 @@ void Frame::residual(s_sample *new_residual, int size) {
                                 "it must be less than the Frame size."));
   }
 
-  memcpy(_residual, new_residual, sizeof(s_sample) * size);
+  memcpy(residual(), new_residual, sizeof(s_sample) * size);
 }
 
-s_sample *Frame::residual() { return _residual; }
+s_sample *Frame::residual() {
+  if (!_residual && _alloc_memory) {
+    _residual = create_buffer(_size);
+  }
+  return _residual;
+}
 
 void Frame::synth_residual(s_sample *new_synth_residual) {
   if (_alloc_memory) {
-    memcpy(_synth_residual, new_synth_residual, sizeof(s_sample) * _synth_size);
+    memcpy(synth_residual(), new_synth_residual,
+           sizeof(s_sample) * _synth_size);
   } else {
     _synth_residual = new_synth_residual;
   }
@@ -419,7 +555,511 @@ void Frame::synth_residual(s_sample *new_synth_residual, int size) {
                                 "it must be less than the Frame synth size."));
   }
 
-  memcpy(_synth_residual, new_synth_residual, sizeof(s_sample) * size);
+  memcpy(synth_residual(), new_synth_residual, sizeof(s_sample) * size);
+}
+
+s_sample *Frame::synth_residual() {
+  if (!_synth_residual && _alloc_memory) {
+    _synth_residual = create_buffer(_synth_size);
+  }
+  return _synth_residual;
+}
+
+// ---------------------------------------------------------------------------
+// FramePool
+// ---------------------------------------------------------------------------
+FramePool::FramePool() {}
+
+FramePool::~FramePool() { clear(); }
+
+void FramePool::clear() {
+  for (int i = 0; i < _frames.size(); i++) {
+    if (_frames[i]) {
+      delete _frames[i];
+      _frames[i] = NULL;
+    }
+  }
+
+  _frames.clear();
+}
+
+int FramePool::size() { return _frames.size(); }
+
+Frame *FramePool::acquire(int frame_size, s_sample *audio, int audio_size) {
+  if (_frames.empty()) {
+    return new Frame(frame_size, audio, audio_size);
+  }
+
+  Frame *frame = _frames.back();
+  _frames.pop_back();
+
+  if (frame->size() != frame_size) {
+    frame->size(frame_size);
+  }
+  frame->clear();
+  frame->audio_view(audio, audio_size);
+  return frame;
+}
+
+void FramePool::release(Frame *frame) {
+  if (frame) {
+    _frames.push_back(frame);
+  }
+}
+
+void FramePool::release(Frames &frames) {
+  for (int i = 0; i < frames.size(); i++) {
+    release(frames[i]);
+    frames[i] = NULL;
+  }
+
+  frames.clear();
+}
+
+// ---------------------------------------------------------------------------
+// FrameSet
+// ---------------------------------------------------------------------------
+FrameSet::FrameSet() {
+  _num_frames = 0;
+  _max_peaks = 100;
+  _max_partials = 100;
+}
+
+FrameSet::FrameSet(int num_frames, int max_peaks, int max_partials) {
+  _num_frames = 0;
+  _max_peaks = max_peaks;
+  _max_partials = max_partials;
+  this->num_frames(num_frames);
+}
+
+FrameSet::~FrameSet() {}
+
+void FrameSet::resize_peaks() {
+  int size = _num_frames * _max_peaks;
+  _num_peaks.resize(_num_frames, 0);
+  _peak_amplitude.resize(size, 0.0);
+  _peak_frequency.resize(size, 0.0);
+  _peak_phase.resize(size, 0.0);
+  _peak_bandwidth.resize(size, 0.0);
+}
+
+void FrameSet::resize_partials() {
+  int size = _num_frames * _max_partials;
+  _num_partials.resize(_num_frames, 0);
+  _partial_amplitude.resize(size, 0.0);
+  _partial_frequency.resize(size, 0.0);
+  _partial_phase.resize(size, 0.0);
+  _partial_bandwidth.resize(size, 0.0);
+}
+
+void FrameSet::clear() {
+  _num_frames = 0;
+  _num_peaks.clear();
+  _num_partials.clear();
+  _peak_amplitude.clear();
+  _peak_frequency.clear();
+  _peak_phase.clear();
+  _peak_bandwidth.clear();
+  _partial_amplitude.clear();
+  _partial_frequency.clear();
+  _partial_phase.clear();
+  _partial_bandwidth.clear();
+}
+
+int FrameSet::num_frames() { return _num_frames; }
+
+void FrameSet::num_frames(int new_num_frames) {
+  // rows are contiguous, so frames can be added or removed at the end
+  // without moving existing data
+  _num_frames = new_num_frames;
+  resize_peaks();
+  resize_partials();
+}
+
+int FrameSet::max_peaks() { return _max_peaks; }
+
+void FrameSet::max_peaks(int new_max_peaks) {
+  if (new_max_peaks == _max_peaks) {
+    return;
+  }
+
+  if (_num_frames > 0) {
+    // changing the row stride invalidates existing data
+    printf("Warning: max peaks changed on a non-empty FrameSet, "
+           "existing peak data was lost.\n");
+  }
+
+  _max_peaks = new_max_peaks;
+  _peak_amplitude.clear();
+  _peak_frequency.clear();
+  _peak_phase.clear();
+  _peak_bandwidth.clear();
+  std::fill(_num_peaks.begin(), _num_peaks.end(), 0);
+  resize_peaks();
+}
+
+int FrameSet::max_partials() { return _max_partials; }
+
+void FrameSet::max_partials(int new_max_partials) {
+  if (new_max_partials == _max_partials) {
+    return;
+  }
+
+  if (_num_frames > 0) {
+    // changing the row stride invalidates existing data
+    printf("Warning: max partials changed on a non-empty FrameSet, "
+           "existing partial data was lost.\n");
+  }
+
+  _max_partials = new_max_partials;
+  _partial_amplitude.clear();
+  _partial_frequency.clear();
+  _partial_phase.clear();
+  _partial_bandwidth.clear();
+  std::fill(_num_partials.begin(), _num_partials.end(), 0);
+  resize_partials();
+}
+
+int FrameSet::num_peaks(int frame_number) { return _num_peaks[frame_number]; }
+
+void FrameSet::num_peaks(int frame_number, int new_num_peaks) {
+  _num_peaks[frame_number] = new_num_peaks;
+}
+
+int FrameSet::num_partials(int frame_number) {
+  return _num_partials[frame_number];
+}
+
+void FrameSet::num_partials(int frame_number, int new_num_partials) {
+  _num_partials[frame_number] = new_num_partials;
+}
+
+int *FrameSet::num_peaks() {
+  return _num_peaks.empty() ? NULL : &_num_peaks[0];
+}
+
+int *FrameSet::num_partials() {
+  return _num_partials.empty() ? NULL : &_num_partials[0];
+}
+
+s_sample *FrameSet::peak_amplitude() {
+  return _peak_amplitude.empty() ? NULL : &_peak_amplitude[0];
 }
 
-s_sample *Frame::synth_residual() { return _synth_residual; }
+s_sample *FrameSet::peak_frequency() {
+  return _peak_frequency.empty() ? NULL : &_peak_frequency[0];
+}
+
+s_sample *FrameSet::peak_phase() {
+  return _peak_phase.empty() ? NULL : &_peak_phase[0];
+}
+
+s_sample *FrameSet::peak_bandwidth() {
+  return _peak_bandwidth.empty() ? NULL : &_peak_bandwidth[0];
+}
+
+s_sample *FrameSet::partial_amplitude() {
+  return _partial_amplitude.empty() ? NULL : &_partial_amplitude[0];
+}
+
+s_sample *FrameSet::partial_frequency() {
+  return _partial_frequency.empty() ? NULL : &_partial_frequency[0];
+}
+
+s_sample *FrameSet::partial_phase() {
+  return _partial_phase.empty() ? NULL : &_partial_phase[0];
+}
+
+s_sample *FrameSet::partial_bandwidth() {
+  return _partial_bandwidth.empty() ? NULL : &_partial_bandwidth[0];
+}
+
+// Copy the peaks and partials stored for frame_number into frame.
+void FrameSet::read_frame(int frame_number, Frame *frame) {
+  if (frame_number < 0 || frame_number >= _num_frames) {
+    throw Exception(std::string("Frame number out of range."));
+  }
+
+  if (frame->max_peaks() < _max_peaks) {
+    frame->max_peaks(_max_peaks);
+  }
+  if (frame->max_partials() < _max_partials) {
+    frame->max_partials(_max_partials);
+  }
+
+  frame->clear_peaks();
+  int row = frame_number * _max_peaks;
+  for (int i = 0; i < _num_peaks[frame_number]; i++) {
+    frame->add_peak(_peak_amplitude[row + i], _peak_frequency[row + i],
+                    _peak_phase[row + i], _peak_bandwidth[row + i]);
+  }
+
+  frame->clear_partials();
+  row = frame_number * _max_partials;
+  for (int i = 0; i < _num_partials[frame_number]; i++) {
+    frame->add_partial(_partial_amplitude[row + i],
+                       _partial_frequency[row + i], _partial_phase[row + i],
+                       _partial_bandwidth[row + i]);
+  }
+}
+
+// Copy the peaks and partials of frame into row frame_number.
+// Peaks and partials beyond max_peaks/max_partials are dropped.
+void FrameSet::write_frame(int frame_number, Frame *frame) {
+  if (frame_number < 0 || frame_number >= _num_frames) {
+    throw Exception(std::string("Frame number out of range."));
+  }
+
+  int num_peaks = std::min(frame->num_peaks(), _max_peaks);
+  int row = frame_number * _max_peaks;
+  for (int i = 0; i < num_peaks; i++) {
+    Peak *p = frame->peak(i);
+    _peak_amplitude[row + i] = p->amplitude;
+    _peak_frequency[row + i] = p->frequency;
+    _peak_phase[row + i] = p->phase;
+    _peak_bandwidth[row + i] = p->bandwidth;
+  }
+  for (int i = num_peaks; i < _max_peaks; i++) {
+    _peak_amplitude[row + i] = 0.0;
+    _peak_frequency[row + i] = 0.0;
+    _peak_phase[row + i] = 0.0;
+    _peak_bandwidth[row + i] = 0.0;
+  }
+  _num_peaks[frame_number] = num_peaks;
+
+  int num_partials = std::min(frame->num_partials(), _max_partials);
+  row = frame_number * _max_partials;
+  for (int i = 0; i < num_partials; i++) {
+    Peak *p = frame->partial(i);
+    _partial_amplitude[row + i] = p->amplitude;
+    _partial_frequency[row + i] = p->frequency;
+    _partial_phase[row + i] = p->phase;
+    _partial_bandwidth[row + i] = p->bandwidth;
+  }
+  for (int i = num_partials; i < _max_partials; i++) {
+    _partial_amplitude[row + i] = 0.0;
+    _partial_frequency[row + i] = 0.0;
+    _partial_phase[row + i] = 0.0;
+    _partial_bandwidth[row + i] = 0.0;
+  }
+  _num_partials[frame_number] = num_partials;
+}
+
+// Append the peaks and partials of frame as a new row.
+void FrameSet::add_frame(Frame *frame) {
+  num_frames(_num_frames + 1);
+  write_frame(_num_frames - 1, frame);
+}
+
+// ---------------------------------------------------------------------------
+// TrackIndex
+// ---------------------------------------------------------------------------
+TrackIndex::TrackIndex() { _num_frames = 0; }
+
+TrackIndex::TrackIndex(FrameSet *frame_set) {
+  _num_frames = 0;
+  build(frame_set);
+}
+
+TrackIndex::~TrackIndex() {}
+
+void TrackIndex::clear() {
+  _num_frames = 0;
+  _partial_number.clear();
+  _start.clear();
+  _length.clear();
+  _offset.clear();
+  _min_frequency.clear();
+  _max_frequency.clear();
+  _amplitude.clear();
+  _frequency.clear();
+  _phase.clear();
+  _bandwidth.clear();
+  _node_end.clear();
+  _node_min_frequency.clear();
+  _node_max_frequency.clear();
+}
+
+// Find the tracks in the partials of frame_set.
+void TrackIndex::build(FrameSet *frame_set) {
+  clear();
+  _num_frames = frame_set->num_frames();
+  int max_partials = frame_set->max_partials();
+  s_sample *amplitude = frame_set->partial_amplitude();
+
+  // find the start and length of each track, numbering tracks as they start
+  std::vector<int> current(max_partials, -1);
+  for (int f = 0; f < _num_frames; f++) {
+    int num_partials = frame_set->num_partials(f);
+    int row = f * max_partials;
+    for (int i = 0; i < max_partials; i++) {
+      if (i < num_partials && amplitude[row + i] > 0) {
+        if (current[i] < 0) {
+          current[i] = _start.size();
+          _partial_number.push_back(i);
+          _start.push_back(f);
+          _length.push_back(0);
+        }
+        _length[current[i]]++;
+      } else {
+        current[i] = -1;
+      }
+    }
+  }
+
+  int num_tracks = _start.size();
+  int num_points = 0;
+  _offset.resize(num_tracks);
+  for (int t = 0; t < num_tracks; t++) {
+    _offset[t] = num_points;
+    num_points += _length[t];
+  }
+
+  // copy the track data
+  _amplitude.resize(num_points);
+  _frequency.resize(num_points);
+  _phase.resize(num_points);
+  _bandwidth.resize(num_points);
+  _min_frequency.resize(num_tracks);
+  _max_frequency.resize(num_tracks);
+  for (int t = 0; t < num_tracks; t++) {
+    int index = _start[t] * max_partials + _partial_number[t];
+    s_sample min_frequency = frame_set->partial_frequency()[index];
+    s_sample max_frequency = min_frequency;
+    for (int n = _offset[t]; n < _offset[t] + _length[t]; n++) {
+      _amplitude[n] = frame_set->partial_amplitude()[index];
+      _frequency[n] = frame_set->partial_frequency()[index];
+      _phase[n] = frame_set->partial_phase()[index];
+      _bandwidth[n] = frame_set->partial_bandwidth()[index];
+      min_frequency = std::min(min_frequency, _frequency[n]);
+      max_frequency = std::max(max_frequency, _frequency[n]);
+      index += max_partials;
+    }
+    _min_frequency[t] = min_frequency;
+    _max_frequency[t] = max_frequency;
+  }
+
+  if (num_tracks > 0) {
+    _node_end.resize(4 * num_tracks);
+    _node_min_frequency.resize(4 * num_tracks);
+    _node_max_frequency.resize(4 * num_tracks);
+    build_tree(1, 0, num_tracks);
+  }
+}
+
+// Tracks are sorted by start frame. Each node of the tree covers the tracks
+// first ... last - 1, and stores the last frame and the frequency range of
+// those tracks, so that a search can skip every node whose tracks all end
+// before (or start after) the frames searched for, or that are outside the
+// frequency range.
+void TrackIndex::build_tree(int node, int first, int last) {
+  if (last - first == 1) {
+    _node_end[node] = _start[first] + _length[first] - 1;
+    _node_min_frequency[node] = _min_frequency[first];
+    _node_max_frequency[node] = _max_frequency[first];
+    return;
+  }
+
+  int middle = (first + last) / 2;
+  build_tree(2 * node, first, middle);
+  build_tree(2 * node + 1, middle, last);
+  _node_end[node] = std::max(_node_end[2 * node], _node_end[2 * node + 1]);
+  _node_min_frequency[node] = std::min(_node_min_frequency[2 * node],
+                                       _node_min_frequency[2 * node + 1]);
+  _node_max_frequency[node] = std::max(_node_max_frequency[2 * node],
+                                       _node_max_frequency[2 * node + 1]);
+}
+
+bool TrackIndex::in_range(int track, int first_frame, int last_frame,
+                          s_sample min_frequency, s_sample max_frequency) {
+  if (_min_frequency[track] >= min_frequency &&
+      _max_frequency[track] <= max_frequency) {
+    return true;
+  }
+
+  // check the frames of the track that are in the range of frames
+  int first = std::max(first_frame, _start[track]) - _start[track];
+  int last = std::min(last_frame, _start[track] + _length[track] - 1) -
+             _start[track];
+  for (int n = _offset[track] + first; n <= _offset[track] + last; n++) {
+    if (_frequency[n] >= min_frequency && _frequency[n] <= max_frequency) {
+      return true;
+    }
+  }
+  return false;
+}
+
+void TrackIndex::find_tracks(int node, int first, int last, int first_frame,
+                             int last_frame, s_sample min_frequency,
+                             s_sample max_frequency,
+                             std::vector<int> &tracks) {
+  if (_start[first] > last_frame || _node_end[node] < first_frame ||
+      _node_min_frequency[node] > max_frequency ||
+      _node_max_frequency[node] < min_frequency) {
+    return;
+  }
+
+  if (last - first == 1) {
+    if (in_range(first, first_frame, last_frame, min_frequency,
+                 max_frequency)) {
+      tracks.push_back(first);
+    }
+    return;
+  }
+
+  int middle = (first + last) / 2;
+  find_tracks(2 * node, first, middle, first_frame, last_frame,
+              min_frequency, max_frequency, tracks);
+  find_tracks(2 * node + 1, middle, last, first_frame, last_frame,
+              min_frequency, max_frequency, tracks);
+}
+
+std::vector<int> TrackIndex::find(int first_frame, int last_frame,
+                                  s_sample min_frequency,
+                                  s_sample max_frequency) {
+  std::vector<int> tracks;
+  if (!_start.empty() && first_frame <= last_frame &&
+      min_frequency <= max_frequency) {
+    find_tracks(1, 0, _start.size(), first_frame, last_frame, min_frequency,
+                max_frequency, tracks);
+  }
+  return tracks;
+}
+
+int TrackIndex::num_frames() { return _num_frames; }
+
+int TrackIndex::num_tracks() { return _start.size(); }
+
+int TrackIndex::num_points() { return _amplitude.size(); }
+
+int *TrackIndex::partial_number() {
+  return _partial_number.empty() ? NULL : &_partial_number[0];
+}
+
+int *TrackIndex::start() { return _start.empty() ? NULL : &_start[0]; }
+
+int *TrackIndex::length() { return _length.empty() ? NULL : &_length[0]; }
+
+int *TrackIndex::offset() { return _offset.empty() ? NULL : &_offset[0]; }
+
+s_sample *TrackIndex::min_frequency() {
+  return _min_frequency.empty() ? NULL : &_min_frequency[0];
+}
+
+s_sample *TrackIndex::max_frequency() {
+  return _max_frequency.empty() ? NULL : &_max_frequency[0];
+}
+
+s_sample *TrackIndex::amplitude() {
+  return _amplitude.empty() ? NULL : &_amplitude[0];
+}
+
+s_sample *TrackIndex::frequency() {
+  return _frequency.empty() ? NULL : &_frequency[0];
+}
+
+s_sample *TrackIndex::phase() { return _phase.empty() ? NULL : &_phase[0]; }
+
+s_sample *TrackIndex::bandwidth() {
+  return _bandwidth.empty() ? NULL : &_bandwidth[0];
+}
@@ -37,6 +37,11 @@ typedef std::vector<Peak *> Peaks;
 // ---------------------------------------------------------------------------
 // Frame
 //
+// Peaks and partials are each stored in a single contiguous array of
+// max_peaks/max_partials Peak objects. As Peak consists of exactly 4
+// s_sample values, the arrays can also be read and written as
+// (n x 4) arrays of amplitude, frequency, phase, bandwidth.
+//
 // Represents a frame of audio information.
 // This can be: - raw audio samples
 //              - an unordered list of sinusoidal peaks
@@ -53,17 +58,20 @@ class Frame {
     int _num_peaks;
     int _max_partials;
     int _num_partials;
-    Peaks _peaks;
-    Peaks _partials;
+    int _peak_capacity;
+    int _partial_capacity;
+    Peak *_peaks;
+    Peak *_partials;
     s_sample *_audio;
     s_sample *_synth;
     s_sample *_residual;
     s_sample *_synth_residual;
     void init();
     bool _alloc_memory;
-    void create_arrays();
+    bool _audio_is_view;
+    s_sample *create_buffer(int size);
+    void own_audio();
     void destroy_arrays();
-    void create_synth_arrays();
     void destroy_synth_arrays();
     void resize_peaks(int new_num_peaks);
     void resize_partials(int new_num_partials);
@@ -71,6 +79,7 @@ class Frame {
   public:
     Frame();
     Frame(int frame_size, bool alloc_memory = false);
+    Frame(int frame_size, s_sample *audio_view, int audio_size);
     ~Frame();
     void clear();
     void clear_peaks();
@@ -87,6 +96,8 @@ class Frame {
     Peak *peak(int peak_number);
     void peak(int peak_number, s_sample amplitude, s_sample frequency,
               s_sample phase, s_sample bandwidth);
+    Peak *peaks();
+    void peaks(int num_peaks, s_sample *peak_data);
 
     // partials
     int num_partials();
@@ -98,6 +109,8 @@ class Frame {
     Peak *partial(int partial_number);
     void partial(int partial_number, s_sample amplitude, s_sample frequency,
                  s_sample phase, s_sample bandwidth);
+    Peak *partials();
+    void partials(int num_partials, s_sample *partial_data);
 
     // audio buffers
     int size();
@@ -106,6 +119,12 @@ class Frame {
     void synth_size(int new_size);
     void audio(s_sample *new_audio);
     void audio(s_sample *new_audio, int size);
+    void audio_view(s_sample *new_audio, int size);
+    bool audio_is_view();
+    bool has_audio();
+    bool has_synth();
+    bool has_residual();
+    bool has_synth_residual();
     s_sample *audio();
     void synth(s_sample *new_synth);
     void synth(s_sample *new_synth, int size);
@@ -120,6 +139,171 @@ class Frame {
 
 typedef std::vector<Frame *> Frames;
 
+// ---------------------------------------------------------------------------
+// FramePool
+//
+// Keeps Frames that are no longer needed so that they can be reused,
+// avoiding allocating new Frames (and their buffers) on every call
+// to find_peaks/synth.
+// ---------------------------------------------------------------------------
+class FramePool {
+  private:
+    Frames _frames;
+
+  public:
+    FramePool();
+    ~FramePool();
+    void clear();
+    int size();
+
+    // Return a cleared Frame of frame_size samples with managed memory,
+    // whose audio is a view of audio (see Frame::audio_view).
+    Frame *acquire(int frame_size, s_sample *audio, int audio_size);
+
+    // Return frames to the pool. The caller must own the frames and must
+    // not use them afterwards (nothing else may still refer to them).
+    void release(Frame *frame);
+    void release(Frames &frames);
+};
+
+// ---------------------------------------------------------------------------
+// FrameSet
+//
+// Peak and partial data for a whole signal, stored column by column.
+// Each of amplitude, frequency, phase and bandwidth is held in one
+// contiguous (num_frames x max_peaks) or (num_frames x max_partials)
+// row-major array, so that analysis results for long signals do not need
+// a separate Frame (and Peak objects) per hop.
+// ---------------------------------------------------------------------------
+class FrameSet {
+  private:
+    int _num_frames;
+    int _max_peaks;
+    int _max_partials;
+    std::vector<int> _num_peaks;
+    std::vector<int> _num_partials;
+    std::vector<s_sample> _peak_amplitude;
+    std::vector<s_sample> _peak_frequency;
+    std::vector<s_sample> _peak_phase;
+    std::vector<s_sample> _peak_bandwidth;
+    std::vector<s_sample> _partial_amplitude;
+    std::vector<s_sample> _partial_frequency;
+    std::vector<s_sample> _partial_phase;
+    std::vector<s_sample> _partial_bandwidth;
+    void resize_peaks();
+    void resize_partials();
+
+  public:
+    FrameSet();
+    FrameSet(int num_frames, int max_peaks = 100, int max_partials = 100);
+    ~FrameSet();
+    void clear();
+
+    int num_frames();
+    void num_frames(int new_num_frames);
+    int max_peaks();
+    void max_peaks(int new_max_peaks);
+    int max_partials();
+    void max_partials(int new_max_partials);
+
+    // per-frame counts
+    int num_peaks(int frame_number);
+    void num_peaks(int frame_number, int new_num_peaks);
+    int num_partials(int frame_number);
+    void num_partials(int frame_number, int new_num_partials);
+    int *num_peaks();
+    int *num_partials();
+
+    // (num_frames x max_peaks) peak arrays
+    s_sample *peak_amplitude();
+    s_sample *peak_frequency();
+    s_sample *peak_phase();
+    s_sample *peak_bandwidth();
+
+    // (num_frames x max_partials) partial arrays
+    s_sample *partial_amplitude();
+    s_sample *partial_frequency();
+    s_sample *partial_phase();
+    s_sample *partial_bandwidth();
+
+    // copy data between a row of the set and a Frame
+    void read_frame(int frame_number, Frame *frame);
+    void write_frame(int frame_number, Frame *frame);
+    void add_frame(Frame *frame);
+};
+
+// ---------------------------------------------------------------------------
+// TrackIndex
+//
+// The partials of a FrameSet as a list of tracks. A track is a run of
+// consecutive frames in which the same partial has a non-zero amplitude.
+// Tracks are numbered in order of their start frame (then partial number),
+// and the amplitudes, frequencies, phases and bandwidths of all tracks are
+// stored one track after another in contiguous arrays: the values of track i
+// are at offset(i) ... offset(i) + length(i) - 1.
+//
+// An interval tree over the tracks finds the tracks that are alive in a
+// range of frames in O(log n + k) time, for n tracks of which k are alive.
+// Each node also stores the frequency range of its tracks, so a search for
+// a range of frequencies skips most of the tracks that are outside it.
+// ---------------------------------------------------------------------------
+class TrackIndex {
+  private:
+    int _num_frames;
+    std::vector<int> _partial_number;
+    std::vector<int> _start;
+    std::vector<int> _length;
+    std::vector<int> _offset;
+    std::vector<s_sample> _min_frequency;
+    std::vector<s_sample> _max_frequency;
+    std::vector<s_sample> _amplitude;
+    std::vector<s_sample> _frequency;
+    std::vector<s_sample> _phase;
+    std::vector<s_sample> _bandwidth;
+
+    // interval tree nodes, each covering a range of tracks
+    std::vector<int> _node_end;
+    std::vector<s_sample> _node_min_frequency;
+    std::vector<s_sample> _node_max_frequency;
+    void build_tree(int node, int first, int last);
+    void find_tracks(int node, int first, int last, int first_frame,
+                     int last_frame, s_sample min_frequency,
+                     s_sample max_frequency, std::vector<int> &tracks);
+    bool in_range(int track, int first_frame, int last_frame,
+                  s_sample min_frequency, s_sample max_frequency);
+
+  public:
+    TrackIndex();
+    TrackIndex(FrameSet *frame_set);
+    ~TrackIndex();
+    void clear();
+    void build(FrameSet *frame_set);
+
+    int num_frames();
+    int num_tracks();
+    int num_points();
+
+    // per-track values
+    int *partial_number();
+    int *start();
+    int *length();
+    int *offset();
+    s_sample *min_frequency();
+    s_sample *max_frequency();
+
+    // track data, for all tracks
+    s_sample *amplitude();
+    s_sample *frequency();
+    s_sample *phase();
+    s_sample *bandwidth();
+
+    // Return the numbers of the tracks with a frequency between
+    // min_frequency and max_frequency (inclusive) in at least one frame
+    // between first_frame and last_frame (inclusive), in increasing order.
+    std::vector<int> find(int first_frame, int last_frame,
+                          s_sample min_frequency, s_sample max_frequency);
+};
+
 } // end of namespace simpl
 
 #endif
@@ -0,0 +1,165 @@
+#include "fft_plans.h"
+
+#include <pthread.h>
+#include <stdlib.h>
+
+#include <map>
+
+namespace simpl {
+
+struct FFTPlanKey {
+    int type;
+    int size;
+    int howmany;
+    unsigned flags;
+
+    bool operator<(const FFTPlanKey& other) const {
+        if(type != other.type) return type < other.type;
+        if(size != other.size) return size < other.size;
+        if(howmany != other.howmany) return howmany < other.howmany;
+        return flags < other.flags;
+    }
+};
+
+typedef std::map<FFTPlanKey, fftw_plan> FFTPlanMap;
+
+struct FFTPlanCache {
+    pthread_mutex_t lock;
+    FFTPlanMap plans;
+    unsigned rigor;
+    bool wisdom_loaded;
+
+    FFTPlanCache() : rigor(FFTW_ESTIMATE), wisdom_loaded(false) {
+        pthread_mutex_init(&lock, NULL);
+    }
+
+    ~FFTPlanCache() {
+        for(FFTPlanMap::iterator i = plans.begin(); i != plans.end(); i++) {
+            fftw_destroy_plan(i->second);
+        }
+        pthread_mutex_destroy(&lock);
+    }
+};
+
+static FFTPlanCache* shared_cache = NULL;
+
+static FFTPlanCache* local_cache() {
+    static FFTPlanCache cache;
+    return &cache;
+}
+
+FFTPlanCache* fft_plan_cache() {
+    return shared_cache ? shared_cache : local_cache();
+}
+
+void fft_share_plan_cache(FFTPlanCache* cache) {
+    shared_cache = cache == local_cache() ? NULL : cache;
+}
+
+void fft_plan_rigor(unsigned rigor) {
+    FFTPlanCache* cache = fft_plan_cache();
+    pthread_mutex_lock(&cache->lock);
+    cache->rigor = rigor;
+    pthread_mutex_unlock(&cache->lock);
+}
+
+unsigned fft_plan_rigor() {
+    return fft_plan_cache()->rigor;
+}
+
+bool fft_load_wisdom(const char* path) {
+    FFTPlanCache* cache = fft_plan_cache();
+    pthread_mutex_lock(&cache->lock);
+    bool result = fftw_import_wisdom_from_filename(path) != 0;
+    cache->wisdom_loaded = true;
+    pthread_mutex_unlock(&cache->lock);
+    return result;
+}
+
+bool fft_save_wisdom(const char* path) {
+    FFTPlanCache* cache = fft_plan_cache();
+    pthread_mutex_lock(&cache->lock);
+    bool result = fftw_export_wisdom_to_filename(path) != 0;
+    pthread_mutex_unlock(&cache->lock);
+    return result;
+}
+
+int fft_num_plans() {
+    FFTPlanCache* cache = fft_plan_cache();
+    pthread_mutex_lock(&cache->lock);
+    int num_plans = (int)cache->plans.size();
+    pthread_mutex_unlock(&cache->lock);
+    return num_plans;
+}
+
+fftw_plan fft_plan(FFTPlanType type, int size, int howmany,
+                   void* in, void* out) {
+    FFTPlanCache* cache = fft_plan_cache();
+    pthread_mutex_lock(&cache->lock);
+
+    if(!cache->wisdom_loaded) {
+        const char* path = getenv("SIMPL_FFTW_WISDOM");
+        if(path) {
+            fftw_import_wisdom_from_filename(path);
+        }
+        cache->wisdom_loaded = true;
+    }
+
+    FFTPlanKey key;
+    key.type = type;
+    key.size = size;
+    key.howmany = howmany;
+    key.flags = cache->rigor;
+    if(fftw_alignment_of((double*)in) || fftw_alignment_of((double*)out)) {
+        key.flags |= FFTW_UNALIGNED;
+    }
+
+    FFTPlanMap::iterator i = cache->plans.find(key);
+    if(i != cache->plans.end()) {
+        fftw_plan plan = i->second;
+        pthread_mutex_unlock(&cache->lock);
+        return plan;
+    }
+
+    int n[1] = {size};
+    int num_bins = (size / 2) + 1;
+    int in_size = (type == FFT_C2R) ? num_bins * 2 : size * 2;
+    int out_size = (type == FFT_R2C) ? num_bins * 2 : size * 2;
+    double* scratch_in = (double*)fftw_malloc(
+        sizeof(double) * in_size * howmany);
+    double* scratch_out = (double*)fftw_malloc(
+        sizeof(double) * out_size * howmany);
+
+    fftw_plan plan = NULL;
+    switch(type) {
+        case FFT_R2C:
+            plan = fftw_plan_many_dft_r2c(
+                1, n, howmany, scratch_in, NULL, 1, size,
+                (fftw_complex*)scratch_out, NULL, 1, num_bins, key.flags);
+            break;
+        case FFT_C2R:
+            plan = fftw_plan_many_dft_c2r(
+                1, n, howmany, (fftw_complex*)scratch_in, NULL, 1, num_bins,
+                scratch_out, NULL, 1, size, key.flags);
+            break;
+        case FFT_FORWARD:
+        case FFT_BACKWARD:
+            plan = fftw_plan_many_dft(
+                1, n, howmany, (fftw_complex*)scratch_in, NULL, 1, size,
+                (fftw_complex*)scratch_out, NULL, 1, size,
+                type == FFT_FORWARD ? FFTW_FORWARD : FFTW_BACKWARD,
+                key.flags);
+            break;
+    }
+
+    fftw_free(scratch_in);
+    fftw_free(scratch_out);
+
+    if(plan) {
+        cache->plans[key] = plan;
+    }
+    pthread_mutex_unlock(&cache->lock);
+    return plan;
+}
+
+} // end of namespace simpl
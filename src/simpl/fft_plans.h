@@ -0,0 +1,90 @@
+#ifndef FFT_PLANS_H
+#define FFT_PLANS_H
+
+#include <fftw3.h>
+
+namespace simpl {
+
+// ---------------------------------------------------------------------------
+// FFT plan cache
+//
+// A process-wide registry of FFTW plans shared by all of the analysis and
+// synthesis backends (MQ, SndObj, Loris). Plans are keyed by transform
+// type, size, number of transforms, planner rigor and whether the arrays
+// are SIMD-aligned, and are created on first use. All planning, which is
+// not thread-safe in FFTW, is done under the registry's lock.
+//
+// Cached plans are owned by the cache: callers must not destroy them, and
+// must run them with the new-array execute functions
+// (fftw_execute_dft_r2c, fftw_execute_dft_c2r, fftw_execute_dft) on
+// out-of-place arrays of the size the plan was created for. Plans are only
+// destroyed when the process exits.
+//
+// The planner rigor defaults to FFTW_ESTIMATE. Setting it to FFTW_MEASURE
+// or FFTW_PATIENT produces faster plans at a higher (one-off) planning
+// cost, which can be avoided on later runs by saving and loading FFTW
+// wisdom. If the SIMPL_FFTW_WISDOM environment variable is set, wisdom
+// is loaded from that file before the first plan is made.
+//
+// The registry is defined in fft_plans.cpp, part of the simpl library that
+// the backends link against. Python extension modules each contain a copy
+// of that code, so all of them except simpl.base attach to the registry of
+// simpl.base with fft_share_plan_cache when they are imported.
+// ---------------------------------------------------------------------------
+
+enum FFTPlanType {
+    FFT_R2C = 0,
+    FFT_C2R,
+    FFT_FORWARD,
+    FFT_BACKWARD
+};
+
+struct FFTPlanCache;
+
+// The registry used by this library: the one passed to
+// fft_share_plan_cache, or otherwise one of its own.
+FFTPlanCache* fft_plan_cache();
+
+// Use cache, the registry of another copy of this library in the same
+// process, instead of this library's own. Must be called before any plans
+// are made.
+void fft_share_plan_cache(FFTPlanCache* cache);
+
+// Set the FFTW planner rigor used for new plans (FFTW_ESTIMATE,
+// FFTW_MEASURE, FFTW_PATIENT or FFTW_EXHAUSTIVE). Plans that have already
+// been made with a different rigor are kept but no longer returned.
+void fft_plan_rigor(unsigned rigor);
+unsigned fft_plan_rigor();
+
+// Load FFTW wisdom from path. Returns true on success.
+bool fft_load_wisdom(const char* path);
+
+// Save the accumulated FFTW wisdom to path. Returns true on success.
+bool fft_save_wisdom(const char* path);
+
+int fft_num_plans();
+
+// Return a cached plan for howmany consecutive transforms of the given
+// type and size. in and out are only used to check the array alignment;
+// planning is done on scratch buffers so that FFTW_MEASURE and
+// FFTW_PATIENT do not overwrite the caller's data.
+fftw_plan fft_plan(FFTPlanType type, int size, int howmany,
+                   void* in, void* out);
+
+inline fftw_plan fft_plan_r2c(int size, double* in, fftw_complex* out) {
+    return fft_plan(FFT_R2C, size, 1, in, out);
+}
+
+inline fftw_plan fft_plan_c2r(int size, fftw_complex* in, double* out) {
+    return fft_plan(FFT_C2R, size, 1, in, out);
+}
+
+inline fftw_plan fft_plan_dft(int size, int sign,
+                              fftw_complex* in, fftw_complex* out) {
+    return fft_plan(sign == FFTW_FORWARD ? FFT_FORWARD : FFT_BACKWARD,
+                    size, 1, in, out);
+}
+
+} // end of namespace simpl
+
+#endif
@@ -1,5 +1,9 @@
 #include "partial_tracking.h"
 
+#include <algorithm>
+#include <limits>
+#include <math.h>
+
 using namespace std;
 using namespace simpl;
 
@@ -54,6 +58,23 @@ Frames PartialTracking::find_partials(Frames frames) {
   return _frames;
 }
 
+// Find partials from the sinusoidal peaks stored in a FrameSet. The partials
+// are written back into the same FrameSet.
+FrameSet *PartialTracking::find_partials(FrameSet *frame_set) {
+  frame_set->max_partials(_max_partials);
+
+  Frame f(0, false);
+  f.max_peaks(frame_set->max_peaks());
+  f.max_partials(_max_partials);
+
+  for (int i = 0; i < frame_set->num_frames(); i++) {
+    frame_set->read_frame(i, &f);
+    update_partials(&f);
+    frame_set->write_frame(i, &f);
+  }
+  return frame_set;
+}
+
 // ---------------------------------------------------------------------------
 // MQPartialTracking
 // ---------------------------------------------------------------------------
@@ -66,22 +87,22 @@ MQPartialTracking::MQPartialTracking() {
   _mq_params.matching_interval = 100.0;
   _mq_params.fundamental = 0;
   init_mq(&_mq_params);
-  _peak_list = NULL;
-  _prev_peak_list = NULL;
+  _peak_list = new MQPeakList();
+  _prev_peak_list = new MQPeakList();
 }
 
 MQPartialTracking::~MQPartialTracking() {
   destroy_mq(&_mq_params);
-  delete_peak_list(_prev_peak_list);
+  delete _peak_list;
+  delete _prev_peak_list;
   _peak_list = NULL;
   _prev_peak_list = NULL;
 }
 
 void MQPartialTracking::reset() {
   reset_mq(&_mq_params);
-  delete_peak_list(_prev_peak_list);
-  _peak_list = NULL;
-  _prev_peak_list = NULL;
+  _peak_list->num_peaks = 0;
+  _prev_peak_list->num_peaks = 0;
 }
 
 void MQPartialTracking::max_partials(int new_max_partials) {
@@ -96,37 +117,324 @@ void MQPartialTracking::update_partials(Frame *frame) {
   }
   frame->clear_partials();
 
-  _peak_list = new MQPeakList();
+  // the previous frame's peaks are kept for matching, the other list is
+  // reused for this frame
+  std::swap(_peak_list, _prev_peak_list);
+  _peak_list->resize(num_peaks);
+
+  Peak *peaks = frame->peaks();
   for (int i = 0; i < num_peaks; i++) {
-    MQPeak *p = new MQPeak();
-    p->amplitude = frame->peak(i)->amplitude;
-    p->frequency = frame->peak(i)->frequency;
-    p->phase = frame->peak(i)->phase;
+    MQPeak *p = &(_peak_list->peaks[i]);
+    p->amplitude = peaks[i].amplitude;
+    p->frequency = peaks[i].frequency;
+    p->phase = peaks[i].phase;
     p->bin = i;
     p->next = NULL;
     p->prev = NULL;
-    mq_add_peak(p, _peak_list);
   }
 
-  MQPeakList *partials = mq_track_peaks(_peak_list, &_mq_params);
-  partials = mq_sort_peaks_by_frequency(partials, num_peaks);
-
-  _peak_list = partials;
-  int num_partials = 0;
-  while (partials && partials->peak && (num_partials < _max_partials)) {
-    frame->add_partial(partials->peak->amplitude, partials->peak->frequency,
-                       partials->peak->phase, 0.0);
+  mq_sort_peaks_by_frequency(_peak_list);
+  mq_track_peaks(_peak_list, &_mq_params);
 
-    partials = partials->next;
-    num_partials++;
+  MQPeak *partials = _peak_list->peaks;
+  for (int i = 0; i < num_peaks; i++) {
+    frame->add_partial(partials[i].amplitude, partials[i].frequency,
+                       partials[i].phase, 0.0);
   }
 
-  for (int i = num_partials; i < _max_partials; i++) {
+  for (int i = num_peaks; i < _max_partials; i++) {
     frame->add_partial(0.0, 0.0, 0.0, 0.0);
   }
+}
+
+// ---------------------------------------------------------------------------
+// OfflinePartialTracking
+// ---------------------------------------------------------------------------
+
+// Solve the assignment problem for the n x n (row-major) cost matrix cost
+// using the Hungarian method, in O(n^3) time. On return, assignment[i] is
+// the column assigned to row i.
+static void min_cost_assignment(int n, const std::vector<double> &cost,
+                                std::vector<int> &assignment) {
+  const double inf = std::numeric_limits<double>::max();
+  std::vector<double> u(n + 1, 0.0);
+  std::vector<double> v(n + 1, 0.0);
+  std::vector<double> min_v(n + 1);
+  std::vector<int> p(n + 1, 0);
+  std::vector<int> way(n + 1, 0);
+  std::vector<bool> used(n + 1);
+
+  for (int i = 1; i <= n; i++) {
+    p[0] = i;
+    int j0 = 0;
+    std::fill(min_v.begin(), min_v.end(), inf);
+    std::fill(used.begin(), used.end(), false);
+
+    // find the shortest augmenting path from row i
+    do {
+      used[j0] = true;
+      int i0 = p[j0];
+      int j1 = 0;
+      double delta = inf;
+      for (int j = 1; j <= n; j++) {
+        if (!used[j]) {
+          double c = cost[(i0 - 1) * n + j - 1] - u[i0] - v[j];
+          if (c < min_v[j]) {
+            min_v[j] = c;
+            way[j] = j0;
+          }
+          if (min_v[j] < delta) {
+            delta = min_v[j];
+            j1 = j;
+          }
+        }
+      }
+      for (int j = 0; j <= n; j++) {
+        if (used[j]) {
+          u[p[j]] += delta;
+          v[j] -= delta;
+        } else {
+          min_v[j] -= delta;
+        }
+      }
+      j0 = j1;
+    } while (p[j0] != 0);
+
+    do {
+      int j1 = way[j0];
+      p[j0] = p[j1];
+      j0 = j1;
+    } while (j0);
+  }
+
+  assignment.assign(n, -1);
+  for (int j = 1; j <= n; j++) {
+    assignment[p[j] - 1] = j - 1;
+  }
+}
+
+OfflinePartialTracking::OfflinePartialTracking() {
+  _matching_interval = 100.0;
+  reset();
+}
+
+OfflinePartialTracking::~OfflinePartialTracking() {}
+
+void OfflinePartialTracking::reset() {
+  _amplitude.assign(_max_partials, 0.0);
+  _frequency.assign(_max_partials, 0.0);
+}
+
+void OfflinePartialTracking::max_partials(int new_max_partials) {
+  _max_partials = new_max_partials;
+  reset();
+}
+
+s_sample OfflinePartialTracking::matching_interval() {
+  return _matching_interval;
+}
+
+void OfflinePartialTracking::matching_interval(
+    s_sample new_matching_interval) {
+  _matching_interval = new_matching_interval;
+}
+
+// Sets _partial_peaks[i] to the index of the peak that continues (or starts)
+// partial i in the next frame, or to -1 if there is no peak for partial i.
+void OfflinePartialTracking::assign_peaks(int num_peaks, s_sample *amplitude,
+                                          s_sample *frequency) {
+  typedef std::pair<s_sample, int> Candidate;
+
+  // live partials and non-zero peaks, sorted by frequency
+  std::vector<Candidate> partials;
+  std::vector<Candidate> peaks;
+  for (int i = 0; i < _max_partials; i++) {
+    if (_amplitude[i] > 0) {
+      partials.push_back(Candidate(_frequency[i], i));
+    }
+  }
+  for (int i = 0; i < num_peaks; i++) {
+    if (amplitude[i] > 0) {
+      peaks.push_back(Candidate(frequency[i], i));
+    }
+  }
+  std::sort(partials.begin(), partials.end());
+  std::sort(peaks.begin(), peaks.end());
+
+  _partial_peaks.assign(_max_partials, -1);
+  std::vector<bool> linked(num_peaks, false);
+  std::vector<double> cost;
+  std::vector<int> assignment;
+
+  // Partials and peaks that are separated by a gap of at least
+  // matching_interval can never be linked, so each group between gaps is
+  // solved as a separate assignment problem.
+  int num_partials = partials.size();
+  int num_candidates = peaks.size();
+  int i = 0;
+  int j = 0;
+  while (i < num_partials || j < num_candidates) {
+    int first_partial = i;
+    int first_peak = j;
+    s_sample previous = 0.0;
+    while (i < num_partials || j < num_candidates) {
+      bool is_partial = j >= num_candidates ||
+                        (i < num_partials && partials[i] <= peaks[j]);
+      s_sample f = is_partial ? partials[i].first : peaks[j].first;
+      if ((i > first_partial || j > first_peak) &&
+          f - previous >= _matching_interval) {
+        break;
+      }
+      previous = f;
+      if (is_partial) {
+        i++;
+      } else {
+        j++;
+      }
+    }
+
+    int rows = i - first_partial;
+    int cols = j - first_peak;
+    if (rows == 0 || cols == 0) {
+      continue;
+    }
+
+    // The cost of linking a partial to a peak is their distance in
+    // frequency. Each partial can also end (cost matching_interval / 2) and
+    // each peak can start a new partial (cost matching_interval / 2), so
+    // partials are only linked to peaks that are closer than
+    // matching_interval.
+    int n = rows + cols;
+    double unlinked = _matching_interval / 2;
+    double never = n * _matching_interval;
+    cost.assign(n * n, never);
+    for (int r = 0; r < rows; r++) {
+      for (int c = 0; c < cols; c++) {
+        double distance = fabs(partials[first_partial + r].first -
+                               peaks[first_peak + c].first);
+        if (distance < _matching_interval) {
+          cost[r * n + c] = distance;
+        }
+      }
+      cost[r * n + cols + r] = unlinked;
+    }
+    for (int c = 0; c < cols; c++) {
+      cost[(rows + c) * n + c] = unlinked;
+      for (int r = 0; r < rows; r++) {
+        cost[(rows + c) * n + cols + r] = 0.0;
+      }
+    }
+
+    min_cost_assignment(n, cost, assignment);
+    for (int r = 0; r < rows; r++) {
+      int c = assignment[r];
+      if (c < cols) {
+        int peak = peaks[first_peak + c].second;
+        _partial_peaks[partials[first_partial + r].second] = peak;
+        linked[peak] = true;
+      }
+    }
+  }
+
+  // start new partials from the remaining peaks, largest first, in the
+  // slots that were not used in the previous frame
+  std::vector<Candidate> new_peaks;
+  for (int k = 0; k < (int)peaks.size(); k++) {
+    int peak = peaks[k].second;
+    if (!linked[peak]) {
+      new_peaks.push_back(Candidate(-amplitude[peak], peak));
+    }
+  }
+  std::sort(new_peaks.begin(), new_peaks.end());
+
+  int slot = 0;
+  for (int k = 0; k < (int)new_peaks.size(); k++) {
+    while (slot < _max_partials && _amplitude[slot] > 0) {
+      slot++;
+    }
+    if (slot >= _max_partials) {
+      break;
+    }
+    _partial_peaks[slot++] = new_peaks[k].second;
+  }
+}
+
+void OfflinePartialTracking::update_partials(Frame *frame) {
+  int num_peaks = frame->num_peaks();
+  Peak *peaks = frame->peaks();
+
+  _peak_amplitude.resize(num_peaks + 1);
+  _peak_frequency.resize(num_peaks + 1);
+  for (int i = 0; i < num_peaks; i++) {
+    _peak_amplitude[i] = peaks[i].amplitude;
+    _peak_frequency[i] = peaks[i].frequency;
+  }
+  assign_peaks(num_peaks, &_peak_amplitude[0], &_peak_frequency[0]);
+
+  // partials that are not continued end with a zero amplitude peak at
+  // their last frequency
+  frame->clear_partials();
+  for (int i = 0; i < _max_partials; i++) {
+    int peak = _partial_peaks[i];
+    if (peak >= 0) {
+      frame->add_partial(peaks[peak].amplitude, peaks[peak].frequency,
+                         peaks[peak].phase, peaks[peak].bandwidth);
+      _amplitude[i] = peaks[peak].amplitude;
+      _frequency[i] = peaks[peak].frequency;
+    } else {
+      if (_amplitude[i] <= 0) {
+        _frequency[i] = 0.0;
+      }
+      frame->add_partial(0.0, _frequency[i], 0.0, 0.0);
+      _amplitude[i] = 0.0;
+    }
+  }
+}
 
-  delete_peak_list(_prev_peak_list);
-  _prev_peak_list = _peak_list;
+// Link the peaks of every frame in the FrameSet. Peaks are read from, and
+// partials written to, the FrameSet arrays without creating any Frames.
+FrameSet *OfflinePartialTracking::find_partials(FrameSet *frame_set) {
+  frame_set->max_partials(_max_partials);
+  reset();
+
+  int max_peaks = frame_set->max_peaks();
+  for (int f = 0; f < frame_set->num_frames(); f++) {
+    int peak_row = f * max_peaks;
+    s_sample *peak_amplitude = frame_set->peak_amplitude() + peak_row;
+    s_sample *peak_frequency = frame_set->peak_frequency() + peak_row;
+    s_sample *peak_phase = frame_set->peak_phase() + peak_row;
+    s_sample *peak_bandwidth = frame_set->peak_bandwidth() + peak_row;
+
+    int row = f * _max_partials;
+    s_sample *amplitude = frame_set->partial_amplitude() + row;
+    s_sample *frequency = frame_set->partial_frequency() + row;
+    s_sample *phase = frame_set->partial_phase() + row;
+    s_sample *bandwidth = frame_set->partial_bandwidth() + row;
+
+    assign_peaks(frame_set->num_peaks(f), peak_amplitude, peak_frequency);
+
+    for (int i = 0; i < _max_partials; i++) {
+      int peak = _partial_peaks[i];
+      if (peak >= 0) {
+        amplitude[i] = peak_amplitude[peak];
+        frequency[i] = peak_frequency[peak];
+        phase[i] = peak_phase[peak];
+        bandwidth[i] = peak_bandwidth[peak];
+      } else {
+        if (_amplitude[i] <= 0) {
+          _frequency[i] = 0.0;
+        }
+        amplitude[i] = 0.0;
+        frequency[i] = _frequency[i];
+        phase[i] = 0.0;
+        bandwidth[i] = 0.0;
+      }
+      _amplitude[i] = amplitude[i];
+      _frequency[i] = frequency[i];
+    }
+    frame_set->num_partials(f, _max_partials);
+  }
+  return frame_set;
 }
 
 // ---------------------------------------------------------------------------
@@ -149,10 +457,9 @@ SMSPartialTracking::SMSPartialTracking() {
   _analysis_params.nGuides = _max_partials;
   _analysis_params.preEmphasis = 0;
   _analysis_params.realtime = 0;
-  sms_initAnalysis(&_analysis_params);
-
-  sms_fillHeader(&_header, &_analysis_params);
-  sms_allocFrameH(&_header, &_data);
+  _configuring = false;
+  _initialised = false;
+  init_analysis();
 
   _peak_amplitude = NULL;
   _peak_frequency = NULL;
@@ -162,8 +469,7 @@ SMSPartialTracking::SMSPartialTracking() {
 }
 
 SMSPartialTracking::~SMSPartialTracking() {
-  sms_freeAnalysis(&_analysis_params);
-  sms_freeFrame(&_data);
+  free_analysis();
   sms_free();
 
   delete[] _peak_amplitude;
@@ -196,22 +502,40 @@ void SMSPartialTracking::init_peaks() {
   memset(_peak_phase, 0.0, sizeof(s_sample) * _max_partials);
 }
 
+void SMSPartialTracking::free_analysis() {
+  if (_initialised) {
+    sms_freeAnalysis(&_analysis_params);
+    sms_freeFrame(&_data);
+    _initialised = false;
+  }
+}
+
+void SMSPartialTracking::init_analysis() {
+  if (!_initialised && !_configuring) {
+    sms_initAnalysis(&_analysis_params);
+    sms_fillHeader(&_header, &_analysis_params);
+    sms_allocFrameH(&_header, &_data);
+    _initialised = true;
+  }
+}
+
+void SMSPartialTracking::begin_configure() { _configuring = true; }
+
+void SMSPartialTracking::end_configure() {
+  _configuring = false;
+  init_analysis();
+}
+
 void SMSPartialTracking::reset() {}
 
 void SMSPartialTracking::max_partials(int new_max_partials) {
   _max_partials = new_max_partials;
 
-  sms_freeAnalysis(&_analysis_params);
-  sms_freeFrame(&_data);
-
+  free_analysis();
   _analysis_params.maxPeaks = _max_partials;
   _analysis_params.nTracks = _max_partials;
   _analysis_params.nGuides = _max_partials;
-
-  sms_initAnalysis(&_analysis_params);
-  sms_fillHeader(&_header, &_analysis_params);
-  sms_allocFrameH(&_header, &_data);
-
+  init_analysis();
   init_peaks();
 }
 
@@ -230,18 +554,13 @@ bool SMSPartialTracking::harmonic() {
 }
 
 void SMSPartialTracking::harmonic(bool is_harmonic) {
-  sms_freeAnalysis(&_analysis_params);
-  sms_freeFrame(&_data);
-
+  free_analysis();
   if (is_harmonic) {
     _analysis_params.iFormat = SMS_FORMAT_HP;
   } else {
     _analysis_params.iFormat = SMS_FORMAT_IHP;
   }
-
-  sms_initAnalysis(&_analysis_params);
-  sms_fillHeader(&_header, &_analysis_params);
-  sms_allocFrameH(&_header, &_data);
+  init_analysis();
 }
 
 double SMSPartialTracking::default_fundamental() {
@@ -249,14 +568,9 @@ double SMSPartialTracking::default_fundamental() {
 }
 
 void SMSPartialTracking::default_fundamental(double new_default_fundamental) {
-  sms_freeAnalysis(&_analysis_params);
-  sms_freeFrame(&_data);
-
+  free_analysis();
   _analysis_params.fDefaultFundamental = new_default_fundamental;
-
-  sms_initAnalysis(&_analysis_params);
-  sms_fillHeader(&_header, &_analysis_params);
-  sms_allocFrameH(&_header, &_data);
+  init_analysis();
 }
 
 int SMSPartialTracking::max_frame_delay() {
@@ -264,27 +578,17 @@ int SMSPartialTracking::max_frame_delay() {
 }
 
 void SMSPartialTracking::max_frame_delay(int new_max_frame_delay) {
-  sms_freeAnalysis(&_analysis_params);
-  sms_freeFrame(&_data);
-
+  free_analysis();
   _analysis_params.iMaxDelayFrames = new_max_frame_delay;
-
-  sms_initAnalysis(&_analysis_params);
-  sms_fillHeader(&_header, &_analysis_params);
-  sms_allocFrameH(&_header, &_data);
+  init_analysis();
 }
 
 int SMSPartialTracking::analysis_delay() { return _analysis_params.analDelay; }
 
 void SMSPartialTracking::analysis_delay(int new_analysis_delay) {
-  sms_freeAnalysis(&_analysis_params);
-  sms_freeFrame(&_data);
-
+  free_analysis();
   _analysis_params.analDelay = new_analysis_delay;
-
-  sms_initAnalysis(&_analysis_params);
-  sms_fillHeader(&_header, &_analysis_params);
-  sms_allocFrameH(&_header, &_data);
+  init_analysis();
 }
 
 int SMSPartialTracking::min_good_frames() {
@@ -292,14 +596,9 @@ int SMSPartialTracking::min_good_frames() {
 }
 
 void SMSPartialTracking::min_good_frames(int new_min_good_frames) {
-  sms_freeAnalysis(&_analysis_params);
-  sms_freeFrame(&_data);
-
+  free_analysis();
   _analysis_params.minGoodFrames = new_min_good_frames;
-
-  sms_initAnalysis(&_analysis_params);
-  sms_fillHeader(&_header, &_analysis_params);
-  sms_allocFrameH(&_header, &_data);
+  init_analysis();
 }
 
 bool SMSPartialTracking::clean_tracks() {
@@ -322,10 +621,11 @@ void SMSPartialTracking::update_partials(Frame *frame) {
   frame->clear_partials();
 
   // set peaks in SMSAnalysisParams object
+  Peak *peaks = frame->peaks();
   for (int i = 0; i < num_peaks; i++) {
-    _peak_amplitude[i] = frame->peak(i)->amplitude;
-    _peak_frequency[i] = frame->peak(i)->frequency;
-    _peak_phase[i] = frame->peak(i)->phase;
+    _peak_amplitude[i] = peaks[i].amplitude;
+    _peak_frequency[i] = peaks[i].frequency;
+    _peak_phase[i] = peaks[i].phase;
   }
 
   sms_setPeaks(&_analysis_params, _max_partials, _peak_amplitude, _max_partials,
@@ -422,10 +722,11 @@ void SndObjPartialTracking::update_partials(Frame *frame) {
   }
   frame->clear_partials();
 
+  Peak *peaks = frame->peaks();
   for (int i = 0; i < num_peaks; i++) {
-    _peak_amplitude[i] = frame->peak(i)->amplitude;
-    _peak_frequency[i] = frame->peak(i)->frequency;
-    _peak_phase[i] = frame->peak(i)->phase;
+    _peak_amplitude[i] = peaks[i].amplitude;
+    _peak_frequency[i] = peaks[i].frequency;
+    _peak_phase[i] = peaks[i].phase;
   }
   for (int i = num_peaks; i < _max_partials; i++) {
     _peak_amplitude[i] = _peak_frequency[i] = _peak_phase[i] = 0.0;
@@ -505,11 +806,12 @@ void LorisPartialTracking::update_partials(Frame *frame) {
     num_peaks = _max_partials;
   }
 
+  Peak *peaks = frame->peaks();
   _analyzer->peaks.clear();
   for (int i = 0; i < num_peaks; i++) {
     Loris::Breakpoint bp =
-        Loris::Breakpoint(frame->peak(i)->frequency, frame->peak(i)->amplitude,
-                          frame->peak(i)->bandwidth, frame->peak(i)->phase);
+        Loris::Breakpoint(peaks[i].frequency, peaks[i].amplitude,
+                          peaks[i].bandwidth, peaks[i].phase);
     _analyzer->peaks.push_back(Loris::SpectralPeak(0, bp));
   }
 
@@ -59,6 +59,7 @@ class PartialTracking {
 
     virtual void update_partials(Frame *frame);
     virtual Frames find_partials(Frames frames);
+    virtual FrameSet *find_partials(FrameSet *frame_set);
 };
 
 // ---------------------------------------------------------------------------
@@ -79,6 +80,41 @@ class MQPartialTracking : public PartialTracking {
     void update_partials(Frame *frame);
 };
 
+// ---------------------------------------------------------------------------
+// OfflinePartialTracking
+//
+// Links the peaks in each frame to the partials of the previous frame by
+// solving a minimum cost assignment, where the cost of continuing a partial
+// is the change in frequency. Peaks and partials more than
+// matching_interval Hz apart are never linked.
+//
+// find_partials(FrameSet*) links all frames of an analysis directly in the
+// FrameSet peak and partial arrays.
+// ---------------------------------------------------------------------------
+class OfflinePartialTracking : public PartialTracking {
+  private:
+    s_sample _matching_interval;
+    std::vector<s_sample> _amplitude;
+    std::vector<s_sample> _frequency;
+    std::vector<s_sample> _peak_amplitude;
+    std::vector<s_sample> _peak_frequency;
+    std::vector<int> _partial_peaks;
+    void assign_peaks(int num_peaks, s_sample *amplitude,
+                      s_sample *frequency);
+
+  public:
+    OfflinePartialTracking();
+    ~OfflinePartialTracking();
+    void reset();
+    using PartialTracking::max_partials;
+    void max_partials(int new_max_partials);
+    s_sample matching_interval();
+    void matching_interval(s_sample new_matching_interval);
+    void update_partials(Frame *frame);
+    using PartialTracking::find_partials;
+    FrameSet *find_partials(FrameSet *frame_set);
+};
+
 // ---------------------------------------------------------------------------
 // SMSPartialTracking
 // ---------------------------------------------------------------------------
@@ -90,12 +126,21 @@ class SMSPartialTracking : public PartialTracking {
     s_sample *_peak_amplitude;
     s_sample *_peak_frequency;
     s_sample *_peak_phase;
+    bool _configuring;
+    bool _initialised;
     void init_peaks();
+    void free_analysis();
+    void init_analysis();
 
   public:
     SMSPartialTracking();
     ~SMSPartialTracking();
     void reset();
+
+    // Parameter changes made between begin_configure and end_configure
+    // re-initialise the SMS analysis once, in end_configure.
+    void begin_configure();
+    void end_configure();
     using PartialTracking::max_partials;
     void max_partials(int new_max_partials);
     bool realtime();
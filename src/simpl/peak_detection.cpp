@@ -6,6 +6,9 @@ using namespace simpl;
 // ---------------------------------------------------------------------------
 // PeakDetection
 // ---------------------------------------------------------------------------
+// Number of frames (per thread) that are in use at any time when
+// find_peaks stores peaks in a FrameSet
+#define FRAME_BLOCK_SIZE 64
 
 PeakDetection::PeakDetection() {
     _sampling_rate = 44100;
@@ -16,21 +19,20 @@ PeakDetection::PeakDetection() {
     _window_type = "hamming";
     _window_size = 2048;
     _min_peak_separation = 1.0; // in Hz
+    _num_threads = 1;
 }
 
-PeakDetection::~PeakDetection() { clear(); }
-
-void PeakDetection::clear() {
-    for (int i = 0; i < _frames.size(); i++) {
-        if (_frames[i]) {
-            delete _frames[i];
-            _frames[i] = NULL;
-        }
-    }
-
-    _frames.clear();
+PeakDetection::~PeakDetection() {
+    clear();
+    destroy_workers();
 }
 
+// Frames from the previous call to find_peaks are kept in a pool
+// and reused by the next call rather than being deleted. Frames that
+// were taken with take_frames are no longer in _frames, so they are
+// never pooled.
+void PeakDetection::clear() { _frame_pool.release(_frames); }
+
 int PeakDetection::sampling_rate() { return _sampling_rate; }
 
 void PeakDetection::sampling_rate(int new_sampling_rate) {
@@ -77,6 +79,12 @@ void PeakDetection::min_peak_separation(s_sample new_min_peak_separation) {
     _min_peak_separation = new_min_peak_separation;
 }
 
+int PeakDetection::num_threads() { return _num_threads; }
+
+void PeakDetection::num_threads(int new_num_threads) {
+    _num_threads = new_num_threads < 1 ? 1 : new_num_threads;
+}
+
 int PeakDetection::num_frames() { return _frames.size(); }
 
 Frame *PeakDetection::frame(int frame_number) { return _frames[frame_number]; }
@@ -85,9 +93,140 @@ Frames PeakDetection::frames() { return _frames; }
 
 void PeakDetection::frames(Frames new_frames) { _frames = new_frames; }
 
+Frames PeakDetection::take_frames() {
+    Frames frames = _frames;
+    _frames.clear();
+    return frames;
+}
+
+PeakDetection *PeakDetection::create_worker() { return NULL; }
+
+// Copy the analysis parameters of pd to this detector. The fields are set
+// directly, so subclasses should only call this before they have been
+// initialised.
+void PeakDetection::copy_parameters(PeakDetection *pd) {
+    _sampling_rate = pd->_sampling_rate;
+    _static_frame_size = pd->_static_frame_size;
+    _hop_size = pd->_hop_size;
+    _max_peaks = pd->_max_peaks;
+    _window_type = pd->_window_type;
+    _window_size = pd->_window_size;
+    _min_peak_separation = pd->_min_peak_separation;
+    _frame_size = pd->_frame_size;
+}
+
+bool PeakDetection::same_parameters(PeakDetection *pd) {
+    return _sampling_rate == pd->_sampling_rate &&
+           _static_frame_size == pd->_static_frame_size &&
+           _hop_size == pd->_hop_size && _max_peaks == pd->_max_peaks &&
+           _window_type == pd->_window_type &&
+           _window_size == pd->_window_size &&
+           _min_peak_separation == pd->_min_peak_separation &&
+           _frame_size == pd->_frame_size;
+}
+
+// Workers are kept between calls to find_peaks, and are only created again
+// when num_threads or one of the analysis parameters has changed. They are
+// created before any threads are started, so they never make FFT plans
+// concurrently.
+void PeakDetection::update_workers() {
+    int num_workers = _num_threads - 1;
+    if (num_workers < 0) {
+        num_workers = 0;
+    }
+    if (_workers.size() == num_workers &&
+        (num_workers == 0 || same_parameters(_workers[0]))) {
+        return;
+    }
+
+    destroy_workers();
+    for (int i = 0; i < num_workers; i++) {
+        PeakDetection *pd = create_worker();
+        if (!pd) {
+            break;
+        }
+        _workers.push_back(pd);
+    }
+}
+
+void PeakDetection::destroy_workers() {
+    for (int i = 0; i < _workers.size(); i++) {
+        delete _workers[i];
+    }
+    _workers.clear();
+}
+
 // Find and return all spectral peaks in a given frame of audio
 void PeakDetection::find_peaks_in_frame(Frame *frame) {}
 
+void PeakDetection::find_peaks_in_frames(int num_frames, Frame **frames) {
+    for (int i = 0; i < num_frames; i++) {
+        find_peaks_in_frame(frames[i]);
+    }
+}
+
+struct AnalyseFramesTask {
+    PeakDetection *pd;
+    int num_frames;
+    Frame **frames;
+    std::string error;
+};
+
+void *PeakDetection::analyse_frames_thread(void *task) {
+    AnalyseFramesTask *t = (AnalyseFramesTask *)task;
+    try {
+        t->pd->find_peaks_in_frames(t->num_frames, t->frames);
+    } catch (std::exception &e) {
+        t->error = e.what();
+    } catch (...) {
+        t->error = "Unknown error in peak detection thread";
+    }
+    return NULL;
+}
+
+void PeakDetection::analyse_frames(int num_frames, Frame **frames) {
+    int num_threads = std::min((int)_workers.size() + 1, num_frames);
+    if (num_threads <= 1) {
+        find_peaks_in_frames(num_frames, frames);
+        return;
+    }
+
+    // frames are split into one contiguous range per thread, the first
+    // range is analysed by the calling thread
+    std::vector<AnalyseFramesTask> tasks(num_threads);
+    std::vector<pthread_t> threads(num_threads);
+    std::vector<bool> started(num_threads, false);
+    int range = (num_frames + num_threads - 1) / num_threads;
+
+    for (int i = 0; i < num_threads; i++) {
+        int start = std::min(i * range, num_frames);
+        tasks[i].pd = (i == 0) ? this : _workers[i - 1];
+        tasks[i].num_frames = std::min(range, num_frames - start);
+        tasks[i].frames = frames + start;
+    }
+
+    for (int i = 1; i < num_threads; i++) {
+        started[i] = pthread_create(&threads[i], NULL, analyse_frames_thread,
+                                    &tasks[i]) == 0;
+    }
+
+    analyse_frames_thread(&tasks[0]);
+
+    for (int i = 1; i < num_threads; i++) {
+        if (started[i]) {
+            pthread_join(threads[i], NULL);
+        } else {
+            analyse_frames_thread(&tasks[i]);
+        }
+    }
+
+    for (int i = 0; i < num_threads; i++) {
+        if (!tasks[i].error.empty()) {
+            throw Exception(tasks[i].error);
+        }
+    }
+}
+
 // Find and return all spectral peaks in a given audio signal.
 // If the signal contains more than 1 frame worth of audio, it will be broken
 // up into separate frames, each containing a std::vector of peaks.
@@ -95,21 +234,33 @@ void PeakDetection::find_peaks_in_frame(Frame *frame) {}
 Frames PeakDetection::find_peaks(int audio_size, s_sample *audio) {
     clear();
     unsigned int pos = 0;
-    bool alloc_memory_in_frame = true;
 
-    while (pos <= audio_size - _hop_size) {
-        if (!_static_frame_size) {
-            _frame_size = next_frame_size();
+    // with a static frame size the frames are independent, so they can
+    // all be created first and then analysed together
+    if (_static_frame_size) {
+        while (pos <= audio_size - _hop_size) {
+            Frame *f = _frame_pool.acquire(_frame_size, &(audio[pos]),
+                                           audio_size - pos);
+            f->max_peaks(_max_peaks);
+            _frames.push_back(f);
+            pos += _hop_size;
         }
 
-        Frame *f = new Frame(_frame_size, alloc_memory_in_frame);
-        f->max_peaks(_max_peaks);
-
-        if ((int)pos <= (audio_size - _frame_size)) {
-            f->audio(&(audio[pos]), _frame_size);
-        } else {
-            f->audio(&(audio[pos]), audio_size - pos);
+        if (_frames.size() > 0) {
+            update_workers();
+            analyse_frames(_frames.size(), &(_frames[0]));
         }
+        return _frames;
+    }
+
+    while (pos <= audio_size - _hop_size) {
+        _frame_size = next_frame_size();
+
+        // frames read their audio directly from the input signal, only the
+        // final (zero-padded) frame copies its samples
+        Frame *f =
+            _frame_pool.acquire(_frame_size, &(audio[pos]), audio_size - pos);
+        f->max_peaks(_max_peaks);
 
         find_peaks_in_frame(f);
         _frames.push_back(f);
@@ -119,10 +270,79 @@ Frames PeakDetection::find_peaks(int audio_size, s_sample *audio) {
     return _frames;
 }
 
+// Find all spectral peaks in a given audio signal, storing the peaks for
+// each frame in frame_set.
+FrameSet *PeakDetection::find_peaks(int audio_size, s_sample *audio,
+                                    FrameSet *frame_set) {
+    clear();
+    unsigned int pos = 0;
+
+    frame_set->clear();
+    frame_set->max_peaks(_max_peaks);
+
+    // with a static frame size, frames are analysed in blocks so at most
+    // FRAME_BLOCK_SIZE frames per thread are in use at any time
+    if (_static_frame_size) {
+        update_workers();
+        int block_size = FRAME_BLOCK_SIZE * (_workers.size() + 1);
+
+        while (pos <= audio_size - _hop_size) {
+            Frame *f = _frame_pool.acquire(_frame_size, &(audio[pos]),
+                                           audio_size - pos);
+            f->max_peaks(_max_peaks);
+            _frames.push_back(f);
+            pos += _hop_size;
+
+            if (_frames.size() == block_size ||
+                pos > audio_size - _hop_size) {
+                analyse_frames(_frames.size(), &(_frames[0]));
+                for (int i = 0; i < _frames.size(); i++) {
+                    frame_set->add_frame(_frames[i]);
+                }
+                clear();
+            }
+        }
+
+        return frame_set;
+    }
+
+    // otherwise a single Frame is reused for every hop
+    Frame f(_frame_size, audio, audio_size);
+    f.max_peaks(_max_peaks);
+
+    while (pos <= audio_size - _hop_size) {
+        _frame_size = next_frame_size();
+
+        if (f.size() != _frame_size) {
+            f.size(_frame_size);
+        }
+        f.clear();
+        f.audio_view(&(audio[pos]), audio_size - pos);
+
+        find_peaks_in_frame(&f);
+        frame_set->add_frame(&f);
+        pos += _hop_size;
+    }
+
+    return frame_set;
+}
+
 // ---------------------------------------------------------------------------
 // MQPeakDetection
 // ---------------------------------------------------------------------------
-MQPeakDetection::MQPeakDetection() {
+// Number of frames that are analysed together by find_peaks
+#define MQ_BATCH_SIZE 64
+
+MQPeakDetection::MQPeakDetection() { init(); }
+
+// Worker constructor, initialised once with the parameters of pd
+MQPeakDetection::MQPeakDetection(MQPeakDetection *pd) {
+    copy_parameters(pd);
+    init();
+}
+
+void MQPeakDetection::init() {
+    _mq_params.batch_size = MQ_BATCH_SIZE;
     _mq_params.max_peaks = _max_peaks;
     _mq_params.frame_size = _frame_size;
     _mq_params.num_bins = (_frame_size / 2) + 1;
@@ -157,18 +377,40 @@ void MQPeakDetection::max_peaks(int new_max_peaks) {
 }
 
 void MQPeakDetection::find_peaks_in_frame(Frame *frame) {
-    MQPeakList *pl = mq_find_peaks(_frame_size, frame->audio(), &_mq_params);
-    MQPeakList *pl_start = pl;
-
-    int num_peaks = 0;
-    while (pl && pl->peak && num_peaks < _max_peaks) {
-        frame->add_peak(pl->peak->amplitude, pl->peak->frequency,
-                        pl->peak->phase, 0.0);
-        pl = pl->next;
-        num_peaks++;
+    int num_peaks = mq_find_peaks(_frame_size, frame->audio(), &_mq_params);
+    MQPeak *peaks = _mq_params.peaks;
+    for (int i = 0; i < num_peaks; i++) {
+        frame->add_peak(peaks[i].amplitude, peaks[i].frequency,
+                        peaks[i].phase, 0.0);
     }
+}
+
+PeakDetection *MQPeakDetection::create_worker() {
+    return new MQPeakDetection(this);
+}
+
+// Find the peaks in num_frames frames, computing the spectra of
+// MQ_BATCH_SIZE frames at a time with a single batched FFT
+void MQPeakDetection::find_peaks_in_frames(int num_frames, Frame **frames) {
+    for (int start = 0; start < num_frames; start += MQ_BATCH_SIZE) {
+        int batch_size = std::min(num_frames - start, MQ_BATCH_SIZE);
+        Frame **batch = frames + start;
+
+        for (int i = 0; i < batch_size; i++) {
+            mq_batch_frame(i, batch[i]->audio(), &_mq_params);
+        }
+
+        mq_batch_stft(batch_size, &_mq_params);
 
-    delete_peak_list(pl_start);
+        for (int i = 0; i < batch_size; i++) {
+            int num_peaks = mq_batch_find_peaks(i, &_mq_params);
+            MQPeak *peaks = _mq_params.peaks;
+            for (int j = 0; j < num_peaks; j++) {
+                batch[i]->add_peak(peaks[j].amplitude, peaks[j].frequency,
+                                   peaks[j].phase, 0.0);
+            }
+        }
+    }
 }
 
 // ---------------------------------------------------------------------------
@@ -192,11 +434,11 @@ SMSPeakDetection::SMSPeakDetection() {
     _analysis_params.nGuides = _max_peaks;
     _analysis_params.preEmphasis = 0;
     _analysis_params.realtime = 0;
-    sms_initAnalysis(&_analysis_params);
+    _configuring = false;
+    _initialised = false;
+    init_analysis();
     _analysis_params.iSizeSound = _frame_size;
 
-    sms_initSpectralPeaks(&_peaks, _max_peaks);
-
     // By default, SMS will change the size of the frames being read
     // depending on the detected fundamental frequency (if any) of the
     // input sound. To prevent this behaviour (useful when comparing
@@ -206,11 +448,33 @@ SMSPeakDetection::SMSPeakDetection() {
 }
 
 SMSPeakDetection::~SMSPeakDetection() {
-    sms_freeAnalysis(&_analysis_params);
-    sms_freeSpectralPeaks(&_peaks);
+    free_analysis();
     sms_free();
 }
 
+void SMSPeakDetection::free_analysis() {
+    if (_initialised) {
+        sms_freeAnalysis(&_analysis_params);
+        sms_freeSpectralPeaks(&_peaks);
+        _initialised = false;
+    }
+}
+
+void SMSPeakDetection::init_analysis() {
+    if (!_initialised && !_configuring) {
+        sms_initAnalysis(&_analysis_params);
+        sms_initSpectralPeaks(&_peaks, _max_peaks);
+        _initialised = true;
+    }
+}
+
+void SMSPeakDetection::begin_configure() { _configuring = true; }
+
+void SMSPeakDetection::end_configure() {
+    _configuring = false;
+    init_analysis();
+}
+
 int SMSPeakDetection::next_frame_size() {
     return _analysis_params.sizeNextRead;
 }
@@ -222,9 +486,9 @@ void SMSPeakDetection::frame_size(int new_frame_size) {
 
 void SMSPeakDetection::hop_size(int new_hop_size) {
     _hop_size = new_hop_size;
-    sms_freeAnalysis(&_analysis_params);
+    free_analysis();
     _analysis_params.iFrameRate = _sampling_rate / _hop_size;
-    sms_initAnalysis(&_analysis_params);
+    init_analysis();
 }
 
 void SMSPeakDetection::max_peaks(int new_max_peaks) {
@@ -233,15 +497,11 @@ void SMSPeakDetection::max_peaks(int new_max_peaks) {
         _max_peaks = SMS_MAX_NPEAKS;
     }
 
-    sms_freeAnalysis(&_analysis_params);
-    sms_freeSpectralPeaks(&_peaks);
-
+    free_analysis();
     _analysis_params.nTracks = _max_peaks;
     _analysis_params.maxPeaks = _max_peaks;
     _analysis_params.nGuides = _max_peaks;
-
-    sms_initAnalysis(&_analysis_params);
-    sms_initSpectralPeaks(&_peaks, _max_peaks);
+    init_analysis();
 }
 
 int SMSPeakDetection::realtime() { return _analysis_params.realtime; }
@@ -269,7 +529,6 @@ void SMSPeakDetection::find_peaks_in_frame(Frame *frame) {
 Frames SMSPeakDetection::find_peaks(int audio_size, s_sample *audio) {
     clear();
     unsigned int pos = 0;
-    bool alloc_memory_in_frame = true;
 
     _analysis_params.iSizeSound = audio_size;
 
@@ -278,15 +537,12 @@ Frames SMSPeakDetection::find_peaks(int audio_size, s_sample *audio) {
             _frame_size = next_frame_size();
         }
 
-        Frame *f = new Frame(_frame_size, alloc_memory_in_frame);
+        // frames read their audio directly from the input signal, only the
+        // final (zero-padded) frame copies its samples
+        Frame *f =
+            _frame_pool.acquire(_frame_size, &(audio[pos]), audio_size - pos);
         f->max_peaks(_max_peaks);
 
-        if ((int)pos <= (audio_size - _frame_size)) {
-            f->audio(&(audio[pos]), _frame_size);
-        } else {
-            f->audio(&(audio[pos]), audio_size - pos);
-        }
-
         find_peaks_in_frame(f);
         _frames.push_back(f);
 
@@ -300,6 +556,43 @@ Frames SMSPeakDetection::find_peaks(int audio_size, s_sample *audio) {
     return _frames;
 }
 
+FrameSet *SMSPeakDetection::find_peaks(int audio_size, s_sample *audio,
+                                       FrameSet *frame_set) {
+    clear();
+    unsigned int pos = 0;
+
+    _analysis_params.iSizeSound = audio_size;
+
+    frame_set->clear();
+    frame_set->max_peaks(_max_peaks);
+
+    Frame f(_frame_size, audio, audio_size);
+    f.max_peaks(_max_peaks);
+
+    while (pos <= audio_size - _hop_size) {
+        if (!_static_frame_size) {
+            _frame_size = next_frame_size();
+        }
+
+        if (f.size() != _frame_size) {
+            f.size(_frame_size);
+        }
+        f.clear();
+        f.audio_view(&(audio[pos]), audio_size - pos);
+
+        find_peaks_in_frame(&f);
+        frame_set->add_frame(&f);
+
+        if (!_static_frame_size) {
+            pos += _frame_size;
+        } else {
+            pos += _hop_size;
+        }
+    }
+
+    return frame_set;
+}
+
 // ---------------------------------------------------------------------------
 // SndObjPeakDetection
 // ---------------------------------------------------------------------------
@@ -388,13 +681,24 @@ SimplLorisAnalyzer::SimplLorisAnalyzer(int window_size, s_sample resolution,
 
     buildFundamentalEnv(false);
 
+    // windows are shared through the window cache
     _window_shape = Loris::KaiserWindow::computeShape(sidelobeLevel());
     _window.resize(window_size);
-    Loris::KaiserWindow::buildWindow(_window, _window_shape);
+    if (!simpl_window_lookup("loris_kaiser", window_size, 1, &_window_shape,
+                             &(_window[0]))) {
+        Loris::KaiserWindow::buildWindow(_window, _window_shape);
+        simpl_window_store("loris_kaiser", window_size, 1, &_window_shape,
+                           &(_window[0]));
+    }
 
     _window_deriv.resize(window_size);
-    Loris::KaiserWindow::buildTimeDerivativeWindow(_window_deriv,
-                                                   _window_shape);
+    if (!simpl_window_lookup("loris_kaiser_deriv", window_size, 1,
+                             &_window_shape, &(_window_deriv[0]))) {
+        Loris::KaiserWindow::buildTimeDerivativeWindow(_window_deriv,
+                                                       _window_shape);
+        simpl_window_store("loris_kaiser_deriv", window_size, 1,
+                           &_window_shape, &(_window_deriv[0]));
+    }
 
     _spectrum = new Loris::ReassignedSpectrum(_window, _window_deriv);
     m_cropTime = 2 * hop_size;
@@ -435,6 +739,14 @@ LorisPeakDetection::LorisPeakDetection() {
     reset();
 }
 
+// Worker constructor, initialised once with the parameters of pd
+LorisPeakDetection::LorisPeakDetection(LorisPeakDetection *pd) {
+    copy_parameters(pd);
+    _resolution = pd->_resolution;
+    _analyzer = NULL;
+    reset();
+}
+
 LorisPeakDetection::~LorisPeakDetection() {
     if (_analyzer) {
         delete _analyzer;
@@ -449,6 +761,10 @@ void LorisPeakDetection::reset() {
                                        _sampling_rate);
 }
 
+PeakDetection *LorisPeakDetection::create_worker() {
+    return new LorisPeakDetection(this);
+}
+
 void LorisPeakDetection::frame_size(int new_frame_size) {
     _frame_size = new_frame_size;
     reset();
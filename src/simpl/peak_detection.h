@@ -1,7 +1,10 @@
 #ifndef PEAK_DETECTION_H
 #define PEAK_DETECTION_H
 
+#include <pthread.h>
+
 #include "base.h"
+#include "window_cache.h"
 
 #include "mq.h"
 #include "twm.h"
@@ -44,6 +47,26 @@ class PeakDetection {
     int _window_size;
     s_sample _min_peak_separation;
     Frames _frames;
+    FramePool _frame_pool;
+    int _num_threads;
+    std::vector<PeakDetection *> _workers;
+
+    // Return a new detector with the same parameters as this one, used to
+    // analyse frames in another thread. Returns NULL (the default) if
+    // frames must be analysed in order by a single detector.
+    virtual PeakDetection *create_worker();
+    void copy_parameters(PeakDetection *pd);
+    bool same_parameters(PeakDetection *pd);
+    void update_workers();
+    void destroy_workers();
+
+    // Find the peaks in num_frames consecutive frames
+    virtual void find_peaks_in_frames(int num_frames, Frame **frames);
+
+    // As above, but the frames are split between this detector and
+    // its workers, each analysing a contiguous range in its own thread
+    void analyse_frames(int num_frames, Frame **frames);
+    static void *analyse_frames_thread(void *task);
 
   public:
     PeakDetection();
@@ -67,11 +90,18 @@ class PeakDetection {
     virtual void window_size(int new_window_size);
     virtual s_sample min_peak_separation();
     virtual void min_peak_separation(s_sample new_min_peak_separation);
+    virtual int num_threads();
+    virtual void num_threads(int new_num_threads);
     int num_frames();
     Frame *frame(int frame_number);
     Frames frames();
     void frames(Frames new_frames);
 
+    // Give up ownership of the frames returned by the last call to
+    // find_peaks. They are not reused or deleted by this detector, the
+    // caller must delete them.
+    Frames take_frames();
+
     // Find and return all spectral peaks in a given frame of audio
     virtual void find_peaks_in_frame(Frame *frame);
 
@@ -79,7 +109,20 @@ class PeakDetection {
     // If the signal contains more than 1 frame worth of audio, it will be
     // broken up into separate frames, with an array of peaks returned for
     // each frame
+    //
+    // The frames belong to the detector: unless they are taken with
+    // take_frames, they are reused by the next call to find_peaks (or
+    // returned to the frame pool by clear).
     virtual Frames find_peaks(int audio_size, s_sample *audio);
+
+    // As above, but the peaks for each frame are stored in frame_set
+    // instead of in a new Frame per hop
+    //
+    // If the frame size is static and the detector supports it, frames are
+    // analysed by num_threads threads. The results are the same as when
+    // using a single thread.
+    virtual FrameSet *find_peaks(int audio_size, s_sample *audio,
+                                 FrameSet *frame_set);
 };
 
 // ---------------------------------------------------------------------------
@@ -88,8 +131,14 @@ class PeakDetection {
 class MQPeakDetection : public PeakDetection {
   private:
     MQParameters _mq_params;
+    void init();
     void reset();
 
+  protected:
+    MQPeakDetection(MQPeakDetection *pd);
+    PeakDetection *create_worker();
+    void find_peaks_in_frames(int num_frames, Frame **frames);
+
   public:
     MQPeakDetection();
     ~MQPeakDetection();
@@ -109,10 +158,19 @@ class SMSPeakDetection : public PeakDetection {
   private:
     SMSAnalysisParams _analysis_params;
     SMSSpectralPeaks _peaks;
+    bool _configuring;
+    bool _initialised;
+    void free_analysis();
+    void init_analysis();
 
   public:
     SMSPeakDetection();
     ~SMSPeakDetection();
+
+    // Parameter changes made between begin_configure and end_configure
+    // re-initialise the SMS analysis once, in end_configure.
+    void begin_configure();
+    void end_configure();
     int next_frame_size();
     using PeakDetection::frame_size;
     void frame_size(int new_frame_size);
@@ -124,6 +182,8 @@ class SMSPeakDetection : public PeakDetection {
     void realtime(int new_realtime);
     void find_peaks_in_frame(Frame *frame);
     Frames find_peaks(int audio_size, s_sample *audio);
+    FrameSet *find_peaks(int audio_size, s_sample *audio,
+                         FrameSet *frame_set);
 };
 
 // ---------------------------------------------------------------------------
@@ -176,6 +236,10 @@ class LorisPeakDetection : public PeakDetection {
     SimplLorisAnalyzer *_analyzer;
     void reset();
 
+  protected:
+    LorisPeakDetection(LorisPeakDetection *pd);
+    PeakDetection *create_worker();
+
   public:
     LorisPeakDetection();
     ~LorisPeakDetection();
@@ -14,16 +14,8 @@ Residual::Residual() {
 
 Residual::~Residual() { clear(); }
 
-void Residual::clear() {
-  for (int i = 0; i < _frames.size(); i++) {
-    if (_frames[i]) {
-      delete _frames[i];
-      _frames[i] = NULL;
-    }
-  }
-
-  _frames.clear();
-}
+// Frames are returned to the pool to be reused by the next call to synth
+void Residual::clear() { _frame_pool.release(_frames); }
 
 void Residual::reset() {}
 
@@ -60,16 +52,13 @@ Frames Residual::synth(Frames &frames) {
 Frames Residual::synth(int original_size, s_sample *original) {
   clear();
   unsigned int pos = 0;
-  bool alloc_memory_in_frame = true;
 
   while (pos <= original_size - _hop_size) {
-    Frame *f = new Frame(_frame_size, alloc_memory_in_frame);
-
-    if ((int)pos <= (original_size - _frame_size)) {
-      f->audio(&(original[pos]), _frame_size);
-    } else {
-      f->audio(&(original[pos]), original_size - pos);
-    }
+    // audio is a view of the original signal (except for the final,
+    // zero-padded frame), synth and residual buffers are only allocated
+    // when synth_frame writes to them
+    Frame *f =
+        _frame_pool.acquire(_frame_size, &(original[pos]), original_size - pos);
 
     synth_frame(f);
     _frames.push_back(f);
@@ -89,7 +78,9 @@ SMSResidual::SMSResidual() {
 
   sms_initResidualParams(&_residual_params);
   _residual_params.hopSize = _hop_size;
-  sms_initResidual(&_residual_params);
+  _configuring = false;
+  _initialised = false;
+  init_residual();
 
   _pd.hop_size(_hop_size);
   _pd.realtime(1);
@@ -98,10 +89,37 @@ SMSResidual::SMSResidual() {
 }
 
 SMSResidual::~SMSResidual() {
-  sms_freeResidual(&_residual_params);
+  free_residual();
   sms_free();
 }
 
+void SMSResidual::free_residual() {
+  if (_initialised) {
+    sms_freeResidual(&_residual_params);
+    _initialised = false;
+  }
+}
+
+void SMSResidual::init_residual() {
+  if (!_initialised && !_configuring) {
+    sms_initResidual(&_residual_params);
+    _initialised = true;
+  }
+}
+
+void SMSResidual::begin_configure() {
+  _configuring = true;
+  _pd.begin_configure();
+  _synth.begin_configure();
+}
+
+void SMSResidual::end_configure() {
+  _configuring = false;
+  init_residual();
+  _pd.end_configure();
+  _synth.end_configure();
+}
+
 void SMSResidual::reset() {}
 
 void SMSResidual::frame_size(int new_frame_size) {
@@ -112,9 +130,9 @@ void SMSResidual::frame_size(int new_frame_size) {
 void SMSResidual::hop_size(int new_hop_size) {
   _hop_size = new_hop_size;
 
-  sms_freeResidual(&_residual_params);
+  free_residual();
   _residual_params.hopSize = _hop_size;
-  sms_initResidual(&_residual_params);
+  init_residual();
 
   _pd.hop_size(_hop_size);
   _synth.hop_size(_hop_size);
@@ -123,9 +141,9 @@ void SMSResidual::hop_size(int new_hop_size) {
 int SMSResidual::num_stochastic_coeffs() { return _residual_params.nCoeffs; }
 
 void SMSResidual::num_stochastic_coeffs(int new_num_stochastic_coeffs) {
-  sms_freeResidual(&_residual_params);
+  free_residual();
   _residual_params.nCoeffs = new_num_stochastic_coeffs;
-  sms_initResidual(&_residual_params);
+  init_residual();
 }
 
 void SMSResidual::residual_frame(Frame *frame) {
@@ -26,6 +26,7 @@ protected:
   int _hop_size;
   int _sampling_rate;
   Frames _frames;
+  FramePool _frame_pool;
 
   void clear();
 
@@ -60,11 +61,22 @@ private:
   SMSPeakDetection _pd;
   SMSPartialTracking _pt;
   SMSSynthesis _synth;
+  bool _configuring;
+  bool _initialised;
+  void free_residual();
+  void init_residual();
 
 public:
   SMSResidual();
   ~SMSResidual();
   void reset();
+
+  // Parameter changes made between begin_configure and end_configure
+  // re-initialise the SMS residual analysis (and its peak detection and
+  // synthesis) once, in end_configure.
+  void begin_configure();
+  void end_configure();
+
   void frame_size(int new_frame_size);
   void hop_size(int new_hop_size);
   int num_stochastic_coeffs();
@@ -11,6 +11,21 @@ Synthesis::Synthesis() {
   _hop_size = 512;
   _max_partials = 100;
   _sampling_rate = 44100;
+  _num_threads = 1;
+
+  pthread_mutex_init(&_thread_lock, NULL);
+  pthread_cond_init(&_work_ready, NULL);
+  pthread_cond_init(&_work_done, NULL);
+  _generation = 0;
+  _pending = 0;
+  _stopping = false;
+}
+
+Synthesis::~Synthesis() {
+  stop_threads();
+  pthread_cond_destroy(&_work_done);
+  pthread_cond_destroy(&_work_ready);
+  pthread_mutex_destroy(&_thread_lock);
 }
 
 void Synthesis::reset() {}
@@ -35,6 +50,167 @@ void Synthesis::sampling_rate(int new_sampling_rate) {
   _sampling_rate = new_sampling_rate;
 }
 
+int Synthesis::num_threads() { return _num_threads; }
+
+void Synthesis::num_threads(int new_num_threads) {
+  new_num_threads = new_num_threads < 1 ? 1 : new_num_threads;
+  if (new_num_threads != _num_threads) {
+    stop_threads();
+  }
+  _num_threads = new_num_threads;
+}
+
+void Synthesis::synth_partials(Frame *frame, int first, int last, int size,
+                               s_sample *output) {}
+
+void *Synthesis::synth_partials_thread(void *task) {
+  SynthPartialsTask *t = (SynthPartialsTask *)task;
+  try {
+    t->synth->synth_partials(t->frame, t->first, t->last, t->size,
+                             t->output);
+  } catch (std::exception &e) {
+    t->error = e.what();
+  } catch (...) {
+    t->error = "Unknown error in synthesis thread";
+  }
+  return NULL;
+}
+
+// Start num_threads - 1 worker threads, one for each task after the
+// first. If a thread can not be created, the remaining tasks are run by
+// the calling thread instead.
+void Synthesis::start_threads() {
+  stop_threads();
+
+  _tasks.resize(_num_threads);
+  for (int i = 0; i < _num_threads; i++) {
+    _tasks[i].synth = this;
+    _tasks[i].generation = _generation;
+  }
+
+  for (int i = 1; i < _num_threads; i++) {
+    pthread_t thread;
+    if (pthread_create(&thread, NULL, synth_worker, &_tasks[i]) != 0) {
+      break;
+    }
+    _threads.push_back(thread);
+  }
+}
+
+void Synthesis::stop_threads() {
+  if (!_threads.empty()) {
+    pthread_mutex_lock(&_thread_lock);
+    _stopping = true;
+    pthread_cond_broadcast(&_work_ready);
+    pthread_mutex_unlock(&_thread_lock);
+
+    for (int i = 0; i < _threads.size(); i++) {
+      pthread_join(_threads[i], NULL);
+    }
+    _threads.clear();
+    _stopping = false;
+  }
+  _tasks.clear();
+}
+
+void *Synthesis::synth_worker(void *task) {
+  SynthPartialsTask *t = (SynthPartialsTask *)task;
+  Synthesis *s = t->synth;
+
+  pthread_mutex_lock(&s->_thread_lock);
+  while (true) {
+    while (!s->_stopping && t->generation == s->_generation) {
+      pthread_cond_wait(&s->_work_ready, &s->_thread_lock);
+    }
+    if (s->_stopping) {
+      break;
+    }
+    t->generation = s->_generation;
+    pthread_mutex_unlock(&s->_thread_lock);
+
+    if (t->first < t->last) {
+      synth_partials_thread(t);
+    }
+
+    pthread_mutex_lock(&s->_thread_lock);
+    if (--s->_pending == 0) {
+      pthread_cond_signal(&s->_work_done);
+    }
+  }
+  pthread_mutex_unlock(&s->_thread_lock);
+  return NULL;
+}
+
+void Synthesis::synth_partials_threaded(Frame *frame, int num_partials,
+                                        int size, s_sample *output) {
+  int num_threads = std::min(_num_threads, num_partials);
+  if (num_threads <= 1) {
+    synth_partials(frame, 0, num_partials, size, output);
+    return;
+  }
+
+  if (_tasks.size() != _num_threads) {
+    start_threads();
+  }
+
+  int range = (num_partials + num_threads - 1) / num_threads;
+
+  if (_thread_buffers.size() < num_threads) {
+    _thread_buffers.resize(num_threads);
+  }
+
+  for (int i = 0; i < _num_threads; i++) {
+    _tasks[i].frame = frame;
+    _tasks[i].first = std::min(i * range, num_partials);
+    _tasks[i].last = std::min((i + 1) * range, num_partials);
+    _tasks[i].size = size;
+    _tasks[i].error.clear();
+    if (i >= num_threads) {
+      _tasks[i].last = _tasks[i].first;
+    } else if (i == 0) {
+      _tasks[i].output = output;
+    } else {
+      _thread_buffers[i].assign(size, 0.0);
+      _tasks[i].output = &(_thread_buffers[i][0]);
+    }
+  }
+
+  int num_workers = _threads.size();
+  if (num_workers > 0) {
+    pthread_mutex_lock(&_thread_lock);
+    _generation++;
+    _pending = num_workers;
+    pthread_cond_broadcast(&_work_ready);
+    pthread_mutex_unlock(&_thread_lock);
+  }
+
+  // tasks without a worker thread are run here
+  synth_partials_thread(&_tasks[0]);
+  for (int i = num_workers + 1; i < num_threads; i++) {
+    synth_partials_thread(&_tasks[i]);
+  }
+
+  if (num_workers > 0) {
+    pthread_mutex_lock(&_thread_lock);
+    while (_pending > 0) {
+      pthread_cond_wait(&_work_done, &_thread_lock);
+    }
+    pthread_mutex_unlock(&_thread_lock);
+  }
+
+  for (int i = 0; i < num_threads; i++) {
+    if (!_tasks[i].error.empty()) {
+      throw Exception(_tasks[i].error);
+    }
+  }
+
+  for (int i = 1; i < num_threads; i++) {
+    for (int n = 0; n < size; n++) {
+      output[n] += _thread_buffers[i][n];
+    }
+  }
+}
+
 void Synthesis::synth_frame(Frame *frame) {}
 
 Frames Synthesis::synth(Frames frames) {
@@ -45,6 +221,26 @@ Frames Synthesis::synth(Frames frames) {
   return frames;
 }
 
+void Synthesis::synth(FrameSet *frame_set, int output_size, s_sample *output) {
+  int num_frames = frame_set->num_frames();
+  if (num_frames * _hop_size > output_size) {
+    num_frames = output_size / _hop_size;
+  }
+
+  memset(output, 0.0, sizeof(s_sample) * output_size);
+
+  // the frame does not own its buffers, each hop is synthesised directly
+  // into the output signal
+  Frame f(_frame_size, false);
+  f.synth_size(_hop_size);
+
+  for (int i = 0; i < num_frames; i++) {
+    frame_set->read_frame(i, &f);
+    f.synth(&(output[i * _hop_size]));
+    synth_frame(&f);
+  }
+}
+
 // ---------------------------------------------------------------------------
 // MQSynthesis
 // ---------------------------------------------------------------------------
@@ -52,6 +248,7 @@ MQSynthesis::MQSynthesis() {
   _prev_amps = NULL;
   _prev_freqs = NULL;
   _prev_phases = NULL;
+  _oscillator_mode = MQ_OSC_EXACT;
   reset();
 }
 
@@ -83,6 +280,14 @@ void MQSynthesis::reset() {
   memset(_prev_amps, 0.0, sizeof(s_sample) * _max_partials);
   memset(_prev_freqs, 0.0, sizeof(s_sample) * _max_partials);
   memset(_prev_phases, 0.0, sizeof(s_sample) * _max_partials);
+
+  _osc_amps.assign(_max_partials, 0.0);
+  _osc_amp_incs.assign(_max_partials, 0.0);
+  _osc_phases.assign(_max_partials, 0.0);
+  _osc_freqs.assign(_max_partials, 0.0);
+  _osc_alphas.assign(_max_partials, 0.0);
+  _osc_betas.assign(_max_partials, 0.0);
+  _osc_out.assign(_max_partials, 0.0);
 }
 
 s_sample MQSynthesis::hz_to_radians(s_sample f) {
@@ -94,20 +299,29 @@ void MQSynthesis::max_partials(int new_max_partials) {
   reset();
 }
 
+int MQSynthesis::oscillator_mode() { return _oscillator_mode; }
+
+void MQSynthesis::oscillator_mode(int new_oscillator_mode) {
+  if (new_oscillator_mode != MQ_OSC_EXACT &&
+      new_oscillator_mode != MQ_OSC_FAST) {
+    throw Exception(std::string("Invalid MQ oscillator mode"));
+  }
+  _oscillator_mode = new_oscillator_mode;
+}
+
 void MQSynthesis::synth_frame(Frame *frame) {
   int num_partials = frame->num_partials();
   if (num_partials > _max_partials) {
     num_partials = _max_partials;
   }
 
-  for (int n = 0; n < _hop_size; n++) {
-    frame->synth()[n] = 0.f;
-  }
+  s_sample hop_size = _hop_size;
 
   for (int i = 0; i < num_partials; i++) {
-    s_sample amp = frame->partial(i)->amplitude;
-    s_sample freq = hz_to_radians(frame->partial(i)->frequency);
-    s_sample phase = frame->partial(i)->phase;
+    Peak *partial = frame->partial(i);
+    s_sample amp = partial->amplitude;
+    s_sample freq = hz_to_radians(partial->frequency);
+    s_sample phase = partial->phase;
 
     // get values for last amplitude, frequency and phase
     // these are the initial values of the instantaneous
@@ -118,7 +332,7 @@ void MQSynthesis::synth_frame(Frame *frame) {
 
     if (prev_amp == 0) {
       prev_freq = freq;
-      prev_phase = frame->partial(i)->phase - (freq * _hop_size);
+      prev_phase = phase - (freq * _hop_size);
       while (prev_phase >= M_PI) {
         prev_phase -= (2.0 * M_PI);
       }
@@ -128,8 +342,8 @@ void MQSynthesis::synth_frame(Frame *frame) {
     }
 
     // amplitudes are linearly interpolated between frames
-    s_sample inst_amp = prev_amp;
-    s_sample amp_inc = (frame->partial(i)->amplitude - prev_amp) / _hop_size;
+    _osc_amps[i] = prev_amp;
+    _osc_amp_incs[i] = (amp - prev_amp) / _hop_size;
 
     // freqs/phases are calculated by cubic interpolation
     s_sample freq_diff = freq - prev_freq;
@@ -139,24 +353,113 @@ void MQSynthesis::synth_frame(Frame *frame) {
     int m = floor(x + 0.5);
     s_sample phase_diff =
         phase - prev_phase - (prev_freq * _hop_size) + (2.0 * M_PI * m);
-    s_sample alpha =
-        ((3.0 / pow(_hop_size, 2.0)) * phase_diff) - (freq_diff / _hop_size);
-    s_sample beta = ((-2.0 / pow(_hop_size, 3.0)) * phase_diff) +
-                    (freq_diff / pow(_hop_size, 2.0));
+    _osc_phases[i] = prev_phase;
+    _osc_freqs[i] = prev_freq;
+    _osc_alphas[i] = ((3.0 / (hop_size * hop_size)) * phase_diff) -
+                     (freq_diff / _hop_size);
+    _osc_betas[i] = ((-2.0 / (hop_size * hop_size * hop_size)) * phase_diff) +
+                    (freq_diff / (hop_size * hop_size));
 
-    // calculate output samples
+    _prev_amps[i] = amp;
+    _prev_freqs[i] = freq;
+    _prev_phases[i] = phase;
+  }
+
+  s_sample *synth = frame->synth();
+  for (int n = 0; n < _hop_size; n++) {
+    synth[n] = 0.f;
+  }
+
+  synth_partials_threaded(frame, num_partials, _hop_size, synth);
+}
+
+void MQSynthesis::synth_partials(Frame *frame, int first, int last, int size,
+                                 s_sample *output) {
+  if (_oscillator_mode == MQ_OSC_FAST) {
+    synth_partials_fast(first, last, output);
+  } else {
+    synth_partials_exact(first, last, output);
+  }
+}
+
+void MQSynthesis::synth_partials_exact(int first, int last,
+                                       s_sample *output) {
+  for (int i = first; i < last; i++) {
+    s_sample inst_amp = _osc_amps[i];
+    s_sample amp_inc = _osc_amp_incs[i];
+    s_sample prev_phase = _osc_phases[i];
+    s_sample prev_freq = _osc_freqs[i];
+    s_sample alpha = _osc_alphas[i];
+    s_sample beta = _osc_betas[i];
+
+    // calculate output samples (powers of n are exact, so this is the
+    // same as using pow)
     s_sample inst_phase = 0.f;
     for (int n = 0; n < _hop_size; n++) {
+      s_sample n2 = (s_sample)n * n;
       inst_amp += amp_inc;
-      inst_phase = prev_phase + (prev_freq * n) +
-                   (alpha * pow((s_sample)n, 2.0)) +
-                   (beta * pow((s_sample)n, 3.0));
-      frame->synth()[n] += (2.f * inst_amp) * cos(inst_phase);
+      inst_phase = prev_phase + (prev_freq * n) + (alpha * n2) +
+                   (beta * (n2 * n));
+      output[n] += (2.f * inst_amp) * cos(inst_phase);
+    }
+  }
+}
+
+void MQSynthesis::synth_partials_fast(int first, int last, s_sample *output) {
+  s_sample *amps = &_osc_amps[0];
+  s_sample *amp_incs = &_osc_amp_incs[0];
+  s_sample *phases = &_osc_phases[0];
+  s_sample *d1 = &_osc_freqs[0];
+  s_sample *d2 = &_osc_alphas[0];
+  s_sample *d3 = &_osc_betas[0];
+  s_sample *out = &_osc_out[0];
+
+  // replace the phase coefficients by the forward differences of the
+  // phase polynomial at n = 0
+  for (int i = first; i < last; i++) {
+    s_sample alpha = d2[i];
+    s_sample beta = d3[i];
+    d1[i] += alpha + beta;
+    d2[i] = (2.0 * alpha) + (6.0 * beta);
+    d3[i] = 6.0 * beta;
+  }
+
+  // adding and subtracting 1.5 * 2^52 rounds to the nearest integer
+  const s_sample round_const = 6755399441055744.0;
+  const s_sample two_pi = 2.0 * M_PI;
+  const s_sample inv_two_pi = 1.0 / (2.0 * M_PI);
+
+  for (int n = 0; n < _hop_size; n++) {
+    for (int i = first; i < last; i++) {
+      amps[i] += amp_incs[i];
+
+      // cos(x) = sin(pi/2 - |x|) for x in [-pi, pi], with sin given by
+      // its Taylor series up to z^17 (error < 1e-13 for |z| <= pi/2)
+      s_sample x = phases[i];
+      x -= two_pi * (((x * inv_two_pi) + round_const) - round_const);
+      s_sample z = (M_PI / 2.0) - fabs(x);
+      s_sample z2 = z * z;
+      s_sample s = 1.0 / 355687428096000.0;
+      s = (s * z2) - (1.0 / 1307674368000.0);
+      s = (s * z2) + (1.0 / 6227020800.0);
+      s = (s * z2) - (1.0 / 39916800.0);
+      s = (s * z2) + (1.0 / 362880.0);
+      s = (s * z2) - (1.0 / 5040.0);
+      s = (s * z2) + (1.0 / 120.0);
+      s = (s * z2) - (1.0 / 6.0);
+      s = (s * z2) + 1.0;
+      out[i] = (2.0 * amps[i]) * (s * z);
+
+      phases[i] += d1[i];
+      d1[i] += d2[i];
+      d2[i] += d3[i];
     }
 
-    _prev_amps[i] = amp;
-    _prev_freqs[i] = freq;
-    _prev_phases[i] = phase;
+    s_sample sum = 0.0;
+    for (int i = first; i < last; i++) {
+      sum += out[i];
+    }
+    output[n] += sum;
   }
 }
 
@@ -175,35 +478,54 @@ SMSSynthesis::SMSSynthesis() {
   _synth_params.sizeHop = _hop_size;
   _synth_params.nTracks = _max_partials;
   _synth_params.deEmphasis = 0;
-  sms_initSynth(&_synth_params);
-
-  sms_allocFrame(&_data, _max_partials, num_stochastic_coeffs(), 1,
-                 stochastic_type(), 0);
+  _configuring = false;
+  _initialised = false;
+  init_synthesis();
 }
 
 SMSSynthesis::~SMSSynthesis() {
-  sms_freeSynth(&_synth_params);
-  sms_freeFrame(&_data);
+  free_synthesis();
   sms_free();
 }
 
+void SMSSynthesis::free_synthesis() {
+  if (_initialised) {
+    sms_freeSynth(&_synth_params);
+    sms_freeFrame(&_data);
+    _initialised = false;
+  }
+}
+
+void SMSSynthesis::init_synthesis() {
+  if (!_initialised && !_configuring) {
+    sms_initSynth(&_synth_params);
+    sms_allocFrame(&_data, _max_partials, num_stochastic_coeffs(), 1,
+                   stochastic_type(), 0);
+    _initialised = true;
+  }
+}
+
+void SMSSynthesis::begin_configure() { _configuring = true; }
+
+void SMSSynthesis::end_configure() {
+  _configuring = false;
+  init_synthesis();
+}
+
 void SMSSynthesis::hop_size(int new_hop_size) {
   _hop_size = new_hop_size;
 
-  sms_freeSynth(&_synth_params);
+  free_synthesis();
   _synth_params.sizeHop = _hop_size;
-  sms_initSynth(&_synth_params);
+  init_synthesis();
 }
 
 void SMSSynthesis::max_partials(int new_max_partials) {
   _max_partials = new_max_partials;
 
-  sms_freeSynth(&_synth_params);
-  sms_freeFrame(&_data);
+  free_synthesis();
   _synth_params.nTracks = _max_partials;
-  sms_initSynth(&_synth_params);
-  sms_allocFrame(&_data, _max_partials, num_stochastic_coeffs(), 1,
-                 stochastic_type(), 0);
+  init_synthesis();
 }
 
 int SMSSynthesis::num_stochastic_coeffs() {
@@ -339,13 +661,21 @@ void SndObjSynthesis::synth_frame(Frame *frame) {
     _analysis->partials[i] = NULL;
   }
 
-  _synth->DoProcess();
+  // all tracks are synthesised, so that partials that are no longer in
+  // the frame fade out
+  _output.assign(_frame_size, 0.0);
+  synth_partials_threaded(frame, _max_partials, _frame_size, &(_output[0]));
 
   for (int i = 0; i < _hop_size; i++) {
-    frame->synth()[i] = _synth->Output(i);
+    frame->synth()[i] = _output[i];
   }
 }
 
+void SndObjSynthesis::synth_partials(Frame *frame, int first, int last,
+                                     int size, s_sample *output) {
+  _synth->SynthTracks(first, last, output);
+}
+
 // ---------------------------------------------------------------------------
 // LorisSynthesis
 // ---------------------------------------------------------------------------
@@ -381,11 +711,201 @@ void LorisSynthesis::synth_frame(Frame *frame) {
     num_partials = _max_partials;
   }
 
-  for (int i = 0; i < num_partials; i++) {
+  synth_partials_threaded(frame, num_partials, _hop_size, frame->synth());
+}
+
+void LorisSynthesis::synth_partials(Frame *frame, int first, int last,
+                                    int size, s_sample *output) {
+  for (int i = first; i < last; i++) {
     Loris::Breakpoint bp = Loris::Breakpoint(
         frame->partial(i)->frequency, frame->partial(i)->amplitude,
         frame->partial(i)->bandwidth * _bandwidth, frame->partial(i)->phase);
-    _oscs[i].oscillate(frame->synth(), frame->synth() + _hop_size, bp,
-                       _sampling_rate);
+    _oscs[i].oscillate(output, output + size, bp, _sampling_rate);
+  }
+}
+
+// ---------------------------------------------------------------------------
+// IFFTSynthesis
+// ---------------------------------------------------------------------------
+
+// Number of kernel values per bin, the main lobe is linearly interpolated
+// between them
+#define IFFT_KERNEL_OVERSAMPLING 1024
+
+// Half-width of the Blackman-Harris main lobe, in bins
+#define IFFT_KERNEL_BINS 4
+
+static const s_sample blackman_harris[4] = {0.35875, 0.48829, 0.14128,
+                                            0.01168};
+
+IFFTSynthesis::IFFTSynthesis() {
+  _spectrum = NULL;
+  _grain = NULL;
+  _plan = NULL;
+  create_buffers();
+}
+
+IFFTSynthesis::~IFFTSynthesis() { destroy_buffers(); }
+
+void IFFTSynthesis::destroy_buffers() {
+  if (_spectrum) {
+    fftw_free(_spectrum);
+    _spectrum = NULL;
+  }
+  if (_grain) {
+    fftw_free(_grain);
+    _grain = NULL;
+  }
+  // plans are owned by the plan cache
+  _plan = NULL;
+}
+
+void IFFTSynthesis::create_buffers() {
+  destroy_buffers();
+
+  _fft_size = _hop_size * 2;
+  _spectrum = (fftw_complex *)fftw_malloc(sizeof(fftw_complex) *
+                                          (_fft_size / 2 + 1));
+  _grain = (s_sample *)fftw_malloc(sizeof(s_sample) * _fft_size);
+  _plan = fft_plan_c2r(_fft_size, _spectrum, _grain);
+
+  // the grain given by the inverse FFT is windowed by a Blackman-Harris
+  // window, replace it by a triangular window (and scale by 1 / fft_size,
+  // as FFTW does not normalise the inverse transform)
+  _window.resize(_fft_size);
+  for (int i = 0; i < _fft_size; i++) {
+    s_sample x = (2.0 * M_PI * i) / _fft_size;
+    s_sample bh = blackman_harris[0] - (blackman_harris[1] * cos(x)) +
+                  (blackman_harris[2] * cos(2.0 * x)) -
+                  (blackman_harris[3] * cos(3.0 * x));
+    s_sample triangle = 1.0 - (fabs((s_sample)(i - _hop_size)) / _hop_size);
+    _window[i] = triangle / (bh * _fft_size);
+  }
+
+  // main lobe of the (zero-phase) Blackman-Harris window spectrum, from 0
+  // to IFFT_KERNEL_BINS bins, as the sum of shifted periodic sinc functions
+  int kernel_size = (IFFT_KERNEL_BINS * IFFT_KERNEL_OVERSAMPLING) + 2;
+  _kernel.resize(kernel_size);
+  for (int i = 0; i < kernel_size; i++) {
+    s_sample bin_offset = (s_sample)i / IFFT_KERNEL_OVERSAMPLING;
+    s_sample value = 0.0;
+    for (int m = -3; m <= 3; m++) {
+      s_sample x = M_PI * (bin_offset - m) / _fft_size;
+      s_sample d = _fft_size - 1;
+      if (fabs(sin(x)) > 1e-12) {
+        d = sin((_fft_size - 1) * x) / sin(x);
+      }
+      value += blackman_harris[abs(m)] * (m == 0 ? 1.0 : 0.5) * d;
+    }
+    _kernel[i] = i < kernel_size - 1 ? value : 0.0;
+  }
+
+  reset();
+}
+
+void IFFTSynthesis::reset() {
+  _overlap.assign(_fft_size, 0.0);
+  _prev_amps.assign(_max_partials, 0.0);
+  _prev_freqs.assign(_max_partials, 0.0);
+  _prev_phases.assign(_max_partials, 0.0);
+}
+
+void IFFTSynthesis::hop_size(int new_hop_size) {
+  _hop_size = new_hop_size;
+  create_buffers();
+}
+
+void IFFTSynthesis::max_partials(int new_max_partials) {
+  _max_partials = new_max_partials;
+  reset();
+}
+
+s_sample IFFTSynthesis::kernel(s_sample bin_offset) {
+  s_sample x = fabs(bin_offset) * IFFT_KERNEL_OVERSAMPLING;
+  int i = (int)x;
+  if (i >= IFFT_KERNEL_BINS * IFFT_KERNEL_OVERSAMPLING) {
+    return 0.0;
+  }
+  s_sample frac = x - i;
+  return _kernel[i] + (frac * (_kernel[i + 1] - _kernel[i]));
+}
+
+// Add the main lobe of a sinusoid to the spectrum. Bins below 0 Hz or
+// above the Nyquist frequency are reflected (as the conjugate) into the
+// spectrum of the real signal.
+void IFFTSynthesis::add_partial(s_sample amp, s_sample freq, s_sample phase) {
+  int num_bins = _fft_size / 2;
+  s_sample bin = (freq * _fft_size) / _sampling_rate;
+  s_sample re = 0.5 * amp * cos(phase);
+  s_sample im = 0.5 * amp * sin(phase);
+
+  int first = (int)ceil(bin - IFFT_KERNEL_BINS);
+  int last = (int)floor(bin + IFFT_KERNEL_BINS);
+  for (int l = first; l <= last; l++) {
+    s_sample w = kernel(l - bin);
+    if (l > 0 && l < num_bins) {
+      _spectrum[l][0] += re * w;
+      _spectrum[l][1] += im * w;
+    } else if (l == 0 || l == num_bins) {
+      _spectrum[l][0] += 2.0 * re * w;
+    } else if (l < 0) {
+      _spectrum[-l][0] += re * w;
+      _spectrum[-l][1] -= im * w;
+    } else {
+      _spectrum[_fft_size - l][0] += re * w;
+      _spectrum[_fft_size - l][1] -= im * w;
+    }
+  }
+}
+
+void IFFTSynthesis::synth_frame(Frame *frame) {
+  int num_partials = frame->num_partials();
+  if (num_partials > _max_partials) {
+    num_partials = _max_partials;
+  }
+
+  memset(_spectrum, 0, sizeof(fftw_complex) * (_fft_size / 2 + 1));
+
+  for (int i = 0; i < num_partials; i++) {
+    Peak *partial = frame->partial(i);
+    s_sample amp = partial->amplitude;
+    s_sample freq = partial->frequency;
+
+    if (amp <= 0 || freq <= 0 || freq >= _sampling_rate / 2.0) {
+      _prev_amps[i] = 0.0;
+      continue;
+    }
+
+    // continuing partials advance by their mean frequency over the hop
+    s_sample phase = partial->phase;
+    if (_prev_amps[i] > 0) {
+      phase = _prev_phases[i] +
+              (M_PI * (_prev_freqs[i] + freq) * _hop_size) / _sampling_rate;
+      phase -= 2.0 * M_PI * floor((phase + M_PI) / (2.0 * M_PI));
+    }
+
+    add_partial(amp, freq, phase);
+
+    _prev_amps[i] = amp;
+    _prev_freqs[i] = freq;
+    _prev_phases[i] = phase;
+  }
+  for (int i = num_partials; i < _max_partials; i++) {
+    _prev_amps[i] = 0.0;
+  }
+
+  fftw_execute_dft_c2r(_plan, _spectrum, _grain);
+
+  // the grain is centred on sample 0 of the inverse FFT, overlap-add it
+  // centred on the end of the next hop
+  for (int i = 0; i < _fft_size; i++) {
+    _overlap[i] += _grain[(i + _hop_size) % _fft_size] * _window[i];
+  }
+
+  s_sample *synth = frame->synth();
+  for (int i = 0; i < _hop_size; i++) {
+    synth[i] = _overlap[i];
+    _overlap[i] = _overlap[i + _hop_size];
+    _overlap[i + _hop_size] = 0.0;
   }
 }
@@ -2,8 +2,10 @@
 #define SYNTHESIS_H
 
 #include <math.h>
+#include <pthread.h>
 
 #include "base.h"
+#include "fft_plans.h"
 
 extern "C" {
 #include "sms.h"
@@ -27,15 +29,63 @@ namespace simpl {
 // Synthesise audio from spectral analysis data
 // ---------------------------------------------------------------------------
 
+class Synthesis;
+
+// A range of partials of one frame, synthesised by one thread
+struct SynthPartialsTask {
+  Synthesis *synth;
+  Frame *frame;
+  int first;
+  int last;
+  int size;
+  s_sample *output;
+  std::string error;
+  int generation;
+};
+
 class Synthesis {
 protected:
   int _frame_size;
   int _hop_size;
   int _max_partials;
   int _sampling_rate;
+  int _num_threads;
+  std::vector<std::vector<s_sample> > _thread_buffers;
+
+  // Synthesise partials first to last - 1 of frame, adding size samples
+  // to output. Synthesis classes that support num_threads implement this
+  // for disjoint ranges of partials, so it may run in several threads.
+  virtual void synth_partials(Frame *frame, int first, int last, int size,
+                              s_sample *output);
+
+  // As above for partials 0 to num_partials - 1, split into one contiguous
+  // range per thread. The first range is added to output by the calling
+  // thread, the others are synthesised into a buffer per thread and then
+  // added to output in order, so the result only depends on num_threads.
+  void synth_partials_threaded(Frame *frame, int num_partials, int size,
+                               s_sample *output);
+  static void *synth_partials_thread(void *task);
+
+  // Worker threads for synth_partials_threaded. They are started when they
+  // are first needed and then kept between frames: for each frame the
+  // calling thread fills in _tasks, increments _generation and wakes them,
+  // then waits until _pending is 0. They are stopped when num_threads
+  // changes or the synthesis object is destroyed.
+  std::vector<pthread_t> _threads;
+  std::vector<SynthPartialsTask> _tasks;
+  pthread_mutex_t _thread_lock;
+  pthread_cond_t _work_ready;
+  pthread_cond_t _work_done;
+  int _generation;
+  int _pending;
+  bool _stopping;
+  void start_threads();
+  void stop_threads();
+  static void *synth_worker(void *task);
 
 public:
   Synthesis();
+  virtual ~Synthesis();
   virtual void reset();
   int frame_size();
   virtual void frame_size(int new_frame_size);
@@ -45,20 +95,57 @@ public:
   virtual void max_partials(int new_max_partials);
   int sampling_rate();
   void sampling_rate(int new_sampling_rate);
+  int num_threads();
+  void num_threads(int new_num_threads);
 
   virtual void synth_frame(Frame *frame);
   virtual Frames synth(Frames frames);
+
+  // Synthesise the partials stored in frame_set, writing one hop of
+  // output per frame into output
+  virtual void synth(FrameSet *frame_set, int output_size, s_sample *output);
 };
 
 // ---------------------------------------------------------------------------
 // MQSynthesis
+//
+// With MQ_OSC_EXACT, each sample of each partial is computed directly from
+// the cubic phase polynomial and the libm cosine.
+//
+// With MQ_OSC_FAST, all partials of a frame are synthesised together as an
+// oscillator bank: the phase polynomials are evaluated by forward
+// differences and the cosines with a polynomial approximation, in a loop
+// over the partials that the compiler can vectorise. The output differs
+// from MQ_OSC_EXACT by less than 1e-9 times the sum of the partial
+// amplitudes (for hop sizes up to 4096).
 // ---------------------------------------------------------------------------
+enum MQOscillatorMode {
+  MQ_OSC_EXACT = 0,
+  MQ_OSC_FAST = 1
+};
+
 class MQSynthesis : public Synthesis {
 private:
   s_sample *_prev_amps;
   s_sample *_prev_freqs;
   s_sample *_prev_phases;
+  int _oscillator_mode;
+
+  // oscillator state and cubic phase coefficients for each partial of the
+  // current frame
+  std::vector<s_sample> _osc_amps;
+  std::vector<s_sample> _osc_amp_incs;
+  std::vector<s_sample> _osc_phases;
+  std::vector<s_sample> _osc_freqs;
+  std::vector<s_sample> _osc_alphas;
+  std::vector<s_sample> _osc_betas;
+  std::vector<s_sample> _osc_out;
+
   s_sample hz_to_radians(s_sample f);
+  void synth_partials_exact(int first, int last, s_sample *output);
+  void synth_partials_fast(int first, int last, s_sample *output);
+  void synth_partials(Frame *frame, int first, int last, int size,
+                      s_sample *output);
 
 public:
   MQSynthesis();
@@ -66,6 +153,8 @@ public:
   void reset();
   using Synthesis::max_partials;
   void max_partials(int new_max_partials);
+  int oscillator_mode();
+  void oscillator_mode(int new_oscillator_mode);
   void synth_frame(Frame *frame);
 };
 
@@ -76,10 +165,19 @@ class SMSSynthesis : public Synthesis {
 private:
   SMSSynthParams _synth_params;
   SMSData _data;
+  bool _configuring;
+  bool _initialised;
+  void free_synthesis();
+  void init_synthesis();
 
 public:
   SMSSynthesis();
   ~SMSSynthesis();
+
+  // Parameter changes made between begin_configure and end_configure
+  // re-initialise the SMS synthesis once, in end_configure.
+  void begin_configure();
+  void end_configure();
   using Synthesis::hop_size;
   void hop_size(int new_hop_size);
   using Synthesis::max_partials;
@@ -109,6 +207,9 @@ private:
   SimplSndObjAnalysisWrapper *_analysis;
   HarmTable *_table;
   SimplAdSyn *_synth;
+  std::vector<s_sample> _output;
+  void synth_partials(Frame *frame, int first, int last, int size,
+                      s_sample *output);
 
 public:
   SndObjSynthesis();
@@ -130,6 +231,8 @@ class LorisSynthesis : public Synthesis {
 private:
   std::vector<Loris::Oscillator> _oscs;
   s_sample _bandwidth;
+  void synth_partials(Frame *frame, int first, int last, int size,
+                      s_sample *output);
 
 public:
   LorisSynthesis();
@@ -142,6 +245,53 @@ public:
   void synth_frame(Frame *frame);
 };
 
+// ---------------------------------------------------------------------------
+// IFFTSynthesis
+//
+// Sinusoidal synthesis in the frequency domain, for partials from any of
+// the analysis backends (based on SineSynthIFFT in libsms).
+//
+// For each frame, the main lobe of a Blackman-Harris window (9 bins) is
+// added to a spectrum at the frequency, amplitude and phase of every
+// partial. One inverse FFT of size 2 * hop_size then gives a windowed
+// grain of all partials, which is reshaped to a triangular window and
+// overlap-added to the output (with 50% overlap). The cost per frame is
+// O(N log N) for the FFT plus a few operations per partial, instead of
+// O(partials * hop_size) for an oscillator bank.
+//
+// The phases of continuing partials are integrated from their
+// frequencies, and partials start with their analysed phase. The output
+// is delayed by hop_size samples (the centre of each grain).
+// ---------------------------------------------------------------------------
+class IFFTSynthesis : public Synthesis {
+private:
+  int _fft_size;
+  fftw_complex *_spectrum;
+  s_sample *_grain;
+  fftw_plan _plan;
+  std::vector<s_sample> _window;
+  std::vector<s_sample> _kernel;
+  std::vector<s_sample> _overlap;
+  std::vector<s_sample> _prev_amps;
+  std::vector<s_sample> _prev_freqs;
+  std::vector<s_sample> _prev_phases;
+
+  void create_buffers();
+  void destroy_buffers();
+  s_sample kernel(s_sample bin_offset);
+  void add_partial(s_sample amp, s_sample freq, s_sample phase);
+
+public:
+  IFFTSynthesis();
+  ~IFFTSynthesis();
+  void reset();
+  using Synthesis::hop_size;
+  void hop_size(int new_hop_size);
+  using Synthesis::max_partials;
+  void max_partials(int new_max_partials);
+  void synth_frame(Frame *frame);
+};
+
 } // namespace simpl
 
 #endif
@@ -0,0 +1,143 @@
+#include "window_cache.h"
+
+#include <pthread.h>
+#include <string.h>
+
+#include <list>
+#include <map>
+#include <string>
+#include <vector>
+
+// Default maximum size of the cache (16 MB)
+#define WINDOW_CACHE_LIMIT (16 * 1024 * 1024)
+
+namespace {
+
+struct WindowKey {
+    std::string type;
+    int size;
+    std::vector<double> params;
+
+    bool operator<(const WindowKey& other) const {
+        if(type != other.type) return type < other.type;
+        if(size != other.size) return size < other.size;
+        return params < other.params;
+    }
+};
+
+typedef std::list<WindowKey> WindowKeys;
+
+struct WindowEntry {
+    std::vector<double> window;
+    WindowKeys::iterator position;
+};
+
+typedef std::map<WindowKey, WindowEntry> WindowMap;
+
+struct WindowCache {
+    pthread_mutex_t lock;
+    WindowMap windows;
+    WindowKeys recently_used;
+    size_t size;
+    size_t limit;
+
+    WindowCache() : size(0), limit(WINDOW_CACHE_LIMIT) {
+        pthread_mutex_init(&lock, NULL);
+    }
+
+    ~WindowCache() { pthread_mutex_destroy(&lock); }
+
+    // Discard the least recently used windows until the cache holds at
+    // most max_bytes
+    void evict(size_t max_bytes) {
+        while(size > max_bytes && !recently_used.empty()) {
+            WindowMap::iterator i = windows.find(recently_used.back());
+            size -= i->second.window.size() * sizeof(double);
+            windows.erase(i);
+            recently_used.pop_back();
+        }
+    }
+};
+
+WindowCache& window_cache() {
+    static WindowCache cache;
+    return cache;
+}
+
+WindowKey make_key(const char *type, int size, int num_params,
+                   const double *params) {
+    WindowKey key;
+    key.type = type;
+    key.size = size;
+    key.params.assign(params, params + num_params);
+    return key;
+}
+
+} // end of anonymous namespace
+
+int simpl_window_lookup(const char *type, int size, int num_params,
+                        const double *params, double *window) {
+    WindowCache& cache = window_cache();
+    WindowKey key = make_key(type, size, num_params, params);
+
+    pthread_mutex_lock(&cache.lock);
+    WindowMap::iterator i = cache.windows.find(key);
+    if(i == cache.windows.end()) {
+        pthread_mutex_unlock(&cache.lock);
+        return 0;
+    }
+
+    memcpy(window, &(i->second.window[0]), sizeof(double) * size);
+    cache.recently_used.splice(cache.recently_used.begin(),
+                               cache.recently_used, i->second.position);
+    pthread_mutex_unlock(&cache.lock);
+    return 1;
+}
+
+void simpl_window_store(const char *type, int size, int num_params,
+                        const double *params, const double *window) {
+    WindowCache& cache = window_cache();
+    size_t bytes = sizeof(double) * size;
+    if(size <= 0) {
+        return;
+    }
+
+    WindowKey key = make_key(type, size, num_params, params);
+
+    pthread_mutex_lock(&cache.lock);
+    if(bytes > cache.limit || cache.windows.find(key) != cache.windows.end()) {
+        pthread_mutex_unlock(&cache.lock);
+        return;
+    }
+
+    cache.evict(cache.limit - bytes);
+    cache.recently_used.push_front(key);
+    WindowEntry& entry = cache.windows[key];
+    entry.window.assign(window, window + size);
+    entry.position = cache.recently_used.begin();
+    cache.size += bytes;
+    pthread_mutex_unlock(&cache.lock);
+}
+
+size_t simpl_window_cache_limit(void) { return window_cache().limit; }
+
+void simpl_window_cache_set_limit(size_t max_bytes) {
+    WindowCache& cache = window_cache();
+    pthread_mutex_lock(&cache.lock);
+    cache.limit = max_bytes;
+    cache.evict(max_bytes);
+    pthread_mutex_unlock(&cache.lock);
+}
+
+size_t simpl_window_cache_size(void) { return window_cache().size; }
+
+int simpl_window_cache_count(void) {
+    return (int)window_cache().windows.size();
+}
+
+void simpl_window_cache_clear(void) {
+    WindowCache& cache = window_cache();
+    pthread_mutex_lock(&cache.lock);
+    cache.evict(0);
+    pthread_mutex_unlock(&cache.lock);
+}
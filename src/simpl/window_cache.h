@@ -0,0 +1,44 @@
+#ifndef WINDOW_CACHE_H
+#define WINDOW_CACHE_H
+
+#include <stddef.h>
+
+/* ---------------------------------------------------------------------------
+ * Window cache
+ *
+ * A process-wide cache of analysis windows and wavetables, shared by all of
+ * the backends (MQ, SMS, SndObj and Loris). Tables are keyed by type, size
+ * and a list of parameters (window shape, number of harmonics, phase, ...).
+ *
+ * simpl_window_lookup copies a cached table into the caller's buffer and
+ * returns 1, or returns 0 if the table is not in the cache. After computing
+ * a missing table, callers add it with simpl_window_store.
+ *
+ * The cache holds at most simpl_window_cache_limit() bytes. When a new
+ * table does not fit, the least recently used tables are discarded.
+ *
+ * The functions have C linkage so that they can be used by the SMS
+ * library, and are safe to call from multiple threads.
+ * ---------------------------------------------------------------------------
+ */
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+int simpl_window_lookup(const char *type, int size, int num_params,
+                        const double *params, double *window);
+void simpl_window_store(const char *type, int size, int num_params,
+                        const double *params, const double *window);
+
+size_t simpl_window_cache_limit(void);
+void simpl_window_cache_set_limit(size_t max_bytes);
+size_t simpl_window_cache_size(void);
+int simpl_window_cache_count(void);
+void simpl_window_cache_clear(void);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif
@@ -386,7 +386,8 @@ int sms_findResidual(int sizeSynthesis, sfloat* pSynthesis,
     sms_residual(residualParams->hopSize, pSynthesis, pOriginal, residualParams);
     sms_filterHighPass(residualParams->hopSize,
                        residualParams->residual,
-                       residualParams->samplingRate);
+                       residualParams->samplingRate,
+                       residualParams->filterDelay);
     return 0;
 }
 
@@ -533,7 +534,8 @@ int sms_analyze(int sizeWaveform, sfloat *pWaveform, SMS_Data *pSmsData, SMS_Ana
             if(pAnalParams->iStochasticType == SMS_STOC_APPROX)
             {
                 /* filter residual with a high pass filter (it solves some problems) */
-                sms_filterHighPass(sizeData, pAnalParams->residualParams.residual, pAnalParams->iSamplingRate);
+                sms_filterHighPass(sizeData, pAnalParams->residualParams.residual, pAnalParams->iSamplingRate,
+                                   pAnalParams->residualParams.filterDelay);
 
                 /* approximate residual */
                 sms_stocAnalysis(sizeData, pAnalParams->residualParams.residual, pAnalParams->residualParams.fftWindow,
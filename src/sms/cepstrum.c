@@ -45,6 +45,17 @@ typedef struct
     gsl_permutation *pPerm;
 } CepstrumMatrices;
 
+/* scratch memory used to compute a spectral envelope, owned by one
+   SMS_SEnvParams (see sms_initSpectralEnvelope) */
+struct SMSCepstrumState
+{
+    CepstrumMatrices m;
+    sfloat *pFftBuffer;
+    int sizeFftBuffer;
+    sfloat pFreqBuff[1000];
+    sfloat pMagBuff[1000];
+};
+
 void FreeDCepstrum(CepstrumMatrices *m)
 {
     gsl_matrix_free(m->pM);
@@ -96,60 +107,60 @@ void AllocateDCepstrum(int nPoints, int nCoeff, CepstrumMatrices *m)
  * \param pMag pointer to partial peak magnitudes (linear)
  * \param fLambda regularization factor
  * \param iMaxFreq maximum frequency of cepstrum
+ * \param pState scratch memory, \see sms_initSpectralEnvelope
  */
 void sms_dCepstrum( int sizeCepstrum, sfloat *pCepstrum, int sizeFreq, sfloat *pFreq, sfloat *pMag, 
-        sfloat fLambda, int iMaxFreq)
+        sfloat fLambda, int iMaxFreq, SMS_CepstrumState *pState)
 {
     int i, k;
     sfloat factor;
     sfloat fNorm = PI  / (sfloat)iMaxFreq; /* value to normalize frequencies to 0:0.5 */
-    //static sizeCepstrumStatic
-    static CepstrumMatrices m;
-    //printf("nPoints: %d, nCoeff: %d \n", m.nPoints, m.nCoeff);
-    if(m.nPoints != sizeCepstrum || m.nCoeff != sizeFreq)
-        AllocateDCepstrum(sizeFreq, sizeCepstrum, &m);
+    CepstrumMatrices *m = &pState->m;
+    //printf("nPoints: %d, nCoeff: %d \n", m->nPoints, m->nCoeff);
+    if(m->nPoints != sizeCepstrum || m->nCoeff != sizeFreq)
+        AllocateDCepstrum(sizeFreq, sizeCepstrum, m);
     int s; /* signum: "(-1)^n, where n is the number of interchanges in the permutation." */
     /* compute matrix M (eq. 4)*/
     for (i=0; i<sizeFreq; i++)
     {
-        gsl_matrix_set (m.pM, i, 0, 1.); // first colum is all 1
+        gsl_matrix_set (m->pM, i, 0, 1.); // first colum is all 1
         for (k=1; k <sizeCepstrum; k++)
-            gsl_matrix_set (m.pM, i, k , 2.*sms_sine(PI_2 + fNorm * k * pFreq[i]) );
+            gsl_matrix_set (m->pM, i, k , 2.*sms_sine(PI_2 + fNorm * k * pFreq[i]) );
     }
 
     /* compute transpose of M */
-    gsl_matrix_transpose_memcpy (m.pMt, m.pM);
+    gsl_matrix_transpose_memcpy (m->pMt, m->pM);
 
     /* compute R diagonal matrix (for eq. 7)*/
     factor = COEF * (fLambda / (1.-fLambda)); /* \todo why is this divided like this again? */
     for (k=0; k<sizeCepstrum; k++)
-        gsl_matrix_set(m.pR, k, k, factor * powf((sfloat) k,2.));
+        gsl_matrix_set(m->pR, k, k, factor * powf((sfloat) k,2.));
 
     /* MtM = Mt * M, later will add R */
-    gsl_blas_dgemm  (CblasNoTrans, CblasNoTrans, 1., m.pMt, m.pM, 0.0, m.pMtMR);
+    gsl_blas_dgemm  (CblasNoTrans, CblasNoTrans, 1., m->pMt, m->pM, 0.0, m->pMtMR);
     /* add R to make MtMR */
-    gsl_matrix_add (m.pMtMR, m.pR);
+    gsl_matrix_add (m->pMtMR, m->pR);
 
     /* set pMag in X and multiply with Mt to get pMtXk */
     for(k = 0; k <sizeFreq; k++)
-        gsl_vector_set(m.pXk, k, log(pMag[k]));
-    gsl_blas_dgemv (CblasNoTrans, 1., m.pMt, m.pXk, 0., m.pMtXk);
+        gsl_vector_set(m->pXk, k, log(pMag[k]));
+    gsl_blas_dgemv (CblasNoTrans, 1., m->pMt, m->pXk, 0., m->pMtXk);
 
     /* solve x (the cepstrum) in Ax = b, where A=MtMR and b=pMtXk */ 
 
     /* ==== the Cholesky Decomposition way ==== */
     /* MtM is 'symmetric and positive definite?' */
-    //gsl_linalg_cholesky_decomp (m.pMtMR);
-    //gsl_linalg_cholesky_solve (m.pMtMR, m.pMtXk, m.pC);
+    //gsl_linalg_cholesky_decomp (m->pMtMR);
+    //gsl_linalg_cholesky_solve (m->pMtMR, m->pMtXk, m->pC);
 
     /* ==== the LU decomposition way ==== */
-    gsl_linalg_LU_decomp (m.pMtMR, m.pPerm, &s);
-    gsl_linalg_LU_solve (m.pMtMR, m.pPerm, m.pMtXk, m.pC);
+    gsl_linalg_LU_decomp (m->pMtMR, m->pPerm, &s);
+    gsl_linalg_LU_solve (m->pMtMR, m->pPerm, m->pMtXk, m->pC);
 
 
     /* copy pC to pCepstrum */
     for(i = 0; i  < sizeCepstrum; i++)
-        pCepstrum[i] = gsl_vector_get (m.pC, i);
+        pCepstrum[i] = gsl_vector_get (m->pC, i);
 }
 
 /*! \brief Spectrum Envelope from Cepstrum
@@ -160,28 +171,31 @@ void sms_dCepstrum( int sizeCepstrum, sfloat *pCepstrum, int sizeFreq, sfloat *p
  * \param pCepstrum pointer to array of cepstrum coefficients
  * \param sizeEnv  size of spectrum envelope (max frequency in bins) \todo does this have to be a pow2
  * \param pEnv pointer to output spectrum envelope (real part only)
+ * \param pState scratch memory, \see sms_initSpectralEnvelope
  */
-void sms_dCepstrumEnvelope(int sizeCepstrum, sfloat *pCepstrum, int sizeEnv, sfloat *pEnv)
+void sms_dCepstrumEnvelope(int sizeCepstrum, sfloat *pCepstrum, int sizeEnv, sfloat *pEnv,
+                           SMS_CepstrumState *pState)
 {
-
-    static sfloat *pFftBuffer;
-    static int sizeFftArray = 0;
     int sizeFft = sizeEnv << 1;
+    int sizeFftArray = pState->sizeFftBuffer;
     int i;
     if(sizeFftArray != sizeFft)
     {
-        if(sizeFftArray != 0) free(pFftBuffer);
+        if(pState->pFftBuffer) free(pState->pFftBuffer);
+        pState->sizeFftBuffer = 0;
         sizeFftArray = sms_power2(sizeFft);
         if(sizeFftArray != sizeFft)
         {
             sms_error("bad fft size, incremented to power of 2");
         }
-        if ((pFftBuffer = (sfloat *) malloc(sizeFftArray * sizeof(sfloat))) == NULL)
+        if ((pState->pFftBuffer = (sfloat *) malloc(sizeFftArray * sizeof(sfloat))) == NULL)
         {
             sms_error("could not allocate memory for fft array");
             return;
         }
+        pState->sizeFftBuffer = sizeFftArray;
     }
+    sfloat *pFftBuffer = pState->pFftBuffer;
     memset(pFftBuffer, 0, sizeFftArray * sizeof(sfloat));
 
     pFftBuffer[0] = pCepstrum[0] * 0.5;
@@ -195,6 +209,45 @@ void sms_dCepstrumEnvelope(int sizeCepstrum, sfloat *pCepstrum, int sizeEnv, sfl
         pEnv[i] = powf(EXP, 2. * pFftBuffer[i*2]);
 }
 
+/*! \brief allocate the scratch memory used by sms_spectralEnvelope
+ *
+ * Each SMS_SEnvParams has its own scratch memory, so several analyses can
+ * compute spectral envelopes at the same time. It is allocated by
+ * sms_initAnalysis when enveloping is turned on.
+ *
+ * \param pSpecEnvParams pointer to a structure of parameters for spectral enveloping
+ * \return 0 on success, -1 on error
+ */
+int sms_initSpectralEnvelope(SMS_SEnvParams *pSpecEnvParams)
+{
+    sms_freeSpectralEnvelope(pSpecEnvParams);
+    pSpecEnvParams->pCepstrumState = (SMS_CepstrumState *)calloc(1, sizeof(SMS_CepstrumState));
+    if(pSpecEnvParams->pCepstrumState == NULL)
+    {
+        sms_error("Could not allocate memory for spectral envelope");
+        return -1;
+    }
+    return 0;
+}
+
+/*! \brief free the scratch memory allocated by sms_initSpectralEnvelope
+ *
+ * \param pSpecEnvParams pointer to a structure of parameters for spectral enveloping
+ */
+void sms_freeSpectralEnvelope(SMS_SEnvParams *pSpecEnvParams)
+{
+    SMS_CepstrumState *pState = pSpecEnvParams->pCepstrumState;
+    if(pState == NULL)
+        return;
+
+    if(pState->m.nPoints != 0 || pState->m.nCoeff != 0)
+        FreeDCepstrum(&pState->m);
+    if(pState->pFftBuffer)
+        free(pState->pFftBuffer);
+    free(pState);
+    pSpecEnvParams->pCepstrumState = NULL;
+}
+
 /*! \brief main function for computing spectral envelope from sinusoidal peaks
  *
  * Magnitudes should already be in linear for this function.
@@ -209,7 +262,16 @@ void sms_spectralEnvelope( SMS_Data *pSmsData, SMS_SEnvParams *pSpecEnvParams)
     int i, k;
     int sizeCepstrum = pSpecEnvParams->iOrder+1;
     //int nPeaks = 0;
-    static sfloat pFreqBuff[1000], pMagBuff[1000];
+    SMS_CepstrumState *pState = pSpecEnvParams->pCepstrumState;
+    sfloat *pFreqBuff, *pMagBuff;
+
+    if(pState == NULL)
+    {
+        sms_error("spectral envelope memory has not been allocated");
+        return;
+    }
+    pFreqBuff = pState->pFreqBuff;
+    pMagBuff = pState->pMagBuff;
 
     /* \todo see if this memset is even necessary, once working */
     //memset(pSmsData->pSpecEnv, 0, pSpecEnvParams->nCoeff * sizeof(sfloat));
@@ -249,11 +311,11 @@ void sms_spectralEnvelope( SMS_Data *pSmsData, SMS_SEnvParams *pSpecEnvParams)
     if(k < 1) // how few can this be?  try out a few in python
         return;
     sms_dCepstrum(sizeCepstrum, pSmsData->pSpecEnv, k, pFreqBuff, pMagBuff, 
-            pSpecEnvParams->fLambda, pSpecEnvParams->iMaxFreq);
+            pSpecEnvParams->fLambda, pSpecEnvParams->iMaxFreq, pState);
 
     if(pSpecEnvParams->iType == SMS_ENV_FBINS)
     {
         sms_dCepstrumEnvelope(sizeCepstrum, pSmsData->pSpecEnv, 
-                pSpecEnvParams->nCoeff, pSmsData->pSpecEnv);
+                pSpecEnvParams->nCoeff, pSmsData->pSpecEnv, pState);
     }
 }
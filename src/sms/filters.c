@@ -59,21 +59,17 @@ sfloat sms_deEmphasis(sfloat fInput, SMS_SynthParams *pSynthParams)
 
 /*! \brief  function to implement a zero-pole filter
  * 
- * \todo will forgetting to reset  pD to zero at the beginning of a new analysis
- * (when there are multiple analyses within the life of one program)
- * cause problems?
- *
  * \param pFa        pointer to numerator coefficients
  * \param pFb        pointer to denominator coefficients
  * \param nCoeff    number of coefficients
  * \param fInput     input sample
+ * \param pD         pointer to the delay line of the filter (nCoeff values)
  * \return value is the  filtered sample 
  */
-static sfloat ZeroPoleFilter(sfloat *pFa, sfloat *pFb, int nCoeff, sfloat fInput )
+static sfloat ZeroPoleFilter(sfloat *pFa, sfloat *pFb, int nCoeff, sfloat fInput, sfloat *pD)
 {
 	double fOut = 0;
 	int iSection;
-    static sfloat pD[5] = {0, 0, 0, 0, 0};
 
 	pD[0] = fInput;
 	for (iSection = nCoeff-1; iSection > 0; iSection--)
@@ -95,8 +91,11 @@ static sfloat ZeroPoleFilter(sfloat *pFa, sfloat *pFb, int nCoeff, sfloat fInput
  * \param sizeResidual        size of signal
  * \param pResidual          pointer to residual signal
  * \param iSamplingRate      sampling rate of signal                                                    
+ * \param pFilterDelay       delay line of the filter (SMS_FILTER_SECTIONS values), 
+ *                          normally SMS_ResidualParams.filterDelay
  */
-void sms_filterHighPass(int sizeResidual, sfloat *pResidual, int iSamplingRate)
+void sms_filterHighPass(int sizeResidual, sfloat *pResidual, int iSamplingRate,
+                        sfloat *pFilterDelay)
 {
 	/* cutoff 800Hz */
 	static sfloat pFCoeff32k[10] =  {0.814255, -3.25702, 4.88553, -3.25702, 
@@ -130,7 +129,8 @@ void sms_filterHighPass(int sizeResidual, sfloat *pResidual, int iSamplingRate)
 			return;
       
 		fSample = pResidual[i];
-		pResidual[i] = ZeroPoleFilter (&pFCoeff[0], &pFCoeff[5], 5, fSample);
+		pResidual[i] = ZeroPoleFilter (&pFCoeff[0], &pFCoeff[SMS_FILTER_SECTIONS],
+		                              SMS_FILTER_SECTIONS, fSample, pFilterDelay);
 	}
 }
 
@@ -22,17 +22,21 @@
  * \brief initialization, free, and debug functions
  */
 
+#include <pthread.h>
 #include "sms.h"
 #include "SFMT.h" /*!< mersenne twister random number genorator */
 
 char *pChDebugFile = "debug.txt"; /*!< debug text file */
 FILE *pDebug; /*!< pointer to debug file */
 
-static char error_message[256];
-static int error_status = 0;
+/*! \brief tables shared by all instances, see SMS_Context */
+SMS_Context sms_context;
+static pthread_mutex_t contextLock = PTHREAD_MUTEX_INITIALIZER;
+
+static SMS_THREAD_LOCAL char error_message[256];
+static SMS_THREAD_LOCAL int error_status = 0;
 static sfloat mag_thresh = .00001; /*!< magnitude threshold for db conversion (-100db)*/
 static sfloat inv_mag_thresh = 100000.; /*!< inv(.00001) */
-static int initIsDone = 0; /* \todo is this variable necessary? */
 
 #define SIZE_TABLES 4096
 #define HALF_MAX 1073741823.5  /*!< half the max of a 32-bit word */
@@ -41,47 +45,68 @@ static int initIsDone = 0; /* \todo is this variable necessary? */
 
 /*! \brief initialize global data
  *
- * Currently, just generating the sine and sinc tables.
- * This is necessary before both analysis and synthesis.
+ * Creates the shared context (sine, sinc and fft tables) on the first
+ * call, later calls only increment its reference count. This is
+ * necessary before both analysis and synthesis, and every call must be
+ * matched by a call to sms_free.
  *
  * If using the Mersenne Twister algorithm for random number
- * generation, initialize (seed) it.
+ * generation, initialize (seed) it when the context is created.
  *
  * \return error code \see SMS_MALLOC or SMS_OK in SMS_ERRORS
  */
 int sms_init(void)
 {
-    if (!initIsDone)
+    int status = 0;
+
+    pthread_mutex_lock(&contextLock);
+    if(sms_context.refCount == 0)
     {
-        initIsDone = 1;
         if(sms_prepSine(SIZE_TABLES))
         {
             sms_error("cannot allocate memory for sine table");
-            return -1;
+            status = -1;
         }
-        if(sms_prepSinc(SIZE_TABLES))
+        else if(sms_prepSinc(SIZE_TABLES))
         {
             sms_error("cannot allocate memory for sinc table");
-            return -1;
+            sms_clearSine();
+            status = -1;
+        }
+        else if(sms_prepFft())
+        {
+            sms_error("cannot allocate memory for fft table");
+            sms_clearSine();
+            sms_clearSinc();
+            status = -1;
         }
-
 #ifdef MERSENNE_TWISTER
-        init_gen_rand(1234);
+        else
+            init_gen_rand(1234);
 #endif
     }
+    if(status == 0)
+        sms_context.refCount++;
+    pthread_mutex_unlock(&contextLock);
 
-    return 0;
+    return status;
 }
 
 /*! \brief free global data
  *
- * deallocates memory allocated to global arrays (windows and tables)
+ * Releases one reference to the shared context. The tables are only
+ * deallocated when the last instance using them calls sms_free.
  */
 void sms_free()
 {
-    initIsDone = 0;
-    sms_clearSine();
-    sms_clearSinc();
+    pthread_mutex_lock(&contextLock);
+    if(sms_context.refCount > 0 && --sms_context.refCount == 0)
+    {
+        sms_clearSine();
+        sms_clearSinc();
+        sms_clearFft();
+    }
+    pthread_mutex_unlock(&contextLock);
 }
 
 /*! \brief give default values to an SMS_AnalParams struct
@@ -149,6 +174,7 @@ void sms_initAnalParams(SMS_AnalParams *pAnalParams)
     pAnalParams->specEnvParams.iMaxFreq = 0;
     pAnalParams->specEnvParams.nCoeff = 0;
     pAnalParams->specEnvParams.iAnchor = 0; /* not yet implemented */
+    pAnalParams->specEnvParams.pCepstrumState = NULL;
     pAnalParams->pFrames = NULL;
     /* fft */
     for(i = 0; i < SMS_MAX_SPEC; i++)
@@ -370,6 +396,11 @@ int sms_initAnalysis(SMS_AnalParams *pAnalParams)
         return -1;
     }
 
+    /* scratch memory for the spectral envelope */
+    if(pAnalParams->specEnvParams.iType != SMS_ENV_NONE &&
+       sms_initSpectralEnvelope(&pAnalParams->specEnvParams) == -1)
+        return -1;
+
     return 0;
 }
 
@@ -489,6 +520,8 @@ void sms_initResidualParams(SMS_ResidualParams *residualParams)
         residualParams->fftBuffer[i] = 0.0;
         residualParams->fftBuffer[i+SMS_MAX_SPEC] = 0.0;
     }
+    for(i = 0; i < SMS_FILTER_SECTIONS; i++)
+        residualParams->filterDelay[i] = 0.0;
 }
 
 /*! \brief initialize residual data structure
@@ -504,6 +537,9 @@ int sms_initResidual(SMS_ResidualParams *residualParams)
         return -1;
     }
 
+    /* high-pass filter starts from silence */
+    memset(residualParams->filterDelay, 0, SMS_FILTER_SECTIONS * sizeof(sfloat));
+
     /* residual signal */
     residualParams->residualSize = residualParams->hopSize * 2;
     residualParams->residual = (sfloat *)calloc(residualParams->residualSize, sizeof(sfloat));
@@ -644,6 +680,7 @@ void sms_freeAnalysis(SMS_AnalParams *pAnalParams)
 
     sms_freeFrame(&pAnalParams->prevFrame);
     sms_freeResidual(&pAnalParams->residualParams);
+    sms_freeSpectralEnvelope(&pAnalParams->specEnvParams);
 
     if(pAnalParams->soundBuffer.pFBuffer)
         free(pAnalParams->soundBuffer.pFBuffer);
@@ -1048,6 +1085,8 @@ void sms_setMagThresh(sfloat x)
 }
 
 /*! \brief get a string containing information about the error code
+ *
+ * The error state is kept per thread.
  *
  * \param pErrorMessage pointer to error message string
  */
@@ -35,6 +35,7 @@
 #define SMS_MAX_NPEAKS 400       /*!< \brief maximum number of peaks  */
 #define SMS_MAX_FRAME_SIZE 10000 /* maximum size of input frame in samples */
 #define SMS_MAX_SPEC 8192        /*! \brief  maximum size for magnitude spectrum */
+#define SMS_FILTER_SECTIONS 5    /*! \brief  number of coefficients in the high-pass filter */
 
 #define sfloat double
 
@@ -157,6 +158,9 @@ typedef struct
     int iStatus;              /*!< status of frame enumerated by SMS_FRAME_STATUS \see SMS_FRAME_STATUS */
 } SMS_AnalFrame;
 
+/*! \brief scratch memory for the discrete cepstrum, defined in cepstrum.c */
+typedef struct SMSCepstrumState SMS_CepstrumState;
+
 /*! \struct SMS_SEnvParams;
  * \brief structure information and data for spectral enveloping
  *
@@ -169,6 +173,7 @@ typedef struct
     sfloat fLambda; /*!< regularization factor */
     int nCoeff;     /*!< number of coefficients (bins) in the envelope */
     int iAnchor;    /*!< whether to make anchor points at DC / Nyquist or not */
+    SMS_CepstrumState *pCepstrumState; /*!< scratch memory, \see sms_initSpectralEnvelope */
 } SMS_SEnvParams;
 
 /*! \struct SMS_Guide
@@ -212,6 +217,7 @@ typedef struct SMSResidualParams
     sfloat *approx;
     sfloat *approxEnvelope;
     sfloat fftBuffer[SMS_MAX_SPEC * 2];
+    sfloat filterDelay[SMS_FILTER_SECTIONS]; /*!< delay line of the high-pass filter */
 } SMS_ResidualParams;
 
 /*! \struct SMS_AnalParams
@@ -556,6 +562,39 @@ enum SMS_FRAME_STATUS
 
 #define SMS_MIN_SIZE_FRAME  128   /* size of synthesis frame */
 
+/*! \struct SMS_Context
+ *  \brief tables shared by all analysis and synthesis instances
+ *
+ *  The context is created by the first call to sms_init and freed by
+ *  the matching last call to sms_free, so instances can be created and
+ *  destroyed in any order. Once it has been created it is only read, which
+ *  allows several instances to run concurrently in different threads.
+ *  Mutable state belongs to the instances (SMS_AnalParams,
+ *  SMS_SynthParams, SMS_ResidualParams), apart from the error status,
+ *  which is thread-local.
+ */
+typedef struct
+{
+    int refCount;         /*!< number of sms_init calls not yet freed */
+    sfloat *pSineTable;   /*!< sine table */
+    sfloat fSineScale;    /*!< value to scale the sine-table-lookup phase */
+    sfloat fSineIncr;     /*!< inverse of fSineScale */
+    sfloat *pSincTable;   /*!< sinc table */
+    sfloat fSincScale;    /*!< value to scale the sinc-table-lookup phase */
+    sfloat *pFftTable;    /*!< OOURA cos/sin table for the largest fft size */
+    int nFftWeights;      /*!< size of the fft table twiddle factors */
+    int nFftCos;          /*!< size of the fft table cosine factors */
+} SMS_Context;
+
+extern SMS_Context sms_context;
+
+/*! \brief storage class for state that cannot be shared between threads */
+#if defined(_MSC_VER)
+#define SMS_THREAD_LOCAL __declspec(thread)
+#else
+#define SMS_THREAD_LOCAL __thread
+#endif
+
 /*! \defgroup math_macros Math Macros 
  *  \brief mathematical operations and values needed for functions within
  *   this library 
@@ -640,8 +679,11 @@ int sms_spectrumMag(int sizeWindow, sfloat *pWaveform, sfloat *pWindow,
                     int sizeMag, sfloat *pMag, sfloat *pFftBuffer);
 
 void sms_dCepstrum(int sizeCepstrum, sfloat *pCepstrum, int sizeFreq, sfloat *pFreq, sfloat *pMag, 
-                   sfloat fLambda, int iSamplingRate);
-void sms_dCepstrumEnvelope(int sizeCepstrum, sfloat *pCepstrum, int sizeEnv, sfloat *pEnv);
+                   sfloat fLambda, int iSamplingRate, SMS_CepstrumState *pState);
+void sms_dCepstrumEnvelope(int sizeCepstrum, sfloat *pCepstrum, int sizeEnv, sfloat *pEnv,
+                           SMS_CepstrumState *pState);
+int sms_initSpectralEnvelope(SMS_SEnvParams *pSpecEnvParams);
+void sms_freeSpectralEnvelope(SMS_SEnvParams *pSpecEnvParams);
 void sms_spectralEnvelope(SMS_Data *pSmsData, SMS_SEnvParams *pSpecEnvParams);
 
 int sms_sizeNextWindow(int iCurrentFrame, SMS_AnalParams *pAnalParams);
@@ -664,6 +706,8 @@ int sms_prepSine(int nTableSize);
 int sms_prepSinc(int nTableSize);
 void sms_clearSine();
 void sms_clearSinc();
+int sms_prepFft();
+void sms_clearFft();
 
 void sms_synthesize(SMS_Data *pSmsFrame, sfloat*pSynthesis, SMS_SynthParams *pSynthParams);
 void sms_sineSynthFrame(SMS_Data *pSmsFrame, sfloat *pBuffer, 
@@ -692,7 +736,8 @@ int sms_initResidual(SMS_ResidualParams *residualParams);
 void sms_freeResidual(SMS_ResidualParams *residualParams);
 int sms_residual(int sizeWindow, sfloat *pSynthesis, sfloat *pOriginal, 
                  SMS_ResidualParams* residualParams);
-void sms_filterHighPass(int sizeResidual, sfloat *pResidual, int iSamplingRate);
+void sms_filterHighPass(int sizeResidual, sfloat *pResidual, int iSamplingRate,
+                        sfloat *pFilterDelay);
 int sms_stocAnalysis(int sizeWindow, sfloat *pResidual, sfloat *pWindow,
                      SMS_Data *pSmsFrame, SMS_AnalParams *pAnalParams);
 
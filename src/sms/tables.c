@@ -21,21 +21,12 @@
 /*! \file tables.c
  * \brief sin and sinc tables.
  * 
- * contains functions for creating and indexing the tables
+ * contains functions for creating and indexing the tables. The tables
+ * are part of the shared context (\see SMS_Context), they are created
+ * and freed by sms_init and sms_free.
  */
 #include "sms.h"
 
-/*! \brief value to scale the sine-table-lookup phase */
-static sfloat fSineScale;
-/*! \brief inverse of fSineScale - turns a division into multiplication */
-static sfloat fSineIncr;
-/*! \brief value to scale the sinc-table-lookup phase */
-static sfloat fSincScale;
-/*! \brief global pointer to the sine table */
-static sfloat *sms_tab_sine;
-/*! \brief global pointer to the sinc table */
-static sfloat *sms_tab_sinc;
-
 /*! \brief prepares the sine table
  * \param  nTableSize    size of table
  * \return error code \see SMS_MALLOC in SMS_ERRORS
@@ -44,29 +35,30 @@ int sms_prepSine(int nTableSize)
 {
     register int i;
     sfloat fTheta;
+    sfloat *pTable = (sfloat *)malloc(nTableSize * sizeof(sfloat));
 
-    sms_tab_sine = (sfloat *)malloc(nTableSize * sizeof(sfloat));
-    if(sms_tab_sine == NULL)
+    if(pTable == NULL)
     {
         sms_error("Could not allocate memory for sine table");
         return SMS_MALLOC;
     }
-    fSineScale =  (sfloat)(TWO_PI) / (sfloat)(nTableSize - 1);
-    fSineIncr = 1.0 / fSineScale;
+    sms_context.fSineScale =  (sfloat)(TWO_PI) / (sfloat)(nTableSize - 1);
+    sms_context.fSineIncr = 1.0 / sms_context.fSineScale;
     fTheta = 0.0;
     for(i = 0; i < nTableSize; i++) 
     {
-        fTheta = fSineScale * (sfloat)i;
-        sms_tab_sine[i] = sin(fTheta);
+        fTheta = sms_context.fSineScale * (sfloat)i;
+        pTable[i] = sin(fTheta);
     }
+    sms_context.pSineTable = pTable;
     return SMS_OK;
 }
 /*! \brief clear sine table */
 void sms_clearSine()
 {
-    if(sms_tab_sine)
-        free(sms_tab_sine);
-    sms_tab_sine = NULL;
+    if(sms_context.pSineTable)
+        free(sms_context.pSineTable);
+    sms_context.pSineTable = NULL;
 }
 
 /*! \brief table-lookup sine method
@@ -80,13 +72,13 @@ sfloat sms_sine(sfloat fTheta)
 
     if(fTheta < 0)
     {
-        i =  .5 - (fTheta * fSineIncr);
-        return -(sms_tab_sine[i]);
+        i =  .5 - (fTheta * sms_context.fSineIncr);
+        return -(sms_context.pSineTable[i]);
     }
     else
     {
-        i = fTheta * fSineIncr + .5;
-        return sms_tab_sine[i];
+        i = fTheta * sms_context.fSineIncr + .5;
+        return sms_context.pSineTable[i];
     }
 }
 
@@ -113,9 +105,9 @@ int sms_prepSinc(int nTableSize)
     sfloat fMax = 0;
     sfloat fTheta = -4.0 * TWO_PI / N;
     sfloat fThetaIncr = (8.0 * TWO_PI / N) / (nTableSize);
+    sfloat *pTable = (sfloat *)calloc(nTableSize, sizeof(sfloat));
 
-    sms_tab_sinc = (sfloat *)calloc(nTableSize, sizeof(sfloat));
-    if(sms_tab_sinc == NULL)
+    if(pTable == NULL)
     {
         sms_error("Could not allocate memory for sinc table");
         return (SMS_MALLOC);
@@ -124,26 +116,27 @@ int sms_prepSinc(int nTableSize)
     for(i = 0; i < nTableSize; i++) 
     {
         for (m = 0; m < 4; m++)
-            sms_tab_sinc[i] +=  -1 * (fA[m]/2) * 
+            pTable[i] +=  -1 * (fA[m]/2) * 
                 (Sinc (fTheta - m * TWO_PI/N, N) + 
                  Sinc (fTheta + m * TWO_PI/N, N));
         fTheta += fThetaIncr;
     }
 
-    fMax = sms_tab_sinc[(int) nTableSize / 2];
+    fMax = pTable[(int) nTableSize / 2];
     for (i = 0; i < nTableSize; i++) 
-        sms_tab_sinc[i] = sms_tab_sinc[i] / fMax;
+        pTable[i] = pTable[i] / fMax;
     
-    fSincScale = (sfloat) nTableSize / 8.0;
+    sms_context.fSincScale = (sfloat) nTableSize / 8.0;
+    sms_context.pSincTable = pTable;
     return SMS_OK;
 }
 
 /*! \brief clear sine table */
 void sms_clearSinc()
 {
-    if(sms_tab_sinc)
-        free(sms_tab_sinc);
-    sms_tab_sinc = 0;
+    if(sms_context.pSincTable)
+        free(sms_context.pSincTable);
+    sms_context.pSincTable = 0;
 }
 
 /*! \brief global sinc table-lookup method
@@ -155,8 +148,8 @@ void sms_clearSinc()
  */
 sfloat sms_sinc(sfloat fTheta)
 {
-	int index = (int) (.5 + fSincScale * fTheta);
-	return sms_tab_sinc[index];
+	int index = (int) (.5 + sms_context.fSincScale * fTheta);
+	return sms_context.pSincTable[index];
 }
 
 
@@ -26,8 +26,46 @@
 #include "sms.h"
 #include "OOURA.h"
 
-static int ip[NMAXSQRT +2];
-static sfloat w[NMAX * 5 / 4];
+/*! \brief largest fft size used by the library (2 * SMS_MAX_SPEC) */
+#define SIZE_FFT_TABLE (2 * SMS_MAX_SPEC)
+/*! \brief size of the rdft work area, 2 + sqrt(SIZE_FFT_TABLE / 2) rounded up */
+#define SIZE_FFT_WORK (2 + 2 * NMAXSQRT)
+
+/*! \brief prepares the shared fft cos/sin table
+ *
+ * The OOURA table is computed once for the largest fft size, and
+ * is also valid for all smaller sizes, so rdft never has to rebuild it
+ * and it can be read by several threads at the same time.
+ *
+ * \return error code \see SMS_MALLOC in SMS_ERRORS
+ */
+int sms_prepFft()
+{
+    int ip[SIZE_FFT_WORK];
+    sfloat *pTable = (sfloat *)malloc((SIZE_FFT_TABLE / 2) * sizeof(sfloat));
+
+    if(pTable == NULL)
+    {
+        sms_error("Could not allocate memory for fft table");
+        return SMS_MALLOC;
+    }
+    makewt(SIZE_FFT_TABLE >> 2, ip, pTable);
+    makect(SIZE_FFT_TABLE >> 2, ip, pTable + (SIZE_FFT_TABLE >> 2));
+    sms_context.nFftWeights = ip[0];
+    sms_context.nFftCos = ip[1];
+    sms_context.pFftTable = pTable;
+    return SMS_OK;
+}
+
+/*! \brief clear fft table */
+void sms_clearFft()
+{
+    if(sms_context.pFftTable)
+        free(sms_context.pFftTable);
+    sms_context.pFftTable = NULL;
+    sms_context.nFftWeights = 0;
+    sms_context.nFftCos = 0;
+}
 
 /*! \brief Forward Fast Fourier Transform
  *
@@ -40,7 +78,12 @@ static sfloat w[NMAX * 5 / 4];
  */
 void sms_fft(int sizeFft, sfloat *pArray)
 { 
-    rdft(sizeFft, 1, pArray, ip, w);
+    /* bit reversal work area, the table sizes stop rdft from
+     * recomputing the shared table */
+    int ip[SIZE_FFT_WORK];
+    ip[0] = sms_context.nFftWeights;
+    ip[1] = sms_context.nFftCos;
+    rdft(sizeFft, 1, pArray, ip, sms_context.pFftTable);
 }
 
 /*! \brief Inverse Forward Fast Fourier Transform
@@ -53,5 +96,10 @@ void sms_fft(int sizeFft, sfloat *pArray)
  */
 void sms_ifft(int sizeFft, sfloat *pArray)
 { 
-    rdft(sizeFft, -1, pArray, ip, w);
+    /* bit reversal work area, the table sizes stop rdft from
+     * recomputing the shared table */
+    int ip[SIZE_FFT_WORK];
+    ip[0] = sms_context.nFftWeights;
+    ip[1] = sms_context.nFftCos;
+    rdft(sizeFft, -1, pArray, ip, sms_context.pFftTable);
 }
@@ -25,6 +25,7 @@
  * Use sms_getWindow() for selecting which window will be made
  */
 #include "sms.h"
+#include "window_cache.h"
 
 /* \brief scale a window by its integral (numeric quadrature)
  *
@@ -220,6 +221,11 @@ void Hanning(int sizeWindow, sfloat *pWindow)
  */
 void sms_getWindow(int sizeWindow, sfloat *pFWindow, int iWindowType)
 {
+    /* windows are shared through the simpl window cache */
+    double windowType = iWindowType;
+    if(simpl_window_lookup("sms", sizeWindow, 1, &windowType, pFWindow))
+        return;
+
     switch(iWindowType)
     {
         case SMS_WIN_BH_62: 
@@ -246,6 +252,8 @@ void sms_getWindow(int sizeWindow, sfloat *pFWindow, int iWindowType)
         default:
             BlackmanHarris(sizeWindow, pFWindow);
     }
+
+    simpl_window_store("sms", sizeWindow, 1, &windowType, pFWindow);
 }
 
 /*! \brief apply a window and center around sample 0
@@ -139,47 +139,11 @@ SimplAdSyn::~SimplAdSyn(){
 short
 SimplAdSyn::DoProcess(){
     if(m_input){
-        double ampnext, amp, freq, freqnext, phase;
-        double* tab = m_ptable->GetTable();
         if((m_tracks = ((SinAnal *)m_input)->GetTracks()) > m_maxtracks){
             m_tracks = m_maxtracks;
         }
         memset(m_output, 0, sizeof(double)*m_vecsize);
-
-        for(int track = 0; track < m_tracks; track++){
-            ampnext =  m_input->Output(track * 3) * m_scale;
-            freqnext = m_input->Output((track * 3) + 1) * m_pitch;
-            freq = m_freqs[track];
-            phase = m_phases[track];
-            amp = m_amps[track];
-
-            // interpolation & track synthesis loop
-            double a, f, frac, incra, incrph;
-            int ndx;
-            a = amp;
-            f = freq;
-            incra = (ampnext - amp) / m_vecsize;
-            incrph = (freqnext - freq) / m_vecsize;
-            for(m_vecpos=0; m_vecpos < m_vecsize; m_vecpos++){
-                if(m_enable) {
-                    // table lookup oscillator
-                    phase += f * m_ratio;
-                    while(phase < 0) phase += m_size;
-                    while(phase >= m_size) phase -= m_size;
-                    ndx = Ftoi(phase);
-                    frac = phase - ndx;
-                    m_output[m_vecpos] += a*(tab[ndx] + (tab[ndx+1] - tab[ndx])*frac);
-                    a += incra;
-                    f += incrph;
-                }
-                else m_output[m_vecpos] = 0.f;
-            }
-
-            // keep amp, freq, and phase values for next time
-            m_amps[track] = ampnext;
-            m_freqs[track] = freqnext;
-            m_phases[track] = phase;
-        }
+        SynthTracks(0, m_tracks, m_output);
         return 1;
     }
     else{
@@ -187,3 +151,44 @@ SimplAdSyn::DoProcess(){
         return 0;
     }
 }
+
+void
+SimplAdSyn::SynthTracks(int first, int last, double* output){
+    double ampnext, amp, freq, freqnext, phase;
+    double* tab = m_ptable->GetTable();
+
+    for(int track = first; track < last; track++){
+        ampnext =  m_input->Output(track * 3) * m_scale;
+        freqnext = m_input->Output((track * 3) + 1) * m_pitch;
+        freq = m_freqs[track];
+        phase = m_phases[track];
+        amp = m_amps[track];
+
+        // interpolation & track synthesis loop
+        double a, f, frac, incra, incrph;
+        int ndx;
+        a = amp;
+        f = freq;
+        incra = (ampnext - amp) / m_vecsize;
+        incrph = (freqnext - freq) / m_vecsize;
+        for(int pos = 0; pos < m_vecsize; pos++){
+            if(m_enable) {
+                // table lookup oscillator
+                phase += f * m_ratio;
+                while(phase < 0) phase += m_size;
+                while(phase >= m_size) phase -= m_size;
+                ndx = Ftoi(phase);
+                frac = phase - ndx;
+                output[pos] += a*(tab[ndx] + (tab[ndx+1] - tab[ndx])*frac);
+                a += incra;
+                f += incrph;
+            }
+            else output[pos] = 0.f;
+        }
+
+        // keep amp, freq, and phase values for next time
+        m_amps[track] = ampnext;
+        m_freqs[track] = freqnext;
+        m_phases[track] = phase;
+    }
+}
@@ -44,6 +44,11 @@ class SimplAdSyn : public AdSyn {
 	         int vecsize=DEF_VECSIZE, double sr=DEF_SR);
   ~SimplAdSyn();
   short DoProcess();
+
+  // Add m_vecsize samples of tracks first to last - 1 to output, without
+  // changing the state of other tracks (so disjoint ranges of tracks can
+  // be synthesised in separate threads)
+  void SynthTracks(int first, int last, double* output);
 };
 
 #endif
@@ -57,7 +57,7 @@ FFT::FFT(){
 
   m_fftIn = (double*) fftw_malloc(sizeof(double) * m_fftsize);
   m_fftOut = (fftw_complex*) fftw_malloc(sizeof(fftw_complex) * m_fftsize);
-  m_plan = fftw_plan_dft_r2c_1d(m_fftsize, m_fftIn, m_fftOut, FFTW_ESTIMATE);
+  m_plan = simpl::fft_plan_r2c(m_fftsize, m_fftIn, m_fftOut);
   memset(m_fftIn, 0, m_fftsize*sizeof(double));
 
 
@@ -92,7 +92,7 @@ FFT::FFT(Table* window, SndObj* input, double scale,
 
   m_fftIn = (double*) fftw_malloc(sizeof(double) * m_fftsize);
   m_fftOut = (fftw_complex*) fftw_malloc(sizeof(fftw_complex) * m_fftsize);
-  m_plan = fftw_plan_dft_r2c_1d(m_fftsize, m_fftIn, m_fftOut, FFTW_ESTIMATE);
+  m_plan = simpl::fft_plan_r2c(m_fftsize, m_fftIn, m_fftOut);
   memset(m_fftIn, 0, m_fftsize*sizeof(double));
 
   AddMsg("scale", 21);
@@ -105,7 +105,6 @@ FFT::FFT(Table* window, SndObj* input, double scale,
 }
 
 FFT::~FFT(){
-  fftw_destroy_plan(m_plan);
   fftw_free(m_fftIn);
   fftw_free(m_fftOut);
   if(m_counter){
@@ -138,7 +137,6 @@ FFT::SetHopSize(int hopsize){
 
 void
 FFT::ReInit(){
-  fftw_destroy_plan(m_plan);
   fftw_free(m_fftIn);
   fftw_free(m_fftOut);
 
@@ -168,7 +166,7 @@ FFT::ReInit(){
 
   m_fftIn = (double*) fftw_malloc(sizeof(double) * m_fftsize);
   m_fftOut = (fftw_complex*) fftw_malloc(sizeof(fftw_complex) * m_fftsize);
-  m_plan = fftw_plan_dft_r2c_1d(m_fftsize, m_fftIn, m_fftOut, FFTW_ESTIMATE);
+  m_plan = simpl::fft_plan_r2c(m_fftsize, m_fftIn, m_fftOut);
   memset(m_fftIn, 0, m_fftsize*sizeof(double));
 
   m_cur =0;
@@ -259,7 +257,7 @@ FFT::DoProcess(){
 void
 FFT::fft(double* signal){
   memcpy(m_fftIn, &signal[0], sizeof(double) * m_fftsize);
-  fftw_execute(m_plan);
+  fftw_execute_dft_r2c(m_plan, m_fftIn, m_fftOut);
 
   m_output[0] = m_fftOut[0][0] / m_norm;
   m_output[1] = m_fftOut[0][1] / m_norm;
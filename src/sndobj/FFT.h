@@ -31,6 +31,7 @@
 #include "SndObj.h"
 #include "Table.h"
 #include <fftw3.h>
+#include "fft_plans.h"
 
 class FFT : public SndObj {
  protected:
@@ -43,7 +44,7 @@ class FFT : public SndObj {
   int *m_counter; // counter 
   double* m_fftIn;
   fftw_complex* m_fftOut;
-  fftw_plan m_plan;
+  fftw_plan m_plan; // owned by the simpl FFT plan cache
   double m_fund;
 
   double m_scale; // scaling factor
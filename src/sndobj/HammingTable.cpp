@@ -27,6 +27,7 @@
 //                                                            //
 //************************************************************//
 #include "HammingTable.h"
+#include "window_cache.h"
 //////////construction / destruction ///////////////////////
 HammingTable :: HammingTable(){
 
@@ -66,10 +67,16 @@ HammingTable :: SetParam(long L, double alpha){
 
 short
 HammingTable :: MakeTable(){
+  // tables are shared through the simpl window cache
+  if(simpl_window_lookup("sndobj_hamming", m_L+1, 1, &m_alpha, m_table))
+    return 1;
+
   for(long n = 0; n < m_L; n++)
     m_table[n]= (double)(m_alpha - (1-m_alpha)*
 			cos(n*TWOPI/(m_L-1.)));
   m_table[m_L] = m_table[m_L-1];   
+
+  simpl_window_store("sndobj_hamming", m_L+1, 1, &m_alpha, m_table);
   return 1;            
       
 
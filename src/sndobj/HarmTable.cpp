@@ -28,6 +28,7 @@
 //************************************************************//
 
 #include "HarmTable.h"
+#include "window_cache.h"
 
 /////////////// CONSTRUCTION / DESTRUCTION /////////////////////
 
@@ -79,6 +80,11 @@ HarmTable :: MakeTable(){
   double max = 1.f;	
   int n = 1, harm = m_harm, i;       
 
+  // tables are shared through the simpl window cache
+  double params[3] = {(double)m_harm, (double)m_typew, m_phase};
+  if(simpl_window_lookup("sndobj_harm", m_L+1, 3, params, m_table))
+    return 1;
+
   switch (m_typew){
   case SINE:
     for(i=0; i < m_L; i++)
@@ -124,6 +130,8 @@ HarmTable :: MakeTable(){
     for(n = 0; n < m_L; n++)
       m_table[n] = m_table[n]/max;
   m_table[m_L] = m_table[0];  // guard point
+
+  simpl_window_store("sndobj_harm", m_L+1, 3, params, m_table);
   return 1;            
 }
 
@@ -34,7 +34,7 @@ IFGram::IFGram(){
 
   m_diffsig = (double*) fftw_malloc(sizeof(double) * m_fftsize);
   m_fftdiff = (fftw_complex*) fftw_malloc(sizeof(fftw_complex) * m_fftsize);
-  m_diffplan = fftw_plan_dft_r2c_1d(m_fftsize, m_diffsig, m_fftdiff, FFTW_ESTIMATE);
+  m_diffplan = simpl::fft_plan_r2c(m_fftsize, m_diffsig, m_fftdiff);
 
   memset(m_diffwin, 0, sizeof(double) * m_fftsize);
   memset(m_pdiff, 0, sizeof(double) * m_halfsize);
@@ -53,7 +53,7 @@ IFGram::IFGram(Table* window, SndObj* input, double scale,
 
   m_diffsig = (double*) fftw_malloc(sizeof(double) * m_fftsize);
   m_fftdiff = (fftw_complex*) fftw_malloc(sizeof(fftw_complex) * m_fftsize);
-  m_diffplan = fftw_plan_dft_r2c_1d(m_fftsize, m_diffsig, m_fftdiff, FFTW_ESTIMATE);
+  m_diffplan = simpl::fft_plan_r2c(m_fftsize, m_diffsig, m_fftdiff);
 
   memset(m_pdiff, 0, sizeof(double) * m_halfsize);
   memset(m_diffsig, 0, sizeof(double) * m_fftsize);
@@ -69,7 +69,6 @@ IFGram::~IFGram(){
       m_pdiff = NULL;
   }
 
-  fftw_destroy_plan(m_diffplan);
   fftw_free(m_diffsig);
   fftw_free(m_fftdiff);
 }
@@ -111,7 +110,6 @@ IFGram::SetFFTSize(int fftsize){
   delete[] m_diffwin;
   delete[] m_phases;
 
-  fftw_destroy_plan(m_diffplan);
   fftw_free(m_diffsig);
   fftw_free(m_fftdiff);
 
@@ -122,6 +120,7 @@ IFGram::SetFFTSize(int fftsize){
 
   m_diffsig = (double*) fftw_malloc(sizeof(double) * m_fftsize);
   m_fftdiff = (fftw_complex*) fftw_malloc(sizeof(fftw_complex) * m_fftsize);
+  m_diffplan = simpl::fft_plan_r2c(m_fftsize, m_diffsig, m_fftdiff);
 
   for(int i=0; i<m_fftsize; i++){
     m_diffwin[i] = m_table->Lookup(i) - m_table->Lookup(i+1);
@@ -154,8 +153,8 @@ IFGram::IFAnalysis(double* signal){
   }
 
   memcpy(m_fftIn, &signal[0], sizeof(double) * m_fftsize);
-  fftw_execute(m_plan);
-  fftw_execute(m_diffplan);
+  fftw_execute_dft_r2c(m_plan, m_fftIn, m_fftOut);
+  fftw_execute_dft_r2c(m_diffplan, m_diffsig, m_fftdiff);
 
   m_output[0] = m_fftOut[0][0] / m_norm;
   m_output[1] = m_fftOut[0][1] / m_norm;
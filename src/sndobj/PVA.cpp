@@ -81,7 +81,7 @@ PVA::pvanalysis(double* signal){
   double re, im, pha, diff;
 
   memcpy(m_fftIn, &signal[0], sizeof(double) * m_fftsize);
-  fftw_execute(m_plan);
+  fftw_execute_dft_r2c(m_plan, m_fftIn, m_fftOut);
 
   m_output[0] = m_fftOut[0][0] / m_norm;
   m_output[1] = m_fftOut[0][1] / m_norm;
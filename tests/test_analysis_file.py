@@ -0,0 +1,105 @@
+import os
+import tempfile
+import warnings
+import numpy as np
+from nose.tools import assert_almost_equals
+import simpl
+
+float_precision = 5
+frame_size = 512
+max_peaks = 10
+max_partials = 5
+
+
+class TestAnalysisFile(object):
+    def setup_method(self, method):
+        fd, self.path = tempfile.mkstemp(suffix='.simpl')
+        os.close(fd)
+
+    def teardown_method(self, method):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _frames(self, num_frames):
+        frames = []
+        for i in range(num_frames):
+            f = simpl.Frame(frame_size, True, False)
+            f.max_peaks = max_peaks
+            f.max_partials = max_partials
+            f.peak_array = np.array([[0.5, 100.0 * (i + 1), 0.1, 0.0],
+                                     [0.25, 200.0 * (i + 1), 0.2, 0.0]])
+            f.partial_array = np.array([[0.5, 100.0 * (i + 1), 0.1, 0.0]])
+            frames.append(f)
+        return frames
+
+    def test_write_read(self):
+        frames = self._frames(4)
+        simpl.write_analysis(self.path, frames, hop_size=256)
+
+        reader = simpl.read_analysis(self.path)
+        assert len(reader) == 4
+        assert reader.frame_size == frame_size
+        assert reader.hop_size == 256
+        assert reader.max_peaks == max_peaks
+        assert reader.max_partials == max_partials
+
+        f = reader[2]
+        assert len(f.peaks) == 2
+        assert len(f.partials) == 1
+        assert_almost_equals(f.peaks[1].frequency, 600.0, float_precision)
+        assert_almost_equals(f.partials[0].phase, 0.1, float_precision)
+
+        frames = reader[1:3]
+        assert len(frames) == 2
+        assert_almost_equals(frames[0].peaks[0].frequency, 200.0,
+                             float_precision)
+        assert_almost_equals(reader[-1].peaks[0].frequency, 400.0,
+                             float_precision)
+        assert np.all(reader.records['num_peaks'] == 2)
+        reader.close()
+
+    def test_append(self):
+        with simpl.AnalysisWriter(self.path, max_peaks, max_partials) as w:
+            for f in self._frames(3):
+                w.write_frame(f)
+
+        reader = simpl.AnalysisReader(self.path)
+        assert len(reader) == 3
+        assert_almost_equals(reader[2].peaks[0].frequency, 300.0,
+                             float_precision)
+        reader.close()
+
+    def test_frame_set(self):
+        fs = simpl.FrameSet(0, max_peaks, max_partials)
+        for f in self._frames(3):
+            fs.add_frame(f)
+        simpl.write_analysis(self.path, fs)
+
+        reader = simpl.read_analysis(self.path)
+        assert len(reader) == 3
+        fs2 = reader.frame_set(1)
+        assert len(fs2) == 2
+        assert list(fs2.num_peaks) == [2, 2]
+        assert np.all(fs2.peak_frequency == fs.peak_frequency[1:])
+        reader.close()
+
+    def test_truncate(self):
+        frames = self._frames(2)
+        with simpl.AnalysisWriter(self.path, 1, max_partials) as w:
+            try:
+                w.write_frames(frames)
+                assert False
+            except ValueError:
+                pass
+            assert w.num_frames == 0
+
+        with simpl.AnalysisWriter(self.path, 1, max_partials,
+                                  truncate=True) as w:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                w.write_frames(frames)
+            assert len(caught) == 2
+
+        reader = simpl.read_analysis(self.path)
+        assert list(reader.records['num_peaks']) == [1, 1]
+        reader.close()
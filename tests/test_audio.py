@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import simpl
+import simpl.pybase as pybase
+
+hop_size = 512
+audio_path = os.path.join(
+    os.path.dirname(__file__), 'audio/flute.wav'
+)
+
+
+class _Residual(pybase.Residual):
+    def residual_frame(self, synth, original):
+        return original - synth
+
+
+class TestAudioWriter(object):
+    @classmethod
+    def setup_class(cls):
+        cls.audio = simpl.read_wav(audio_path)[0]
+        cls.tmp_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def teardown_class(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_array_writer(self):
+        writer = simpl.ArrayWriter(size=100)
+        for i in range(0, 1024, 64):
+            writer.write(self.audio[i:i + 64])
+        assert writer.num_samples == 1024
+        assert np.all(writer.audio == self.audio[:1024])
+
+        output = np.zeros(1000)
+        writer = simpl.audio_writer(output)
+        writer.write(self.audio[:1000])
+        assert np.all(output == self.audio[:1000])
+        try:
+            writer.write(self.audio[:1])
+            assert False
+        except ValueError:
+            pass
+
+    def test_wav_writer(self):
+        path = os.path.join(self.tmp_dir, 'out.wav')
+        with simpl.WavWriter(path, 44100) as writer:
+            for i in range(0, len(self.audio), hop_size):
+                writer.write(self.audio[i:i + hop_size])
+
+        audio, sampling_rate = simpl.read_wav(path)
+        assert sampling_rate == 44100
+        assert len(audio) == len(self.audio)
+        assert np.max(np.abs(audio - self.audio)) < 1.0 / 32768
+
+    def test_residual(self):
+        num_frames = len(self.audio) // hop_size
+        synth = self.audio * 0.5
+        residual = _Residual()
+        residual.hop_size = hop_size
+
+        output = residual.find_residual(synth, self.audio)
+        assert len(output) == num_frames * hop_size
+        assert np.allclose(output, self.audio[:len(output)] * 0.5)
+
+        writer = simpl.ArrayWriter()
+        assert residual.find_residual(synth, self.audio, writer) is writer
+        assert np.all(writer.audio == output)
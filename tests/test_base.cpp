@@ -89,3 +89,223 @@ void TestFrame::test_audio() {
         CPPUNIT_ASSERT(frame->audio()[i] == rotated_samples[i]);
     }
 }
+
+void TestFrame::test_audio_view() {
+    sample samples[8] = {0, 1, 2, 3, 4, 5, 6, 7};
+    Frame view(8, &samples[0], 8);
+
+    CPPUNIT_ASSERT(view.audio_is_view());
+    CPPUNIT_ASSERT(view.audio() == &samples[0]);
+
+    // short input is copied and zero-padded
+    view.audio_view(&samples[0], 5);
+    CPPUNIT_ASSERT(!view.audio_is_view());
+    CPPUNIT_ASSERT(view.audio() != &samples[0]);
+    for(int i = 0; i < 5; i++) {
+        CPPUNIT_ASSERT(view.audio()[i] == samples[i]);
+    }
+    for(int i = 5; i < 8; i++) {
+        CPPUNIT_ASSERT(view.audio()[i] == 0);
+    }
+}
+
+void TestFrame::test_frame_pool() {
+    sample samples[8] = {0, 1, 2, 3, 4, 5, 6, 7};
+    FramePool pool;
+
+    Frame* f = pool.acquire(8, &samples[0], 8);
+    f->add_peak(1.5, 220, 0, 0);
+    pool.release(f);
+    CPPUNIT_ASSERT(pool.size() == 1);
+
+    // released frames are reused and cleared
+    Frame* g = pool.acquire(4, &samples[2], 6);
+    CPPUNIT_ASSERT(g == f);
+    CPPUNIT_ASSERT(pool.size() == 0);
+    CPPUNIT_ASSERT(g->size() == 4);
+    CPPUNIT_ASSERT(g->num_peaks() == 0);
+    CPPUNIT_ASSERT(g->audio() == &samples[2]);
+    pool.release(g);
+}
+
+void TestFrame::test_lazy_buffers() {
+    Frame f(512, true);
+    CPPUNIT_ASSERT(!f.has_audio());
+    CPPUNIT_ASSERT(!f.has_synth());
+    CPPUNIT_ASSERT(!f.has_residual());
+    CPPUNIT_ASSERT(!f.has_synth_residual());
+
+    CPPUNIT_ASSERT(f.synth()[0] == 0);
+    CPPUNIT_ASSERT(f.has_synth());
+    CPPUNIT_ASSERT(!f.has_synth_residual());
+}
+
+
+// ---------------------------------------------------------------------------
+//	TestFrameSet
+// ---------------------------------------------------------------------------
+
+void TestFrameSet::setUp() {
+    frame_set = new FrameSet(0, 10, 10);
+}
+
+void TestFrameSet::tearDown() {
+    delete frame_set;
+}
+
+void TestFrameSet::test_num_frames() {
+    frame_set->num_frames(4);
+    CPPUNIT_ASSERT(frame_set->num_frames() == 4);
+    CPPUNIT_ASSERT(frame_set->num_peaks(3) == 0);
+    CPPUNIT_ASSERT(frame_set->num_partials(3) == 0);
+    frame_set->clear();
+    CPPUNIT_ASSERT(frame_set->num_frames() == 0);
+}
+
+void TestFrameSet::test_add_frame() {
+    Frame frame(512, false);
+    frame.add_peak(1.5, 220, 0, 0);
+    frame.add_peak(2.0, 440, 0, 0);
+    frame.add_partial(1.5, 220, 0, 0);
+
+    frame_set->add_frame(&frame);
+    frame_set->add_frame(&frame);
+
+    CPPUNIT_ASSERT(frame_set->num_frames() == 2);
+    CPPUNIT_ASSERT(frame_set->num_peaks(1) == 2);
+    CPPUNIT_ASSERT(frame_set->num_partials(1) == 1);
+    CPPUNIT_ASSERT_DOUBLES_EQUAL(
+        440, frame_set->peak_frequency()[frame_set->max_peaks() + 1],
+        PRECISION);
+    CPPUNIT_ASSERT_DOUBLES_EQUAL(
+        1.5, frame_set->partial_amplitude()[frame_set->max_partials()],
+        PRECISION);
+    frame_set->clear();
+}
+
+void TestFrameSet::test_read_frame() {
+    Frame frame(512, false);
+    frame.add_peak(1.5, 220, 0, 0);
+    frame_set->add_frame(&frame);
+
+    Frame copy(512, false);
+    frame_set->read_frame(0, &copy);
+    CPPUNIT_ASSERT(copy.num_peaks() == 1);
+    CPPUNIT_ASSERT_DOUBLES_EQUAL(1.5, copy.peak(0)->amplitude, PRECISION);
+    CPPUNIT_ASSERT_DOUBLES_EQUAL(220, copy.peak(0)->frequency, PRECISION);
+    frame_set->clear();
+}
+
+
+// ---------------------------------------------------------------------------
+//	TestTrackIndex
+// ---------------------------------------------------------------------------
+
+void TestTrackIndex::setUp() {
+    // partial 0: 100 Hz in frames 0-3, partial 1: 500 Hz in frames 1-2 and
+    // 900 Hz in frames 4-5
+    s_sample amplitudes[] = {0.5, 0.0, 0.5, 0.2, 0.5, 0.2,
+                             0.5, 0.0, 0.0, 0.2, 0.0, 0.2};
+    s_sample frequencies[] = {100, 0, 100, 500, 100, 500,
+                              100, 500, 0, 900, 0, 900};
+
+    frame_set = new FrameSet(6, 2, 2);
+    for(int i = 0; i < 12; i++) {
+        frame_set->partial_amplitude()[i] = amplitudes[i];
+        frame_set->partial_frequency()[i] = frequencies[i];
+    }
+    for(int i = 0; i < 6; i++) {
+        frame_set->num_partials(i, 2);
+    }
+}
+
+void TestTrackIndex::tearDown() {
+    delete frame_set;
+}
+
+void TestTrackIndex::test_build() {
+    TrackIndex index(frame_set);
+    CPPUNIT_ASSERT(index.num_frames() == 6);
+    CPPUNIT_ASSERT(index.num_tracks() == 3);
+    CPPUNIT_ASSERT(index.num_points() == 8);
+
+    CPPUNIT_ASSERT(index.start()[0] == 0);
+    CPPUNIT_ASSERT(index.length()[0] == 4);
+    CPPUNIT_ASSERT(index.partial_number()[1] == 1);
+    CPPUNIT_ASSERT(index.start()[1] == 1);
+    CPPUNIT_ASSERT(index.length()[1] == 2);
+    CPPUNIT_ASSERT(index.start()[2] == 4);
+    CPPUNIT_ASSERT(index.offset()[2] == 6);
+    CPPUNIT_ASSERT_DOUBLES_EQUAL(900, index.frequency()[index.offset()[2]],
+                                 PRECISION);
+}
+
+void TestTrackIndex::test_find() {
+    TrackIndex index(frame_set);
+
+    std::vector<int> tracks = index.find(0, 5, 0, 1000);
+    CPPUNIT_ASSERT(tracks.size() == 3);
+
+    tracks = index.find(2, 4, 200, 1000);
+    CPPUNIT_ASSERT(tracks.size() == 2);
+    CPPUNIT_ASSERT(tracks[0] == 1);
+    CPPUNIT_ASSERT(tracks[1] == 2);
+
+    tracks = index.find(3, 3, 200, 1000);
+    CPPUNIT_ASSERT(tracks.empty());
+}
+
+
+// ---------------------------------------------------------------------------
+//	TestWindowCache
+// ---------------------------------------------------------------------------
+
+void TestWindowCache::setUp() {
+    simpl_window_cache_clear();
+}
+
+void TestWindowCache::tearDown() {
+    simpl_window_cache_clear();
+}
+
+void TestWindowCache::test_lookup() {
+    double params[2] = {0.5, 2.0};
+    double window[4] = {0.1, 0.2, 0.3, 0.4};
+    double cached[4] = {0, 0, 0, 0};
+
+    CPPUNIT_ASSERT(!simpl_window_lookup("test", 4, 2, params, cached));
+    simpl_window_store("test", 4, 2, params, window);
+    CPPUNIT_ASSERT(simpl_window_cache_count() == 1);
+    CPPUNIT_ASSERT(simpl_window_cache_size() == sizeof(window));
+
+    CPPUNIT_ASSERT(simpl_window_lookup("test", 4, 2, params, cached));
+    for(int i = 0; i < 4; i++) {
+        CPPUNIT_ASSERT(cached[i] == window[i]);
+    }
+
+    // type, size and parameters are all part of the key
+    params[1] = 3.0;
+    CPPUNIT_ASSERT(!simpl_window_lookup("test", 4, 2, params, cached));
+    CPPUNIT_ASSERT(!simpl_window_lookup("test", 3, 0, NULL, cached));
+    CPPUNIT_ASSERT(!simpl_window_lookup("other", 4, 2, params, cached));
+}
+
+void TestWindowCache::test_limit() {
+    double window[4] = {0.1, 0.2, 0.3, 0.4};
+    double cached[4];
+    size_t limit = simpl_window_cache_limit();
+
+    // room for two windows, the least recently used is discarded
+    simpl_window_cache_set_limit(2 * sizeof(window));
+    simpl_window_store("a", 4, 0, NULL, window);
+    simpl_window_store("b", 4, 0, NULL, window);
+    CPPUNIT_ASSERT(simpl_window_lookup("a", 4, 0, NULL, cached));
+    simpl_window_store("c", 4, 0, NULL, window);
+
+    CPPUNIT_ASSERT(simpl_window_cache_count() == 2);
+    CPPUNIT_ASSERT(simpl_window_lookup("a", 4, 0, NULL, cached));
+    CPPUNIT_ASSERT(!simpl_window_lookup("b", 4, 0, NULL, cached));
+    CPPUNIT_ASSERT(simpl_window_lookup("c", 4, 0, NULL, cached));
+
+    simpl_window_cache_set_limit(limit);
+}
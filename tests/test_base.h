@@ -10,6 +10,7 @@
 #include <cppunit/extensions/TestFactoryRegistry.h>
 
 #include "../src/simpl/base.h"
+#include "../src/simpl/window_cache.h"
 
 namespace simpl
 {
@@ -42,6 +43,9 @@ class TestFrame : public CPPUNIT_NS::TestCase {
     CPPUNIT_TEST(test_add_peak);
     CPPUNIT_TEST(test_clear);
     CPPUNIT_TEST(test_audio);
+    CPPUNIT_TEST(test_audio_view);
+    CPPUNIT_TEST(test_frame_pool);
+    CPPUNIT_TEST(test_lazy_buffers);
     CPPUNIT_TEST_SUITE_END();
 
 public:
@@ -58,6 +62,71 @@ protected:
     void test_add_peak();
     void test_clear();
     void test_audio();
+    void test_audio_view();
+    void test_frame_pool();
+    void test_lazy_buffers();
+};
+
+// ---------------------------------------------------------------------------
+//	TestFrameSet
+// ---------------------------------------------------------------------------
+class TestFrameSet : public CPPUNIT_NS::TestCase {
+    CPPUNIT_TEST_SUITE(TestFrameSet);
+    CPPUNIT_TEST(test_num_frames);
+    CPPUNIT_TEST(test_add_frame);
+    CPPUNIT_TEST(test_read_frame);
+    CPPUNIT_TEST_SUITE_END();
+
+public:
+    void setUp();
+    void tearDown();
+
+protected:
+    static const double PRECISION = 0.001;
+    FrameSet* frame_set;
+
+    void test_num_frames();
+    void test_add_frame();
+    void test_read_frame();
+};
+
+// ---------------------------------------------------------------------------
+//	TestTrackIndex
+// ---------------------------------------------------------------------------
+class TestTrackIndex : public CPPUNIT_NS::TestCase {
+    CPPUNIT_TEST_SUITE(TestTrackIndex);
+    CPPUNIT_TEST(test_build);
+    CPPUNIT_TEST(test_find);
+    CPPUNIT_TEST_SUITE_END();
+
+public:
+    void setUp();
+    void tearDown();
+
+protected:
+    static const double PRECISION = 0.001;
+    FrameSet* frame_set;
+
+    void test_build();
+    void test_find();
+};
+
+// ---------------------------------------------------------------------------
+//	TestWindowCache
+// ---------------------------------------------------------------------------
+class TestWindowCache : public CPPUNIT_NS::TestCase {
+    CPPUNIT_TEST_SUITE(TestWindowCache);
+    CPPUNIT_TEST(test_lookup);
+    CPPUNIT_TEST(test_limit);
+    CPPUNIT_TEST_SUITE_END();
+
+public:
+    void setUp();
+    void tearDown();
+
+protected:
+    void test_lookup();
+    void test_limit();
 };
 
 } // end of namespace simpl
@@ -35,6 +35,69 @@ class TestFrame(object):
         f.synth_residual = a
         assert np.all(f.synth_residual == a)
 
+    def test_lazy_buffers(self):
+        N = 256
+        f = base.Frame(N)
+        assert not f.has_audio
+        assert not f.has_synth
+        assert not f.has_residual
+        assert not f.has_synth_residual
+
+        # buffers are allocated (and zeroed) on first access
+        assert np.all(f.synth == 0)
+        assert f.has_synth
+        assert not f.has_residual
+
+        f.residual = np.ones(N)
+        assert f.has_residual
+        assert not f.has_synth_residual
+
+        # changing the size releases the buffers
+        f.size = N * 2
+        assert not f.has_residual
+        assert len(f.residual) == N * 2
+
+    def test_audio_view(self):
+        N = 256
+        f = base.Frame(N)
+        a = np.random.rand(N)
+        f.audio_view(a)
+        assert f.audio_is_view
+        assert np.all(f.audio == a)
+
+        # frame audio shares memory with a
+        a[0] = 2.0
+        assert f.audio[0] == 2.0
+
+        # short input is copied and zero-padded
+        b = np.random.rand(N - 10)
+        f.audio_view(b)
+        assert not f.audio_is_view
+        assert np.all(f.audio[0:N - 10] == b)
+        assert np.all(f.audio[N - 10:] == 0)
+
+        f.audio_view(a)
+        f.clear()
+        assert not f.audio_is_view
+        assert np.all(f.audio == 0)
+        assert a[0] == 2.0
+
+    def test_audio_view_without_memory(self):
+        N = 256
+        f = base.Frame(N, True, False)
+        a = np.random.rand(N)
+        f.audio_view(a)
+        assert f.audio_is_view
+        del a
+        assert len(f.audio) == N
+
+        # there is no buffer to copy short input into
+        try:
+            f.audio_view(np.random.rand(N - 10))
+            assert False
+        except RuntimeError:
+            pass
+
     def test_peaks(self):
         p = base.Peak()
         p.amplitude = 0.5
@@ -71,3 +134,186 @@ class TestFrame(object):
                              float_precision)
         assert_almost_equals(f.partial(0).frequency, p.frequency,
                              float_precision)
+
+    def test_peak_array(self):
+        f = base.Frame()
+        assert len(f.peak_array) == 0
+
+        peaks = np.array([[0.5, 220.0, 0.1, 0.0],
+                          [0.25, 440.0, 0.2, 0.0]])
+        f.peak_array = peaks
+        assert len(f.peaks) == 2
+        assert_almost_equals(f.peaks[1].frequency, 440.0, float_precision)
+
+        a = f.peak_array
+        assert a.dtype == base.peak_dtype
+        assert np.all(a['amplitude'] == peaks[:, 0])
+
+        # the view shares memory with the frame
+        a['amplitude'][0] = 1.0
+        assert_almost_equals(f.peak(0).amplitude, 1.0, float_precision)
+
+        g = base.Frame()
+        g.peak_array = a
+        assert np.all(g.peak_array == a)
+
+    def test_partial_array(self):
+        f = base.Frame()
+        f.max_partials = 3
+        f.partial_array = np.ones((3, 4))
+        assert len(f.partials) == 3
+        assert np.all(f.partial_array['bandwidth'] == 1.0)
+
+    def test_peak_array_from_own_view(self):
+        f = base.Frame()
+        peaks = np.array([[0.5, 220.0, 0.1, 0.0],
+                          [0.25, 440.0, 0.2, 0.0]])
+        f.peak_array = peaks
+        f.peak_array = f.peak_array
+        assert np.all(f.peak_array.view(np.float64).reshape(-1, 4) == peaks)
+
+        f.peak_array = f.peak_array[1:]
+        assert len(f.peaks) == 1
+        assert_almost_equals(f.peaks[0].frequency, 440.0, float_precision)
+
+        f.max_partials = 2
+        f.partial_array = peaks
+        f.partial_array = f.partial_array[:1]
+        assert len(f.partials) == 1
+        assert_almost_equals(f.partials[0].frequency, 220.0, float_precision)
+
+    def test_resize_with_views(self):
+        f = base.Frame()
+        f.max_peaks = 2
+        f.peak_array = np.ones((2, 4))
+        view = f.peak_array[1:]
+        try:
+            f.max_peaks = 100
+            assert False
+        except BufferError:
+            pass
+        f.max_peaks = 2
+        assert len(view) == 1
+
+        # views of the peaks do not prevent changing max_partials
+        f.max_partials = 100
+        f.partial_array = np.ones((1, 4))
+        partials = f.partial_array
+        try:
+            f.max_partials = 200
+            assert False
+        except BufferError:
+            pass
+
+        del view, partials
+        f.max_peaks = 100
+        f.max_partials = 200
+        assert f.max_peaks == 100
+        assert f.max_partials == 200
+
+
+class TestFrameSet(object):
+    def test_add_frame(self):
+        max_peaks = 10
+        max_partials = 5
+        fs = base.FrameSet(0, max_peaks, max_partials)
+        assert len(fs) == 0
+
+        p = base.Peak()
+        p.amplitude = 0.5
+        p.frequency = 220.0
+        p.phase = 0.0
+
+        f = base.Frame()
+        f.add_peak(p)
+        f.add_partial(p)
+        fs.add_frame(f)
+        fs.add_frame(f)
+
+        assert len(fs) == 2
+        assert fs.peak_amplitude.shape == (2, max_peaks)
+        assert fs.partial_frequency.shape == (2, max_partials)
+        assert list(fs.num_peaks) == [1, 1]
+        assert list(fs.num_partials) == [1, 1]
+        assert_almost_equals(fs.peak_frequency[1, 0], p.frequency,
+                             float_precision)
+        assert fs.peak_amplitude[0, 1] == 0.0
+
+    def test_views(self):
+        fs = base.FrameSet(3, 4, 4)
+        fs.peak_amplitude[1, 2] = 0.25
+        fs.num_peaks[1] = 3
+
+        f = fs.frame(1)
+        assert len(f.peaks) == 3
+        assert_almost_equals(f.peaks[2].amplitude, 0.25, float_precision)
+
+    def test_resize_with_views(self):
+        fs = base.FrameSet(3, 4, 4)
+        f = base.Frame()
+        view = fs.peak_frequency[1:]
+        for resize in [lambda: fs.add_frame(f), fs.clear,
+                       lambda: setattr(fs, 'num_frames', 10),
+                       lambda: setattr(fs, 'max_peaks', 8)]:
+            try:
+                resize()
+                assert False
+            except BufferError:
+                pass
+        fs.max_peaks = 4
+        assert len(fs) == 3
+
+        del view
+        fs.add_frame(f)
+        assert len(fs) == 4
+        assert fs.peak_frequency.shape == (4, 4)
+
+
+class TestTrackIndex(object):
+    def _frame_set(self):
+        # partial 0: 100 Hz in frames 0-3, partial 1: 500 Hz in frames 1-2
+        # and 900 Hz in frames 4-5
+        fs = base.FrameSet(6, 2, 2)
+        fs.num_partials[:] = 2
+        fs.partial_amplitude[:] = [[0.5, 0.0], [0.5, 0.2], [0.5, 0.2],
+                                   [0.5, 0.0], [0.0, 0.2], [0.0, 0.2]]
+        fs.partial_frequency[:] = [[100, 0], [100, 500], [100, 500],
+                                   [100, 500], [0, 900], [0, 900]]
+        return fs
+
+    def test_tracks(self):
+        index = base.TrackIndex(self._frame_set())
+        assert len(index) == 3
+        assert list(index.start) == [0, 1, 4]
+        assert list(index.length) == [4, 2, 2]
+        assert list(index.partial_number) == [0, 1, 1]
+        assert list(index.offset) == [0, 4, 6]
+        assert list(index.frequency[4:6]) == [500, 500]
+
+        partial = index.partial(2)
+        assert partial.starting_frame == 4
+        assert partial.partial_number == 1
+        assert partial.get_length() == 2
+        assert_almost_equals(partial.peaks[0].frequency, 900, float_precision)
+        assert partial.peaks[1].previous_peak is partial.peaks[0]
+
+    def test_find(self):
+        index = base.TrackIndex(self._frame_set())
+        assert list(index.find(0, 5)) == [0, 1, 2]
+        assert list(index.find(2, 4, 200, 1000)) == [1, 2]
+        assert list(index.find(3, 3, 200, 1000)) == []
+        assert len(index.partials(index.find(0, 0))) == 1
+
+    def test_rebuild_with_views(self):
+        index = base.TrackIndex(self._frame_set())
+        frequency = index.frequency
+        for rebuild in [lambda: index.build(self._frame_set()), index.clear]:
+            try:
+                rebuild()
+                assert False
+            except BufferError:
+                pass
+
+        del frequency
+        index.build(base.FrameSet(1, 2, 2))
+        assert len(index) == 0
@@ -0,0 +1,159 @@
+import os
+import numpy as np
+from nose.tools import assert_almost_equals
+import simpl
+import simpl.mq as mq
+import simpl.synthesis as synthesis
+
+float_precision = 5
+frame_size = 2048
+max_peaks = 10
+audio_path = os.path.join(
+    os.path.dirname(__file__), 'audio/flute.wav'
+)
+
+
+class TestMQPeakDetection(object):
+    @classmethod
+    def setup_class(cls):
+        cls.audio = simpl.read_wav(audio_path)[0]
+
+    def test_find_peaks_in_frame(self):
+        pd = mq.MQPeakDetection()
+        pd.max_peaks = max_peaks
+
+        frame = simpl.Frame(frame_size)
+        frame.audio = self.audio[len(self.audio) // 2:
+                                 (len(self.audio) // 2) + frame_size]
+        peaks = pd.find_peaks_in_frame(frame)
+
+        # compare with a direct search of the magnitude spectrum
+        spectrum = np.abs(np.fft.rfft(frame.audio * pd._window))
+        bins = [b for b in range(2, len(spectrum) - 1)
+                if spectrum[b] > spectrum[b - 1] and
+                spectrum[b] > spectrum[b + 1]]
+        bins = sorted(bins, key=lambda b: spectrum[b])[-max_peaks:]
+        bins.sort()
+
+        assert len(peaks) == max_peaks
+        assert len(frame.peaks) == max_peaks
+        for peak, b in zip(peaks, bins):
+            assert_almost_equals(peak.amplitude, spectrum[b], float_precision)
+            assert_almost_equals(peak.frequency, b * pd._fundamental,
+                                 float_precision)
+
+
+    def test_analysis_window(self):
+        pd = mq.MQPeakDetection()
+        pd2 = mq.MQPeakDetection()
+        pd2.frame_size = pd.frame_size
+        assert pd._window is pd2._window
+        assert_almost_equals(np.sum(pd._window), 1.0, float_precision)
+
+        for size in range(mq.max_cached_windows + 1):
+            mq.analysis_window(size + 16)
+        assert len(mq._windows) == mq.max_cached_windows
+
+
+class TestMQPartialTracking(object):
+    def _frame(self, freqs, amps):
+        frame = simpl.Frame(frame_size)
+        frame.max_peaks = len(freqs)
+        peaks = []
+        for f, a in zip(freqs, amps):
+            p = simpl.Peak()
+            p.frequency = f
+            p.amplitude = a
+            peaks.append(p)
+        frame.peaks = peaks
+        return frame
+
+    def test_update_partials(self):
+        pt = mq.MQPartialTracking()
+        pt.max_partials = 4
+
+        # first frame: the 4 largest peaks start partials
+        frame = self._frame([100.0, 200.0, 300.0, 400.0, 500.0],
+                            [0.5, 0.1, 0.4, 0.3, 0.2])
+        partials = pt.update_partials(frame)
+        assert [p.frequency for p in partials] == [100.0, 300.0, 400.0, 500.0]
+
+        # 105 and 310 continue the partials at 100 and 300, 480 is closer to
+        # 500 than to 400 so the partial at 400 dies (with 0 amplitude), and
+        # there is no free slot for 900
+        frame = self._frame([105.0, 310.0, 480.0, 900.0],
+                            [0.5, 0.4, 0.2, 0.1])
+        pt.update_partials(frame)
+        freqs = [p.frequency for p in frame.partials]
+        amps = [p.amplitude for p in frame.partials]
+        assert freqs == [105.0, 310.0, 400.0, 480.0]
+        assert amps == [0.5, 0.4, 0.0, 0.2]
+
+        # the dead partial is removed and the free slot gets the new peak
+        frame = self._frame([105.0, 310.0, 480.0, 900.0],
+                            [0.5, 0.4, 0.2, 0.1])
+        pt.update_partials(frame)
+        freqs = [p.frequency for p in frame.partials]
+        assert freqs == [105.0, 310.0, 900.0, 480.0]
+
+
+class TestMQSynthesis(object):
+    @classmethod
+    def setup_class(cls):
+        cls.audio = simpl.read_wav(audio_path)[0]
+
+    def test_synth(self):
+        hop_size = 512
+        pd = mq.MQPeakDetection()
+        pd.hop_size = hop_size
+        pd.max_peaks = max_peaks
+        pt = mq.MQPartialTracking()
+        pt.max_partials = max_peaks
+        frames = pt.find_partials(pd.find_peaks(self.audio))
+
+        # compare with the native implementation
+        synth = mq.MQSynthesis()
+        synth.hop_size = hop_size
+        synth.max_partials = max_peaks
+        synth_audio = synth.synth(frames)
+
+        native_synth = synthesis.MQSynthesis()
+        native_synth.hop_size = hop_size
+        native_synth.max_partials = max_peaks
+        native_audio = native_synth.synth(frames)
+
+        assert len(synth_audio) == len(native_audio)
+        assert np.max(np.abs(synth_audio)) > 0
+        for s1, s2 in zip(synth_audio, native_audio):
+            assert_almost_equals(s1, s2, float_precision)
+
+
+class TestTWM(object):
+    def _peaks(self, f0, num_peaks):
+        peaks = []
+        for i in range(num_peaks):
+            p = simpl.Peak()
+            p.amplitude = 0.4
+            p.frequency = f0 * (i + 1)
+            peaks.append(p)
+        return peaks
+
+    def test_twm(self):
+        f0 = 220.0
+        estimate = mq.twm(self._peaks(f0, 10), f_min=20.0, f_step=20.0)
+        assert_almost_equals(estimate, f0, float_precision)
+
+    def test_twm_frames(self):
+        fundamentals = [120.0, 220.0, 440.0]
+        num_peaks = [10, 4, 6]
+        amps = np.zeros((3, 10))
+        freqs = np.zeros((3, 10))
+        for i, (f0, n) in enumerate(zip(fundamentals, num_peaks)):
+            amps[i, :n] = 0.4
+            freqs[i, :n] = f0 * np.arange(1, n + 1)
+
+        estimates = mq.twm_frames(amps, freqs, num_peaks, f_min=20.0,
+                                  f_step=20.0)
+        for i, (f0, n) in enumerate(zip(fundamentals, num_peaks)):
+            assert estimates[i] == mq.twm(self._peaks(f0, n), f_min=20.0,
+                                          f_step=20.0)
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+from nose.tools import assert_almost_equals
+import simpl
+import simpl.mq as mq
+
+float_precision = 5
+frame_size = 512
+hop_size = 256
+max_peaks = 10
+max_partials = 10
+segment_size = 50 * hop_size
+overlap = 8 * hop_size
+audio_path = os.path.join(
+    os.path.dirname(__file__), 'audio/flute.wav'
+)
+
+
+class TestParallelAnalysis(object):
+    @classmethod
+    def setup_class(cls):
+        cls.audio = simpl.read_wav(audio_path)[0]
+
+    def _peak_detection(self):
+        pd = mq.MQPeakDetection()
+        pd.frame_size = frame_size
+        pd.hop_size = hop_size
+        pd.max_peaks = max_peaks
+        pd.static_frame_size = True
+        return pd
+
+    def _partial_tracking(self):
+        pt = mq.MQPartialTracking()
+        pt.max_partials = max_partials
+        return pt
+
+    def _links(self, frames):
+        # frequencies of the partials that continue from each frame to the
+        # next, which do not depend on the numbering of the partials
+        links = []
+        for f1, f2 in zip(frames[:-1], frames[1:]):
+            links.append(sorted(
+                (round(p1['frequency'], float_precision),
+                 round(p2['frequency'], float_precision))
+                for p1, p2 in zip(f1.partial_array, f2.partial_array)
+                if p1['amplitude'] > 0 and p2['amplitude'] > 0
+            ))
+        return links
+
+    def test_peaks(self):
+        frames = self._peak_detection().find_peaks(self.audio)
+
+        analysis = simpl.ParallelAnalysis(self._peak_detection(),
+                                          segment_size=segment_size,
+                                          overlap=overlap, num_processes=2)
+        parallel_frames = analysis.analyse(self.audio)
+
+        assert len(parallel_frames) == len(frames)
+        for f1, f2 in zip(frames, parallel_frames):
+            assert f1.size == f2.size
+            assert np.all(f1.audio == f2.audio)
+            assert len(f1.peaks) == len(f2.peaks)
+            for p1, p2 in zip(f1.peaks, f2.peaks):
+                assert_almost_equals(p1.amplitude, p2.amplitude,
+                                     float_precision)
+                assert_almost_equals(p1.frequency, p2.frequency,
+                                     float_precision)
+
+    def test_partials(self):
+        pd = self._peak_detection()
+        frames = self._partial_tracking().find_partials(
+            pd.find_peaks(self.audio)
+        )
+
+        analysis = simpl.ParallelAnalysis(self._peak_detection(),
+                                          self._partial_tracking(),
+                                          segment_size=segment_size,
+                                          overlap=overlap, num_processes=2)
+        parallel_frames = analysis.analyse(self.audio)
+
+        assert len(parallel_frames) == len(frames)
+        for f in parallel_frames:
+            assert len(f.partials) == max_partials
+        assert self._links(parallel_frames) == self._links(frames)
+
+    def test_serial(self):
+        pd = self._peak_detection()
+        frames = self._partial_tracking().find_partials(
+            pd.find_peaks(self.audio)
+        )
+
+        analysis = simpl.ParallelAnalysis(self._peak_detection(),
+                                          self._partial_tracking(),
+                                          segment_size=segment_size,
+                                          overlap=overlap, num_processes=1)
+        serial_frames = analysis.analyse(self.audio)
+
+        assert len(serial_frames) == len(frames)
+        for f1, f2 in zip(frames, serial_frames):
+            for p1, p2 in zip(f1.partials, f2.partials):
+                assert_almost_equals(p1.frequency, p2.frequency,
+                                     float_precision)
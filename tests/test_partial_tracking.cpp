@@ -143,6 +143,82 @@ void TestMQPartialTracking::test_peaks() {
     ::test_peaks(&_pd, &_pt, &_sf);
 }
 
+void TestMQPartialTracking::test_track_peaks() {
+    MQParameters params;
+    params.matching_interval = 100.0;
+
+    float prev_frequencies[] = {100, 200, 300, 1000};
+    float frequencies[] = {105, 195, 250, 400};
+    MQPeakList prev_peaks, peaks;
+    prev_peaks.resize(4);
+    peaks.resize(4);
+    for(int i = 0; i < 4; i++) {
+        prev_peaks.peaks[i].frequency = prev_frequencies[i];
+        peaks.peaks[i].frequency = frequencies[i];
+    }
+
+    mq_track_peaks(&prev_peaks, &params);
+    CPPUNIT_ASSERT(params.prev_peaks == &prev_peaks);
+    mq_track_peaks(&peaks, &params);
+
+    CPPUNIT_ASSERT(prev_peaks.peaks[0].next == &(peaks.peaks[0]));
+    CPPUNIT_ASSERT(prev_peaks.peaks[1].next == &(peaks.peaks[1]));
+    CPPUNIT_ASSERT(prev_peaks.peaks[2].next == &(peaks.peaks[2]));
+    CPPUNIT_ASSERT(prev_peaks.peaks[3].next == NULL);
+    CPPUNIT_ASSERT(peaks.peaks[0].prev == &(prev_peaks.peaks[0]));
+    CPPUNIT_ASSERT(peaks.peaks[3].prev == NULL);
+}
+
+
+// ---------------------------------------------------------------------------
+//	TestOfflinePartialTracking
+// ---------------------------------------------------------------------------
+void TestOfflinePartialTracking::setUp() {
+    _sf = SndfileHandle(TEST_AUDIO_FILE);
+
+    if(_sf.error() > 0) {
+        throw Exception(std::string("Could not open audio file: ") +
+                        std::string(TEST_AUDIO_FILE));
+    }
+}
+
+void TestOfflinePartialTracking::test_basic() {
+    ::test_basic(&_pd, &_pt, &_sf);
+}
+
+void TestOfflinePartialTracking::test_peaks() {
+    ::test_peaks(&_pd, &_pt, &_sf);
+}
+
+void TestOfflinePartialTracking::test_frame_set() {
+    // 160 Hz is closest to 140 Hz, but the minimum cost assignment links it
+    // to 230 Hz so that the partial at 100 Hz is continued too
+    s_sample frequencies[] = {100, 160, 1000, 140, 230, 0};
+    s_sample amplitudes[] = {0.5, 0.4, 0.3, 0.5, 0.4, 0.0};
+
+    FrameSet frame_set(2, 3, 3);
+    frame_set.num_peaks(0, 3);
+    frame_set.num_peaks(1, 2);
+    for(int i = 0; i < 6; i++) {
+        frame_set.peak_frequency()[i] = frequencies[i];
+        frame_set.peak_amplitude()[i] = amplitudes[i];
+    }
+
+    _pt.reset();
+    _pt.max_partials(3);
+    _pt.find_partials(&frame_set);
+
+    s_sample *partial_frequency = frame_set.partial_frequency();
+    s_sample *partial_amplitude = frame_set.partial_amplitude();
+    CPPUNIT_ASSERT(frame_set.num_partials(1) == 3);
+    CPPUNIT_ASSERT_DOUBLES_EQUAL(140.0, partial_frequency[3], PRECISION);
+    CPPUNIT_ASSERT_DOUBLES_EQUAL(230.0, partial_frequency[4], PRECISION);
+
+    // the partial at 1000 Hz ends with a zero amplitude peak
+    CPPUNIT_ASSERT_DOUBLES_EQUAL(1000.0, partial_frequency[5], PRECISION);
+    CPPUNIT_ASSERT_DOUBLES_EQUAL(0.0, partial_amplitude[5], PRECISION);
+}
+
 
 // ---------------------------------------------------------------------------
 //	TestSMSPartialTracking
@@ -18,6 +18,7 @@ class TestMQPartialTracking : public CPPUNIT_NS::TestCase {
     CPPUNIT_TEST_SUITE(TestMQPartialTracking);
     CPPUNIT_TEST(test_basic);
     CPPUNIT_TEST(test_peaks);
+    CPPUNIT_TEST(test_track_peaks);
     CPPUNIT_TEST_SUITE_END();
 
 public:
@@ -30,6 +31,31 @@ protected:
 
     void test_basic();
     void test_peaks();
+    void test_track_peaks();
+};
+
+
+// ---------------------------------------------------------------------------
+//	TestOfflinePartialTracking
+// ---------------------------------------------------------------------------
+class TestOfflinePartialTracking : public CPPUNIT_NS::TestCase {
+    CPPUNIT_TEST_SUITE(TestOfflinePartialTracking);
+    CPPUNIT_TEST(test_basic);
+    CPPUNIT_TEST(test_peaks);
+    CPPUNIT_TEST(test_frame_set);
+    CPPUNIT_TEST_SUITE_END();
+
+public:
+    void setUp();
+
+protected:
+    MQPeakDetection _pd;
+    OfflinePartialTracking _pt;
+    SndfileHandle _sf;
+
+    void test_basic();
+    void test_peaks();
+    void test_frame_set();
 };
 
 
@@ -11,6 +11,7 @@ SndObjPeakDetection = peak_detection.SndObjPeakDetection
 PartialTracking = partial_tracking.PartialTracking
 SMSPartialTracking = partial_tracking.SMSPartialTracking
 SndObjPartialTracking = partial_tracking.SndObjPartialTracking
+OfflinePartialTracking = partial_tracking.OfflinePartialTracking
 
 float_precision = 2
 frame_size = 512
@@ -62,6 +63,55 @@ class TestPartialTracking(object):
         assert frames[0].max_partials == 100
 
 
+class TestOfflinePartialTracking(object):
+    def _frame_set(self):
+        # the partial at 160 Hz is closest to the peak at 140 Hz, but
+        # continuing it with 230 Hz lets the partial at 100 Hz continue too.
+        # The partial at 1000 Hz ends and a partial at 3000 Hz starts.
+        frame_set = simpl.FrameSet(3, 3, 3)
+        frame_set.num_peaks[:] = [3, 2, 3]
+        frame_set.peak_frequency[:] = [[100.0, 160.0, 1000.0],
+                                       [140.0, 230.0, 0.0],
+                                       [150.0, 240.0, 3000.0]]
+        frame_set.peak_amplitude[:] = [[0.5, 0.4, 0.3],
+                                       [0.5, 0.4, 0.0],
+                                       [0.5, 0.4, 0.2]]
+        return frame_set
+
+    def test_find_partials(self):
+        pt = OfflinePartialTracking()
+        pt.max_partials = 3
+        assert pt.matching_interval == 100
+
+        frame_set = pt.find_partials(self._frame_set())
+        assert list(frame_set.num_partials) == [3, 3, 3]
+        assert frame_set.partial_frequency.tolist() == [
+            [100.0, 160.0, 1000.0],
+            [140.0, 230.0, 1000.0],
+            [150.0, 240.0, 3000.0]
+        ]
+        assert frame_set.partial_amplitude[1].tolist() == [0.5, 0.4, 0.0]
+
+        # linking a list of Frames gives the same partials
+        pt = OfflinePartialTracking()
+        pt.max_partials = 3
+        frames = pt.find_partials(list(self._frame_set()))
+        for i, frame in enumerate(frames):
+            for p, f in zip(frame.partials, frame_set.partial_frequency[i]):
+                assert p.frequency == f
+
+    def test_engine(self):
+        pt = PartialTracking()
+        pt.max_partials = 3
+        frame_set = pt.find_partials(self._frame_set(), engine='offline')
+        assert frame_set.partial_frequency[2].tolist() == [150.0, 240.0,
+                                                           3000.0]
+
+        frames = pt.find_partials(list(self._frame_set()), engine='offline')
+        assert [p.frequency for p in frames[2].partials] == [150.0, 240.0,
+                                                             3000.0]
+
+
 class TestSMSPartialTracking(object):
     @classmethod
     def setup_class(cls):
@@ -84,6 +134,39 @@ class TestSMSPartialTracking(object):
         assert len(frames[0].partials) == max_partials
         assert frames[0].max_partials == max_partials
 
+    def test_configure(self):
+        pd = SMSPeakDetection()
+        pd.configure(hop_size=hop_size, max_peaks=max_peaks)
+        assert pd.hop_size == hop_size
+        assert pd.max_peaks == max_peaks
+        peaks = pd.find_peaks(self.audio)
+
+        pt1 = SMSPartialTracking()
+        pt1.max_partials = max_partials
+        pt1.max_frame_delay = 2
+        frames1 = pt1.find_partials(peaks)
+
+        pt2 = SMSPartialTracking()
+        pt2.configure(max_partials=max_partials, max_frame_delay=2)
+        assert pt2.max_partials == max_partials
+        assert pt2.max_frame_delay == 2
+        frames2 = pt2.find_partials(peaks)
+
+        assert len(frames1) == len(frames2)
+        for f1, f2 in zip(frames1, frames2):
+            assert len(f1.partials) == len(f2.partials)
+            for p1, p2 in zip(f1.partials, f2.partials):
+                assert_almost_equals(p1.frequency, p2.frequency,
+                                     float_precision)
+
+        # unknown parameters are rejected before anything is changed
+        try:
+            pt2.configure(max_partials=5, frame_size=1024)
+            assert False
+        except AttributeError:
+            pass
+        assert pt2.max_partials == max_partials
+
     def test_partial_tracking(self):
         pd = SMSPeakDetection()
         pd.max_peaks = max_peaks
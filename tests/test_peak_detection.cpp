@@ -70,6 +70,93 @@ void TestMQPeakDetection::test_find_peaks_change_hop_frame_size() {
     }
 }
 
+void TestMQPeakDetection::test_find_peaks_batch() {
+    // more frames than are analysed in a single batch
+    int num_frames = 100;
+    int num_samples = _pd.frame_size() + (_pd.hop_size() * num_frames);
+
+    std::vector<sample> audio(_sf.frames(), 0.0);
+    _sf.read(&audio[0], (int)_sf.frames());
+
+    _pd.clear();
+    Frames frames = _pd.find_peaks(num_samples, &(audio[0]));
+
+    FrameSet frame_set;
+    _pd.find_peaks(num_samples, &(audio[0]), &frame_set);
+    CPPUNIT_ASSERT(frame_set.num_frames() == frames.size());
+
+    // the batched analysis must give the same peaks as analysing each frame
+    Frame f(_pd.frame_size(), true);
+    for(int i = 0; i < frames.size(); i++) {
+        f.clear();
+        f.audio(frames[i]->audio());
+        _pd.find_peaks_in_frame(&f);
+
+        CPPUNIT_ASSERT(f.num_peaks() == frames[i]->num_peaks());
+        CPPUNIT_ASSERT(f.num_peaks() == frame_set.num_peaks(i));
+        for(int j = 0; j < f.num_peaks(); j++) {
+            CPPUNIT_ASSERT_DOUBLES_EQUAL(f.peak(j)->frequency,
+                                         frames[i]->peak(j)->frequency,
+                                         PRECISION);
+            CPPUNIT_ASSERT_DOUBLES_EQUAL(f.peak(j)->amplitude,
+                                         frames[i]->peak(j)->amplitude,
+                                         PRECISION);
+        }
+    }
+}
+
+void TestMQPeakDetection::test_fft_plan_cache() {
+    int frame_size = _pd.frame_size();
+
+    // plans are shared between instances
+    MQPeakDetection pd;
+    pd.frame_size(frame_size * 2);
+    int num_plans = fft_num_plans();
+    MQPeakDetection pd2;
+    pd2.frame_size(frame_size * 2);
+    CPPUNIT_ASSERT(fft_num_plans() == num_plans);
+
+    // and reused when the same size is requested again
+    pd.frame_size(frame_size);
+    pd.frame_size(frame_size * 2);
+    _pd.max_peaks(_pd.max_peaks());
+    CPPUNIT_ASSERT(fft_num_plans() == num_plans);
+}
+
+void TestMQPeakDetection::test_find_peaks_threads() {
+    int num_frames = 100;
+    int num_samples = _pd.frame_size() + (_pd.hop_size() * num_frames);
+
+    std::vector<sample> audio(_sf.frames(), 0.0);
+    _sf.read(&audio[0], (int)_sf.frames());
+
+    FrameSet serial;
+    _pd.find_peaks(num_samples, &(audio[0]), &serial);
+
+    // the threaded analysis must give exactly the same peaks
+    _pd.num_threads(4);
+    FrameSet threaded;
+    _pd.find_peaks(num_samples, &(audio[0]), &threaded);
+    Frames frames = _pd.find_peaks(num_samples, &(audio[0]));
+    _pd.num_threads(1);
+
+    CPPUNIT_ASSERT(threaded.num_frames() == serial.num_frames());
+    CPPUNIT_ASSERT(frames.size() == serial.num_frames());
+    for(int i = 0; i < serial.num_frames(); i++) {
+        CPPUNIT_ASSERT(threaded.num_peaks(i) == serial.num_peaks(i));
+        CPPUNIT_ASSERT(frames[i]->num_peaks() == serial.num_peaks(i));
+        for(int j = 0; j < serial.num_peaks(i); j++) {
+            int n = (i * serial.max_peaks()) + j;
+            CPPUNIT_ASSERT(threaded.peak_frequency()[n] ==
+                           serial.peak_frequency()[n]);
+            CPPUNIT_ASSERT(threaded.peak_amplitude()[n] ==
+                           serial.peak_amplitude()[n]);
+            CPPUNIT_ASSERT(frames[i]->peak(j)->frequency ==
+                           serial.peak_frequency()[n]);
+        }
+    }
+}
+
 
 // ---------------------------------------------------------------------------
 //	TestTWM
@@ -93,6 +180,22 @@ void TestTWM::test_basic() {
     }
 }
 
+void TestTWM::test_few_harmonics() {
+    // the amplitude term must scale the weighted frequency error,
+    // otherwise the estimate is far below the fundamental
+    int num_peaks = 10;
+    int base_freq = 220;
+    std::vector<Peak> peaks(num_peaks);
+
+    for(int i = 0; i < num_peaks; i++) {
+        peaks[i].amplitude = 0.4;
+        peaks[i].frequency = base_freq * (i + 1);
+    }
+
+    CPPUNIT_ASSERT_DOUBLES_EQUAL(base_freq, twm(num_peaks, &peaks[0]),
+                                 PRECISION);
+}
+
 // ---------------------------------------------------------------------------
 //	TestLorisPeakDetection
 // ---------------------------------------------------------------------------
@@ -6,6 +6,7 @@
 #include "../src/simpl/base.h"
 #include "../src/simpl/peak_detection.h"
 #include "../src/simpl/exceptions.h"
+#include "../src/simpl/fft_plans.h"
 #include "test_common.h"
 
 namespace simpl
@@ -20,6 +21,9 @@ class TestMQPeakDetection : public CPPUNIT_NS::TestCase {
     CPPUNIT_TEST(test_find_peaks_basic);
     CPPUNIT_TEST(test_find_peaks_audio);
     CPPUNIT_TEST(test_find_peaks_change_hop_frame_size);
+    CPPUNIT_TEST(test_find_peaks_batch);
+    CPPUNIT_TEST(test_fft_plan_cache);
+    CPPUNIT_TEST(test_find_peaks_threads);
     CPPUNIT_TEST_SUITE_END();
 
 public:
@@ -33,6 +37,9 @@ protected:
     void test_find_peaks_basic();
     void test_find_peaks_audio();
     void test_find_peaks_change_hop_frame_size();
+    void test_find_peaks_batch();
+    void test_fft_plan_cache();
+    void test_find_peaks_threads();
 };
 
 
@@ -42,10 +49,12 @@ protected:
 class TestTWM : public CPPUNIT_NS::TestCase {
     CPPUNIT_TEST_SUITE(TestTWM);
     CPPUNIT_TEST(test_basic);
+    CPPUNIT_TEST(test_few_harmonics);
     CPPUNIT_TEST_SUITE_END();
 
 protected:
     void test_basic();
+    void test_few_harmonics();
 };
 
 
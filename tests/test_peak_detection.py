@@ -1,7 +1,10 @@
 import os
 import json
+import numpy as np
+from nose.tools import assert_almost_equals
 import simpl
 import simpl.peak_detection as peak_detection
+import simpl.synthesis as synthesis
 
 PeakDetection = peak_detection.PeakDetection
 SMSPeakDetection = peak_detection.SMSPeakDetection
@@ -42,6 +45,93 @@ class TestPeakDetection(object):
         assert len(pd.frames[0].peaks) == 0
         assert pd.frames[0].max_peaks == max_peaks
 
+    def test_num_threads(self):
+        for cls in (peak_detection.MQPeakDetection,
+                    peak_detection.LorisPeakDetection):
+            pd = cls()
+            pd.max_peaks = max_peaks
+            serial = pd.find_peaks(self.audio, simpl.FrameSet())
+
+            pd.num_threads = 4
+            threaded = pd.find_peaks(self.audio, simpl.FrameSet())
+            assert np.all(threaded.num_peaks == serial.num_peaks)
+            assert np.all(threaded.peak_frequency == serial.peak_frequency)
+            assert np.all(threaded.peak_amplitude == serial.peak_amplitude)
+
+            # workers are kept between calls, but follow parameter changes
+            pd.max_peaks = max_peaks // 2
+            threaded = pd.find_peaks(self.audio, simpl.FrameSet())
+            pd = cls()
+            pd.max_peaks = max_peaks // 2
+            serial = pd.find_peaks(self.audio, simpl.FrameSet())
+            assert np.all(threaded.num_peaks == serial.num_peaks)
+            assert np.all(threaded.peak_frequency == serial.peak_frequency)
+
+    def test_frames_owned(self):
+        # frames returned by find_peaks are not changed by later calls,
+        # and stay valid after the detector is freed
+        for cls in (peak_detection.MQPeakDetection,
+                    peak_detection.LorisPeakDetection):
+            pd = cls()
+            pd.max_peaks = max_peaks
+            frames = pd.find_peaks(self.audio)
+            peaks = [f.peak_array.copy() for f in frames]
+
+            pd.find_peaks(self.audio[::-1].copy())
+            del pd
+            assert len(frames) == num_frames
+            for f, p in zip(frames, peaks):
+                assert np.all(f.peak_array == p)
+                assert len(f.audio) == f.size
+
+
+class TestTWM(object):
+    def test_twm(self):
+        f0 = 110.0
+        peaks = np.zeros((100, 4))
+        peaks[:, 0] = 0.4
+        peaks[:, 1] = f0 * np.arange(1, 101)
+        assert_almost_equals(simpl.twm(peaks), f0, 3)
+
+    def test_twm_frames(self):
+        fs = simpl.FrameSet(0, 20, 20)
+        for f0 in [220.0, 440.0]:
+            f = simpl.Frame()
+            f.max_peaks = 20
+            f.peak_array = np.column_stack((
+                np.repeat(0.4, 10), f0 * np.arange(1, 11),
+                np.zeros(10), np.zeros(10)
+            ))
+            fs.add_frame(f)
+        estimates = simpl.twm_frames(fs)
+        assert_almost_equals(estimates[0], 220.0, 3)
+        assert_almost_equals(estimates[1], 440.0, 3)
+        assert estimates[1] == simpl.twm(fs[1].peak_array)
+
+
+class TestFFTPlans(object):
+    def test_fft_plan_rigor(self):
+        assert simpl.fft_plan_rigor() == 'estimate'
+        assert simpl.fft_plan_rigor('measure') == 'measure'
+        assert peak_detection.fft_plan_rigor() == 'measure'
+        simpl.fft_plan_rigor('estimate')
+
+    def test_fft_plans_shared(self):
+        pd = SndObjPeakDetection()
+        pd.frame_size = 1024
+        num_plans = peak_detection.num_fft_plans()
+        pd2 = SndObjPeakDetection()
+        pd2.frame_size = 1024
+        assert peak_detection.num_fft_plans() == num_plans
+
+    def test_fft_plans_shared_between_modules(self):
+        pd = SndObjPeakDetection()
+        pd.frame_size = 1024
+        assert synthesis.num_fft_plans() == peak_detection.num_fft_plans()
+        assert synthesis.fft_plan_rigor('measure') == 'measure'
+        assert peak_detection.fft_plan_rigor() == 'measure'
+        synthesis.fft_plan_rigor('estimate')
+
 
 class TestSMSPeakDetection(object):
     @classmethod
@@ -0,0 +1,85 @@
+import os
+import numpy as np
+from nose.tools import assert_almost_equals
+import simpl
+import simpl.mq as mq
+
+float_precision = 5
+frame_size = 512
+hop_size = 256
+max_peaks = 10
+max_partials = 10
+num_samples = 8192
+audio_path = os.path.join(
+    os.path.dirname(__file__), 'audio/flute.wav'
+)
+
+
+class TestStreamAnalysis(object):
+    @classmethod
+    def setup_class(cls):
+        audio = simpl.read_wav(audio_path)[0]
+        cls.audio = audio[len(audio) // 2:(len(audio) // 2) + num_samples]
+
+    def _peak_detection(self):
+        pd = mq.MQPeakDetection()
+        pd.frame_size = frame_size
+        pd.hop_size = hop_size
+        pd.max_peaks = max_peaks
+        return pd
+
+    def _stream(self, stream, block_size):
+        frames = []
+        for i in range(0, len(self.audio), block_size):
+            frames.extend(stream.process(self.audio[i:i + block_size]))
+        frames.extend(stream.flush())
+        return frames
+
+    def test_process(self):
+        frames = self._peak_detection().find_peaks(self.audio)
+
+        for block_size in [64, 100, 128, 1000]:
+            stream = simpl.StreamAnalysis(self._peak_detection())
+            stream_frames = self._stream(stream, block_size)
+
+            assert len(stream_frames) == len(frames)
+            for f1, f2 in zip(frames, stream_frames):
+                assert f1.size == f2.size
+                assert len(f1.peaks) == len(f2.peaks)
+                for p1, p2 in zip(f1.peaks, f2.peaks):
+                    assert_almost_equals(p1.amplitude, p2.amplitude,
+                                         float_precision)
+                    assert_almost_equals(p1.frequency, p2.frequency,
+                                         float_precision)
+
+    def test_frames_ready(self):
+        stream = simpl.StreamAnalysis(self._peak_detection())
+
+        # a frame is returned as soon as it is complete
+        assert stream.process(self.audio[:frame_size - 1]) == []
+        frames = stream.process(self.audio[frame_size - 1:frame_size])
+        assert len(frames) == 1
+        assert np.all(frames[0].audio == self.audio[:frame_size])
+
+        frames = stream.process(self.audio[frame_size:frame_size + hop_size])
+        assert len(frames) == 1
+        assert np.all(frames[0].audio ==
+                      self.audio[hop_size:hop_size + frame_size])
+
+    def test_partials(self):
+        pd = self._peak_detection()
+        pt = mq.MQPartialTracking()
+        pt.max_partials = max_partials
+        frames = pt.find_partials(pd.find_peaks(self.audio))
+
+        pt = mq.MQPartialTracking()
+        pt.max_partials = max_partials
+        stream = simpl.StreamAnalysis(self._peak_detection(), pt)
+        stream_frames = self._stream(stream, 128)
+
+        assert len(stream_frames) == len(frames)
+        for f1, f2 in zip(frames, stream_frames):
+            assert len(f1.partials) == len(f2.partials)
+            for p1, p2 in zip(f1.partials, f2.partials):
+                assert_almost_equals(p1.frequency, p2.frequency,
+                                     float_precision)
@@ -104,6 +104,70 @@ static void test_changing_frame_size(PeakDetection *pd, PartialTracking* pt,
     }
 }
 
+// ---------------------------------------------------------------------------
+//	test_num_threads
+// ---------------------------------------------------------------------------
+static std::vector<sample> synth_frames(Synthesis *synth, Frames frames) {
+    std::vector<sample> output;
+    synth->reset();
+    for(int i = 0; i < frames.size(); i++) {
+        memset(frames[i]->synth(), 0, sizeof(sample) * synth->hop_size());
+        synth->synth_frame(frames[i]);
+        output.insert(output.end(), frames[i]->synth(),
+                      frames[i]->synth() + synth->hop_size());
+    }
+    return output;
+}
+
+static void test_num_threads(PeakDetection *pd, PartialTracking* pt,
+                             Synthesis* synth, Synthesis* threaded,
+                             SndfileHandle *sf) {
+    int num_samples = 4096;
+    int hop_size = 256;
+    int frame_size = 512;
+
+    std::vector<sample> audio(sf->frames(), 0.0);
+    sf->read(&audio[0], (int)sf->frames());
+
+    pd->clear();
+    pt->reset();
+    pd->frame_size(frame_size);
+    pd->hop_size(hop_size);
+    synth->frame_size(hop_size);
+    synth->hop_size(hop_size);
+    threaded->frame_size(hop_size);
+    threaded->hop_size(hop_size);
+
+    Frames frames = pd->find_peaks(num_samples,
+                                   &(audio[(int)sf->frames() / 2]));
+    frames = pt->find_partials(frames);
+    for(int i = 0; i < frames.size(); i++) {
+        frames[i]->synth_size(hop_size);
+    }
+
+    CPPUNIT_ASSERT(synth->num_threads() == 1);
+    threaded->num_threads(0);
+    CPPUNIT_ASSERT(threaded->num_threads() == 1);
+    threaded->num_threads(4);
+    CPPUNIT_ASSERT(threaded->num_threads() == 4);
+
+    std::vector<sample> output = synth_frames(synth, frames);
+    std::vector<sample> threaded_output = synth_frames(threaded, frames);
+    std::vector<sample> threaded_output2 = synth_frames(threaded, frames);
+
+    // worker threads are restarted when num_threads changes
+    threaded->num_threads(3);
+    std::vector<sample> threaded_output3 = synth_frames(threaded, frames);
+
+    CPPUNIT_ASSERT(output.size() == threaded_output.size());
+    CPPUNIT_ASSERT(output.size() == threaded_output3.size());
+    for(int i = 0; i < output.size(); i++) {
+        CPPUNIT_ASSERT_DOUBLES_EQUAL(output[i], threaded_output[i], 1e-9);
+        CPPUNIT_ASSERT(threaded_output[i] == threaded_output2[i]);
+        CPPUNIT_ASSERT_DOUBLES_EQUAL(output[i], threaded_output3[i], 1e-9);
+    }
+}
+
 // ---------------------------------------------------------------------------
 //	TestMQSynthesis
 // ---------------------------------------------------------------------------
@@ -124,6 +188,62 @@ void TestMQSynthesis::test_changing_frame_size() {
     ::test_changing_frame_size(&_pd, &_pt, &_synth, &_sf);
 }
 
+void TestMQSynthesis::test_num_threads() {
+    MQSynthesis threaded;
+    ::test_num_threads(&_pd, &_pt, &_synth, &threaded, &_sf);
+
+    MQSynthesis fast;
+    MQSynthesis threaded_fast;
+    fast.oscillator_mode(MQ_OSC_FAST);
+    threaded_fast.oscillator_mode(MQ_OSC_FAST);
+    ::test_num_threads(&_pd, &_pt, &fast, &threaded_fast, &_sf);
+}
+
+void TestMQSynthesis::test_oscillator_mode() {
+    int num_samples = 4096;
+    int hop_size = 256;
+    int frame_size = 512;
+
+    std::vector<sample> audio(_sf.frames(), 0.0);
+    _sf.read(&audio[0], (int)_sf.frames());
+
+    _pd.clear();
+    _pt.reset();
+    _pd.frame_size(frame_size);
+    _pd.hop_size(hop_size);
+
+    Frames frames = _pd.find_peaks(num_samples,
+                                   &(audio[(int)_sf.frames() / 2]));
+    frames = _pt.find_partials(frames);
+
+    MQSynthesis exact;
+    MQSynthesis fast;
+    exact.hop_size(hop_size);
+    fast.hop_size(hop_size);
+    fast.oscillator_mode(MQ_OSC_FAST);
+    CPPUNIT_ASSERT(exact.oscillator_mode() == MQ_OSC_EXACT);
+    CPPUNIT_ASSERT(fast.oscillator_mode() == MQ_OSC_FAST);
+
+    std::vector<sample> exact_synth(hop_size);
+    for(int i = 0; i < frames.size(); i++) {
+        exact.synth_frame(frames[i]);
+        for(int j = 0; j < hop_size; j++) {
+            exact_synth[j] = frames[i]->synth()[j];
+        }
+        fast.synth_frame(frames[i]);
+
+        double max_error = 1e-15;
+        for(int p = 0; p < frames[i]->num_partials(); p++) {
+            max_error += frames[i]->partial(p)->amplitude * 1e-9;
+        }
+
+        for(int j = 0; j < hop_size; j++) {
+            CPPUNIT_ASSERT_DOUBLES_EQUAL(exact_synth[j],
+                                         frames[i]->synth()[j], max_error);
+        }
+    }
+}
+
 // ---------------------------------------------------------------------------
 //	TestLorisSynthesis
 // ---------------------------------------------------------------------------
@@ -144,6 +264,70 @@ void TestLorisSynthesis::test_changing_frame_size() {
     ::test_changing_frame_size(&_pd, &_pt, &_synth, &_sf);
 }
 
+void TestLorisSynthesis::test_num_threads() {
+    LorisSynthesis threaded;
+    ::test_num_threads(&_pd, &_pt, &_synth, &threaded, &_sf);
+}
+
+// ---------------------------------------------------------------------------
+//	TestIFFTSynthesis
+// ---------------------------------------------------------------------------
+void TestIFFTSynthesis::setUp() {
+    _sf = SndfileHandle(TEST_AUDIO_FILE);
+
+    if(_sf.error() > 0) {
+        throw Exception(std::string("Could not open audio file: ") +
+                        std::string(TEST_AUDIO_FILE));
+    }
+}
+
+void TestIFFTSynthesis::test_basic() {
+    ::test_basic(&_pd, &_pt, &_synth, &_sf);
+}
+
+void TestIFFTSynthesis::test_changing_frame_size() {
+    ::test_changing_frame_size(&_pd, &_pt, &_synth, &_sf);
+}
+
+void TestIFFTSynthesis::test_sinusoids() {
+    int num_frames = 32;
+    int hop_size = 256;
+    int num_partials = 3;
+    sample amps[] = {0.5, 0.25, 0.1};
+    sample freqs[] = {440.0, 3111.7, 12345.6};
+    sample phases[] = {0.3, -1.2, 2.0};
+
+    _synth.hop_size(hop_size);
+    _synth.max_partials(num_partials);
+    _synth.reset();
+    sample sampling_rate = _synth.sampling_rate();
+
+    // the output is delayed by one hop, so starts from the second frame
+    for(int i = 0; i < num_frames; i++) {
+        Frame frame(hop_size, true);
+        frame.max_partials(num_partials);
+        for(int p = 0; p < num_partials; p++) {
+            sample phase = phases[p] +
+                (2 * M_PI * freqs[p] * i * hop_size) / sampling_rate;
+            frame.add_partial(amps[p], freqs[p], fmod(phase, 2 * M_PI), 0.0);
+        }
+        _synth.synth_frame(&frame);
+
+        if(i < 2) {
+            continue;
+        }
+        for(int j = 0; j < hop_size; j++) {
+            sample t = ((i - 1) * hop_size) + j;
+            sample expected = 0.0;
+            for(int p = 0; p < num_partials; p++) {
+                expected += amps[p] *
+                    cos(phases[p] + (2 * M_PI * freqs[p] * t) / sampling_rate);
+            }
+            CPPUNIT_ASSERT_DOUBLES_EQUAL(expected, frame.synth()[j], 0.01);
+        }
+    }
+}
+
 // ---------------------------------------------------------------------------
 //	TestSMSSynthesis
 // ---------------------------------------------------------------------------
@@ -184,6 +368,16 @@ void TestSMSSynthesis::test_changing_frame_size() {
     ::test_changing_frame_size(&_pd, &_pt, &_synth, &_sf);
 }
 
+void TestSMSSynthesis::test_shared_context() {
+    // destroying other SMS instances must not free the tables
+    // that are still used by this one
+    {
+        SMSPeakDetection pd;
+        SMSSynthesis synth;
+    }
+    ::test_basic(&_pd, &_pt, &_synth, &_sf);
+}
+
 
 // ---------------------------------------------------------------------------
 //	TestSndObjSynthesis
@@ -204,3 +398,8 @@ void TestSndObjSynthesis::test_basic() {
 void TestSndObjSynthesis::test_changing_frame_size() {
     ::test_changing_frame_size(&_pd, &_pt, &_synth, &_sf);
 }
+
+void TestSndObjSynthesis::test_num_threads() {
+    SndObjSynthesis threaded;
+    ::test_num_threads(&_pd, &_pt, &_synth, &threaded, &_sf);
+}
@@ -19,6 +19,8 @@ class TestMQSynthesis : public CPPUNIT_NS::TestCase {
     CPPUNIT_TEST_SUITE(TestMQSynthesis);
     CPPUNIT_TEST(test_basic);
     CPPUNIT_TEST(test_changing_frame_size);
+    CPPUNIT_TEST(test_num_threads);
+    CPPUNIT_TEST(test_oscillator_mode);
     CPPUNIT_TEST_SUITE_END();
 
 public:
@@ -32,6 +34,8 @@ protected:
 
     void test_basic();
     void test_changing_frame_size();
+    void test_num_threads();
+    void test_oscillator_mode();
 };
 
 // ---------------------------------------------------------------------------
@@ -41,6 +45,7 @@ class TestLorisSynthesis : public CPPUNIT_NS::TestCase {
     CPPUNIT_TEST_SUITE(TestLorisSynthesis);
     CPPUNIT_TEST(test_basic);
     CPPUNIT_TEST(test_changing_frame_size);
+    CPPUNIT_TEST(test_num_threads);
     CPPUNIT_TEST_SUITE_END();
 
 public:
@@ -54,6 +59,31 @@ protected:
 
     void test_basic();
     void test_changing_frame_size();
+    void test_num_threads();
+};
+
+// ---------------------------------------------------------------------------
+//	TestIFFTSynthesis
+// ---------------------------------------------------------------------------
+class TestIFFTSynthesis : public CPPUNIT_NS::TestCase {
+    CPPUNIT_TEST_SUITE(TestIFFTSynthesis);
+    CPPUNIT_TEST(test_basic);
+    CPPUNIT_TEST(test_changing_frame_size);
+    CPPUNIT_TEST(test_sinusoids);
+    CPPUNIT_TEST_SUITE_END();
+
+public:
+    void setUp();
+
+protected:
+    MQPeakDetection _pd;
+    MQPartialTracking _pt;
+    IFFTSynthesis _synth;
+    SndfileHandle _sf;
+
+    void test_basic();
+    void test_changing_frame_size();
+    void test_sinusoids();
 };
 
 // ---------------------------------------------------------------------------
@@ -63,6 +93,7 @@ class TestSMSSynthesis : public CPPUNIT_NS::TestCase {
     CPPUNIT_TEST_SUITE(TestSMSSynthesis);
     CPPUNIT_TEST(test_basic);
     CPPUNIT_TEST(test_changing_frame_size);
+    CPPUNIT_TEST(test_shared_context);
     CPPUNIT_TEST_SUITE_END();
 
 public:
@@ -78,6 +109,7 @@ protected:
 
     void test_basic();
     void test_changing_frame_size();
+    void test_shared_context();
 };
 
 
@@ -88,6 +120,7 @@ class TestSndObjSynthesis : public CPPUNIT_NS::TestCase {
     CPPUNIT_TEST_SUITE(TestSndObjSynthesis);
     CPPUNIT_TEST(test_basic);
     CPPUNIT_TEST(test_changing_frame_size);
+    CPPUNIT_TEST(test_num_threads);
     CPPUNIT_TEST_SUITE_END();
 
 public:
@@ -102,6 +135,7 @@ protected:
 
     void test_basic();
     void test_changing_frame_size();
+    void test_num_threads();
 };
 
 } // end of namespace simpl
@@ -10,16 +10,21 @@
 
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestPeak);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestFrame);
+CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestFrameSet);
+CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestTrackIndex);
+CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestWindowCache);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestMQPeakDetection);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestSndObjPeakDetection);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestTWM);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestLorisPeakDetection);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestMQPartialTracking);
+CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestOfflinePartialTracking);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestSMSPartialTracking);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestSndObjPartialTracking);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestLorisPartialTracking);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestMQSynthesis);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestLorisSynthesis);
+CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestIFFTSynthesis);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestSMSSynthesis);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestSndObjSynthesis);
 CPPUNIT_TEST_SUITE_REGISTRATION(simpl::TestSMSResidual);